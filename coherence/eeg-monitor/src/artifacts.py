@@ -0,0 +1,208 @@
+"""
+Streaming Artifact Detector
+Flags amplitude, step, muscle and flat-line artifacts on filtered EEG
+chunks as they arrive, as per-epoch masks for rejecting analysis windows
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+# Artifact flag bits (combined per sample and per epoch)
+AMPLITUDE = 1   # |x| > max_amplitude: blinks, electrode pops
+DERIVATIVE = 2  # |x[n] - x[n-1]| > max_derivative: movement
+VARIANCE = 4    # rolling variance > max_variance: jaw clench, muscle
+FLAT = 8        # rolling std < min_amplitude: electrode off, saturated
+
+FLAG_NAMES = {AMPLITUDE: 'amplitude', DERIVATIVE: 'derivative', VARIANCE: 'variance', FLAT: 'flat'}
+
+
+class ArtifactDetector:
+    """
+    Per-channel artifact flags for a filtered (samples x channels) stream.
+
+    Every chunk is processed once, for all channels at once, with O(1)
+    work per sample: amplitude and sample-to-sample step thresholds, and a
+    rolling variance over `variance_window` seconds kept as running sums
+    of x and x² (each new sample adds its terms, the sample leaving the
+    window subtracts its own). A variance flag marks the sample ending the
+    window, so it trails the burst by up to `variance_window`.
+
+    Sample flags are OR-ed into epochs of `epoch_duration` seconds, aligned
+    to the absolute sample count (epoch k covers samples [kE, (k+1)E)), and
+    kept in a ring covering `muse.buffer_duration`. window_flags() tells a
+    consumer whether any epoch overlapping a window is contaminated.
+
+    The detector must see every sample written to the ring it describes,
+    in order, so its sample count matches the ring's.
+    """
+
+    RESYNC_INTERVAL = 1 << 16  # samples between exact recomputations of the running sums
+
+    def __init__(self, config: Dict, channels: Optional[int] = None):
+        """
+        Initialize the detector.
+
+        Args:
+            config: Configuration dictionary (muse and
+                    signal_processing.artifacts)
+            channels: Number of channels (defaults to muse.channel_count)
+        """
+        muse_config = config['muse']
+        artifacts = config.get('signal_processing', {}).get('artifacts', {})
+        self.sample_rate = muse_config['sample_rate']
+        self.channels = channels or muse_config['channel_count']
+
+        self.enabled = artifacts.get('enabled', True)
+        self.max_amplitude = artifacts.get('max_amplitude', 200)
+        self.min_amplitude = artifacts.get('min_amplitude', 0.1)
+        self.max_derivative = artifacts.get('max_derivative', 50)
+        self.max_variance = artifacts.get('max_variance', 500)
+        self.window = max(2, int(round(artifacts.get('variance_window', 0.5) * self.sample_rate)))
+        self.epoch_samples = max(1, int(round(artifacts.get('epoch_duration', 0.25) * self.sample_rate)))
+
+        buffer_samples = int(muse_config.get('buffer_duration', 30) * self.sample_rate)
+        self._epochs = np.zeros((buffer_samples // self.epoch_samples + 2, self.channels), dtype=np.uint8)
+
+        # Flags counted per type (epochs flagged, per channel)
+        self.epochs_flagged = {name: np.zeros(self.channels, dtype=np.int64) for name in FLAG_NAMES.values()}
+        self.samples_processed = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the rolling state (e.g. after a gap); the sample count continues."""
+        self._history = np.zeros((self.window, self.channels))
+        self._sum = np.zeros(self.channels)
+        self._sum_squares = np.zeros(self.channels)
+        self._filled = 0
+        self._last = None
+        self._since_resync = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Flag the next chunk.
+
+        Args:
+            samples: Filtered chunk of shape (n, channels), µV
+
+        Returns:
+            Per-sample flag bits, shape (n, channels), uint8
+        """
+        n = len(samples)
+        if n == 0 or not self.enabled:
+            self.samples_processed += n
+            return np.zeros((n, self.channels), dtype=np.uint8)
+
+        x = np.asarray(samples, dtype=np.float64)
+        flags = np.where(np.abs(x) > self.max_amplitude, AMPLITUDE, 0).astype(np.uint8)
+
+        previous = x[:1] if self._last is None else self._last[None]
+        steps = np.abs(np.diff(x, axis=0, prepend=previous))
+        flags |= np.where(steps > self.max_derivative, DERIVATIVE, 0).astype(np.uint8)
+        self._last = x[-1].copy()
+
+        # Rolling variance: running sums updated with (entering - leaving)
+        extended = np.concatenate((self._history, x))
+        leaving = extended[:n]
+        sums = self._sum + np.cumsum(x - leaving, axis=0)
+        sum_squares = self._sum_squares + np.cumsum(x * x - leaving * leaving, axis=0)
+        self._history = extended[n:]
+        self._since_resync += n
+        if self._since_resync >= self.RESYNC_INTERVAL:  # bound floating point drift
+            self._since_resync = 0
+            sums[-1] = self._history.sum(axis=0)
+            sum_squares[-1] = (self._history ** 2).sum(axis=0)
+        self._sum, self._sum_squares = sums[-1].copy(), sum_squares[-1].copy()
+
+        counts = np.minimum(self._filled + np.arange(1, n + 1), self.window)[:, None]
+        self._filled = min(self._filled + n, self.window)
+        variance = np.maximum(sum_squares / counts - (sums / counts) ** 2, 0.0)
+        full = counts >= self.window  # judge variance only over a full window
+        flags |= np.where(full & (variance > self.max_variance), VARIANCE, 0).astype(np.uint8)
+        flags |= np.where(full & (variance < self.min_amplitude ** 2), FLAT, 0).astype(np.uint8)
+
+        self._update_epochs(flags)
+        return flags
+
+    def _update_epochs(self, flags: np.ndarray) -> None:
+        """OR sample flags into their epochs (the current epoch may be partial)."""
+        start = self.samples_processed
+        end = start + len(flags)
+        first_epoch = start // self.epoch_samples
+        last_epoch = (end - 1) // self.epoch_samples
+
+        # Chunk offsets where each epoch starts
+        boundaries = np.arange(first_epoch, last_epoch + 1) * self.epoch_samples - start
+        boundaries[0] = 0
+        per_epoch = np.bitwise_or.reduceat(flags, boundaries, axis=0)
+
+        capacity = len(self._epochs)
+        for offset, epoch in enumerate(range(first_epoch, last_epoch + 1)):
+            slot = epoch % capacity
+            if epoch * self.epoch_samples >= start:  # epoch starts in this chunk: clear the old slot
+                self._epochs[slot] = per_epoch[offset]
+            else:
+                self._epochs[slot] |= per_epoch[offset]
+            if (epoch + 1) * self.epoch_samples <= end:  # epoch complete: count it
+                for bit, name in FLAG_NAMES.items():
+                    self.epochs_flagged[name] += (self._epochs[slot] & bit) > 0
+
+        self.samples_processed = end
+
+    def window_flags(self, start: int, end: int) -> np.ndarray:
+        """
+        Artifact flags of a window, per channel.
+
+        Args:
+            start: First sample (absolute sample count)
+            end: Sample count after the last sample
+
+        Returns:
+            Flag bits OR-ed over every epoch overlapping [start, end),
+            shape (channels,), uint8 (zeros if disabled)
+        """
+        if not self.enabled or end <= start:
+            return np.zeros(self.channels, dtype=np.uint8)
+
+        first = start // self.epoch_samples
+        last = (min(end, self.samples_processed) - 1) // self.epoch_samples
+        capacity = len(self._epochs)
+        first = max(first, last - capacity + 2)  # older epochs were overwritten
+        slots = np.arange(first, last + 1) % capacity
+        return np.bitwise_or.reduce(self._epochs[slots], axis=0)
+
+    @staticmethod
+    def describe(flags: np.ndarray, channel_names: List[str]) -> Dict[str, List[str]]:
+        """
+        Name the artifacts in a per-channel flag array.
+
+        Args:
+            flags: Flag bits per channel
+            channel_names: Channel names
+
+        Returns:
+            Dictionary of channel name -> artifact names, for flagged channels
+        """
+        return {
+            channel: [name for bit, name in FLAG_NAMES.items() if value & bit]
+            for channel, value in zip(channel_names, flags.tolist()) if value
+        }
+
+    def get_stats(self) -> Dict:
+        """
+        Get detector statistics.
+
+        Returns:
+            Dictionary with samples processed and flagged epochs per
+            artifact type (per channel)
+        """
+        return {
+            'enabled': self.enabled,
+            'samples_processed': self.samples_processed,
+            'epochs_flagged': {name: counts.tolist() for name, counts in self.epochs_flagged.items()}
+        }
@@ -0,0 +1,253 @@
+"""
+Band Power Engine
+Streaming delta-gamma band powers for all channels from overlapped EEG
+windows, as BandPowers for NeurofeedbackProtocol.calculate_metrics
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.fft import rfft, rfftfreq
+
+try:
+    from .artifacts import ArtifactDetector
+    from .protocols.band_powers import BandPowers
+    from .sample_ring import SampleRing
+except ImportError:
+    from artifacts import ArtifactDetector
+    from protocols.band_powers import BandPowers
+    from sample_ring import SampleRing
+
+
+logger = logging.getLogger(__name__)
+
+
+class BandPowerEngine:
+    """
+    Band powers for every channel from windows of a SampleRing.
+
+    Windows are `signal_processing.window_duration` seconds long and start
+    every hop = window_duration * (1 - overlap) seconds. Each hop costs one
+    rfft over a (samples x channels) block:
+
+    - Remove each channel's mean, apply the cached Hann window
+    - One-sided PSD (µV²/Hz), scaled as scipy.signal.periodogram
+    - Band powers for all bands and channels at once, as differences of
+      the PSD's cumulative sum at cached band edges (bands may overlap)
+
+    Band powers are absolute (µV²), returned as BandPowers (channels x
+    bands, in BandPowers.BANDS order).
+
+    With an ArtifactDetector over the same ring, windows overlapping any
+    flagged epoch are rejected before the FFT (see poll), so contaminated
+    data never reaches protocol scoring.
+
+    Other consumers of the per-hop spectrum (e.g. SignalQualityMonitor)
+    register with add_spectrum_consumer() instead of running their own
+    FFT; they receive every window's spectrum, rejected windows included.
+    """
+
+    def __init__(self, config: Dict, ring: Optional[SampleRing] = None,
+                 artifacts: Optional[ArtifactDetector] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            config: Configuration dictionary
+            ring: Sample ring to read windows from (needed for poll/stream)
+            artifacts: Detector screening the same ring (windows with
+                       artifacts are rejected if artifacts.reject_windows)
+
+        Raises:
+            ValueError: If the window, overlap or bands are invalid, or the
+                        channels or bands do not cover BandPowers' layout
+        """
+        muse_config = config['muse']
+        processing = config['signal_processing']
+
+        self.sample_rate = muse_config['sample_rate']
+        self.channel_names: List[str] = list(muse_config['channel_names'])
+        self.band_names: List[str] = list(processing['bands'])
+        self.update_interval = config.get('protocols', {}).get('update_interval', 1.0)
+        self.ring = ring
+        self.artifacts = artifacts
+        self.reject_windows = processing.get('artifacts', {}).get('reject_windows', True)
+        self._spectrum_consumers: List[Callable[[np.ndarray, int, Optional[np.ndarray]], None]] = []
+
+        self.window_samples = int(round(processing['window_duration'] * self.sample_rate))
+        overlap = processing.get('overlap', 0.5)
+        if not (0 <= overlap < 1):
+            raise ValueError(f"signal_processing.overlap must be in [0, 1), got {overlap}")
+        self.hop_samples = max(1, int(round(self.window_samples * (1 - overlap))))
+
+        # Cached window, PSD scaling and band edges (bin indices)
+        n = self.window_samples
+        self._window = np.hanning(n + 1)[:-1][:, None]  # periodic Hann
+        self.freqs = rfftfreq(n, 1 / self.sample_rate)
+        self.frequency_resolution = self.sample_rate / n
+        scale = np.full(len(self.freqs), 2.0 / (self.sample_rate * float(np.sum(self._window ** 2))))
+        scale[0] /= 2
+        if n % 2 == 0:
+            scale[-1] /= 2
+        self._scale = (scale * self.frequency_resolution)[:, None]  # PSD x bin width
+
+        self._band_starts, self._band_stops = self._band_edges(processing['bands'])
+
+        # Rows of band_power_matrix in BandPowers column order
+        missing = [band for band in BandPowers.BANDS if band not in self.band_names]
+        if missing:
+            raise ValueError(f"signal_processing.bands is missing {missing}")
+        if tuple(self.channel_names) != BandPowers.CHANNELS:
+            raise ValueError(f"muse.channel_names must be {list(BandPowers.CHANNELS)}")
+        self._band_order = [self.band_names.index(band) for band in BandPowers.BANDS]
+        self._last_end = 0
+        self.hops_computed = 0
+        self.windows_rejected = 0
+        self.last_rejection: Optional[Dict[str, List[str]]] = None  # channel -> artifact names
+
+    def _band_edges(self, bands: Dict[str, List[float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bin index ranges [start, stop) of each band (low <= f < high).
+
+        Raises:
+            ValueError: If a band is empty or beyond the Nyquist frequency
+        """
+        starts, stops = [], []
+        nyquist = self.sample_rate / 2
+        for name, (low, high) in bands.items():
+            if not (0 <= low < high <= nyquist):
+                raise ValueError(f"Band '{name}' must satisfy 0 <= low < high <= {nyquist} Hz")
+            start = int(np.searchsorted(self.freqs, low, side='left'))
+            stop = int(np.searchsorted(self.freqs, high, side='left'))
+            if stop <= start:
+                raise ValueError(
+                    f"Band '{name}' ({low}-{high} Hz) is narrower than the "
+                    f"{self.frequency_resolution:.2f} Hz frequency resolution"
+                )
+            starts.append(start)
+            stops.append(stop)
+        return np.array(starts), np.array(stops)
+
+    def add_spectrum_consumer(self, consumer: Callable[[np.ndarray, int, Optional[np.ndarray]], None]) -> None:
+        """
+        Share each hop's spectrum with another component.
+
+        Args:
+            consumer: Called as consumer(power, end, flags) for every
+                      window: power per bin (µV², shape (bins, channels),
+                      frequencies in self.freqs), the window's end sample
+                      count, and its artifact flags per channel (or None
+                      without a detector)
+        """
+        self._spectrum_consumers.append(consumer)
+
+    def power_spectrum(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Power per frequency bin of one window.
+
+        Args:
+            samples: Window of shape (window_samples, channels), µV
+
+        Returns:
+            Array of shape (len(self.freqs), channels): one-sided PSD
+            times bin width (µV² per bin), summing to the window's variance
+        """
+        x = np.asarray(samples, dtype=np.float64)
+        x = (x - x.mean(axis=0)) * self._window
+        spectrum = rfft(x, axis=0)
+        return (spectrum.real ** 2 + spectrum.imag ** 2) * self._scale
+
+    def _band_sums(self, power: np.ndarray) -> np.ndarray:
+        """Band powers from a power spectrum, shape (bands, channels)."""
+        # Cumulative sum with a leading zero row: band = cum[stop] - cum[start]
+        cumulative = np.empty((len(power) + 1, power.shape[1]))
+        cumulative[0] = 0.0
+        np.cumsum(power, axis=0, out=cumulative[1:])
+        return cumulative[self._band_stops] - cumulative[self._band_starts]
+
+    def band_power_matrix(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Band powers of one window.
+
+        Args:
+            samples: Window of shape (window_samples, channels), µV
+
+        Returns:
+            Array of shape (bands, channels), µV²
+        """
+        return self._band_sums(self.power_spectrum(samples))
+
+    def compute(self, samples: np.ndarray, timestamp: Optional[float] = None) -> BandPowers:
+        """
+        Band powers of one window, as protocol input.
+
+        Args:
+            samples: Window of shape (window_samples, channels), µV
+            timestamp: Time of the window's last sample
+
+        Returns:
+            BandPowers (use to_dict() for JSON messages)
+        """
+        matrix = self.band_power_matrix(samples)
+        return BandPowers(matrix[self._band_order].T, timestamp)
+
+    def poll(self) -> Optional[BandPowers]:
+        """
+        Compute band powers if a hop has completed since the last call.
+
+        Windows end on the hop grid (every hop_samples since the first full
+        window). If several hops completed, only the newest is computed.
+        A window with artifacts on any channel is rejected (counted in
+        windows_rejected, described in last_rejection).
+
+        Returns:
+            BandPowers (see compute), or None if no new hop or the window
+            was rejected
+        """
+        written = self.ring.written
+        if written < self.window_samples:
+            return None
+
+        end = written - (written - self.window_samples) % self.hop_samples
+        if end == self._last_end:
+            return None
+        self._last_end = end
+
+        flags = None
+        if self.artifacts is not None:
+            flags = self.artifacts.window_flags(end - self.window_samples, end)
+        rejected = self.reject_windows and flags is not None and bool(flags.any())
+        if rejected:
+            self.windows_rejected += 1
+            self.last_rejection = self.artifacts.describe(flags, self.channel_names)
+            if not self._spectrum_consumers:
+                return None  # nobody needs this window's spectrum
+
+        samples, timestamps = self.ring.latest(self.window_samples, end=end)
+        power = self.power_spectrum(samples)
+        for consumer in self._spectrum_consumers:
+            consumer(power, end, flags)
+        if rejected:
+            return None
+
+        self.hops_computed += 1
+        return BandPowers(self._band_sums(power)[self._band_order].T, float(timestamps[-1]))
+
+    async def stream(self, on_band_powers: Callable[[BandPowers], Awaitable[None]]) -> None:
+        """
+        Emit band powers every `protocols.update_interval` seconds.
+
+        Args:
+            on_band_powers: Coroutine called with each new BandPowers
+        """
+        while True:
+            try:
+                band_powers = self.poll()
+                if band_powers is not None:
+                    await on_band_powers(band_powers)
+            except Exception as e:
+                logger.error(f"Error computing band powers: {e}", exc_info=True)
+
+            await asyncio.sleep(self.update_interval)
@@ -0,0 +1,139 @@
+"""
+Streaming EEG Filters
+Bandpass and notch filtering of multichannel EEG chunk by chunk, with the
+filter state carried across chunks
+"""
+
+import functools
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+from scipy import signal
+
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=16)
+def design_filter(sample_rate: float,
+                  bandpass: Optional[tuple] = None,
+                  notch: Optional[tuple] = None) -> np.ndarray:
+    """
+    Design the bandpass + notch cascade as second-order sections.
+
+    Designs are cached per sample rate and settings, so every filter built
+    from the same configuration shares one coefficient array (do not
+    modify it).
+
+    Args:
+        sample_rate: Sample rate (Hz)
+        bandpass: (low_cutoff, high_cutoff, order) of a Butterworth bandpass,
+                  or None
+        notch: (frequency, quality_factor) of an IIR notch, or None
+
+    Returns:
+        SOS array of shape (sections, 6), shared between callers; empty if
+        no filter is enabled
+
+    Raises:
+        ValueError: If a cutoff or notch frequency is outside (0, Nyquist)
+    """
+    nyquist = sample_rate / 2
+    sections = []
+
+    if bandpass is not None:
+        low, high, order = bandpass
+        if not (0 < low < high < nyquist):
+            raise ValueError(f"Bandpass {low}-{high} Hz must lie within (0, {nyquist}) Hz")
+        sections.append(signal.butter(order, [low, high], btype='bandpass', fs=sample_rate, output='sos'))
+
+    if notch is not None:
+        frequency, quality = notch
+        if not (0 < frequency < nyquist):
+            raise ValueError(f"Notch at {frequency} Hz must lie within (0, {nyquist}) Hz")
+        b, a = signal.iirnotch(frequency, quality, fs=sample_rate)
+        sections.append(signal.tf2sos(b, a))
+
+    return np.vstack(sections) if sections else np.empty((0, 6))
+
+
+class StreamingFilter:
+    """
+    Bandpass + notch filter for (samples x channels) EEG chunks.
+
+    Each chunk is filtered once, as it arrives: the per-channel SOS state
+    (`zi`, shape (sections, 2, channels)) is carried from one chunk to the
+    next, so the output is identical to filtering the whole recording at
+    once and chunk boundaries leave no trace. On the first chunk (and after
+    reset()) the state is set to the filter's steady state for that
+    chunk's first sample, so the large electrode DC offset does not ring
+    through the highpass.
+
+    Consumers read overlapping windows of the already filtered signal
+    instead of refiltering each window.
+    """
+
+    def __init__(self, config: Dict, channels: Optional[int] = None):
+        """
+        Initialize the filter.
+
+        Args:
+            config: Configuration dictionary (muse.sample_rate and
+                    signal_processing.bandpass/notch)
+            channels: Number of channels (defaults to muse.channel_count)
+
+        Raises:
+            ValueError: If the filter settings are invalid
+        """
+        self.sample_rate = config['muse']['sample_rate']
+        self.channels = channels or config['muse']['channel_count']
+        processing = config.get('signal_processing', {})
+
+        bandpass_config = processing.get('bandpass', {})
+        bandpass = None
+        if bandpass_config.get('enabled', False):
+            bandpass = (float(bandpass_config['low_cutoff']), float(bandpass_config['high_cutoff']),
+                        int(bandpass_config.get('order', 4)))
+
+        notch_config = processing.get('notch', {})
+        notch = None
+        if notch_config.get('enabled', False):
+            notch = (float(notch_config['frequency']), float(notch_config.get('quality_factor', 30)))
+
+        self.sos = design_filter(float(self.sample_rate), bandpass, notch)
+        # Unit steady state per section, scaled by the first sample on start
+        self._zi_unit = signal.sosfilt_zi(self.sos)[:, :, None] if len(self.sos) else None
+        self._zi: Optional[np.ndarray] = None
+        self.samples_filtered = 0
+
+    @property
+    def enabled(self) -> bool:
+        """True if any filter section is configured."""
+        return len(self.sos) > 0
+
+    def reset(self) -> None:
+        """Forget the filter state (e.g. after a gap in the stream)."""
+        self._zi = None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Filter the next chunk in place.
+
+        Args:
+            samples: Float array of shape (n, channels), oldest first;
+                     overwritten with the filtered signal
+
+        Returns:
+            The same array
+        """
+        n = len(samples)
+        if n == 0 or not self.enabled:
+            return samples
+
+        if self._zi is None:
+            self._zi = self._zi_unit * samples[0]
+
+        samples[...], self._zi = signal.sosfilt(self.sos, samples, axis=0, zi=self._zi)
+        self.samples_filtered += n
+        return samples
@@ -0,0 +1,349 @@
+"""
+Muse Headset Interface
+Discovers the Muse 2 EEG stream via LSL (muselsl) and acquires it in
+chunks on a background thread into a preallocated ring buffer
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    from pylsl import StreamInlet, cf_double64, local_clock, proc_clocksync, resolve_byprop
+    PYLSL_AVAILABLE = True
+except ImportError:
+    PYLSL_AVAILABLE = False
+
+try:
+    from .artifacts import ArtifactDetector
+    from .filters import StreamingFilter
+    from .sample_ring import SampleReader, SampleRing, TimestampDejitterer
+except ImportError:
+    from artifacts import ArtifactDetector
+    from filters import StreamingFilter
+    from sample_ring import SampleReader, SampleRing, TimestampDejitterer
+
+
+logger = logging.getLogger(__name__)
+
+
+def lsl_clock_offset(lsl_local_clock: Callable[[], float], clock: Callable[[], float] = time.time,
+                     probes: int = 5) -> float:
+    """
+    Measure the offset from the LSL clock to a local clock in this process.
+
+    Sample timestamps (after proc_clocksync) are in pylsl.local_clock()
+    time; adding this offset maps them onto `clock`. Each probe brackets one
+    LSL clock read between two local reads, and the tightest bracket wins.
+
+    Args:
+        lsl_local_clock: pylsl.local_clock
+        clock: Target clock (time.time, the clock of message timestamps)
+        probes: Number of bracketed reads
+
+    Returns:
+        Seconds to add to LSL local-clock times
+    """
+    best_span = float('inf')
+    best_offset = 0.0
+
+    for _ in range(probes):
+        before = clock()
+        lsl_time = lsl_local_clock()
+        after = clock()
+        if after - before < best_span:
+            best_span = after - before
+            best_offset = (before + after) / 2 - lsl_time
+
+    return best_offset
+
+
+class MuseHeadset:
+    """
+    Interface for the Muse 2 headset's LSL stream.
+
+    A background thread pulls whole chunks with `inlet.pull_chunk` straight
+    into a preallocated array (no per-sample Python objects), dejitters
+    their timestamps and appends them to a SampleRing sized for
+    `muse.buffer_duration` seconds. The blocking pull releases the GIL, so
+    the event loop is not held up while waiting for data.
+
+    Each chunk is also bandpass/notch filtered once on arrival (see
+    StreamingFilter) into a second ring, `filtered_ring`, so windowed
+    consumers never refilter overlapping data. The filtered chunk is also
+    screened by an ArtifactDetector, whose per-epoch masks line up with
+    filtered_ring's sample count.
+
+    Consumers read without copying:
+    - latest(seconds, filtered): views of the newest window (e.g. for
+      band powers)
+    - reader(filtered=...): a cursor returning each new sample once,
+      counting samples it fell too far behind to see
+    """
+
+    def __init__(self, config: Dict):
+        """
+        Initialize the headset interface.
+
+        Args:
+            config: Configuration dictionary
+        """
+        muse_config = config['muse']
+        self.stream_type = muse_config['stream_type']
+        self.connection_timeout = muse_config['connection_timeout']
+        self.reconnect_delay = muse_config['reconnect_delay']
+        self.max_reconnect_attempts = muse_config['max_reconnect_attempts']
+
+        self.sample_rate = muse_config['sample_rate']
+        self.channel_names = list(muse_config['channel_names'])
+        self.channel_count = muse_config['channel_count']
+
+        # Acquisition settings
+        self.pull_timeout = muse_config.get('pull_timeout', 0.02)
+        self.stall_timeout = muse_config.get('stall_timeout', 2.0)
+        buffer_duration = muse_config.get('buffer_duration', 30)
+        self.max_chunk = muse_config.get('max_chunk', 1024)
+
+        self.ring = SampleRing(int(buffer_duration * self.sample_rate), self.channel_count)
+        self.filtered_ring = SampleRing(self.ring.capacity, self.channel_count)
+        self.filter = StreamingFilter(config, self.channel_count)
+        self.artifacts = ArtifactDetector(config, self.channel_count)
+        self.dejitterer = TimestampDejitterer(self.sample_rate, muse_config.get('dejitter_half_life', 90))
+
+        self.inlet = None
+        self.stream_name: Optional[str] = None
+        # Seconds from LSL sample timestamps to Unix time (set on connect)
+        self.clock_offset: Optional[float] = None
+        self.is_connected = False
+        self.reconnect_count = 0
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # Statistics (written by the acquisition thread)
+        self.chunks_received = 0
+        self.samples_received = 0
+        self.stalls = 0
+        self.last_sample_time: Optional[float] = None  # time.monotonic()
+
+    async def connect(self) -> bool:
+        """
+        Discover the Muse LSL stream and start acquisition.
+
+        Returns:
+            True if a stream was found and acquisition started
+        """
+        if not PYLSL_AVAILABLE:
+            logger.error("pylsl is not installed (pip install pylsl)")
+            return False
+
+        logger.info(f"Looking for an LSL '{self.stream_type}' stream...")
+        loop = asyncio.get_running_loop()
+        try:
+            streams = await loop.run_in_executor(
+                None, lambda: resolve_byprop('type', self.stream_type, timeout=self.connection_timeout)
+            )
+            if not streams:
+                logger.error(
+                    f"No LSL '{self.stream_type}' stream found. "
+                    f"Is 'muselsl stream' running and the headset on?"
+                )
+                return False
+
+            info = streams[0]
+            if info.channel_count() < self.channel_count:
+                logger.error(
+                    f"Stream '{info.name()}' has {info.channel_count()} channels, "
+                    f"expected at least {self.channel_count}"
+                )
+                return False
+
+            # proc_clocksync maps timestamps onto this machine's LSL clock
+            inlet = StreamInlet(info, max_buflen=60, processing_flags=proc_clocksync)
+            await loop.run_in_executor(None, inlet.open_stream, self.connection_timeout)
+
+        except Exception as e:
+            logger.error(f"LSL connection error: {e}", exc_info=True)
+            return False
+
+        self.stream_name = info.name()
+        self.clock_offset = lsl_clock_offset(local_clock)
+        dtype = np.float64 if info.channel_format() == cf_double64 else np.float32
+        self.start_acquisition(inlet, info.channel_count(), dtype)
+        self.is_connected = True
+        self.reconnect_count = 0
+        logger.info(f"Connected to '{self.stream_name}' ({info.nominal_srate():.0f} Hz, "
+                    f"{info.channel_count()} channels)")
+        return True
+
+    def start_acquisition(self, inlet, stream_channels: int, dtype=np.float32) -> None:
+        """
+        Start the background acquisition thread on an open inlet.
+
+        Args:
+            inlet: pylsl StreamInlet (or anything with the same pull_chunk)
+            stream_channels: Channels in the stream (muselsl adds an AUX
+                             channel after the four EEG channels)
+            dtype: Sample type matching the stream's channel format
+        """
+        self.stop_acquisition()
+        self.inlet = inlet
+        self._chunk = np.zeros((self.max_chunk, stream_channels), dtype=dtype)
+        self._filter_buffer = np.zeros((self.max_chunk, self.channel_count))
+        self.dejitterer.reset()
+        self.filter.reset()
+        self.artifacts.reset()
+        self.last_sample_time = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._acquire, name='muse-acquisition', daemon=True)
+        self._thread.start()
+
+    def stop_acquisition(self) -> None:
+        """Stop the acquisition thread (waits for the current pull)."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=self.pull_timeout + 1.0)
+            self._thread = None
+
+    def _acquire(self) -> None:
+        """Acquisition thread: pull chunks into the ring until stopped."""
+        chunk = self._chunk  # pull_chunk fills it in place
+        filter_buffer = self._filter_buffer
+        stalled = False
+        gaps = self.dejitterer.gaps
+
+        while not self._stop.is_set():
+            try:
+                _, timestamps = self.inlet.pull_chunk(
+                    timeout=self.pull_timeout, max_samples=self.max_chunk, dest_obj=chunk
+                )
+            except Exception as e:
+                logger.error(f"LSL stream lost: {e}")
+                self.is_connected = False
+                return
+
+            n = len(timestamps)
+            now = time.monotonic()
+            if n == 0:
+                if not stalled and now - self.last_sample_time > self.stall_timeout:
+                    stalled = True
+                    self.stalls += 1
+                    logger.warning(f"No EEG samples for {self.stall_timeout:.0f}s (headset off or out of range?)")
+                continue
+            stalled = False
+
+            samples = chunk[:n, :self.channel_count]
+            timestamps = self.dejitterer.process(timestamps)
+            self.ring.write(samples, timestamps)
+
+            if self.dejitterer.gaps != gaps:  # samples were lost: restart the filter
+                gaps = self.dejitterer.gaps
+                self.filter.reset()
+                self.artifacts.reset()
+            filtered = filter_buffer[:n]
+            filtered[...] = samples
+            self.filter.process(filtered)
+            self.artifacts.process(filtered)  # flags are in place before the samples are published
+            self.filtered_ring.write(filtered, timestamps)
+
+            self.chunks_received += 1
+            self.samples_received += n
+            self.last_sample_time = now
+
+    def latest(self, seconds: float, filtered: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the newest samples as zero-copy views.
+
+        Args:
+            seconds: Window length
+            filtered: Read the bandpass/notch filtered signal instead of raw
+
+        Returns:
+            Tuple of (samples of shape (n, channels) in µV, dejittered
+            timestamps); shorter than requested until enough has arrived
+        """
+        ring = self.filtered_ring if filtered else self.ring
+        return ring.latest_seconds(seconds, self.sample_rate)
+
+    def reader(self, from_start: bool = False, filtered: bool = False) -> SampleReader:
+        """
+        Create a cursor that returns each newly acquired sample once.
+
+        Args:
+            from_start: Start at the oldest buffered sample
+            filtered: Read the bandpass/notch filtered signal instead of raw
+
+        Returns:
+            New SampleReader over the ring
+        """
+        ring = self.filtered_ring if filtered else self.ring
+        return ring.reader(from_start)
+
+    async def disconnect(self) -> None:
+        """Stop acquisition and close the LSL inlet."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.stop_acquisition)
+        if self.inlet is not None:
+            try:
+                if hasattr(self.inlet, 'close_stream'):
+                    self.inlet.close_stream()
+                logger.info("Disconnected from Muse stream")
+            except Exception as e:
+                logger.warning(f"Disconnect warning: {e}")
+            finally:
+                self.inlet = None
+        self.is_connected = False
+
+    async def maintain_connection(self) -> None:
+        """
+        Maintain connection with auto-reconnect.
+
+        Reconnects if the stream is lost or stops delivering samples.
+        """
+        while True:
+            stalled = (
+                self.is_connected and self.last_sample_time is not None
+                and time.monotonic() - self.last_sample_time > 3 * self.stall_timeout
+            )
+            if stalled:
+                logger.warning("EEG stream stalled, reconnecting")
+                await self.disconnect()
+
+            if not self.is_connected:
+                if self.reconnect_count < self.max_reconnect_attempts:
+                    self.reconnect_count += 1
+                    logger.info(f"Attempting to reconnect ({self.reconnect_count}/{self.max_reconnect_attempts})...")
+                    if await self.connect():
+                        logger.info("Reconnection successful")
+                    else:
+                        await asyncio.sleep(self.reconnect_delay)
+                else:
+                    logger.error(f"Max reconnect attempts ({self.max_reconnect_attempts}) reached")
+                    break
+
+            await asyncio.sleep(1)
+
+    def get_status(self) -> Dict:
+        """
+        Get connection and acquisition status.
+
+        Returns:
+            Dictionary with connection information and acquisition counters
+        """
+        return {
+            'connected': self.is_connected,
+            'stream_name': self.stream_name,
+            'reconnect_count': self.reconnect_count,
+            'sample_rate': self.sample_rate,
+            'effective_sample_rate': self.dejitterer.effective_rate,
+            'samples_received': self.samples_received,
+            'chunks_received': self.chunks_received,
+            'buffered_seconds': len(self.ring) / self.sample_rate,
+            'timestamp_gaps': self.dejitterer.gaps,
+            'artifacts': self.artifacts.get_stats(),
+            'stalls': self.stalls
+        }
@@ -0,0 +1,526 @@
+"""
+Muse LSL Simulator
+Publishes a Muse 2 shaped LSL stream (as muselsl does) from synthetic EEG
+or a replayed recording, for testing without a headset
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import signal
+
+try:
+    from pylsl import StreamInfo, StreamOutlet, local_clock
+    PYLSL_AVAILABLE = True
+except ImportError:
+    PYLSL_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+
+AUX_CHANNEL = 'Right AUX'  # muselsl's fifth channel
+
+# Pink (1/f) noise from white noise: 3-pole approximation (Kellet's pinking filter)
+PINK_B = np.array([0.049922035, -0.095993537, 0.050612699, -0.004408786])
+PINK_A = np.array([1.0, -2.494956002, 2.017265875, -0.522189400])
+
+
+class SyntheticEEG:
+    """
+    Synthetic Muse 2 EEG, generated in chunks of any size.
+
+    Each channel is pink background noise plus an alpha and a theta
+    rhythm (alpha strongest at the temporal sites TP9/TP10, theta at the
+    frontal sites AF7/AF8), mains line noise and, at random (Poisson)
+    times, eye blinks: half-second bumps on the frontal channels.
+    Output depends only on the seed and the sample index, never on the
+    chunk sizes requested. Amplitudes are attributes and can be changed
+    while streaming (e.g. to step alpha up and down).
+    """
+
+    CHANNEL_WEIGHTS = {  # (alpha, theta, blink) per channel, Muse 2 order
+        'TP9': (1.0, 0.5, 0.1),
+        'AF7': (0.5, 1.0, 1.0),
+        'AF8': (0.5, 1.0, 1.0),
+        'TP10': (1.0, 0.5, 0.1),
+    }
+    BLINK_DURATION = 0.5  # seconds
+
+    def __init__(self, sample_rate: float = 256, channel_names: Optional[List[str]] = None,
+                 alpha_amplitude: float = 10.0, alpha_frequency: float = 10.0,
+                 theta_amplitude: float = 5.0, theta_frequency: float = 6.0,
+                 noise_amplitude: float = 5.0, blinks_per_minute: float = 10.0,
+                 blink_amplitude: float = 250.0, line_noise_amplitude: float = 2.0,
+                 line_frequency: float = 60.0, seed: Optional[int] = None):
+        """
+        Initialize the generator.
+
+        Args:
+            sample_rate: Samples per second
+            channel_names: EEG channels (default TP9, AF7, AF8, TP10)
+            alpha_amplitude: Alpha rhythm amplitude (µV, at full weight)
+            alpha_frequency: Alpha rhythm frequency (Hz)
+            theta_amplitude: Theta rhythm amplitude (µV, at full weight)
+            theta_frequency: Theta rhythm frequency (Hz)
+            noise_amplitude: Background noise standard deviation (µV)
+            blinks_per_minute: Mean blink rate (0: no blinks)
+            blink_amplitude: Blink peak on the frontal channels (µV)
+            line_noise_amplitude: Mains interference amplitude (µV)
+            line_frequency: Mains frequency (Hz)
+            seed: Random seed (None: different every run)
+        """
+        self.sample_rate = sample_rate
+        self.channel_names = list(channel_names or self.CHANNEL_WEIGHTS)
+        self.alpha_amplitude = alpha_amplitude
+        self.alpha_frequency = alpha_frequency
+        self.theta_amplitude = theta_amplitude
+        self.theta_frequency = theta_frequency
+        self.noise_amplitude = noise_amplitude
+        self.blinks_per_minute = blinks_per_minute
+        self.blink_amplitude = blink_amplitude
+        self.line_noise_amplitude = line_noise_amplitude
+        self.line_frequency = line_frequency
+
+        weights = np.array([self.CHANNEL_WEIGHTS.get(name, (0.5, 0.5, 0.0)) for name in self.channel_names])
+        self._alpha_weights, self._theta_weights, self._blink_weights = weights.T
+        self._phases = np.random.default_rng(seed).uniform(0, 2 * np.pi, (3, len(self.channel_names)))
+        noise_seed, blink_seed = np.random.SeedSequence(seed).spawn(2)
+        self._noise_rng = np.random.default_rng(noise_seed)
+        self._blink_rng = np.random.default_rng(blink_seed)
+        self._blink_samples = int(round(self.BLINK_DURATION * sample_rate))
+        self._blink_shape = np.hanning(self._blink_samples + 2)[1:-1]
+        self._pink_state = np.zeros((len(PINK_A) - 1, len(self.channel_names)))
+        impulse = signal.lfilter(PINK_B, PINK_A, signal.unit_impulse(4 * int(sample_rate)))
+        self._pink_scale = 1.0 / np.sqrt(np.sum(impulse ** 2))  # unit variance
+        self.position = 0
+        self._blinks: List[int] = []  # onsets (sample index) of blinks not yet finished
+        self._next_blink = self._draw_blink(0)
+
+    @classmethod
+    def from_config(cls, config: Dict, seed: Optional[int] = None) -> 'SyntheticEEG':
+        """
+        Create a generator from simulator.synthetic in the configuration.
+
+        Args:
+            config: Configuration dictionary
+            seed: Random seed (None: simulator.seed)
+
+        Returns:
+            SyntheticEEG
+        """
+        simulator = config.get('simulator', {})
+        return cls(config['muse']['sample_rate'], config['muse']['channel_names'],
+                   seed=simulator.get('seed') if seed is None else seed,
+                   **simulator.get('synthetic', {}))
+
+    def _draw_blink(self, after: int) -> Optional[int]:
+        """Onset of the next blink after sample `after` (None without blinks)."""
+        if self.blinks_per_minute <= 0:
+            return None
+        interval = self._blink_rng.exponential(60.0 / self.blinks_per_minute)
+        return after + max(1, int(interval * self.sample_rate))
+
+    def generate(self, n: int) -> np.ndarray:
+        """
+        Generate the next n samples.
+
+        Args:
+            n: Number of samples
+
+        Returns:
+            Samples of shape (n, channels), µV
+        """
+        index = self.position + np.arange(n)
+        t = (index / self.sample_rate)[:, None]
+        samples, self._pink_state = signal.lfilter(
+            PINK_B, PINK_A, self._noise_rng.standard_normal((n, len(self.channel_names))), axis=0,
+            zi=self._pink_state
+        )
+        samples *= self.noise_amplitude * self._pink_scale
+        samples += self.alpha_amplitude * self._alpha_weights * np.sin(
+            2 * np.pi * self.alpha_frequency * t + self._phases[0])
+        samples += self.theta_amplitude * self._theta_weights * np.sin(
+            2 * np.pi * self.theta_frequency * t + self._phases[1])
+        samples += self.line_noise_amplitude * np.sin(2 * np.pi * self.line_frequency * t + self._phases[2])
+
+        # Blinks starting before the end of this chunk
+        end = self.position + n
+        while self._next_blink is not None and self._next_blink < end:
+            self._blinks.append(self._next_blink)
+            self._next_blink = self._draw_blink(self._next_blink)
+        for onset in self._blinks:
+            start, stop = max(onset, self.position), min(onset + self._blink_samples, end)
+            if start < stop:
+                bump = self.blink_amplitude * self._blink_shape[start - onset:stop - onset]
+                samples[start - self.position:stop - self.position] += bump[:, None] * self._blink_weights
+        self._blinks = [onset for onset in self._blinks if onset + self._blink_samples > end]
+
+        self.position = end
+        return samples
+
+
+class RecordingSource:
+    """Replays recorded EEG (samples x channels, µV), optionally looping."""
+
+    def __init__(self, samples: np.ndarray, loop: bool = True):
+        """
+        Initialize the source.
+
+        Args:
+            samples: Recording of shape (n, channels)
+            loop: Start over at the end (False: stop at the end)
+
+        Raises:
+            ValueError: If the recording is empty or not 2-D
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim != 2 or len(samples) == 0:
+            raise ValueError(f"Recording must be a non-empty (samples x channels) array, got {samples.shape}")
+        self.samples = samples
+        self.loop = loop
+        self.position = 0
+
+    @classmethod
+    def load(cls, path: str, channel_names: List[str], loop: bool = True) -> 'RecordingSource':
+        """
+        Load a recording.
+
+        Args:
+            path: .npy array (samples x channels), or CSV with a header row
+                  such as `muselsl record` writes (timestamps, TP9, AF7, AF8,
+                  TP10, Right AUX); the named channels are replayed
+            channel_names: Channels to take from a CSV
+            loop: Start over at the end
+
+        Returns:
+            RecordingSource
+
+        Raises:
+            ValueError: If a CSV lacks a channel
+        """
+        if path.endswith('.npy'):
+            return cls(np.load(path), loop)
+
+        with open(path) as f:
+            header = [name.strip() for name in f.readline().split(',')]
+        missing = [name for name in channel_names if name not in header]
+        if missing:
+            raise ValueError(f"{path} has no column for {missing} (columns: {header})")
+        data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2,
+                          usecols=[header.index(name) for name in channel_names])
+        return cls(data, loop)
+
+    def generate(self, n: int) -> np.ndarray:
+        """
+        Next n samples (fewer at the end of a recording that does not loop).
+
+        Args:
+            n: Number of samples
+
+        Returns:
+            Samples of shape (<= n, channels)
+        """
+        total = len(self.samples)
+        if not self.loop:
+            chunk = self.samples[self.position:self.position + n]
+            self.position += len(chunk)
+            return chunk
+        index = (self.position + np.arange(n)) % total
+        self.position = (self.position + n) % total
+        return self.samples[index]
+
+
+class MuseSimulator:
+    """
+    A Muse 2 stream as muselsl publishes it, from a sample source.
+
+    Samples come in chunks of `chunk_size` (muselsl: 12) with four EEG
+    channels plus the Right AUX channel (noise). Timestamps advance at
+    the nominal rate; with `jitter`, every chunk's timestamps (and, when
+    publishing, its delivery) are offset by Gaussian noise of that
+    standard deviation, like Bluetooth arrival-time stamping. `speed`
+    replays faster (or slower) than real time; 0 delivers as fast as
+    possible.
+
+    publish() serves the stream over LSL (needs pylsl); SimulatedInlet
+    serves it in-process to MuseHeadset.start_acquisition (no pylsl).
+    """
+
+    def __init__(self, config: Dict, source=None):
+        """
+        Initialize the simulator.
+
+        Args:
+            config: Configuration dictionary (muse and simulator)
+            source: Anything with generate(n) -> (n, 4) samples (default:
+                    SyntheticEEG from simulator.synthetic)
+
+        Raises:
+            ValueError: If chunk_size, speed or jitter is invalid
+        """
+        muse_config = config['muse']
+        simulator = config.get('simulator', {})
+        self.sample_rate = muse_config['sample_rate']
+        self.channel_names: List[str] = list(muse_config['channel_names'])
+        self.stream_type = muse_config.get('stream_type', 'EEG')
+        self.stream_name = simulator.get('stream_name', 'Muse')
+        self.aux_channel = simulator.get('aux_channel', True)
+        self.chunk_size = int(simulator.get('chunk_size', 12))
+        self.speed = float(simulator.get('speed', 1.0))
+        self.jitter = float(simulator.get('jitter', 0.0))
+        if self.chunk_size < 1 or self.speed < 0 or self.jitter < 0:
+            raise ValueError("simulator.chunk_size must be >= 1, speed and jitter >= 0")
+
+        self.source = source if source is not None else SyntheticEEG.from_config(config)
+        self._rng = np.random.default_rng(simulator.get('seed'))
+        self.channel_count = len(self.channel_names) + (1 if self.aux_channel else 0)
+        self.samples_sent = 0
+        self.chunks_sent = 0
+
+    def next_chunk(self, start_time: float = 0.0, size: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Produce the next chunk.
+
+        Args:
+            start_time: Timestamp of the stream's first sample
+            size: Samples in this chunk (default chunk_size)
+
+        Returns:
+            Tuple of (samples of shape (n, channel_count), float32 µV,
+            timestamps); empty at the end of a finite recording
+        """
+        eeg = self.source.generate(size or self.chunk_size)
+        n = len(eeg)
+        samples = np.empty((n, self.channel_count), dtype=np.float32)
+        samples[:, :eeg.shape[1]] = eeg
+        if self.aux_channel:
+            samples[:, -1] = self._rng.normal(0, 1.0, n)
+
+        timestamps = start_time + (self.samples_sent + np.arange(n)) / self.sample_rate
+        if self.jitter and n:
+            timestamps += self._rng.normal(0, self.jitter)
+        self.samples_sent += n
+        self.chunks_sent += n > 0
+        return samples, timestamps
+
+    def chunks(self, duration: Optional[float] = None, start_time: float = 0.0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Iterate over chunks (unpaced).
+
+        Args:
+            duration: Seconds of stream time (None: until the source ends)
+            start_time: Timestamp of the stream's first sample
+
+        Yields:
+            (samples, timestamps) as next_chunk
+        """
+        limit = None if duration is None else int(round(duration * self.sample_rate))
+        while limit is None or self.samples_sent < limit:
+            size = self.chunk_size if limit is None else min(self.chunk_size, limit - self.samples_sent)
+            samples, timestamps = self.next_chunk(start_time, size)
+            if len(samples) == 0:
+                return
+            yield samples, timestamps
+
+    def due(self, started: float, samples: int) -> float:
+        """time.monotonic() at which `samples` samples are due (speed 0: now)."""
+        if self.speed == 0:
+            return started
+        return started + samples / self.sample_rate / self.speed
+
+    def stream_info(self):
+        """
+        LSL stream description matching muselsl.
+
+        Raises:
+            RuntimeError: If pylsl is not installed
+        """
+        if not PYLSL_AVAILABLE:
+            raise RuntimeError("pylsl is not installed (pip install pylsl)")
+        info = StreamInfo(self.stream_name, self.stream_type, self.channel_count, self.sample_rate,
+                          'float32', 'MuseSimulator')
+        info.desc().append_child_value('manufacturer', 'Muse')
+        channels = info.desc().append_child('channels')
+        for name in self.channel_names + ([AUX_CHANNEL] if self.aux_channel else []):
+            channels.append_child('channel') \
+                .append_child_value('label', name) \
+                .append_child_value('unit', 'microvolts') \
+                .append_child_value('type', 'EEG')
+        return info
+
+    def publish(self, duration: Optional[float] = None) -> None:
+        """
+        Serve the stream over LSL until the duration or source ends (blocks).
+
+        Args:
+            duration: Seconds of stream time (None: until the source ends
+                      or KeyboardInterrupt)
+
+        Raises:
+            RuntimeError: If pylsl is not installed
+        """
+        info = self.stream_info()  # raises without pylsl
+        outlet = StreamOutlet(info, self.chunk_size, 360)
+        started = time.monotonic()
+        start_time = local_clock()
+        logger.info(f"Publishing '{self.stream_name}' ({self.channel_count} channels, {self.sample_rate} Hz, "
+                    f"chunks of {self.chunk_size}, speed {self.speed or 'max'}x)")
+        for samples, timestamps in self.chunks(duration, start_time):
+            delay = self.due(started, self.samples_sent) - time.monotonic()
+            if self.jitter and self.speed:
+                delay += abs(self._rng.normal(0, self.jitter))
+            if delay > 0:
+                time.sleep(delay)
+            outlet.push_chunk(samples, float(timestamps[-1]))
+        logger.info(f"Published {self.samples_sent} samples in {self.chunks_sent} chunks")
+
+    def get_stats(self) -> Dict:
+        """
+        Get simulator statistics.
+
+        Returns:
+            Dictionary with samples and chunks sent and the settings
+        """
+        return {
+            'samples_sent': self.samples_sent,
+            'chunks_sent': self.chunks_sent,
+            'chunk_size': self.chunk_size,
+            'speed': self.speed,
+            'jitter': self.jitter
+        }
+
+
+class SimulatedInlet:
+    """
+    In-process stand-in for pylsl.StreamInlet, fed by a MuseSimulator.
+
+    pull_chunk() returns the chunks that are due (paced by the simulator's
+    speed, all at once with speed 0), so MuseHeadset.start_acquisition()
+    runs its real acquisition path without LSL or a headset.
+    """
+
+    def __init__(self, simulator: MuseSimulator, duration: Optional[float] = None, start_time: float = 0.0):
+        """
+        Initialize the inlet.
+
+        Args:
+            simulator: Sample source
+            duration: Seconds of stream time before the stream ends (None:
+                      until the simulator's source ends)
+            start_time: Timestamp of the first sample
+        """
+        self.simulator = simulator
+        self.start_time = start_time
+        self.limit = None if duration is None else int(round(duration * simulator.sample_rate))
+        self.finished = False
+        self._started: Optional[float] = None
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def _fill(self, max_samples: int) -> None:
+        """Queue the chunks that are due, up to max_samples."""
+        simulator = self.simulator
+        queued = sum(len(samples) for samples, _ in self._pending)
+        while queued < max_samples and not self.finished:
+            if self.limit is not None and simulator.samples_sent >= self.limit:
+                self.finished = True
+            elif simulator.due(self._started, simulator.samples_sent + simulator.chunk_size) > time.monotonic():
+                return
+            else:
+                size = simulator.chunk_size
+                if self.limit is not None:
+                    size = min(size, self.limit - simulator.samples_sent)
+                samples, timestamps = simulator.next_chunk(self.start_time, size)
+                if len(samples) == 0:
+                    self.finished = True
+                    return
+                self._pending.append((samples, timestamps))
+                queued += len(samples)
+
+    def pull_chunk(self, timeout: float = 0.0, max_samples: int = 1024,
+                   dest_obj: Optional[np.ndarray] = None) -> Tuple[None, List[float]]:
+        """
+        Copy the due samples into dest_obj (as pylsl's pull_chunk).
+
+        Args:
+            timeout: Seconds to wait for a chunk to become due
+            max_samples: Most samples to return
+            dest_obj: Array of shape (>= max_samples, channel_count) to fill
+
+        Returns:
+            Tuple of (None, timestamps of the samples written)
+        """
+        if self._started is None:
+            self._started = time.monotonic()
+        self._fill(max_samples)
+        if not self._pending:
+            wait = timeout
+            if not self.finished:
+                next_due = self.simulator.due(self._started, self.simulator.samples_sent + self.simulator.chunk_size)
+                wait = min(timeout, max(0.0, next_due - time.monotonic()))
+            time.sleep(wait)
+            self._fill(max_samples)
+
+        n, timestamps = 0, []
+        while self._pending and n < max_samples:
+            samples, stamps = self._pending[0]
+            take = min(len(samples), max_samples - n)
+            dest_obj[n:n + take] = samples[:take]
+            timestamps.extend(stamps[:take].tolist())
+            n += take
+            if take == len(samples):
+                self._pending.pop(0)
+            else:
+                self._pending[0] = (samples[take:], stamps[take:])
+        return None, timestamps
+
+
+def main() -> None:
+    """Command line: publish a simulated Muse stream until interrupted."""
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Publish a simulated Muse 2 LSL stream")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml'))
+    parser.add_argument('--recording', help="Replay a .npy or muselsl CSV recording instead of synthetic EEG")
+    parser.add_argument('--speed', type=float, help="Playback speed (0: as fast as possible)")
+    parser.add_argument('--chunk-size', type=int, help="Samples per chunk")
+    parser.add_argument('--jitter', type=float, help="Timestamp jitter per chunk (seconds, std)")
+    parser.add_argument('--alpha', type=float, help="Alpha amplitude (µV)")
+    parser.add_argument('--theta', type=float, help="Theta amplitude (µV)")
+    parser.add_argument('--blinks', type=float, help="Blinks per minute")
+    parser.add_argument('--line-noise', type=float, help="Line noise amplitude (µV)")
+    parser.add_argument('--duration', type=float, help="Seconds of stream time (default: forever)")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    simulator = config.setdefault('simulator', {})
+    synthetic = simulator.setdefault('synthetic', {})
+    for key, value in (('speed', args.speed), ('chunk_size', args.chunk_size),
+                       ('jitter', args.jitter), ('seed', args.seed)):
+        if value is not None:
+            simulator[key] = value
+    for key, value in (('alpha_amplitude', args.alpha), ('theta_amplitude', args.theta),
+                       ('blinks_per_minute', args.blinks), ('line_noise_amplitude', args.line_noise)):
+        if value is not None:
+            synthetic[key] = value
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    source = None
+    if args.recording:
+        source = RecordingSource.load(args.recording, config['muse']['channel_names'])
+    try:
+        MuseSimulator(config, source).publish(args.duration)
+    except RuntimeError as e:
+        raise SystemExit(f"Error: {e}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Protocol Calculator
+Evaluates every enabled neurofeedback protocol on each band power update
+and serves the active protocol's metrics
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+try:
+    from .protocols import BandPowers, BaselineEstimator, NeurofeedbackProtocol, ProtocolFactory
+    from .score_processing import ScoreProcessor
+except ImportError:
+    from protocols import BandPowers, BaselineEstimator, NeurofeedbackProtocol, ProtocolFactory
+    from score_processing import ScoreProcessor
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProtocolCalculator:
+    """
+    Runs all enabled protocols against one shared snapshot per tick.
+
+    Every enabled protocol evaluates the same BandPowers snapshot, whose
+    (channels x bands) arrays of absolute, relative and log power are
+    computed once when it is created. Because all protocols are
+    evaluated every tick, their smoothing state is always current:
+    switching the active protocol is instant and needs no warm-up.
+
+    The cost of each tick is timed per protocol (and for converting legacy
+    dictionary input) and reported by get_timings().
+
+    Baselines are collected on the same snapshots: start_baseline() folds
+    each tick into a shared BaselineEstimator for `protocols.baseline.duration`
+    seconds, then hands it to every protocol. With `auto_update` it keeps
+    adapting afterwards (exponential forgetting over `half_life`).
+
+    The scores of all protocols are then post-processed together by a
+    ScoreProcessor (protocols.yaml `global`: outlier rejection, temporal
+    filter, trends). With the temporal filter enabled, smoothing moves
+    from the protocols to the processor, after outlier rejection; each
+    protocol's metrics keep the unprocessed score as 'raw_score'.
+    """
+
+    def __init__(self, config: Dict, protocols_config: Dict):
+        """
+        Initialize the calculator.
+
+        Args:
+            config: Configuration dictionary (default.yaml)
+            protocols_config: Protocol definitions (protocols.yaml)
+
+        Raises:
+            ValueError: If no protocol is enabled or a protocol config is invalid
+        """
+        self.protocols: Dict[str, NeurofeedbackProtocol] = {}
+        for key, protocol_config in protocols_config['protocols'].items():
+            if protocol_config.get('enabled', True):
+                self.protocols[key] = ProtocolFactory.create(key, protocol_config)
+        if not self.protocols:
+            raise ValueError("No neurofeedback protocols enabled")
+
+        protocols_settings = config.get('protocols', {})
+        default = protocols_settings.get('default')
+        self.active_protocol = default if default in self.protocols else next(iter(self.protocols))
+
+        baseline_config = protocols_settings.get('baseline', {})
+        self.auto_update_baseline = baseline_config.get('auto_update', False)
+        self.baseline_duration = baseline_config.get('duration', 60)
+        self._baseline_settings = (
+            protocols_settings.get('update_interval', 1.0),
+            baseline_config.get('half_life', 300) if self.auto_update_baseline else None
+        )
+        self.baseline = BaselineEstimator(self.baseline_duration, *self._baseline_settings)
+        self.collecting_baseline = False
+
+        self.score_processor = ScoreProcessor(
+            protocols_config.get('global', {}),
+            [p.config.get('parameters', {}).get('smoothing_factor', 0.0) for p in self.protocols.values()],
+            protocols_settings.get('update_interval', 1.0)
+        )
+        for protocol in self.protocols.values():
+            protocol.external_smoothing = self.score_processor.smoothing
+
+        self.latest_metrics: Dict[str, Optional[Dict]] = {key: None for key in self.protocols}
+        self.latest_band_powers: Optional[BandPowers] = None
+        self.errors: Dict[str, int] = {key: 0 for key in self.protocols}
+
+        # Per-tick cost: [ticks, total seconds, last seconds, max seconds]
+        self._timings: Dict[str, List[float]] = {key: [0, 0.0, 0.0, 0.0] for key in ('band_powers', *self.protocols, 'score_processing')}
+
+        logger.info(f"Protocols enabled: {', '.join(self.protocols)} (active: {self.active_protocol})")
+
+    def _record_time(self, key: str, elapsed: float) -> None:
+        timing = self._timings[key]
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] = elapsed
+        if elapsed > timing[3]:
+            timing[3] = elapsed
+
+    def evaluate_all(self, band_powers: Union[BandPowers, Dict]) -> Dict[str, Optional[Dict]]:
+        """
+        Evaluate every enabled protocol on one band power update.
+
+        A protocol that fails keeps its previous metrics (the error is
+        logged and counted) and gets no score this tick.
+
+        Args:
+            band_powers: BandPowers (or legacy dictionary, converted once)
+
+        Returns:
+            Latest metrics by protocol key
+
+        Raises:
+            ValueError: If a dictionary is invalid
+        """
+        start = time.perf_counter()
+        band_powers = BandPowers.coerce(band_powers)
+        now = time.perf_counter()
+        self._record_time('band_powers', now - start)
+        self.latest_band_powers = band_powers
+
+        scores = np.full(len(self.protocols), np.nan)
+        for i, (key, protocol) in enumerate(self.protocols.items()):
+            start = now
+            try:
+                self.latest_metrics[key] = protocol.calculate_metrics(band_powers)
+                scores[i] = self.latest_metrics[key]['score']
+            except Exception as e:
+                self.errors[key] += 1
+                logger.warning(f"{protocol.name}: {e}")
+            now = time.perf_counter()
+            self._record_time(key, now - start)
+
+        if self.score_processor.enabled:
+            self._post_process(scores)
+            self._record_time('score_processing', time.perf_counter() - now)
+
+        # Fold the tick into the baseline after scoring, so it is scored against the past only
+        if self.collecting_baseline or (self.auto_update_baseline and self.baseline.complete):
+            self._update_baseline(band_powers)
+
+        return self.latest_metrics
+
+    def _post_process(self, scores: np.ndarray) -> None:
+        """Replace this tick's scores with post-processed ones (feedback levels follow)."""
+        processed = self.score_processor.process(scores)
+        for i, (key, protocol) in enumerate(self.protocols.items()):
+            if np.isnan(scores[i]):
+                continue
+            metrics = self.latest_metrics[key]
+            metrics['raw_score'] = metrics['score']
+            metrics['score'] = float(processed['score'][i])
+            metrics['feedback_level'] = protocol.feedback_level(metrics['score'])
+            metrics['outlier'] = bool(processed['outlier'][i])
+            if self.score_processor.include_trends:
+                trend = float(processed['trend'][i])
+                metrics['trend'] = trend
+                metrics['trend_direction'] = self.score_processor.trend_direction(trend)
+
+    def _update_baseline(self, band_powers: BandPowers) -> None:
+        """Add one tick to the shared baseline; hand it to the protocols when complete."""
+        try:
+            self.baseline.update(band_powers)
+        except ValueError as e:  # rows changed (per-channel vs averaged input): start over
+            logger.warning(f"Baseline restarted: {e}")
+            self.baseline.reset()
+            self.baseline.update(band_powers)
+
+        if self.collecting_baseline and self.baseline.complete:
+            self.collecting_baseline = False
+            for protocol in self.protocols.values():
+                protocol.set_baseline(self.baseline)
+            logger.info(f"Baseline complete ({self.baseline.count} updates)")
+
+    def calculate_metrics(self, band_powers: Union[BandPowers, Dict]) -> Optional[Dict]:
+        """
+        Evaluate all protocols and return the active protocol's metrics.
+
+        Args:
+            band_powers: BandPowers (or legacy dictionary)
+
+        Returns:
+            Active protocol metrics, or None if it has not produced any yet
+        """
+        return self.evaluate_all(band_powers)[self.active_protocol]
+
+    def set_protocol(self, protocol_name: str) -> Optional[Dict]:
+        """
+        Switch the active protocol (instant: its state is already current).
+
+        Args:
+            protocol_name: Protocol key (e.g. 'theta_beta_ratio')
+
+        Returns:
+            The protocol's latest metrics, or None before the first update
+
+        Raises:
+            ValueError: If the protocol is unknown or not enabled
+        """
+        if protocol_name not in self.protocols:
+            raise ValueError(f"Unknown protocol: '{protocol_name}'")
+        self.active_protocol = protocol_name
+        logger.info(f"Active protocol: {protocol_name}")
+        return self.latest_metrics[protocol_name]
+
+    def get_protocol(self, protocol_name: Optional[str] = None) -> NeurofeedbackProtocol:
+        """Get a protocol instance (the active one by default)."""
+        return self.protocols[protocol_name or self.active_protocol]
+
+    def available_protocols(self) -> List[str]:
+        """Keys of the enabled protocols."""
+        return list(self.protocols)
+
+    def start_baseline(self, duration: Optional[float] = None) -> None:
+        """
+        Start collecting a baseline from the next ticks.
+
+        Protocols keep their current baseline until the new one is complete.
+
+        Args:
+            duration: Seconds to collect (default `protocols.baseline.duration`)
+        """
+        # A new estimator: protocols keep scoring against the one they hold
+        self.baseline = BaselineEstimator(duration or self.baseline_duration, *self._baseline_settings)
+        self.collecting_baseline = True
+        logger.info(f"Collecting baseline for {self.baseline.duration} s")
+
+    def set_baseline(self, band_powers: Union[BandPowers, Dict]) -> None:
+        """
+        Set the baseline of every protocol from one measurement.
+
+        Args:
+            band_powers: Baseline BandPowers (or legacy dictionary)
+        """
+        snapshot = BaselineEstimator.from_snapshot(band_powers)
+        for protocol in self.protocols.values():
+            protocol.set_baseline(snapshot)
+
+    def clear_baseline(self) -> None:
+        """Clear the baseline of every protocol (and stop collecting one)."""
+        self.collecting_baseline = False
+        self.baseline = BaselineEstimator(self.baseline_duration, *self._baseline_settings)
+        for protocol in self.protocols.values():
+            protocol.clear_baseline()
+
+    def get_baseline_status(self) -> Dict:
+        """
+        Get baseline collection status.
+
+        Returns:
+            Dictionary with collecting, auto_update and the shared
+            estimator's status (updates, duration, progress, complete)
+        """
+        return {
+            'collecting': self.collecting_baseline,
+            'auto_update': self.auto_update_baseline,
+            **self.baseline.get_status()
+        }
+
+    def get_timings(self) -> Dict[str, Dict]:
+        """
+        Get the per-tick evaluation cost.
+
+        Returns:
+            Dictionary keyed by 'band_powers' (dictionary conversion),
+            protocol key and 'score_processing', each with ticks, last_us,
+            mean_us and max_us
+        """
+        return {
+            key: {
+                'ticks': int(ticks),
+                'last_us': last * 1e6,
+                'mean_us': total / ticks * 1e6 if ticks else 0.0,
+                'max_us': longest * 1e6
+            }
+            for key, (ticks, total, last, longest) in self._timings.items()
+        }
+
+    def get_status(self) -> Dict:
+        """
+        Get calculator status.
+
+        Returns:
+            Dictionary with the active and enabled protocols, error counts,
+            baseline status, score post-processing and per-protocol timings
+        """
+        return {
+            'active_protocol': self.active_protocol,
+            'protocols': self.available_protocols(),
+            'errors': dict(self.errors),
+            'score_processing': self.score_processor.get_stats(),
+            'baseline': self.get_baseline_status(),
+            'timings': self.get_timings()
+        }
@@ -4,5 +4,23 @@ Contains all neurofeedback protocol implementations
 """
 
 from .base import NeurofeedbackProtocol
+from .band_powers import BandPowers
+from .baseline import BaselineEstimator
+from .alpha_enhancement import AlphaEnhancement
+from .theta_beta_ratio import ThetaBetaRatio
+from .alpha_asymmetry import AlphaAsymmetry
+from .theta_enhancement import ThetaEnhancement
+from .beta_enhancement import BetaEnhancement
+from .factory import ProtocolFactory
 
-__all__ = ['NeurofeedbackProtocol']
+__all__ = [
+    'NeurofeedbackProtocol',
+    'BandPowers',
+    'BaselineEstimator',
+    'AlphaEnhancement',
+    'ThetaBetaRatio',
+    'AlphaAsymmetry',
+    'ThetaEnhancement',
+    'BetaEnhancement',
+    'ProtocolFactory'
+]
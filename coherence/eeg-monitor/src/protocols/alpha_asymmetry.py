@@ -0,0 +1,87 @@
+"""
+Alpha Asymmetry Protocol
+
+Balance frontal left/right alpha for mood regulation (Davidson's frontal
+alpha asymmetry model).
+"""
+
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+from .band_powers import BandPowers
+from .base import NeurofeedbackProtocol
+
+
+class AlphaAsymmetry(NeurofeedbackProtocol):
+    """
+    Frontal alpha asymmetry log(right alpha) - log(left alpha).
+
+    Positive = right dominance (withdrawal), negative = left dominance
+    (approach). The score rewards closeness to `target_asymmetry`: the
+    distance thresholds (excellent <= 0.1 ... low > 0.5) map to scores
+    85/70/50/30, linearly in between.
+    """
+
+    def __init__(self, config: Dict):
+        """
+        Initialize the protocol.
+
+        Args:
+            config: Protocol configuration (an entry of protocols.yaml)
+
+        Raises:
+            ValueError: If the thresholds are invalid
+        """
+        super().__init__(config)
+        parameters = config.get('parameters', {})
+        self.target_asymmetry = parameters.get('target_asymmetry', 0.0)
+        self.balance_tolerance = parameters.get('balance_tolerance', 0.1)
+        mapping = config.get('hemisphere_mapping', {})
+        self.left_channel = mapping.get('left', 'AF7')
+        self.right_channel = mapping.get('right', 'AF8')
+        self._left, self._right = self._channel_rows([self.left_channel, self.right_channel])
+        self._points, self._scores = self._inverse_scale(
+            {'excellent': 0.1, 'good': 0.2, 'medium': 0.3, 'low': 0.5, **config.get('thresholds', {})}
+        )
+
+    @property
+    def name(self) -> str:
+        return self.config.get('name', "Alpha Asymmetry")
+
+    @property
+    def description(self) -> str:
+        return self.config.get('description', "Balance left/right hemisphere alpha for mood regulation")
+
+    @property
+    def frequency_bands(self) -> Dict[str, Tuple[float, float]]:
+        return {band: tuple(edges) for band, edges in self.config.get('frequency_bands', {}).items()}
+
+    def calculate_metrics(self, band_powers: Union[BandPowers, Dict]) -> Dict:
+        """
+        Score the frontal asymmetry.
+
+        Raises:
+            ValueError: If the input has no per-channel powers
+        """
+        band_powers = self._validate_band_powers(band_powers)
+        if not band_powers.per_channel:
+            raise ValueError(f"{self.name} needs per-channel powers for "
+                             f"{self.left_channel} and {self.right_channel}")
+
+        log_alpha = band_powers.log_values[:, BandPowers.ALPHA]
+        asymmetry = float(log_alpha[self._right] - log_alpha[self._left])
+        distance = abs(asymmetry - self.target_asymmetry)
+
+        score = self._smooth(float(np.interp(distance, self._points, self._scores)))
+        return {
+            'score': score,
+            'direction': 'balanced',
+            'feedback_level': self.feedback_level(score),
+            'details': {
+                'asymmetry': asymmetry,
+                'target_asymmetry': self.target_asymmetry,
+                'balanced': distance <= self.balance_tolerance,
+                'dominance': 'left' if asymmetry < 0 else 'right'
+            }
+        }
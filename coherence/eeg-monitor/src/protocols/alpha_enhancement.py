@@ -0,0 +1,15 @@
+"""
+Alpha Enhancement Protocol
+
+Increase alpha (8-13 Hz) for relaxation and meditation training.
+"""
+
+from .enhancement import BandEnhancementProtocol
+
+
+class AlphaEnhancement(BandEnhancementProtocol):
+    """Higher alpha share = better (usually trained with eyes closed)."""
+
+    band = 'alpha'
+    default_name = "Alpha Enhancement"
+    default_description = "Increase alpha waves (8-13 Hz) for relaxation and meditation training"
@@ -0,0 +1,182 @@
+"""
+Band Powers Type
+
+Array-backed band powers for all channels, validated once on construction
+and converted to the legacy nested dictionary only at the JSON boundary.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class BandPowers:
+    """
+    Delta-gamma band powers of one window, as a (channels x bands) array.
+
+    Rows follow CHANNELS (Muse 2: TP9, AF7, AF8, TP10), or a single 'mean'
+    row for channel-averaged input; columns follow BANDS. Index constants
+    (ALPHA, AF7, ...) let protocols index arrays directly instead of
+    looking up names. Derived arrays every protocol needs (total, relative
+    and log power) are computed once, with the validation, when the object
+    is created. All arrays are read-only, so instances can be shared (e.g.
+    as a baseline) without copying.
+
+    Attributes:
+        values: Absolute band powers (µV²), shape (channels, bands)
+        timestamp: Time of the window's last sample, if known
+        total: Summed band power per channel, shape (channels,)
+        relative: Band power as a fraction of the channel's total
+        log_values: Natural log of the band powers (floored at 1e-12)
+    """
+
+    BANDS: Tuple[str, ...] = ('delta', 'theta', 'alpha', 'beta', 'gamma')
+    CHANNELS: Tuple[str, ...] = ('TP9', 'AF7', 'AF8', 'TP10')
+    DELTA, THETA, ALPHA, BETA, GAMMA = range(5)
+    TP9, AF7, AF8, TP10 = range(4)
+
+    __slots__ = ('values', 'timestamp', 'total', 'relative', 'log_values')
+
+    def __init__(self, values: np.ndarray, timestamp: Optional[float] = None):
+        """
+        Validate and wrap a band power matrix.
+
+        Args:
+            values: Band powers of shape (len(CHANNELS), len(BANDS)), or
+                    (1, len(BANDS)) for channel-averaged powers
+            timestamp: Time of the window's last sample
+
+        Raises:
+            ValueError: If the shape is wrong or any power is negative or
+                        not finite
+        """
+        values = np.array(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(self.BANDS) or values.shape[0] not in (1, len(self.CHANNELS)):
+            raise ValueError(f"Band powers must have shape ({len(self.CHANNELS)} or 1, {len(self.BANDS)}), "
+                             f"got {values.shape}")
+        lowest, highest = values.min(), values.max()
+        if not (lowest >= 0 and highest < np.inf):  # also false for NaN
+            raise ValueError("Band powers must be finite and non-negative")
+
+        total = values.sum(axis=1)
+        relative = values / np.maximum(total, 1e-12)[:, None]
+        log_values = np.log(np.maximum(values, 1e-12))
+        for array in (values, total, relative, log_values):
+            array.flags.writeable = False
+
+        self.values = values
+        self.timestamp = timestamp
+        self.total = total
+        self.relative = relative
+        self.log_values = log_values
+
+    @classmethod
+    def from_dict(cls, band_powers: Dict) -> 'BandPowers':
+        """
+        Convert the legacy nested dictionary.
+
+        Uses the per-channel powers under 'channels' if present, otherwise
+        the top-level (channel-averaged) band values.
+
+        Args:
+            band_powers: {'delta': ..., 'gamma': ..., 'channels': {'TP9':
+                         {'delta': ..., ...}, ...}, 'timestamp': ...}
+
+        Returns:
+            New BandPowers
+
+        Raises:
+            ValueError: If bands or channels are missing or values invalid
+        """
+        if not isinstance(band_powers, dict):
+            raise ValueError("band_powers must be a dictionary")
+
+        channels = band_powers.get('channels')
+        if channels is None:
+            missing = [band for band in cls.BANDS if band not in band_powers]
+            if missing:
+                raise ValueError(f"Missing required band powers: {missing}")
+            rows = [[band_powers[band] for band in cls.BANDS]]
+        else:
+            if not isinstance(channels, dict):
+                raise ValueError("band_powers['channels'] must be a dictionary")
+            rows = []
+            for channel in cls.CHANNELS:
+                if not isinstance(channels.get(channel), dict):
+                    raise ValueError(f"Missing channel: {channel}")
+                missing = [band for band in cls.BANDS if band not in channels[channel]]
+                if missing:
+                    raise ValueError(f"Channel '{channel}' is missing band powers: {missing}")
+                rows.append([channels[channel][band] for band in cls.BANDS])
+
+        try:
+            values = np.array(rows, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("Band powers must be numeric")
+        return cls(values, band_powers.get('timestamp'))
+
+    @classmethod
+    def coerce(cls, band_powers) -> 'BandPowers':
+        """
+        Accept BandPowers or the legacy dictionary.
+
+        Args:
+            band_powers: BandPowers (returned as is) or dictionary
+
+        Returns:
+            BandPowers
+
+        Raises:
+            ValueError: If a dictionary is invalid
+        """
+        if isinstance(band_powers, cls):
+            return band_powers
+        return cls.from_dict(band_powers)
+
+    @property
+    def per_channel(self) -> bool:
+        """True if rows are individual channels (not one averaged row)."""
+        return self.values.shape[0] == len(self.CHANNELS)
+
+    @property
+    def channels(self) -> Tuple[str, ...]:
+        """Row names."""
+        return self.CHANNELS if self.per_channel else ('mean',)
+
+    @property
+    def mean(self) -> np.ndarray:
+        """Band powers averaged over channels, shape (bands,)."""
+        return self.values.mean(axis=0)
+
+    def band(self, name: str) -> np.ndarray:
+        """Powers of one band on every channel (view)."""
+        return self.values[:, self.BANDS.index(name)]
+
+    def channel(self, name: str) -> np.ndarray:
+        """Powers of every band on one channel (view)."""
+        return self.values[self.CHANNELS.index(name)]
+
+    def __getitem__(self, band: str) -> float:
+        """Channel-averaged power of a band, like the legacy dictionary."""
+        return float(self.values[:, self.BANDS.index(band)].mean())
+
+    def to_dict(self) -> Dict:
+        """
+        Convert to the legacy nested dictionary (for JSON messages).
+
+        Returns:
+            Dictionary with each band's mean over channels, per-channel
+            'channels' (if per-channel) and 'timestamp'
+        """
+        result = dict(zip(self.BANDS, self.mean.tolist()))
+        if self.per_channel:
+            result['channels'] = {
+                channel: dict(zip(self.BANDS, row))
+                for channel, row in zip(self.CHANNELS, self.values.tolist())
+            }
+        result['timestamp'] = self.timestamp
+        return result
+
+    def __repr__(self) -> str:
+        means = ', '.join(f"{band}={value:.3g}" for band, value in zip(self.BANDS, self.mean))
+        return f"<BandPowers {means} ({len(self.values)} rows)>"
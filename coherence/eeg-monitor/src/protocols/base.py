@@ -6,9 +6,14 @@ must implement. It establishes a plugin architecture for easy protocol extension
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple, Union
 import logging
 
+import numpy as np
+
+from .band_powers import BandPowers
+from .baseline import BaselineEstimator
+
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +42,9 @@ class NeurofeedbackProtocol(ABC):
                    parameters, thresholds, and other settings
         """
         self.config = config
-        self.baseline: Optional[Dict] = None
+        self.baseline: Optional[BaselineEstimator] = None
+        self._smoothed_score: Optional[float] = None
+        self.external_smoothing = False  # True when a score post-processor smooths instead
         self._validate_config()
 
     @property
@@ -65,14 +72,18 @@ class NeurofeedbackProtocol(ABC):
         pass
 
     @abstractmethod
-    def calculate_metrics(self, band_powers: Dict) -> Dict:
+    def calculate_metrics(self, band_powers: Union[BandPowers, Dict]) -> Dict:
         """
         Calculate protocol-specific neurofeedback metrics from band powers.
 
         This is the core method that implements the protocol's algorithm.
 
         Args:
-            band_powers: Dictionary containing frequency band power values:
+            band_powers: BandPowers, a validated (channels x bands) array:
+                values[BandPowers.AF7, BandPowers.ALPHA] is AF7's alpha power,
+                with relative and log powers precomputed. The legacy nested
+                dictionary is also accepted (converted by
+                _validate_band_powers):
                 {
                     'delta': float,  # 0.5-4 Hz
                     'theta': float,  # 4-8 Hz
@@ -101,7 +112,7 @@ class NeurofeedbackProtocol(ABC):
         """
         pass
 
-    def set_baseline(self, band_powers: Dict) -> None:
+    def set_baseline(self, baseline: Union[BaselineEstimator, BandPowers, Dict]) -> None:
         """
         Set baseline measurements for relative scoring.
 
@@ -109,10 +120,14 @@ class NeurofeedbackProtocol(ABC):
         during a calm, eyes-closed resting state.
 
         Args:
-            band_powers: Baseline band power measurements in same format
-                        as calculate_metrics() input
+            baseline: A BaselineEstimator (shared, not copied: one that
+                      keeps adapting is seen as it is on every tick), or a
+                      single band power measurement in the same format as
+                      calculate_metrics() input (mean only, no z-scores)
         """
-        self.baseline = band_powers.copy()
+        if not isinstance(baseline, BaselineEstimator):
+            baseline = BaselineEstimator.from_snapshot(baseline)
+        self.baseline = baseline
         logger.info(f"{self.name}: Baseline set")
 
     def clear_baseline(self) -> None:
@@ -120,14 +135,36 @@ class NeurofeedbackProtocol(ABC):
         self.baseline = None
         logger.info(f"{self.name}: Baseline cleared")
 
-    def get_baseline(self) -> Optional[Dict]:
+    def get_baseline(self) -> Optional[BandPowers]:
         """
         Get the current baseline.
 
         Returns:
-            Baseline band powers dictionary, or None if no baseline set
+            Baseline mean band powers, or None if no baseline set
+        """
+        return self.baseline.mean if self.baseline is not None else None
+
+    def _baseline_zscore(self, band_powers: BandPowers, rows: Union[List[int], slice],
+                         column: int) -> Optional[float]:
+        """
+        Mean log power z-score of one band against the baseline.
+
+        Args:
+            band_powers: Band powers of this tick
+            rows: Channel rows to average (used if the baseline's rows
+                  match the input's)
+            column: Band column
+
+        Returns:
+            Mean z-score over the rows, or None without a baseline spread
         """
-        return self.baseline
+        baseline = self.baseline
+        if baseline is None or not baseline.has_spread:
+            return None
+        if baseline.per_channel != band_powers.per_channel:
+            rows = slice(None)
+        log_std = np.maximum(baseline.log_std[rows, column], baseline.MIN_STD)
+        return float(((band_powers.log_values[rows, column] - baseline.log_mean[rows, column]) / log_std).mean())
 
     def _validate_config(self) -> None:
         """
@@ -141,47 +178,100 @@ class NeurofeedbackProtocol(ABC):
         if not isinstance(self.config, dict):
             raise ValueError(f"{self.name}: config must be a dictionary")
 
-    def _validate_band_powers(self, band_powers: Dict) -> None:
+    def _validate_band_powers(self, band_powers: Union[BandPowers, Dict]) -> BandPowers:
+        """
+        Validate band_powers input.
+
+        BandPowers are validated when created, so they pass straight
+        through; a legacy dictionary is converted (and thereby validated)
+        once.
+
+        Args:
+            band_powers: BandPowers or legacy band powers dictionary
+
+        Returns:
+            BandPowers
+
+        Raises:
+            ValueError: If a dictionary is missing required keys or malformed
+        """
+        return BandPowers.coerce(band_powers)
+
+    def _smooth(self, score: float) -> float:
         """
-        Validate band_powers input structure.
+        Exponentially smooth the score with `parameters.smoothing_factor`.
 
         Args:
-            band_powers: Band powers dictionary to validate
+            score: Raw score of this tick
+
+        Returns:
+            Smoothed score (the raw score on the first tick, and always
+            with external_smoothing)
+        """
+        if self.external_smoothing:
+            return score
+        factor = self.config.get('parameters', {}).get('smoothing_factor', 0.0)
+        if self._smoothed_score is None:
+            self._smoothed_score = score
+        else:
+            self._smoothed_score = factor * self._smoothed_score + (1 - factor) * score
+        return self._smoothed_score
+
+    def _channel_rows(self, names: Optional[List[str]]) -> Union[List[int], slice]:
+        """
+        Row indices of configured channels, resolved once at configuration.
+
+        Args:
+            names: Channel names (e.g. preferred_channels), or None for all
+
+        Returns:
+            Index list into BandPowers rows, or a slice over all rows
 
         Raises:
-            ValueError: If band_powers is missing required keys or malformed
+            ValueError: If a channel name is unknown
         """
-        if not isinstance(band_powers, dict):
-            raise ValueError("band_powers must be a dictionary")
+        if not names:
+            return slice(None)
+        unknown = [name for name in names if name not in BandPowers.CHANNELS]
+        if unknown:
+            raise ValueError(f"{self.name}: unknown channels {unknown}")
+        return [BandPowers.CHANNELS.index(name) for name in names]
+
+    @staticmethod
+    def _inverse_scale(thresholds: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Piecewise-linear scale for metrics where smaller is better.
 
-        # Check for required band power keys
-        required_bands = ['delta', 'theta', 'alpha', 'beta', 'gamma']
-        missing_bands = [band for band in required_bands if band not in band_powers]
+        The metric's 'excellent', 'good', 'medium' and 'low' thresholds map
+        to scores 85, 70, 50 and 30 (the default feedback levels); zero
+        scores 100 and twice the 'low' threshold scores 0.
 
-        if missing_bands:
-            raise ValueError(f"Missing required band powers: {missing_bands}")
+        Args:
+            thresholds: Metric thresholds (ascending: excellent < ... < low)
 
-        # Validate band power values are numeric
-        for band in required_bands:
-            if not isinstance(band_powers[band], (int, float)):
-                raise ValueError(f"Band power '{band}' must be numeric, got {type(band_powers[band])}")
+        Returns:
+            Tuple of (metric points, scores) for np.interp
 
-            if band_powers[band] < 0:
-                raise ValueError(f"Band power '{band}' must be non-negative")
+        Raises:
+            ValueError: If the thresholds are not ascending
+        """
+        points = np.array([0.0, thresholds['excellent'], thresholds['good'],
+                           thresholds['medium'], thresholds['low'], 2.0 * thresholds['low']])
+        if np.any(np.diff(points) <= 0):
+            raise ValueError(f"Thresholds must increase from excellent to low, got {thresholds}")
+        return points, np.array([100.0, 85.0, 70.0, 50.0, 30.0, 0.0])
 
-        # Validate channels structure if present
-        if 'channels' in band_powers:
-            if not isinstance(band_powers['channels'], dict):
-                raise ValueError("band_powers['channels'] must be a dictionary")
+    def feedback_level(self, score: float) -> str:
+        """
+        Feedback level of a score (e.g. after post-processing).
 
-            expected_channels = ['TP9', 'AF7', 'AF8', 'TP10']
-            for channel in expected_channels:
-                if channel not in band_powers['channels']:
-                    raise ValueError(f"Missing channel: {channel}")
+        Args:
+            score: Score (0-100)
 
-                channel_data = band_powers['channels'][channel]
-                if not isinstance(channel_data, dict):
-                    raise ValueError(f"Channel '{channel}' data must be a dictionary")
+        Returns:
+            Feedback level string (default score thresholds 85/70/50)
+        """
+        return self._get_feedback_level(score, {})
 
     def _get_feedback_level(self, score: float, thresholds: Dict) -> str:
         """
@@ -0,0 +1,199 @@
+"""
+Baseline Estimator
+
+Running mean and variance of band powers per channel and band, for
+baseline-relative scoring and z-scores without keeping raw history.
+"""
+
+import math
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from .band_powers import BandPowers
+
+
+class BaselineEstimator:
+    """
+    Streaming baseline of absolute, relative and log band powers.
+
+    Each update folds one BandPowers into running statistics with Welford's
+    algorithm, for all channels and bands at once: O(1) time and memory per
+    update, numerically stable, no history kept. Three quantities are
+    tracked per (channel, band): absolute power, relative power and log
+    power (band power is roughly log-normal, so z-scores use log power).
+
+    The baseline is complete after `duration` seconds of updates (one
+    update per `update_interval`), with every update weighted equally.
+    With a `half_life`, updates after that forget exponentially (weighted
+    Welford, West 1979): the baseline follows slow drift such as electrode
+    settling, with an effective memory of about half_life / ln 2 seconds.
+    """
+
+    MIN_STD = 1e-6  # floor of the log power spread used for z-scores
+
+    def __init__(self, duration: float = 60.0, update_interval: float = 1.0,
+                 half_life: Optional[float] = None):
+        """
+        Initialize an empty baseline.
+
+        Args:
+            duration: Seconds of band powers that make a complete baseline
+            update_interval: Seconds between updates
+            half_life: Seconds after which an update's weight halves, once
+                       the baseline is complete (None: stop forgetting, i.e.
+                       every update counts equally)
+
+        Raises:
+            ValueError: If update_interval or half_life is not positive
+        """
+        if not update_interval > 0:
+            raise ValueError(f"update_interval must be positive, got {update_interval}")
+        if half_life is not None and not half_life > 0:
+            raise ValueError(f"half_life must be positive, got {half_life}")
+        self.duration = duration
+        self.update_interval = update_interval
+        self.half_life = half_life
+        self.forgetting = 0.5 ** (update_interval / half_life) if half_life else 1.0
+        self.reset()
+
+    @classmethod
+    def from_snapshot(cls, band_powers: Union[BandPowers, Dict]) -> 'BaselineEstimator':
+        """
+        Baseline of a single band power measurement (mean only, no spread).
+
+        Args:
+            band_powers: BandPowers or legacy dictionary
+
+        Returns:
+            Complete BaselineEstimator with one update
+        """
+        baseline = cls(duration=0.0)
+        baseline.update(band_powers)
+        return baseline
+
+    def reset(self, duration: Optional[float] = None) -> None:
+        """
+        Forget all updates.
+
+        Args:
+            duration: New baseline duration in seconds (unchanged if None)
+        """
+        if duration is not None:
+            self.duration = duration
+        self.count = 0
+        self.weight = 0.0
+        self._mean: Optional[np.ndarray] = None  # (3, rows, bands): absolute, relative, log
+        self._m2: Optional[np.ndarray] = None
+        self._mean_powers: Optional[BandPowers] = None
+
+    @property
+    def target_count(self) -> int:
+        """Updates needed for a complete baseline."""
+        return max(1, math.ceil(self.duration / self.update_interval - 1e-9))
+
+    @property
+    def complete(self) -> bool:
+        """True once `duration` seconds of updates have been folded in."""
+        return self.count >= self.target_count
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the baseline duration collected (0-1)."""
+        return min(1.0, self.count / self.target_count)
+
+    @property
+    def per_channel(self) -> bool:
+        """True if the baseline has one row per channel."""
+        return self._mean is not None and self._mean.shape[1] == len(BandPowers.CHANNELS)
+
+    def update(self, band_powers: Union[BandPowers, Dict]) -> None:
+        """
+        Fold one band power measurement into the baseline.
+
+        Args:
+            band_powers: BandPowers or legacy dictionary
+
+        Raises:
+            ValueError: If the input is invalid or its rows (per-channel or
+                        channel-averaged) differ from earlier updates
+        """
+        band_powers = BandPowers.coerce(band_powers)
+        x = np.stack((band_powers.values, band_powers.relative, band_powers.log_values))
+
+        if self._mean is None:
+            self._mean = np.zeros_like(x)
+            self._m2 = np.zeros_like(x)
+        elif x.shape != self._mean.shape:
+            raise ValueError(f"Band powers have {x.shape[1]} rows, the baseline has {self._mean.shape[1]}")
+
+        forgetting = self.forgetting if self.complete else 1.0
+        self.weight = forgetting * self.weight + 1.0
+        delta = x - self._mean
+        self._mean += delta / self.weight
+        self._m2 *= forgetting
+        self._m2 += delta * (x - self._mean)
+        self.count += 1
+        self._mean_powers = None
+
+    @property
+    def mean(self) -> Optional[BandPowers]:
+        """Mean absolute band powers, or None before the first update."""
+        if self._mean is None:
+            return None
+        if self._mean_powers is None:
+            self._mean_powers = BandPowers(np.maximum(self._mean[0], 0.0))
+        return self._mean_powers
+
+    @property
+    def relative_mean(self) -> Optional[np.ndarray]:
+        """Mean relative band powers, shape (rows, bands)."""
+        return None if self._mean is None else self._mean[1]
+
+    @property
+    def log_mean(self) -> Optional[np.ndarray]:
+        """Mean log band powers, shape (rows, bands)."""
+        return None if self._mean is None else self._mean[2]
+
+    @property
+    def log_std(self) -> Optional[np.ndarray]:
+        """Standard deviation of log band powers (population, weighted)."""
+        if self._m2 is None:
+            return None
+        return np.sqrt(np.maximum(self._m2[2], 0.0) / self.weight)
+
+    @property
+    def has_spread(self) -> bool:
+        """True once there are at least two updates (z-scores are defined)."""
+        return self.count >= 2
+
+    def zscores(self, band_powers: BandPowers) -> Optional[np.ndarray]:
+        """
+        Log power z-scores against the baseline.
+
+        Args:
+            band_powers: Band powers with the baseline's rows
+
+        Returns:
+            (log power - baseline mean) / baseline std, shape (rows, bands),
+            or None before the baseline has a spread
+        """
+        if not self.has_spread:
+            return None
+        return (band_powers.log_values - self._mean[2]) / np.maximum(self.log_std, self.MIN_STD)
+
+    def get_status(self) -> Dict:
+        """
+        Get baseline status.
+
+        Returns:
+            Dictionary with update count, progress, completeness and
+            whether it keeps adapting (half_life)
+        """
+        return {
+            'updates': self.count,
+            'duration': self.duration,
+            'progress': self.progress,
+            'complete': self.complete,
+            'half_life': self.half_life
+        }
@@ -0,0 +1,15 @@
+"""
+Beta Enhancement Protocol
+
+Increase beta (12-30 Hz) for alertness and active concentration.
+"""
+
+from .enhancement import BandEnhancementProtocol
+
+
+class BetaEnhancement(BandEnhancementProtocol):
+    """Higher beta share = better (usually trained with eyes open)."""
+
+    band = 'beta'
+    default_name = "Beta Enhancement"
+    default_description = "Increase beta waves (12-30 Hz) for alertness and active concentration"
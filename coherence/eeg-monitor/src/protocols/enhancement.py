@@ -0,0 +1,113 @@
+"""
+Band Enhancement Protocols
+
+Shared implementation of the "increase one band" protocols (alpha, theta
+and beta enhancement).
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+from .band_powers import BandPowers
+from .base import NeurofeedbackProtocol
+
+
+class BandEnhancementProtocol(NeurofeedbackProtocol):
+    """
+    Reward a higher share of one band in the total power.
+
+    The trained quantity is the band's relative power (fraction of the
+    summed band powers), averaged over `preferred_channels`. Relative
+    power is robust to electrode contact changing absolute amplitudes.
+
+    Scoring: 50 at the reference and 100 at twice the reference (capped).
+    The reference is the baseline's mean relative power if a baseline is
+    set and `use_relative_power` is on, otherwise an even share of all
+    bands. The band's log power z-score against the baseline is reported
+    in the details once the baseline has a spread. Scores are smoothed
+    with `parameters.smoothing_factor`.
+
+    Subclasses set `band`, `default_name` and `default_description`.
+    """
+
+    band = ''
+    default_name = ''
+    default_description = ''
+
+    def __init__(self, config: Dict):
+        """
+        Initialize the protocol.
+
+        Args:
+            config: Protocol configuration (an entry of protocols.yaml)
+        """
+        super().__init__(config)
+        parameters = config.get('parameters', {})
+        self.use_relative_power = parameters.get('use_relative_power', True)
+        self.preferred_channels: Optional[List[str]] = config.get('preferred_channels')
+        self.thresholds = config.get('thresholds', {})
+
+        # Array indices, resolved once
+        self._column = BandPowers.BANDS.index(self.band)
+        self._rows = self._channel_rows(self.preferred_channels)
+
+    @property
+    def name(self) -> str:
+        return self.config.get('name', self.default_name)
+
+    @property
+    def description(self) -> str:
+        return self.config.get('description', self.default_description)
+
+    @property
+    def frequency_bands(self) -> Dict[str, Tuple[float, float]]:
+        return {band: tuple(edges) for band, edges in self.config.get('frequency_bands', {}).items()}
+
+    def _rows_of(self, band_powers: BandPowers) -> Union[List[int], slice]:
+        """Preferred channel rows (all rows for channel-averaged input)."""
+        return self._rows if band_powers.per_channel else slice(None)
+
+    def calculate_metrics(self, band_powers: Union[BandPowers, Dict]) -> Dict:
+        band_powers = self._validate_band_powers(band_powers)
+        rows = self._rows_of(band_powers)
+        relative = float(band_powers.relative[rows, self._column].mean())
+
+        baseline = None
+        if self.use_relative_power and self.baseline is not None and self.baseline.count:  # may be adapting
+            baseline_rows = self._rows if self.baseline.per_channel else slice(None)
+            baseline = float(self.baseline.relative_mean[baseline_rows, self._column].mean())
+        reference = baseline if baseline else 1.0 / len(BandPowers.BANDS)
+        details = {
+            f'{self.band}_power': float(band_powers.values[rows, self._column].mean()),
+            'relative_power': relative * 100,
+            'baseline': baseline * 100 if baseline else None,
+            'relative_increase': (relative / baseline - 1) * 100 if baseline else None,
+            'zscore': self._baseline_zscore(band_powers, rows, self._column),
+        }
+
+        score = self._smooth(self._adjust_score(min(100.0, 50.0 * relative / reference), band_powers, rows, details))
+        return {
+            'score': score,
+            'direction': 'higher',
+            'feedback_level': self.feedback_level(score),
+            'details': details
+        }
+
+    def feedback_level(self, score: float) -> str:
+        """Feedback level of a score on the configured score thresholds."""
+        return self._get_feedback_level(score, self.thresholds)
+
+    def _adjust_score(self, score: float, band_powers: BandPowers,
+                      rows: Union[List[int], slice], details: Dict) -> float:
+        """
+        Protocol-specific adjustment of the raw score (before smoothing).
+
+        Args:
+            score: Raw score
+            band_powers: Band powers of this tick
+            rows: Channel rows the protocol uses
+            details: Details dictionary to add protocol-specific entries to
+
+        Returns:
+            Adjusted raw score
+        """
+        return score
@@ -0,0 +1,61 @@
+"""
+Protocol Factory
+
+Maps protocol keys (as in config/protocols.yaml) to protocol classes.
+"""
+
+from typing import Dict, List, Type
+
+from .alpha_asymmetry import AlphaAsymmetry
+from .alpha_enhancement import AlphaEnhancement
+from .base import NeurofeedbackProtocol
+from .beta_enhancement import BetaEnhancement
+from .theta_beta_ratio import ThetaBetaRatio
+from .theta_enhancement import ThetaEnhancement
+
+
+class ProtocolFactory:
+    """Registry of protocol classes by configuration key."""
+
+    _registry: Dict[str, Type[NeurofeedbackProtocol]] = {
+        'alpha_enhancement': AlphaEnhancement,
+        'theta_beta_ratio': ThetaBetaRatio,
+        'alpha_asymmetry': AlphaAsymmetry,
+        'theta_enhancement': ThetaEnhancement,
+        'beta_enhancement': BetaEnhancement,
+    }
+
+    @classmethod
+    def register(cls, key: str, protocol_class: Type[NeurofeedbackProtocol]) -> None:
+        """
+        Register a protocol class (for protocols added outside this package).
+
+        Args:
+            key: Configuration key
+            protocol_class: NeurofeedbackProtocol subclass
+        """
+        cls._registry[key] = protocol_class
+
+    @classmethod
+    def create(cls, key: str, config: Dict) -> NeurofeedbackProtocol:
+        """
+        Instantiate a protocol.
+
+        Args:
+            key: Configuration key (e.g. 'alpha_enhancement')
+            config: Protocol configuration
+
+        Returns:
+            New protocol instance
+
+        Raises:
+            ValueError: If the key is unknown
+        """
+        if key not in cls._registry:
+            raise ValueError(f"Unknown protocol: '{key}'")
+        return cls._registry[key](config)
+
+    @classmethod
+    def available(cls) -> List[str]:
+        """Registered protocol keys."""
+        return list(cls._registry)
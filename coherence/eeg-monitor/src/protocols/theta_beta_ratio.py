@@ -0,0 +1,83 @@
+"""
+Theta/Beta Ratio Protocol
+
+Reduce the frontal theta/beta ratio for attention and focus (ADHD
+protocol). Lower ratio = better (inverse scoring).
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .band_powers import BandPowers
+from .base import NeurofeedbackProtocol
+
+
+class ThetaBetaRatio(NeurofeedbackProtocol):
+    """
+    Theta/beta power ratio over `preferred_channels` (AF7, AF8).
+
+    Ratios are computed for all preferred channels at once and combined by
+    `calculation.method` ('mean' or 'peak'). The ratio thresholds
+    (excellent <= 1.5 ... low > 3.0) map to scores 85/70/50/30, linearly
+    in between.
+    """
+
+    def __init__(self, config: Dict):
+        """
+        Initialize the protocol.
+
+        Args:
+            config: Protocol configuration (an entry of protocols.yaml)
+
+        Raises:
+            ValueError: If the thresholds or calculation method are invalid
+        """
+        super().__init__(config)
+        self.preferred_channels: Optional[List[str]] = config.get('preferred_channels')
+        self.target_ratio = config.get('parameters', {}).get('target_ratio', 1.5)
+        self.method = config.get('calculation', {}).get('method', 'mean')
+        self._rows = self._channel_rows(self.preferred_channels)
+        self._points, self._scores = self._inverse_scale(
+            {'excellent': 1.5, 'good': 2.0, 'medium': 2.5, 'low': 3.0, **config.get('thresholds', {})}
+        )
+
+    @property
+    def name(self) -> str:
+        return self.config.get('name', "Theta/Beta Ratio")
+
+    @property
+    def description(self) -> str:
+        return self.config.get('description', "Reduce theta/beta ratio for improved attention and focus")
+
+    @property
+    def frequency_bands(self) -> Dict[str, Tuple[float, float]]:
+        return {band: tuple(edges) for band, edges in self.config.get('frequency_bands', {}).items()}
+
+    def _validate_config(self) -> None:
+        super()._validate_config()
+        method = self.config.get('calculation', {}).get('method', 'mean')
+        if method not in ('mean', 'peak'):
+            raise ValueError(f"{self.name}: calculation.method must be 'mean' or 'peak', got '{method}'")
+
+    def calculate_metrics(self, band_powers: Union[BandPowers, Dict]) -> Dict:
+        band_powers = self._validate_band_powers(band_powers)
+        rows = self._rows if band_powers.per_channel else slice(None)
+        theta = band_powers.values[rows, BandPowers.THETA]
+        beta = band_powers.values[rows, BandPowers.BETA]
+        ratios = theta / np.maximum(beta, 1e-12)
+        ratio = float(ratios.max() if self.method == 'peak' else ratios.mean())
+
+        score = self._smooth(float(np.interp(ratio, self._points, self._scores)))
+        return {
+            'score': score,
+            'direction': 'lower',
+            'feedback_level': self.feedback_level(score),
+            'details': {
+                'ratio': ratio,
+                'target_ratio': self.target_ratio,
+                'channel_ratios': ratios.tolist(),
+                'theta_power': float(theta.mean()),
+                'beta_power': float(beta.mean())
+            }
+        }
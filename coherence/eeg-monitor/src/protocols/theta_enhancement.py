@@ -0,0 +1,39 @@
+"""
+Theta Enhancement Protocol
+
+Increase theta (4-8 Hz) for deep meditation and creativity, with a
+drowsiness safeguard.
+"""
+
+from typing import Dict, List, Union
+
+from .band_powers import BandPowers
+from .enhancement import BandEnhancementProtocol
+
+
+class ThetaEnhancement(BandEnhancementProtocol):
+    """
+    Higher theta share = better, unless the user is drifting into sleep.
+
+    With `parameters.suppress_if_drowsy`, a delta share above
+    `parameters.delta_threshold` percent marks the tick as drowsy and caps
+    the score at the 'low' threshold, so falling asleep is not rewarded.
+    """
+
+    band = 'theta'
+    default_name = "Theta Enhancement"
+    default_description = "Increase theta waves (4-8 Hz) for deep meditation and creativity"
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        parameters = config.get('parameters', {})
+        self.suppress_if_drowsy = parameters.get('suppress_if_drowsy', False)
+        self.delta_threshold = parameters.get('delta_threshold', 50)
+
+    def _adjust_score(self, score: float, band_powers: BandPowers,
+                      rows: Union[List[int], slice], details: Dict) -> float:
+        delta = float(band_powers.relative[rows, BandPowers.DELTA].mean()) * 100
+        drowsy = self.suppress_if_drowsy and delta > self.delta_threshold
+        details['delta_relative_power'] = delta
+        details['drowsy'] = drowsy
+        return min(score, self.thresholds.get('low', 30)) if drowsy else score
@@ -0,0 +1,284 @@
+"""
+Sample Ring Buffer
+Preallocated (samples x channels) ring for multichannel EEG, written by an
+acquisition thread and read as zero-copy views, plus online timestamp
+dejittering for LSL chunks
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class SampleRing:
+    """
+    Ring buffer of multichannel samples and their timestamps.
+
+    The ring is stored twice over (a "mirrored" ring of 2 x capacity rows,
+    every sample written at position p and p + capacity), so the newest N
+    samples are always one contiguous slice. Readers get NumPy views into
+    the ring instead of copies.
+
+    One thread writes; any number of readers may read. A view stays valid
+    until the writer has written `capacity - N` further samples, so size
+    the ring a few seconds longer than the longest window read.
+    """
+
+    def __init__(self, capacity: int, channels: int, dtype=np.float32):
+        """
+        Initialize the ring.
+
+        Args:
+            capacity: Samples held (per channel)
+            channels: Number of channels
+            dtype: Sample data type
+        """
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.zeros((2 * capacity, channels), dtype=dtype)
+        self._times = np.zeros(2 * capacity)
+        self._written = 0  # samples ever written; published after the data
+
+    @property
+    def written(self) -> int:
+        """Total number of samples ever written."""
+        return self._written
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def write(self, samples: np.ndarray, timestamps: np.ndarray) -> None:
+        """
+        Append samples (writer only).
+
+        Args:
+            samples: Array of shape (n, channels)
+            timestamps: Array of n timestamps (seconds)
+        """
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            timestamps = timestamps[-self.capacity:]
+            skipped, n = n - self.capacity, self.capacity
+        else:
+            skipped = 0
+
+        capacity = self.capacity
+        position = (self._written + skipped) % capacity
+        first = min(n, capacity - position)
+
+        for buffer, values in ((self._data, samples), (self._times, timestamps)):
+            buffer[position:position + first] = values[:first]
+            buffer[position + capacity:position + capacity + first] = values[:first]
+            if first < n:
+                buffer[:n - first] = values[first:]
+                buffer[capacity:capacity + n - first] = values[first:]
+
+        self._written += skipped + n  # publish only after the data is in place
+
+    def latest(self, n: int, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the newest samples as views into the ring.
+
+        Args:
+            n: Number of samples (clipped to what is buffered)
+            end: Sample count to read up to (defaults to everything written)
+
+        Returns:
+            Tuple of (samples of shape (n, channels), timestamps), oldest first
+        """
+        written = self._written if end is None else end
+        n = max(0, min(n, written, self.capacity))
+        stop = written % self.capacity + self.capacity
+        return self._data[stop - n:stop], self._times[stop - n:stop]
+
+    def latest_seconds(self, seconds: float, sample_rate: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the newest `seconds` of samples as views into the ring.
+
+        Args:
+            seconds: Window length
+            sample_rate: Nominal sample rate (Hz)
+
+        Returns:
+            Same as latest()
+        """
+        return self.latest(int(round(seconds * sample_rate)))
+
+    def reader(self, from_start: bool = False) -> 'SampleReader':
+        """
+        Create a reader with its own cursor.
+
+        Args:
+            from_start: Start at the oldest buffered sample instead of only
+                        seeing samples written from now on
+
+        Returns:
+            New SampleReader
+        """
+        return SampleReader(self, from_start)
+
+
+class SampleReader:
+    """
+    Cursor over a SampleRing returning each sample once.
+
+    Attributes:
+        dropped: Samples overwritten before this reader got to them
+    """
+
+    def __init__(self, ring: SampleRing, from_start: bool = False):
+        """
+        Initialize the reader.
+
+        Args:
+            ring: Ring to read
+            from_start: Start at the oldest buffered sample
+        """
+        self.ring = ring
+        written = ring.written
+        self.cursor = max(0, written - ring.capacity) if from_start else written
+        self.dropped = 0
+
+    def read(self, max_samples: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the samples written since the last read, as views into the ring.
+
+        Args:
+            max_samples: Upper bound on the samples returned (oldest first)
+
+        Returns:
+            Tuple of (samples of shape (n, channels), timestamps)
+        """
+        written = self.ring.written
+        oldest = written - self.ring.capacity
+        if self.cursor < oldest:
+            self.dropped += oldest - self.cursor
+            self.cursor = oldest
+
+        end = written
+        if max_samples is not None:
+            end = min(end, self.cursor + max_samples)
+        samples, timestamps = self.ring.latest(end - self.cursor, end=end)
+        self.cursor = end
+        return samples, timestamps
+
+    def available(self) -> int:
+        """Number of samples waiting to be read (at most the ring capacity)."""
+        return min(self.ring.written - self.cursor, self.ring.capacity)
+
+
+class TimestampDejitterer:
+    """
+    Smooth LSL timestamps with an exponentially weighted linear fit.
+
+    LSL stamps each chunk when it is pushed, so consecutive samples carry
+    Bluetooth and scheduling jitter of several milliseconds. Sample clocks
+    are regular, though, so timestamps are refitted as t = a + b * n (n =
+    sample index) by exponentially forgetting least squares: the offset
+    follows clock drift and b is the stream's effective sample period.
+    Each chunk is fitted in a few vectorized operations.
+
+    If a chunk starts far from where the fit predicts (samples lost, or
+    the stream restarted), the fit starts over.
+    """
+
+    GAP_TOLERANCE = 0.25  # seconds off the fit that count as a gap
+    MIN_SPAN = 2.0        # seconds of samples before the period is fitted too
+
+    def __init__(self, sample_rate: float, half_life: float = 90.0):
+        """
+        Initialize the dejitterer.
+
+        Args:
+            sample_rate: Nominal sample rate (Hz)
+            half_life: Seconds after which a sample's weight has halved
+        """
+        self.sample_rate = sample_rate
+        self.nominal_period = 1.0 / sample_rate
+        self.forget = 0.5 ** (1.0 / (half_life * sample_rate))
+        self.gaps = 0
+        # Per chunk length: (x, weights, weights * x, decay, sum w, sum w*x, sum w*x*x)
+        self._plans: Dict[int, Tuple] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the fit (e.g. after reconnecting)."""
+        self._t_ref: Optional[float] = None
+        # Weighted sums over x (sample index relative to the next sample)
+        # and t (seconds since _t_ref): weight, x, t, x*x, x*t
+        self._sums = (0.0, 0.0, 0.0, 0.0, 0.0)
+        self._count = 0
+        self.period = self.nominal_period
+        self._offset = 0.0
+
+    @property
+    def effective_rate(self) -> float:
+        """Sample rate estimated from the timestamps (Hz)."""
+        return 1.0 / self.period
+
+    def process(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Dejitter the timestamps of the next chunk.
+
+        Args:
+            timestamps: Raw timestamps of consecutive samples (seconds)
+
+        Returns:
+            Smoothed timestamps (new array)
+        """
+        t = np.asarray(timestamps, dtype=np.float64)
+        m = len(t)
+        if m == 0:
+            return t
+
+        if self._t_ref is None:
+            self._t_ref = float(t[0])
+        elif abs(t[0] - self._t_ref - self._offset) > self.GAP_TOLERANCE:
+            self.gaps += 1
+            self.reset()
+            self._t_ref = float(t[0])
+
+        t = t - self._t_ref
+        x, weights, weighted_x, decay, w_sum, wx_sum, wxx_sum = self._get_plan(m)
+
+        s0, sx, st, sxx, sxt = self._sums
+        s0 = s0 * decay + w_sum
+        sx = sx * decay + wx_sum
+        st = st * decay + float(weights @ t)
+        sxx = sxx * decay + wxx_sum
+        sxt = sxt * decay + float(weighted_x @ t)
+
+        # Move the origin to the sample after this chunk: x -> x - m
+        sxx -= 2 * m * sx - m * m * s0
+        sxt -= m * st
+        sx -= m * s0
+        self._sums = (s0, sx, st, sxx, sxt)
+        self._count += m
+
+        determinant = s0 * sxx - sx * sx
+        period = self.nominal_period
+        if self._count * self.nominal_period >= self.MIN_SPAN and determinant > 0:
+            fitted = (s0 * sxt - sx * st) / determinant
+            # Implausible rates (more than 5% off nominal) keep the nominal period
+            if abs(fitted - self.nominal_period) < 0.05 * self.nominal_period:
+                period = fitted
+        self.period = period
+
+        # Fitted time of the next (not yet received) sample
+        self._offset = (st - period * sx) / s0
+        return self._t_ref + self._offset + period * (x - m)
+
+    def _get_plan(self, m: int) -> Tuple:
+        """Index vector, weights and weighted moments for an m-sample chunk."""
+        plan = self._plans.get(m)
+        if plan is None:
+            x = np.arange(m, dtype=np.float64)
+            weights = self.forget ** (m - 1 - x)
+            weighted_x = weights * x
+            plan = (x, weights, weighted_x, self.forget ** m,
+                    float(weights.sum()), float(weighted_x.sum()), float(weighted_x @ x))
+            self._plans[m] = plan
+        return plan
@@ -0,0 +1,402 @@
+"""
+Score Post-Processing
+Streaming outlier rejection, temporal smoothing and trends for protocol
+scores, vectorized over all score streams with constant memory
+"""
+
+import logging
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class P2Quantiles:
+    """
+    Streaming quantile estimates (P² algorithm, Jain & Chlamtac 1985).
+
+    Each quantile of each stream is tracked by five markers (minimum,
+    p/2, p, (1+p)/2, maximum) whose heights are adjusted by piecewise
+    parabolic interpolation as observations arrive. Memory is constant
+    (5 markers per quantile and stream) and every update is a handful of
+    vectorized operations over all quantiles and streams at once; no
+    observations are kept beyond the first five.
+    """
+
+    MIN_COUNT = 5  # observations before estimates exist
+
+    def __init__(self, probabilities: Sequence[float], streams: int):
+        """
+        Initialize the estimator.
+
+        Args:
+            probabilities: Quantiles to track, each in (0, 1)
+            streams: Number of independent streams
+
+        Raises:
+            ValueError: If a probability is outside (0, 1)
+        """
+        p = np.asarray(probabilities, dtype=np.float64)
+        if np.any((p <= 0) | (p >= 1)):
+            raise ValueError(f"Quantile probabilities must lie in (0, 1), got {list(probabilities)}")
+        self.probabilities = p
+        self.streams = streams
+        # Desired marker position increments per observation, shape (quantiles, 1, 5)
+        self._increments = np.stack((np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)), axis=-1)[:, None]
+        self.reset()
+
+    def reset(self, streams: Optional[np.ndarray] = None) -> None:
+        """
+        Forget observations.
+
+        Args:
+            streams: Indexes of the streams to restart (default: all)
+        """
+        if streams is not None:
+            self.count[streams] = 0
+            self._heights[:, streams] = 0.0
+            self._positions[:, streams] = 0.0
+            return
+        shape = (len(self.probabilities), self.streams, 5)
+        self.count = np.zeros(self.streams, dtype=np.int64)
+        self._first = np.zeros((self.streams, self.MIN_COUNT))
+        self._heights = np.zeros(shape)
+        self._positions = np.zeros(shape)
+
+    def update(self, values: np.ndarray, valid: np.ndarray) -> None:
+        """
+        Add one observation to each valid stream.
+
+        Args:
+            values: One value per stream
+            valid: Streams to update (others are left unchanged)
+        """
+        warming = valid & (self.count < self.MIN_COUNT)
+        ready = valid & ~warming
+        if warming.any():
+            streams = np.flatnonzero(warming)
+            self._first[streams, self.count[streams]] = values[streams]
+        self.count[valid] += 1
+
+        started = warming & (self.count == self.MIN_COUNT)
+        if started.any():
+            self._heights[:, started] = np.sort(self._first[started], axis=-1)
+            self._positions[:, started] = np.arange(5.0)
+
+        if ready.all():
+            self._step(slice(None), values)  # usual case: views, no copies
+        elif ready.any():
+            self._step(np.flatnonzero(ready), values)
+
+    def _step(self, streams: Union[np.ndarray, slice], values: np.ndarray) -> None:
+        """P² update of the given streams (all quantiles at once)."""
+        q = self._heights[:, streams]
+        n = self._positions[:, streams]
+        x = values[streams][None]  # (1, k), broadcast over quantiles
+
+        # Extend the extremes, then shift the positions of markers above x
+        q[..., 0] = np.minimum(q[..., 0], x)
+        q[..., 4] = np.maximum(q[..., 4], x)
+        n[..., 1:4] += x[..., None] < q[..., 1:4]
+        n[..., 4] += 1
+        desired = (self.count[streams] - 1)[None, :, None] * self._increments
+
+        # Move interior markers that drifted at least one position from their target
+        for i in (1, 2, 3):
+            offset = desired[..., i] - n[..., i]
+            up = (offset >= 1) & (n[..., i + 1] - n[..., i] > 1)
+            down = (offset <= -1) & (n[..., i - 1] - n[..., i] < -1)
+            step = np.where(up, 1.0, -1.0)
+
+            qi, below, above = q[..., i], q[..., i - 1], q[..., i + 1]
+            ni, n_below, n_above = n[..., i], n[..., i - 1], n[..., i + 1]
+            parabolic = qi + step / (n_above - n_below) * (
+                (ni - n_below + step) * (above - qi) / (n_above - ni)
+                + (n_above - ni - step) * (qi - below) / (ni - n_below)
+            )
+            linear = qi + step * (np.where(up, above, below) - qi) / (np.where(up, n_above, n_below) - ni)
+            moved = np.where((below < parabolic) & (parabolic < above), parabolic, linear)
+
+            move = up | down
+            q[..., i] = np.where(move, moved, qi)
+            n[..., i] += np.where(move, step, 0.0)
+
+        self._heights[:, streams] = q
+        self._positions[:, streams] = n
+
+    @property
+    def quantiles(self) -> np.ndarray:
+        """
+        Estimates, shape (quantiles, streams); NaN before MIN_COUNT observations.
+
+        Interpolated between the markers around each quantile's position:
+        the middle marker once it has converged, and the exact percentile
+        of the first observations before that.
+        """
+        target = self.probabilities[:, None] * (self.count - 1)
+        n, q = self._positions, self._heights
+        segment = np.sum(n[..., 1:4] <= target[..., None], axis=-1, keepdims=True)
+        n0, n1 = np.take_along_axis(n, segment, -1)[..., 0], np.take_along_axis(n, segment + 1, -1)[..., 0]
+        q0, q1 = np.take_along_axis(q, segment, -1)[..., 0], np.take_along_axis(q, segment + 1, -1)[..., 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            estimate = q0 + (target - n0) / (n1 - n0) * (q1 - q0)
+        return np.where(self.count >= self.MIN_COUNT, estimate, np.nan)
+
+
+class ScoreProcessor:
+    """
+    Post-processing of protocol scores, one stream per protocol.
+
+    Each tick takes one raw score per stream (NaN: no score this tick)
+    and, all streams at once, with O(1) time and memory per stream:
+
+    1. Outlier rejection (`outlier_rejection`): 'iqr' flags scores beyond
+       `threshold` interquartile ranges outside the quartiles, estimated
+       with P² (no score history); 'zscore' flags scores more than
+       `threshold` standard deviations from the running mean. Both need 5
+       scores first and look back about `memory` seconds only: two P²
+       estimators restart in turn, the older one setting the fences, and
+       the z-score mean and variance are exponentially weighted. The
+       spread is at least `min_spread` points, so a saturated score (e.g.
+       pinned at 100) does not reject every change. A rejected score is
+       replaced by the stream's last accepted score, but at most
+       `max_consecutive` times in a row: the next one is taken as a level
+       shift, accepted, and the stream's statistics restart from it.
+    2. Smoothing (`temporal_filter`): 'exponential' uses each protocol's
+       `parameters.smoothing_factor` (the stream's factor); 'moving_average'
+       averages the last `window_size` scores with a running sum.
+    3. Trend (`feedback.include_trends`): slope of an exponentially
+       weighted least squares line through the cleaned scores, with a
+       memory of about `trend_window` seconds, in score points per second.
+       Sums are kept relative to the newest tick, so they stay bounded.
+    """
+
+    METHODS = {'outlier_rejection': ('iqr', 'zscore'), 'temporal_filter': ('exponential', 'moving_average')}
+
+    def __init__(self, global_config: Dict, smoothing_factors: Sequence[float], update_interval: float = 1.0):
+        """
+        Initialize the processor.
+
+        Args:
+            global_config: The 'global' section of protocols.yaml
+            smoothing_factors: Exponential smoothing factor of each stream
+            update_interval: Seconds between ticks
+
+        Raises:
+            ValueError: If a method is unknown or a window is not positive
+        """
+        for section, methods in self.METHODS.items():
+            method = global_config.get(section, {}).get('method', methods[0])
+            if method not in methods:
+                raise ValueError(f"global.{section}.method must be one of {methods}, got '{method}'")
+
+        outliers = global_config.get('outlier_rejection', {})
+        self.reject_outliers = outliers.get('enabled', False)
+        self.outlier_method = outliers.get('method', 'iqr')
+        self.outlier_threshold = outliers.get('threshold', 3.0)
+        self.outlier_memory = outliers.get('memory', 60)
+        self.min_spread = outliers.get('min_spread', 2.0)
+        self.max_consecutive = int(outliers.get('max_consecutive', 5))
+        if not self.outlier_memory > 0 or self.max_consecutive < 1 or self.min_spread < 0:
+            raise ValueError("outlier_rejection.memory and max_consecutive must be positive "
+                             "and min_spread non-negative")
+
+        temporal = global_config.get('temporal_filter', {})
+        self.smoothing = temporal.get('enabled', False)
+        self.smoothing_method = temporal.get('method', 'exponential')
+        self.window_size = int(temporal.get('window_size', 5))
+
+        feedback = global_config.get('feedback', {})
+        self.include_trends = feedback.get('include_trends', False)
+        self.trend_window = feedback.get('trend_window', 10)
+        self.trend_threshold = feedback.get('trend_threshold', 0.5)
+        if self.window_size < 1 or not self.trend_window > 0:
+            raise ValueError("temporal_filter.window_size and feedback.trend_window must be positive")
+
+        self.streams = len(smoothing_factors)
+        self.update_interval = update_interval
+        self._factors = np.asarray(smoothing_factors, dtype=np.float64)
+        self._forgetting = max(0.0, 1.0 - update_interval / self.trend_window)
+        # Scores the rejection statistics are based on: the active P² estimator
+        # holds half to all of memory_ticks, the z-score weights 1 / memory_ticks
+        self.memory_ticks = max(2 * P2Quantiles.MIN_COUNT, int(round(self.outlier_memory / update_interval)))
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        """True if any stage is enabled."""
+        return self.reject_outliers or self.smoothing or self.include_trends
+
+    def reset(self) -> None:
+        """Forget all scores."""
+        n = self.streams
+        self._quartiles = (P2Quantiles((0.25, 0.75), n), P2Quantiles((0.25, 0.75), n))
+        self._count = np.zeros(n)  # exponentially weighted mean / variance for 'zscore'
+        self._mean = np.zeros(n)
+        self._var = np.zeros(n)
+        self._rejected_run = np.zeros(n, dtype=np.int64)
+        self._last = np.full(n, np.nan)
+        self._smoothed = np.full(n, np.nan)
+        self._window = np.zeros((self.window_size, n))
+        self._window_sum = np.zeros(n)
+        self._window_count = np.zeros(n)
+        self._window_next = np.zeros(n, dtype=np.int64)
+        self._trend_sums = np.zeros((5, n))  # weight, Σt, Σt², Σy, Σty (t = 0 at the newest tick)
+        self.outliers_rejected = np.zeros(n, dtype=np.int64)
+        self.level_shifts = np.zeros(n, dtype=np.int64)
+
+    def process(self, scores: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Process one tick of raw scores.
+
+        Args:
+            scores: Raw score per stream (NaN where a stream has no score)
+
+        Returns:
+            Dictionary of arrays (one value per stream): 'score' (cleaned
+            and smoothed; NaN until a stream has a score), 'outlier'
+            (bool) and 'trend' (score points per second)
+        """
+        x = np.asarray(scores, dtype=np.float64)
+        valid = np.isfinite(x)
+
+        outlier = np.zeros(self.streams, dtype=bool)
+        if self.reject_outliers:
+            outlier = valid & self._detect_outliers(x)
+            self._rejected_run = np.where(outlier, self._rejected_run + 1, np.where(valid, 0, self._rejected_run))
+            shift = self._rejected_run > self.max_consecutive
+            if shift.any():
+                # Too many rejections in a row: the level moved, start over from here
+                outlier &= ~shift
+                self._rejected_run[shift] = 0
+                self._restart_statistics(np.flatnonzero(shift))
+                self.level_shifts += shift
+            self._update_statistics(x, valid)
+            self.outliers_rejected += outlier
+
+        accepted = valid & ~outlier
+        self._last = np.where(accepted, x, self._last)
+        cleaned = self._last
+        current = valid & np.isfinite(cleaned)  # streams with a score this tick
+
+        score = self._smooth(cleaned, current) if self.smoothing else np.where(valid, cleaned, np.nan)
+        trend = self._trend(cleaned, current) if self.include_trends else np.zeros(self.streams)
+        return {'score': score, 'outlier': outlier, 'trend': trend}
+
+    def trend_direction(self, trend: float) -> str:
+        """'improving', 'declining' or 'stable' for a slope in points per second."""
+        if trend > self.trend_threshold:
+            return 'improving'
+        if trend < -self.trend_threshold:
+            return 'declining'
+        return 'stable'
+
+    @property
+    def quartiles(self) -> np.ndarray:
+        """Quartiles setting the 'iqr' fences, shape (2, streams); NaN while warming up."""
+        first, second = self._quartiles
+        return np.where(first.count >= second.count, first.quantiles, second.quantiles)
+
+    def _detect_outliers(self, x: np.ndarray) -> np.ndarray:
+        """Flag scores outside the fences of the recent scores."""
+        k = self.outlier_threshold
+        with np.errstate(invalid='ignore'):
+            if self.outlier_method == 'iqr':
+                lower, upper = self.quartiles
+                spread = np.maximum(upper - lower, self.min_spread)
+                return (x < lower - k * spread) | (x > upper + k * spread)  # False while NaN
+
+            ready = self._count >= P2Quantiles.MIN_COUNT
+            std = np.maximum(np.sqrt(self._var), self.min_spread)
+            return ready & (np.abs(x - self._mean) > k * std)
+
+    def _update_statistics(self, x: np.ndarray, valid: np.ndarray) -> None:
+        """Fold valid scores into the rejection statistics."""
+        if self.outlier_method == 'iqr':
+            first, second = self._quartiles
+            first.update(x, valid)
+            second.update(x, valid)
+            # Once the younger estimator has half the memory, the older one
+            # restarts (ties: the first), so the fences never cover more
+            # than memory_ticks scores or fewer than half of them
+            older_is_first = first.count >= second.count
+            younger_count = np.where(older_is_first, second.count, first.count)
+            restart = younger_count >= self.memory_ticks // 2
+            if restart.any():
+                first.reset(np.flatnonzero(restart & older_is_first))
+                second.reset(np.flatnonzero(restart & ~older_is_first))
+            return
+
+        # Welford's update with the count capped at memory_ticks: exact at
+        # first, then an exponentially weighted mean and variance
+        value = np.where(valid, x, 0.0)
+        self._count = np.minimum(self._count + valid, self.memory_ticks)
+        weight = np.where(valid, 1.0 / np.maximum(self._count, 1), 0.0)
+        delta = value - self._mean
+        self._mean += weight * delta
+        self._var = (1 - weight) * (self._var + weight * delta * delta)
+
+    def _restart_statistics(self, streams: np.ndarray) -> None:
+        """Forget the rejection statistics of some streams."""
+        for estimator in self._quartiles:
+            estimator.reset(streams)
+        self._count[streams] = 0
+        self._mean[streams] = 0.0
+        self._var[streams] = 0.0
+
+    def _smooth(self, x: np.ndarray, current: np.ndarray) -> np.ndarray:
+        """Smooth the streams that have a score this tick."""
+        if self.smoothing_method == 'exponential':
+            blended = np.where(np.isnan(self._smoothed), x,
+                               self._factors * self._smoothed + (1 - self._factors) * x)
+            self._smoothed = np.where(current, blended, self._smoothed)
+            return self._smoothed
+
+        # Moving average: running sum over a ring of the last window_size scores
+        streams = np.flatnonzero(current)
+        slots = self._window_next[streams]
+        self._window_sum[streams] += x[streams] - self._window[slots, streams]
+        self._window[slots, streams] = x[streams]
+        self._window_next[streams] = (slots + 1) % self.window_size
+        self._window_count[streams] = np.minimum(self._window_count[streams] + 1, self.window_size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self._window_count > 0, self._window_sum / self._window_count, np.nan)
+
+    def _trend(self, y: np.ndarray, current: np.ndarray) -> np.ndarray:
+        """Update the weighted least squares sums and return the slopes."""
+        weight, st, stt, sy, sty = self._trend_sums
+        f = self._forgetting
+        # Shift the time origin one tick back (t -> t - 1), decay, add the new point at t = 0
+        value = np.where(current, y, 0.0)
+        updated = np.stack((
+            f * weight + 1,
+            f * (st - weight),
+            f * (stt - 2 * st + weight),
+            f * sy + value,
+            f * (sty - sy)
+        ))
+        self._trend_sums = np.where(current, updated, self._trend_sums)
+
+        weight, st, stt, sy, sty = self._trend_sums
+        denominator = weight * stt - st * st
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = np.where(denominator > 1e-9, (weight * sty - st * sy) / denominator, 0.0)
+        return slope / self.update_interval
+
+    def get_stats(self) -> Dict:
+        """
+        Get processing statistics.
+
+        Returns:
+            Dictionary with the enabled stages, and outliers rejected and
+            level shifts accepted per stream
+        """
+        return {
+            'outlier_rejection': self.outlier_method if self.reject_outliers else None,
+            'temporal_filter': self.smoothing_method if self.smoothing else None,
+            'trends': self.include_trends,
+            'outliers_rejected': self.outliers_rejected.tolist(),
+            'level_shifts': self.level_shifts.tolist()
+        }
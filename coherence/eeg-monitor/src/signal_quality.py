@@ -0,0 +1,226 @@
+"""
+Signal Quality Monitor
+Continuous per-channel electrode contact, noise and line interference
+scores from the band power engine's spectra, for live headset fitting
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from .artifacts import AMPLITUDE, DERIVATIVE, FLAT, VARIANCE, ArtifactDetector
+    from .band_power import BandPowerEngine
+    from .sample_ring import SampleRing
+except ImportError:
+    from artifacts import AMPLITUDE, DERIVATIVE, FLAT, VARIANCE, ArtifactDetector
+    from band_power import BandPowerEngine
+    from sample_ring import SampleRing
+
+
+logger = logging.getLogger(__name__)
+
+
+# Quality labels by minimum score (same names as connection_status.channel_quality)
+QUALITY_LEVELS = ((85, 'excellent'), (70, 'good'), (40, 'fair'), (1e-9, 'poor'))
+
+
+class SignalQualityMonitor:
+    """
+    Per-channel signal quality, updated on every band power window.
+
+    The monitor registers as a spectrum consumer of a BandPowerEngine, so
+    it costs no FFT of its own. For each window (rejected ones included,
+    since a bad fit is exactly when the operator needs feedback) and all
+    channels at once it derives:
+
+    - variance: total power of the filtered spectrum (Parseval); too low
+      means poor contact or an electrode off the head, too high means noise
+    - high_frequency_ratio: share of the filtered power at >= 30 Hz
+      (muscle, electrode noise)
+    - line_noise_ratio: mains power (3 bins around the notch frequency)
+      relative to the EEG. The filtered signal has had its mains notched
+      out, so these bins are a Hann-windowed DFT of the raw window: a
+      precomputed (3 x window) matrix product instead of a full FFT
+    - dc_offset: mean of the raw window (reported only)
+    - artifacts: the detector's flags for the window (flat forces a score
+      of 0, any other artifact caps it at ARTIFACT_CAP)
+
+    Each check is scored 0-100 by piecewise linear interpolation between
+    the configured thresholds (score 70 = at the limit of 'good'); the
+    channel score is the worst check, the overall score the worst channel.
+    """
+
+    ARTIFACT_CAP = 50  # highest score of a window with blinks, steps or muscle
+    HIGH_FREQUENCY = 30.0  # Hz, start of the muscle / noise band
+
+    def __init__(self, config: Dict, engine: BandPowerEngine, raw_ring: Optional[SampleRing] = None):
+        """
+        Initialize the monitor and register it with the engine.
+
+        Args:
+            config: Configuration dictionary (signal_quality and
+                    signal_processing.notch)
+            engine: Band power engine whose spectra are scored
+            raw_ring: Unfiltered ring the engine's ring was filtered from
+                      (same sample count), for line noise and DC offset.
+                      Without it, line noise is read from the engine's
+                      spectrum (only meaningful with the notch disabled)
+        """
+        quality = config.get('signal_quality', {})
+        notch = config.get('signal_processing', {}).get('notch', {})
+        self.enabled = quality.get('enabled', True)
+        self.update_interval = quality.get('update_interval', 1.0)
+        self.channel_names: List[str] = list(engine.channel_names)
+        self.engine = engine
+        self.raw_ring = raw_ring
+
+        # Score curves: (points, scores) for np.interp
+        flat = quality.get('flat_variance', 1.0)
+        low = quality.get('low_variance', 10.0)
+        high = quality.get('high_variance', 1000.0)
+        self._variance_curve = (
+            np.log10([flat, low, 2 * low, high / 2, high, 10 * high]),
+            [0, 70, 100, 100, 70, 0]
+        )
+        line_limit = quality.get('max_line_noise_ratio', 0.1)
+        high_frequency_limit = quality.get('max_high_frequency_ratio', 0.3)
+        self._line_curve = ([0, line_limit, 3 * line_limit], [100, 70, 0])
+        self._high_frequency_curve = ([0, high_frequency_limit, 3 * high_frequency_limit], [100, 70, 0])
+        self.flat_variance = flat
+
+        freqs = engine.freqs
+        self._high_frequency_start = int(np.searchsorted(freqs, self.HIGH_FREQUENCY))
+
+        # Line noise bins and their DFT rows (Hann-windowed, PSD x bin width
+        # scaling as the engine's spectrum)
+        self.line_frequency = float(notch.get('frequency', 60))
+        center = int(round(self.line_frequency / engine.frequency_resolution))
+        self._line_bins = np.arange(max(center - 1, 1), min(center + 2, len(freqs) - 1))
+        n = engine.window_samples
+        window = np.hanning(n + 1)[:-1]
+        self._line_dft = np.exp(-2j * np.pi * np.outer(self._line_bins, np.arange(n)) / n) * window
+        self._line_scale = 2.0 / (n * float(np.sum(window ** 2)))
+
+        self.latest_report: Optional[Dict] = None
+        self.updates = 0
+        self._elapsed = 0.0
+        engine.add_spectrum_consumer(self.update)
+
+    def update(self, power: np.ndarray, end: int, flags: Optional[np.ndarray]) -> None:
+        """
+        Score one window (called by the engine for every hop).
+
+        Args:
+            power: Filtered power per bin (µV²), shape (bins, channels)
+            end: Sample count at the window's end
+            flags: Artifact flag bits per channel, or None
+        """
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+
+        variance = power.sum(axis=0)
+        high_frequency_ratio = power[self._high_frequency_start:].sum(axis=0) / np.maximum(variance, 1e-12)
+
+        dc_offset = None
+        if self.raw_ring is not None:
+            raw, _ = self.raw_ring.latest(self.engine.window_samples, end=end)
+            raw = np.asarray(raw, dtype=np.float64)
+            dc_offset = raw.mean(axis=0)
+            line_bins = self._line_dft @ (raw - dc_offset)
+            line_power = (line_bins.real ** 2 + line_bins.imag ** 2).sum(axis=0) * self._line_scale
+        else:
+            line_power = power[self._line_bins].sum(axis=0)
+        line_noise_ratio = line_power / np.maximum(variance + line_power, 1e-12)
+
+        scores = np.minimum.reduce([
+            np.interp(np.log10(np.maximum(variance, 1e-12)), *self._variance_curve),
+            np.interp(line_noise_ratio, *self._line_curve),
+            np.interp(high_frequency_ratio, *self._high_frequency_curve)
+        ])
+        if flags is not None:
+            scores = np.where(flags & (AMPLITUDE | DERIVATIVE | VARIANCE), np.minimum(scores, self.ARTIFACT_CAP), scores)
+            scores = np.where(flags & FLAT, 0.0, scores)
+        scores = np.where(variance < self.flat_variance, 0.0, scores)
+
+        labels = [self.label(score) for score in scores.tolist()]
+        details = {
+            'variance': variance.tolist(),
+            'line_noise_ratio': line_noise_ratio.tolist(),
+            'high_frequency_ratio': high_frequency_ratio.tolist(),
+            'dc_offset': dc_offset.tolist() if dc_offset is not None else None,
+            'artifacts': ArtifactDetector.describe(flags, self.channel_names) if flags is not None else {}
+        }
+        self.latest_report = {
+            'signal_quality': self.label(float(scores.min())),
+            'channel_quality': dict(zip(self.channel_names, labels)),
+            'channel_scores': dict(zip(self.channel_names, np.round(scores, 1).tolist())),
+            'details': {
+                key: dict(zip(self.channel_names, value)) if isinstance(value, list) else value
+                for key, value in details.items()
+            },
+            'sample_count': end
+        }
+
+        self.updates += 1
+        self._elapsed += time.perf_counter() - start
+
+    @staticmethod
+    def label(score: float) -> str:
+        """Quality label of a 0-100 score ('disconnected' at 0)."""
+        for minimum, name in QUALITY_LEVELS:
+            if score >= minimum:
+                return name
+        return 'disconnected'
+
+    def get_report(self) -> Optional[Dict]:
+        """
+        Get the latest quality report.
+
+        Returns:
+            Dictionary with overall signal_quality, per-channel
+            channel_quality labels and channel_scores (0-100), per-check
+            details by channel and the window's sample_count; None before
+            the first window
+        """
+        return self.latest_report
+
+    def get_stats(self) -> Dict:
+        """
+        Get monitor statistics.
+
+        Returns:
+            Dictionary with the number of windows scored and their mean
+            cost in microseconds
+        """
+        return {
+            'enabled': self.enabled,
+            'updates': self.updates,
+            'mean_us': self._elapsed / self.updates * 1e6 if self.updates else 0.0
+        }
+
+    async def stream(self, on_quality: Callable[[Dict], Awaitable[None]]) -> None:
+        """
+        Publish the latest report every `signal_quality.update_interval` seconds.
+
+        The engine's stream (or poll) must be running: reports are only
+        produced as its windows are computed.
+
+        Args:
+            on_quality: Coroutine called with each new report
+        """
+        published = None
+        while True:
+            try:
+                report = self.latest_report
+                if report is not None and report is not published:
+                    published = report
+                    await on_quality(report)
+            except Exception as e:
+                logger.error(f"Error publishing signal quality: {e}", exc_info=True)
+
+            await asyncio.sleep(self.update_interval)
@@ -0,0 +1,340 @@
+"""
+EEG Waveform Streaming
+Anti-aliased polyphase decimation of the filtered EEG to display rates,
+and the binary eeg_waveform frame shared by every client at a rate
+"""
+
+import functools
+import logging
+import struct
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import signal
+
+
+logger = logging.getLogger(__name__)
+
+
+# Binary frame header (little-endian, 32 bytes): magic, version, encoding,
+# channels, reserved, display rate (Hz), scale (µV per unit), timestamp of
+# the first sample, samples per channel, index of the first sample
+FRAME_HEADER = struct.Struct('<4sBBBBffdII')
+FRAME_MAGIC = b'EEGW'
+FRAME_VERSION = 1
+ENCODINGS = {'float16': (1, '<f2'), 'int16': (2, '<i2')}
+
+TAPS_PER_PHASE = 16  # FIR length per polyphase branch (longer: sharper anti-aliasing)
+
+
+@functools.lru_cache(maxsize=16)
+def design_decimator(sample_rate: float, factor: int) -> np.ndarray:
+    """
+    Design the anti-aliasing lowpass for decimation by `factor`.
+
+    The cutoff is 80% of the output Nyquist frequency (Hamming windowed
+    FIR, TAPS_PER_PHASE * factor + 1 taps). Designs are cached and shared
+    between decimators (do not modify them).
+
+    Args:
+        sample_rate: Input sample rate (Hz)
+        factor: Integer decimation factor (1 = no filtering)
+
+    Returns:
+        FIR taps
+
+    Raises:
+        ValueError: If factor < 1
+    """
+    if factor < 1:
+        raise ValueError(f"Decimation factor must be >= 1, got {factor}")
+    if factor == 1:
+        return np.ones(1)
+    return signal.firwin(TAPS_PER_PHASE * factor + 1, 0.4 * sample_rate / factor, fs=sample_rate)
+
+
+class PolyphaseDecimator:
+    """
+    Streaming FIR decimation of a (samples x channels) stream.
+
+    Only every `factor`-th output of the lowpass is computed, each as one
+    dot product over the last len(taps) inputs: the polyphase form of
+    filter-then-downsample, costing len(taps) multiply-adds per output
+    sample instead of per input sample. Outputs fall on input samples
+    whose index (since reset) is a multiple of `factor`, so any chunking
+    gives the same result; the last len(taps) - 1 inputs are carried
+    between chunks. Output timestamps are corrected for the filter's
+    (linear phase) group delay.
+    """
+
+    def __init__(self, sample_rate: float, factor: int, channels: int):
+        """
+        Initialize the decimator.
+
+        Args:
+            sample_rate: Input sample rate (Hz)
+            factor: Integer decimation factor
+            channels: Number of channels
+        """
+        self.sample_rate = sample_rate
+        self.factor = factor
+        self.channels = channels
+        self.output_rate = sample_rate / factor
+        self.taps = design_decimator(sample_rate, factor)
+        self._kernel = self.taps[::-1].copy()
+        self.delay = (len(self.taps) - 1) / 2 / sample_rate  # seconds
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the carried samples and restart the output grid."""
+        self._history: Optional[np.ndarray] = None
+        self.samples_in = 0
+        self.samples_out = 0
+
+    def process(self, samples: np.ndarray, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decimate the next chunk.
+
+        Args:
+            samples: Chunk of shape (n, channels)
+            timestamps: Timestamp of each sample, shape (n,)
+
+        Returns:
+            Tuple of (decimated samples of shape (k, channels), timestamps)
+        """
+        n = len(samples)
+        if n == 0:
+            return np.empty((0, self.channels)), np.empty(0)
+
+        x = np.asarray(samples, dtype=np.float64)
+        carry = len(self.taps) - 1
+        if self._history is None:  # start from a steady state instead of zeros
+            self._history = np.repeat(x[:1], carry, axis=0)
+        extended = np.concatenate((self._history, x))
+
+        # Chunk indices of the outputs; window p ends at chunk sample p
+        positions = np.arange(-self.samples_in % self.factor, n, self.factor)
+        output = sliding_window_view(extended, len(self.taps), axis=0)[positions] @ self._kernel
+
+        self._history = extended[len(extended) - carry:]
+        self.samples_in += n
+        self.samples_out += len(positions)
+        return output, np.asarray(timestamps, dtype=np.float64)[positions] - self.delay
+
+
+def encode_frame(samples: np.ndarray, timestamp: float, sample_rate: float, first_index: int,
+                 encoding: str = 'float16', resolution: float = 0.02) -> bytes:
+    """
+    Encode samples as a binary eeg_waveform frame.
+
+    Args:
+        samples: Samples of shape (n, channels), µV
+        timestamp: Time of the first sample
+        sample_rate: Sample rate of the frame (Hz)
+        first_index: Index of the first sample in the stream (lets
+                     clients detect missing frames)
+        encoding: 'float16' (µV) or 'int16' (multiples of `resolution`)
+        resolution: µV per int16 step (values beyond the range saturate)
+
+    Returns:
+        FRAME_HEADER followed by the samples, interleaved (sample-major)
+
+    Raises:
+        ValueError: If the encoding is unknown
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown waveform encoding: '{encoding}' (use {', '.join(ENCODINGS)})")
+    code, dtype = ENCODINGS[encoding]
+
+    if encoding == 'int16':
+        scale = resolution
+        payload = np.clip(np.rint(samples / resolution), -32768, 32767).astype(dtype)
+    else:
+        scale = 1.0
+        payload = np.asarray(samples).astype(dtype)
+
+    n, channels = payload.shape
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, code, channels, 0, sample_rate, scale,
+                               timestamp, n, first_index & 0xFFFFFFFF)
+    return header + payload.tobytes()
+
+
+def decode_frame(frame: bytes) -> Dict:
+    """
+    Decode a binary eeg_waveform frame (reference for clients).
+
+    Args:
+        frame: Frame bytes
+
+    Returns:
+        Dictionary with encoding, sample_rate, timestamp, first_index and
+        samples (µV, shape (n, channels), float32)
+
+    Raises:
+        ValueError: If the frame is not a valid eeg_waveform frame
+    """
+    if len(frame) < FRAME_HEADER.size:
+        raise ValueError("Frame shorter than its header")
+    magic, version, code, channels, _, sample_rate, scale, timestamp, n, first_index = \
+        FRAME_HEADER.unpack_from(frame)
+    names = {value[0]: name for name, value in ENCODINGS.items()}
+    if magic != FRAME_MAGIC or version != FRAME_VERSION or code not in names:
+        raise ValueError("Not an eeg_waveform frame")
+
+    encoding = names[code]
+    values = np.frombuffer(frame, dtype=ENCODINGS[encoding][1], count=n * channels, offset=FRAME_HEADER.size)
+    return {
+        'encoding': encoding,
+        'sample_rate': sample_rate,
+        'timestamp': timestamp,
+        'first_index': first_index,
+        'samples': values.reshape(n, channels).astype(np.float32) * np.float32(scale)
+    }
+
+
+class WaveformFanout:
+    """
+    Per-client waveform subscriptions, computed and encoded once per rate.
+
+    Clients request a display rate and an encoding. The rate is served as
+    sample_rate / factor for the largest integer factor that does not go
+    below the request. Clients sharing a factor share one decimator, and
+    clients sharing a factor and an encoding share one encoded frame, so
+    the cost per tick grows with the number of distinct settings, not with
+    the number of clients.
+    """
+
+    def __init__(self, config: Dict):
+        """
+        Initialize the fan-out.
+
+        Args:
+            config: Configuration dictionary (muse and websocket.waveform)
+        """
+        muse_config = config['muse']
+        websocket_config = config.get('websocket', {})
+        waveform = websocket_config.get('waveform', {})
+        self.sample_rate = muse_config['sample_rate']
+        self.channel_names: List[str] = list(muse_config['channel_names'])
+        self.enabled = websocket_config.get('stream_raw_waveform', False)
+        self.default_rate = waveform.get('display_rate', 64)
+        self.default_encoding = waveform.get('encoding', 'float16')
+        self.resolution = waveform.get('int16_resolution', 0.02)
+        self.frame_interval = waveform.get('frame_interval', 0.1)
+
+        self.subscriptions: Dict[Hashable, Tuple[int, str]] = {}  # client -> (factor, encoding)
+        self._decimators: Dict[int, PolyphaseDecimator] = {}
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+
+    def factor_for(self, display_rate: float) -> int:
+        """
+        Decimation factor serving a requested display rate.
+
+        Raises:
+            ValueError: If the rate is not positive
+        """
+        if not display_rate > 0:
+            raise ValueError(f"Display rate must be positive, got {display_rate}")
+        return max(1, int(self.sample_rate // display_rate))
+
+    def subscribe(self, client: Hashable, display_rate: Optional[float] = None,
+                  encoding: Optional[str] = None) -> Dict:
+        """
+        Subscribe (or re-subscribe) a client.
+
+        Args:
+            client: Client key (e.g. its connection)
+            display_rate: Requested samples per second per channel
+                          (defaults to websocket.waveform.display_rate)
+            encoding: 'float16' or 'int16' (defaults to the configured one)
+
+        Returns:
+            Settings actually served: display_rate, decimation, encoding,
+            scale, channels, frame_interval
+
+        Raises:
+            ValueError: If the rate or encoding is invalid
+        """
+        encoding = encoding or self.default_encoding
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown waveform encoding: '{encoding}' (use {', '.join(ENCODINGS)})")
+        factor = self.factor_for(float(display_rate or self.default_rate))
+
+        self.subscriptions[client] = (factor, encoding)
+        return {
+            'display_rate': self.sample_rate / factor,
+            'decimation': factor,
+            'encoding': encoding,
+            'scale': self.resolution if encoding == 'int16' else 1.0,
+            'channels': self.channel_names,
+            'frame_interval': self.frame_interval
+        }
+
+    def unsubscribe(self, client: Hashable) -> None:
+        """Stop sending frames to a client."""
+        self.subscriptions.pop(client, None)
+
+    def reset(self) -> None:
+        """Restart every decimator (e.g. after samples were lost)."""
+        for decimator in self._decimators.values():
+            decimator.reset()
+
+    def process(self, samples: np.ndarray, timestamps: np.ndarray) -> List[Tuple[bytes, List[Hashable]]]:
+        """
+        Decimate and encode new samples for all subscribers.
+
+        Args:
+            samples: New filtered samples of shape (n, channels), µV
+            timestamps: Their timestamps
+
+        Returns:
+            List of (frame, clients) pairs, one per distinct (rate,
+            encoding); empty if there are no subscribers or new samples
+        """
+        groups: Dict[Tuple[int, str], List[Hashable]] = {}
+        for client, key in self.subscriptions.items():
+            groups.setdefault(key, []).append(client)
+
+        # Decimators live as long as some client uses their factor
+        factors = {factor for factor, _ in groups}
+        for factor in list(self._decimators):
+            if factor not in factors:
+                del self._decimators[factor]
+
+        decimated = {}
+        for factor in factors:
+            if factor not in self._decimators:
+                self._decimators[factor] = PolyphaseDecimator(self.sample_rate, factor, len(self.channel_names))
+            decimator = self._decimators[factor]
+            first_index = decimator.samples_out
+            output, output_times = decimator.process(samples, timestamps)
+            decimated[factor] = (output, output_times, first_index, decimator.output_rate)
+
+        frames = []
+        for (factor, encoding), clients in groups.items():
+            output, output_times, first_index, rate = decimated[factor]
+            if len(output) == 0:
+                continue
+            frame = encode_frame(output, float(output_times[0]), rate, first_index, encoding, self.resolution)
+            self.frames_encoded += 1
+            self.bytes_encoded += len(frame)
+            frames.append((frame, clients))
+        return frames
+
+    def get_stats(self) -> Dict:
+        """
+        Get fan-out statistics.
+
+        Returns:
+            Dictionary with subscriber count, active decimation factors and
+            frames and bytes encoded (once per shared frame)
+        """
+        return {
+            'enabled': self.enabled,
+            'subscribers': len(self.subscriptions),
+            'decimations': sorted(self._decimators),
+            'frames_encoded': self.frames_encoded,
+            'bytes_encoded': self.bytes_encoded
+        }
@@ -0,0 +1,542 @@
+"""
+WebSocket Server for Real-Time EEG Neurofeedback Streaming
+Broadcasts protocol metrics, band powers, signal quality and binary EEG
+waveform frames to connected browser clients
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple, Union
+
+import websockets
+from websockets.asyncio.server import ServerConnection, serve
+
+try:
+    from .protocol_calculator import ProtocolCalculator
+    from .protocols import BandPowers
+    from .sample_ring import SampleReader
+    from .waveform import WaveformFanout
+except ImportError:
+    from protocol_calculator import ProtocolCalculator
+    from protocols import BandPowers
+    from sample_ring import SampleReader
+    from waveform import WaveformFanout
+
+
+logger = logging.getLogger(__name__)
+
+
+def make_message(msg_type: str, **fields) -> dict:
+    """
+    Build a server-to-client message.
+
+    Args:
+        msg_type: Message type (e.g. 'protocol_metric')
+        **fields: Message fields
+
+    Returns:
+        Message dictionary with 'type' and a Unix 'timestamp'
+    """
+    return {'type': msg_type, 'timestamp': time.time(), **fields}
+
+
+def band_powers_fields(band_powers: BandPowers) -> dict:
+    """Fields of a 'band_powers' message (see WEBSOCKET_PROTOCOL.md)."""
+    legacy = band_powers.to_dict()
+    powers = {band: legacy[band] for band in BandPowers.BANDS}
+    total = sum(powers.values())
+    return {
+        'powers': powers,
+        'channels': legacy.get('channels', {}),
+        'total_power': total,
+        'relative_powers': {band: 100 * value / total if total > 0 else 0.0 for band, value in powers.items()}
+    }
+
+
+class ClientSendQueue:
+    """
+    Outgoing messages for one client, sent in order by a dedicated task.
+
+    Broadcasts (band powers, metrics, connection status, waveform frames)
+    are bounded: with `max_messages` of them waiting, the oldest is
+    dropped, so a client that stops reading loses part of its own backlog
+    instead of stalling streaming or the other clients (a waveform frame
+    carries its first sample index, so the gap is visible). Replies to the
+    client's own requests are never dropped; the per-client message rate
+    limit already bounds them.
+    """
+
+    def __init__(self, websocket: ServerConnection, max_messages: int):
+        """
+        Initialize the queue and start its sender task.
+
+        Args:
+            websocket: Client connection
+            max_messages: Streaming messages held before the oldest is dropped
+        """
+        self.websocket = websocket
+        self.max_messages = max_messages
+        # (message, droppable) in send order
+        self.messages: Deque[Tuple[Union[str, bytes], bool]] = deque()
+        self.droppable = 0
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, message: Union[str, bytes], droppable: bool = True) -> bool:
+        """
+        Queue a message behind everything already queued for this client.
+
+        Args:
+            message: Encoded JSON message or binary waveform frame
+            droppable: False for replies that must be delivered
+
+        Returns:
+            False if the oldest streaming message was dropped to make room
+        """
+        full = droppable and self.droppable >= self.max_messages
+        if full:
+            self._drop_oldest()
+        self.messages.append((message, droppable))
+        self.droppable += droppable
+        self._wakeup.set()
+        return not full
+
+    def close(self) -> None:
+        """Stop sending and discard anything still queued."""
+        self._task.cancel()
+        self.messages.clear()
+        self.droppable = 0
+
+    def _drop_oldest(self) -> None:
+        """Remove the oldest droppable message (replies queued before it stay)."""
+        for index, (_, droppable) in enumerate(self.messages):
+            if droppable:
+                del self.messages[index]
+                self.droppable -= 1
+                self.dropped += 1
+                return
+
+    async def _run(self) -> None:
+        """Send queued messages in order until the connection closes."""
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.messages:
+                    message, droppable = self.messages.popleft()
+                    self.droppable -= droppable
+                    await self.websocket.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class EEGWebSocketServer:
+    """
+    WebSocket server streaming neurofeedback data to browser clients.
+
+    JSON messages are encoded once per broadcast. EEG waveforms are sent
+    only to clients that subscribe ('subscribe_waveform'), as binary
+    frames decimated to the client's display rate; clients with the same
+    rate and encoding share one encoded frame (see WaveformFanout).
+    Everything sent to a client, replies included, goes through its
+    ClientSendQueue, so messages arrive in order and one client that stops
+    reading cannot stall the others.
+    """
+
+    # Close code and reason for each limit
+    CLOSE_REASONS = {
+        'server_full': (1008, "Server full"),
+        'message_size': (1009, "Message too large"),
+        'message_rate': (1008, "Rate limit exceeded"),
+    }
+
+    def __init__(self, config: dict, calculator: Optional[ProtocolCalculator] = None):
+        """
+        Initialize WebSocket server.
+
+        Args:
+            config: Configuration dictionary
+            calculator: Protocol calculator for switch_protocol and
+                        baseline commands
+        """
+        websocket_config = config['websocket']
+        self.host = websocket_config['host']
+        self.port = websocket_config['port']
+        self.cors_origins = websocket_config['cors_origins']
+        self.max_clients = websocket_config.get('max_clients', 10)
+        self.max_message_size = websocket_config.get('max_message_size', 1024)
+        self.max_messages_per_second = websocket_config.get('max_messages_per_second', 10)
+        self.stream_band_powers = websocket_config.get('stream_band_powers', True)
+        self.stream_protocol_metrics = websocket_config.get('stream_protocol_metrics', True)
+        self.client_queue_size = websocket_config.get('client_queue_size', 64)
+        self.calculator = calculator
+
+        self.waveform = WaveformFanout(config)
+
+        # Connected clients and their outgoing queues
+        self.clients: Set[ServerConnection] = set()
+        self.send_queues: Dict[ServerConnection, ClientSendQueue] = {}
+        self.messages_dropped = 0
+
+        # Shutdown event for clean server termination
+        self.shutdown_event = asyncio.Event()
+        self.started_at = time.time()
+
+        # Latest data cache (sent to new clients)
+        self.latest_metrics: Optional[dict] = None
+        self.latest_band_powers: Optional[dict] = None
+        self.connection_status = {
+            'muse_connected': False,
+            'device_name': None,
+            'signal_quality': 'disconnected'
+        }
+
+    async def start(self) -> None:
+        """Start the WebSocket server and serve until stop() is called."""
+        logger.info(f"Starting WebSocket server on ws://{self.host}:{self.port}")
+
+        # Non-browser clients (scripts, tests) send no Origin header
+        origins = [*self.cors_origins, None] if self.cors_origins else None
+        async with serve(
+            self._handler,
+            self.host,
+            self.port,
+            origins=origins,
+            max_size=max(self.max_message_size, 1),
+            compression=None  # frames are small; float16 samples barely compress
+        ):
+            await self.shutdown_event.wait()
+
+        logger.info("WebSocket server stopped")
+
+    async def stop(self) -> None:
+        """Stop the WebSocket server gracefully."""
+        logger.info("Stopping WebSocket server...")
+        self.shutdown_event.set()
+
+    async def _handler(self, websocket: ServerConnection) -> None:
+        """
+        Handle one client connection.
+
+        Args:
+            websocket: WebSocket connection
+        """
+        client_address = websocket.remote_address
+
+        if len(self.clients) >= self.max_clients:
+            logger.warning(f"Rejecting {client_address}: server full")
+            await websocket.close(*self.CLOSE_REASONS['server_full'])
+            return
+
+        self.clients.add(websocket)
+        queue = ClientSendQueue(websocket, self.client_queue_size)
+        self.send_queues[websocket] = queue
+        # Queued first, so every broadcast reaches the client after it
+        self._send_initial_state(websocket)
+        logger.info(f"Client connected: {client_address}")
+
+        # Message rate limit: count messages per one-second window
+        window_start, window_count = time.monotonic(), 0
+
+        try:
+            async for message in websocket:
+                if len(message) > self.max_message_size:
+                    await websocket.close(*self.CLOSE_REASONS['message_size'])
+                    break
+
+                now = time.monotonic()
+                if now - window_start >= 1.0:
+                    window_start, window_count = now, 0
+                window_count += 1
+                if window_count > self.max_messages_per_second:
+                    logger.warning(f"Closing {client_address}: rate limit exceeded")
+                    await websocket.close(*self.CLOSE_REASONS['message_rate'])
+                    break
+
+                await self._handle_message(websocket, message)
+
+        except websockets.exceptions.ConnectionClosed:
+            logger.info(f"Client disconnected: {client_address}")
+        except Exception as e:
+            logger.error(f"Error handling client {client_address}: {e}")
+        finally:
+            self.clients.discard(websocket)
+            self.send_queues.pop(websocket, None)
+            queue.close()
+            self.waveform.unsubscribe(websocket)
+
+    def _send_initial_state(self, websocket: ServerConnection) -> None:
+        """
+        Send current state to a newly connected client.
+
+        Args:
+            websocket: WebSocket connection
+        """
+        self._reply(websocket, make_message(
+            'initial_state',
+            connection_status=self.connection_status,
+            current_protocol=self.calculator.active_protocol if self.calculator else None,
+            latest_metrics=self.latest_metrics,
+            latest_band_powers=self.latest_band_powers
+        ))
+
+    def _reply(self, websocket: ServerConnection, message: dict) -> None:
+        """Queue a message for one client (never dropped; nothing if it has gone)."""
+        queue = self.send_queues.get(websocket)
+        if queue is not None:
+            queue.put(json.dumps(message), droppable=False)
+
+    def _send_error(self, websocket: ServerConnection, code: str, message: str,
+                    severity: str = 'warning', details: Optional[dict] = None) -> None:
+        """Send an 'error' message to one client."""
+        self._reply(websocket, make_message(
+            'error', severity=severity, code=code, message=message, details=details or {}
+        ))
+
+    async def _handle_message(self, websocket: ServerConnection, message: Union[str, bytes]) -> None:
+        """
+        Handle one client message.
+
+        Args:
+            websocket: WebSocket connection
+            message: Raw message
+        """
+        try:
+            data = json.loads(message)
+            msg_type = data.get('type') if isinstance(data, dict) else None
+
+            if msg_type == 'ping':
+                self._reply(websocket, make_message('pong'))
+
+            elif msg_type == 'request_status':
+                self._reply(websocket, make_message(
+                    'status',
+                    connection_status=self.connection_status,
+                    current_protocol=self.calculator.active_protocol if self.calculator else None,
+                    connected_clients=len(self.clients),
+                    waveform=self.waveform.get_stats()
+                ))
+
+            elif msg_type == 'switch_protocol':
+                await self._handle_switch_protocol(websocket, data)
+
+            elif msg_type == 'set_baseline':
+                self._handle_set_baseline(websocket, data)
+
+            elif msg_type == 'clear_baseline' and self.calculator is not None:
+                self.calculator.clear_baseline()
+                self._reply(websocket, make_message('baseline_cleared', success=True))
+
+            elif msg_type == 'subscribe_waveform':
+                self._handle_subscribe_waveform(websocket, data)
+
+            elif msg_type == 'unsubscribe_waveform':
+                self.waveform.unsubscribe(websocket)
+                self._reply(websocket, make_message('waveform_unsubscribed'))
+
+            else:
+                self._send_error(websocket, 'INVALID_MESSAGE', f"Unsupported message type: {msg_type!r}")
+
+        except json.JSONDecodeError:
+            self._send_error(websocket, 'INVALID_MESSAGE', "Message is not valid JSON")
+        except websockets.exceptions.ConnectionClosed:
+            raise
+        except Exception as e:
+            logger.error(f"Error handling message: {e}")
+
+    async def _handle_switch_protocol(self, websocket: ServerConnection, data: dict) -> None:
+        """
+        Handle a 'switch_protocol' message.
+
+        Args:
+            websocket: WebSocket connection
+            data: Decoded message ({'type': 'switch_protocol', 'protocol': key})
+        """
+        if 'protocol' not in data:
+            self._send_error(websocket, 'INVALID_MESSAGE', "Missing required field: 'protocol'",
+                             details={'received': data})
+            return
+        if self.calculator is None:
+            self._send_error(websocket, 'NOT_AVAILABLE', "No protocol calculator running", severity='error')
+            return
+
+        try:
+            metrics = self.calculator.set_protocol(data['protocol'])
+        except ValueError as e:
+            self._send_error(websocket, 'INVALID_PROTOCOL', str(e), severity='error', details={
+                'requested': data['protocol'],
+                'available': self.calculator.available_protocols()
+            })
+            return
+
+        await self._broadcast(make_message('protocol_switched', protocol=data['protocol'], success=True))
+        if metrics is not None:  # the new protocol's state is already current
+            await self.broadcast_protocol_metrics(metrics)
+
+    def _handle_set_baseline(self, websocket: ServerConnection, data: dict) -> None:
+        """
+        Handle a 'set_baseline' message: collect, then reply 'baseline_set'.
+
+        Args:
+            websocket: WebSocket connection
+            data: Decoded message (optional 'duration' in seconds)
+        """
+        if self.calculator is None:
+            self._send_error(websocket, 'NOT_AVAILABLE', "No protocol calculator running", severity='error')
+            return
+        duration = data.get('duration')
+        if duration is not None and not (isinstance(duration, (int, float)) and duration > 0):
+            self._send_error(websocket, 'INVALID_MESSAGE', "'duration' must be a positive number",
+                             details={'received': data})
+            return
+
+        self.calculator.start_baseline(duration)
+        asyncio.create_task(self._reply_when_baseline_complete(websocket, self.calculator.baseline))
+
+    async def _reply_when_baseline_complete(self, websocket: ServerConnection, baseline) -> None:
+        """Send 'baseline_set' once `baseline` is complete (nothing if it was replaced)."""
+        while self.calculator.baseline is baseline and not baseline.complete:
+            await asyncio.sleep(baseline.update_interval / 2)
+        if self.calculator.baseline is baseline:
+            self._reply(websocket, make_message(
+                'baseline_set', success=True, updates=baseline.count,
+                baseline={band: value for band, value in baseline.mean.to_dict().items()
+                          if band in BandPowers.BANDS}
+            ))
+
+    def _handle_subscribe_waveform(self, websocket: ServerConnection, data: dict) -> None:
+        """
+        Handle a 'subscribe_waveform' message.
+
+        Args:
+            websocket: WebSocket connection
+            data: Decoded message (optional 'display_rate' in Hz and
+                  'encoding': 'float16' or 'int16')
+        """
+        if not self.waveform.enabled:
+            self._send_error(websocket, 'WAVEFORM_DISABLED',
+                             "Waveform streaming is disabled (websocket.stream_raw_waveform)")
+            return
+
+        try:
+            settings = self.waveform.subscribe(websocket, data.get('display_rate'), data.get('encoding'))
+        except (TypeError, ValueError) as e:
+            self._send_error(websocket, 'INVALID_MESSAGE', str(e), details={'received': data})
+            return
+
+        self._reply(websocket, make_message('waveform_subscribed', **settings))
+
+    async def broadcast_protocol_metrics(self, metrics: dict, protocol: Optional[str] = None,
+                                         sample_time: Optional[float] = None) -> None:
+        """
+        Broadcast the active protocol's metrics.
+
+        Args:
+            metrics: Result of calculate_metrics
+            protocol: Protocol key (defaults to the calculator's active one)
+            sample_time: Unix time of the newest EEG sample the metrics
+                         cover (e.g. band_powers.timestamp + clock_offset)
+        """
+        if protocol is None and self.calculator is not None:
+            protocol = self.calculator.active_protocol
+        self.latest_metrics = metrics
+        if self.stream_protocol_metrics:
+            message = make_message('protocol_metric', protocol=protocol, **metrics)
+            if sample_time is not None:
+                message['sample_time'] = sample_time
+            await self._broadcast(message)
+
+    async def broadcast_band_powers(self, band_powers: BandPowers,
+                                    sample_time: Optional[float] = None) -> None:
+        """
+        Broadcast band powers.
+
+        Args:
+            band_powers: Latest BandPowers
+            sample_time: Unix time of the newest EEG sample they cover
+                         (e.g. band_powers.timestamp + clock_offset)
+        """
+        fields = band_powers_fields(band_powers)
+        self.latest_band_powers = fields['powers']
+        if self.stream_band_powers:
+            message = make_message('band_powers', **fields)
+            if sample_time is not None:
+                message['sample_time'] = sample_time
+            await self._broadcast(message)
+
+    async def broadcast_connection_status(self, status: dict) -> None:
+        """
+        Broadcast headset connection and signal quality.
+
+        Args:
+            status: Connection fields (muse_connected, device_name, ...)
+                    and/or a SignalQualityMonitor report
+        """
+        self.connection_status.update(
+            (key, value) for key, value in status.items() if key not in ('details', 'sample_count')
+        )
+        await self._broadcast(make_message('connection_status', **self.connection_status))
+
+    async def _broadcast(self, message: dict) -> None:
+        """
+        Broadcast a JSON message to all connected clients (encoded once).
+
+        Args:
+            message: Message dictionary to broadcast
+        """
+        if not self.clients:
+            return
+        await self._send_all(json.dumps(message), self.clients)
+
+    async def _send_all(self, message: Union[str, bytes], clients: Iterable[ServerConnection]) -> None:
+        """Queue one encoded message for several clients without waiting for any send."""
+        for client in clients:
+            queue = self.send_queues.get(client)
+            if queue is not None and not queue.put(message):
+                self.messages_dropped += 1
+
+    async def stream_waveform(self, reader: SampleReader) -> None:
+        """
+        Send waveform frames every `websocket.waveform.frame_interval` seconds.
+
+        Args:
+            reader: Reader over the filtered ring (e.g.
+                    muse.reader(filtered=True))
+        """
+        dropped = reader.dropped
+        while not self.shutdown_event.is_set():
+            try:
+                samples, timestamps = reader.read()
+                if reader.dropped != dropped:  # fell behind the ring: restart the filters
+                    dropped = reader.dropped
+                    self.waveform.reset()
+                if self.waveform.subscriptions and len(samples):
+                    for frame, clients in self.waveform.process(samples, timestamps):
+                        await self._send_all(frame, clients)
+            except Exception as e:
+                logger.error(f"Error streaming waveform: {e}", exc_info=True)
+
+            await asyncio.sleep(self.waveform.frame_interval)
+
+    def get_stats(self) -> dict:
+        """
+        Get server statistics.
+
+        Returns:
+            Dictionary with server stats
+        """
+        return {
+            'connected_clients': len(self.clients),
+            'max_clients': self.max_clients,
+            'host': self.host,
+            'port': self.port,
+            'uptime_seconds': time.time() - self.started_at,
+            'has_metrics': self.latest_metrics is not None,
+            'muse_connected': self.connection_status['muse_connected'],
+            'messages_dropped': self.messages_dropped,
+            'waveform': self.waveform.get_stats()
+        }
@@ -0,0 +1,27 @@
+"""
+Shared test setup: src/ on the import path and the default configuration
+"""
+
+import os
+import sys
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+
+
+@pytest.fixture
+def config() -> dict:
+    """A fresh copy of config/default.yaml (tests may modify it)."""
+    with open(CONFIG_PATH) as f:
+        return yaml.safe_load(f)
+
+
+@pytest.fixture
+def fs(config) -> int:
+    """The Muse 2 nominal sample rate (Hz) from the default configuration."""
+    return config['muse']['sample_rate']
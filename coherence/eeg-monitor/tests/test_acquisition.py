@@ -0,0 +1,123 @@
+"""
+Tests: sample ring buffer, timestamp dejittering and chunked acquisition
+
+Runs without a headset or pylsl (the acquisition thread is fed by an
+in-memory inlet).
+
+Run with: python -m pytest tests/test_acquisition.py
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from filters import StreamingFilter
+from muse_headset import MuseHeadset
+from sample_ring import SampleRing, TimestampDejitterer
+
+
+def test_latest_is_a_contiguous_view_across_wraparound():
+    ring = SampleRing(capacity=10, channels=2)
+    for i in range(7):
+        ring.write(np.column_stack((np.arange(3) + 3 * i, -np.arange(3) - 3 * i)), np.arange(3) + 3.0 * i)
+
+    samples, timestamps = ring.latest(10)
+    np.testing.assert_array_equal(timestamps, np.arange(11, 21))
+    np.testing.assert_array_equal(samples[:, 0], np.arange(11, 21))
+    assert np.shares_memory(samples, ring._data)
+    assert len(ring.latest(4)[0]) == 4
+
+
+def test_reader_returns_each_sample_once_and_counts_overruns():
+    ring = SampleRing(capacity=8, channels=1)
+    reader = ring.reader()
+    ring.write(np.arange(5)[:, None], np.arange(5.0))
+    np.testing.assert_array_equal(reader.read(max_samples=3)[1], [0, 1, 2])
+    np.testing.assert_array_equal(reader.read()[1], [3, 4])
+    assert len(reader.read()[1]) == 0
+
+    ring.write(np.arange(5, 20)[:, None], np.arange(5.0, 20.0))
+    np.testing.assert_array_equal(reader.read()[1], np.arange(12, 20))
+    assert reader.dropped == 7
+
+
+def chunked_timestamps(chunks: int, rate: float, fs: int, seed: int = 0):
+    """muselsl-style timestamps: 12-sample chunks stamped on arrival at nominal rate fs, with latency jitter."""
+    rng = np.random.default_rng(seed)
+    for k in range(chunks):
+        index = np.arange(12 * k, 12 * (k + 1))
+        true = 1000.0 + index / rate
+        yield true, true[-1] + rng.exponential(0.004) - (11 - np.arange(12)) / fs
+
+
+def test_dejitter_removes_jitter_and_tracks_the_real_rate(fs):
+    dejitterer = TimestampDejitterer(fs)
+    raw_error, smoothed_error = [], []
+    for k, (true, raw) in enumerate(chunked_timestamps(2000, rate=256.4, fs=fs)):
+        smoothed = dejitterer.process(raw)
+        if k > 200:
+            raw_error.append(raw - true)
+            smoothed_error.append(smoothed - true)
+
+    assert np.std(np.concatenate(smoothed_error)) < 0.1 * np.std(np.concatenate(raw_error))
+    assert abs(dejitterer.effective_rate - 256.4) < 0.05
+
+
+def test_dejitter_restarts_after_a_gap(fs):
+    dejitterer = TimestampDejitterer(fs)
+    for _, raw in chunked_timestamps(100, rate=fs, fs=fs):
+        dejitterer.process(raw)
+
+    resumed = 2000.0 + np.arange(12) / fs
+    np.testing.assert_allclose(dejitterer.process(resumed), resumed)
+    assert dejitterer.gaps == 1
+
+
+class ChunkInlet:
+    """In-memory stand-in for pylsl.StreamInlet.pull_chunk (5 channels like muselsl)."""
+
+    def __init__(self, samples: np.ndarray, fs: int, chunk: int = 12):
+        self.samples = samples
+        self.fs = fs
+        self.chunk = chunk
+        self.position = 0
+        self.done = threading.Event()
+
+    def pull_chunk(self, timeout=0.0, max_samples=1024, dest_obj=None):
+        n = min(self.chunk, max_samples, len(self.samples) - self.position)
+        if n <= 0:
+            self.done.set()
+            time.sleep(timeout)
+            return None, []
+        dest_obj[:n] = self.samples[self.position:self.position + n]
+        timestamps = list(1000.0 + (self.position + np.arange(n)) / self.fs)
+        self.position += n
+        return None, timestamps
+
+
+def test_acquisition_thread_fills_the_ring(config, fs):
+    samples = np.random.default_rng(1).normal(0, 20, (3000, 5)).astype(np.float32)
+    inlet = ChunkInlet(samples, fs)
+    muse = MuseHeadset(config)
+    reader = muse.reader()
+
+    muse.start_acquisition(inlet, stream_channels=5)
+    assert inlet.done.wait(timeout=5)
+    muse.stop_acquisition()
+
+    window, timestamps = muse.latest(2.0)
+    assert window.shape == (512, 4)
+    np.testing.assert_array_equal(window, samples[-512:, :4])
+    np.testing.assert_allclose(np.diff(timestamps), 1 / fs, rtol=1e-6)
+
+    # Filtered once on arrival, continuous across chunks
+    filtered, _ = muse.latest(2.0, filtered=True)
+    expected = StreamingFilter(config).process(samples[:, :4].astype(np.float64))
+    np.testing.assert_allclose(filtered, expected[-512:], rtol=1e-5, atol=1e-3)
+
+    received, _ = reader.read()
+    np.testing.assert_array_equal(received, samples[:, :4])
+    status = muse.get_status()
+    assert status['samples_received'] == 3000
+    assert status['chunks_received'] == 250
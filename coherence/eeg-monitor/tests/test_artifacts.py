@@ -0,0 +1,84 @@
+"""
+Tests: streaming artifact detector and band power window rejection
+
+Run with: python -m pytest tests/test_artifacts.py
+"""
+
+import numpy as np
+
+from artifacts import AMPLITUDE, FLAT, VARIANCE, ArtifactDetector
+from band_power import BandPowerEngine
+from sample_ring import SampleRing
+
+
+def clean_eeg(n: int, fs: int, seed: int = 0) -> np.ndarray:
+    """Filtered-looking EEG: 10 Hz rhythm plus noise, ~10 µV, 4 channels."""
+    t = np.arange(n) / fs
+    rng = np.random.default_rng(seed)
+    return 10 * np.sin(2 * np.pi * 10 * t)[:, None] + rng.normal(0, 5, (n, 4))
+
+
+def feed(detector: ArtifactDetector, data: np.ndarray, seed: int = 1) -> np.ndarray:
+    """Process data in random-sized chunks, returning the concatenated sample flags."""
+    rng = np.random.default_rng(seed)
+    flags, start = [], 0
+    while start < len(data):
+        size = int(rng.integers(1, 40))
+        flags.append(detector.process(data[start:start + size]))
+        start += size
+    return np.concatenate(flags)
+
+
+def test_rolling_variance_matches_brute_force(config, fs):
+    data = clean_eeg(fs * 6, fs)
+    data[fs * 3:fs * 4, 2] += np.random.default_rng(2).normal(0, 40, fs)  # muscle burst on AF8
+    detector = ArtifactDetector(config)
+    flags = feed(detector, data)
+
+    window = detector.window
+    windows = np.lib.stride_tricks.sliding_window_view(data, window, axis=0)
+    expected = np.zeros(data.shape, dtype=bool)
+    expected[window - 1:] = windows.var(axis=-1) > detector.max_variance
+    np.testing.assert_array_equal((flags & VARIANCE) > 0, expected)
+    assert expected[:, 2].any() and not expected[:, [0, 1, 3]].any()
+
+
+def test_epoch_masks_locate_blinks_and_flat_channels(config, fs):
+    data = clean_eeg(fs * 8, fs)
+    data[fs * 4 + 10:fs * 4 + 40, 1] += 250  # blink on AF7
+    data[:, 3] = 0.0                          # TP10 off the head
+    detector = ArtifactDetector(config)
+    feed(detector, data)
+
+    blink = detector.window_flags(fs * 3, fs * 5)
+    assert blink[1] & AMPLITUDE
+    assert not blink[0] and not blink[2]
+    assert blink[3] & FLAT
+    assert not detector.window_flags(fs * 6, fs * 8)[:3].any()
+    assert detector.get_stats()['epochs_flagged']['amplitude'][1] >= 1
+
+
+def test_band_power_engine_rejects_contaminated_windows(config, fs):
+    ring = SampleRing(fs * 30, 4)
+    detector = ArtifactDetector(config)
+    engine = BandPowerEngine(config, ring, detector)
+
+    data = clean_eeg(fs * 8, fs)
+    data[int(fs * 4.2):int(fs * 4.2) + 20, 1] += 250  # blink on AF7 at 4.2 s
+    timestamps = np.arange(len(data)) / fs
+
+    computed = []
+    for start in range(0, len(data), 12):
+        chunk = data[start:start + 12]
+        detector.process(chunk)
+        ring.write(chunk, timestamps[start:start + 12])
+        powers = engine.poll()
+        if powers is not None:
+            computed.append(round(powers.timestamp * fs) + 1)
+
+    # 2 s windows every second: those ending at 5, 6 s contain the blink
+    # (and the 0.5 s of raised rolling variance after it)
+    assert computed == [2 * fs, 3 * fs, 4 * fs, 7 * fs, 8 * fs]
+    assert engine.windows_rejected == 2
+    assert list(engine.last_rejection) == ['AF7']
+    assert 'amplitude' in engine.last_rejection['AF7']
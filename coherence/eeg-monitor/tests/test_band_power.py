@@ -0,0 +1,81 @@
+"""
+Tests: streaming band power engine
+
+Run with: python -m pytest tests/test_band_power.py
+"""
+
+import numpy as np
+import pytest
+from scipy import signal
+
+from band_power import BandPowerEngine
+from protocols import BandPowers
+from sample_ring import SampleRing
+
+
+def sinusoids(n: int, fs: int) -> np.ndarray:
+    """Alpha, theta, beta tones and noise on the four channels, with DC offsets."""
+    t = np.arange(n) / fs
+    rng = np.random.default_rng(0)
+    return np.column_stack((
+        20 * np.sin(2 * np.pi * 10 * t),
+        10 * np.sin(2 * np.pi * 6 * t),
+        5 * np.sin(2 * np.pi * 20 * t),
+        rng.normal(0, 3, n),
+    )) + 800
+
+
+def test_tones_land_in_their_bands(config, fs):
+    engine = BandPowerEngine(config)
+    powers = engine.compute(sinusoids(512, fs))
+
+    values = powers.values
+    assert values[BandPowers.TP9, BandPowers.ALPHA] == pytest.approx(20 ** 2 / 2, rel=0.01)
+    assert values[BandPowers.AF7, BandPowers.THETA] == pytest.approx(10 ** 2 / 2, rel=0.01)
+    assert values[BandPowers.AF8, BandPowers.BETA] == pytest.approx(5 ** 2 / 2, rel=0.01)
+    assert values[BandPowers.TP9, BandPowers.DELTA] < 0.01  # DC offset removed
+    assert powers['alpha'] == pytest.approx(powers.band('alpha').mean())
+
+
+def test_matches_scipy_periodogram(config, fs):
+    engine = BandPowerEngine(config)
+    window = sinusoids(512, fs)
+
+    freqs, psd = signal.periodogram(window, fs, window='hann', detrend='constant', axis=0)
+    expected = np.array([
+        psd[(freqs >= low) & (freqs < high)].sum(axis=0) * (freqs[1] - freqs[0])
+        for low, high in config['signal_processing']['bands'].values()
+    ])
+    np.testing.assert_allclose(engine.band_power_matrix(window), expected, rtol=1e-10, atol=1e-12)
+
+
+def test_poll_computes_once_per_hop(config, fs):
+    ring = SampleRing(fs * 10, 4)
+    engine = BandPowerEngine(config, ring)
+    data = sinusoids(fs * 5, fs)
+
+    results = []
+    for start in range(0, len(data), 12):
+        ring.write(data[start:start + 12], np.arange(start, start + 12) / fs)
+        powers = engine.poll()
+        if powers is not None:
+            results.append(powers)
+
+    # 2 s windows every 1 s (50% overlap) over 5 s of signal
+    assert [round(p.timestamp * fs) + 1 for p in results] == [512, 768, 1024, 1280]
+    assert engine.poll() is None
+
+
+def test_output_round_trips_through_the_legacy_dict(config, fs):
+    powers = BandPowerEngine(config).compute(sinusoids(512, fs), timestamp=12.5)
+    legacy = powers.to_dict()
+
+    assert legacy['channels']['AF7']['theta'] == powers.values[BandPowers.AF7, BandPowers.THETA]
+    assert legacy['timestamp'] == 12.5
+    np.testing.assert_array_equal(BandPowers.from_dict(legacy).values, powers.values)
+
+
+def test_rejects_band_beyond_nyquist(config):
+    config['signal_processing']['bands']['gamma'] = [30, 200]
+    with pytest.raises(ValueError):
+        BandPowerEngine(config)
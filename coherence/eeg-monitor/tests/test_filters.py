@@ -0,0 +1,66 @@
+"""
+Tests: streaming bandpass/notch filters
+
+Run with: python -m pytest tests/test_filters.py
+"""
+
+import numpy as np
+import pytest
+from scipy import signal
+
+from filters import StreamingFilter, design_filter
+
+
+def eeg(n: int, fs: int, seed: int = 0) -> np.ndarray:
+    """10 Hz rhythm, 60 Hz line noise and noise on an 800 µV electrode offset, 4 channels."""
+    t = np.arange(n) / fs
+    rng = np.random.default_rng(seed)
+    tones = 20 * np.sin(2 * np.pi * 10 * t) + 30 * np.sin(2 * np.pi * 60 * t)
+    return 800 + tones[:, None] + rng.normal(0, 5, (n, 4))
+
+
+def test_chunked_output_matches_filtering_in_one_pass(config, fs):
+    data = eeg(fs * 10, fs)
+    chunked = StreamingFilter(config)
+    pieces = []
+    rng = np.random.default_rng(1)
+    start = 0
+    while start < len(data):
+        size = int(rng.integers(1, 40))
+        pieces.append(chunked.process(data[start:start + size].copy()))
+        start += size
+
+    whole = StreamingFilter(config).process(data.copy())
+    np.testing.assert_allclose(np.concatenate(pieces), whole, atol=1e-9)
+    assert chunked.samples_filtered == len(data)
+
+
+def test_removes_offset_and_line_noise_without_a_startup_transient(config, fs):
+    data = eeg(fs * 10, fs)
+    filtered = StreamingFilter(config).process(data.copy())
+
+    # No ringing from the 800 µV offset, even in the first samples
+    assert np.max(np.abs(filtered[:fs])) < 100
+
+    freqs, psd = signal.periodogram(filtered[fs * 2:], fs, axis=0)
+    alpha = psd[np.argmin(np.abs(freqs - 10))]
+    line = psd[np.argmin(np.abs(freqs - 60))]
+    raw_freqs, raw_psd = signal.periodogram(data[fs * 2:], fs, axis=0)
+    assert np.all(alpha > 0.9 * raw_psd[np.argmin(np.abs(raw_freqs - 10))])
+    assert np.all(line < 1e-3 * raw_psd[np.argmin(np.abs(raw_freqs - 60))])
+
+
+def test_designs_are_cached_and_disabled_filters_pass_through(config, fs):
+    assert StreamingFilter(config).sos is StreamingFilter(config).sos
+
+    config['signal_processing']['bandpass']['enabled'] = False
+    config['signal_processing']['notch']['enabled'] = False
+    passthrough = StreamingFilter(config)
+    data = eeg(100, fs)
+    assert not passthrough.enabled
+    np.testing.assert_array_equal(passthrough.process(data.copy()), data)
+
+
+def test_rejects_cutoff_beyond_nyquist():
+    with pytest.raises(ValueError):
+        design_filter(256.0, (0.5, 200.0, 4), None)
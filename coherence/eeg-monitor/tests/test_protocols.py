@@ -0,0 +1,166 @@
+"""
+Tests: neurofeedback protocols and the shared-snapshot protocol calculator
+
+Run with: python -m pytest tests/test_protocols.py
+"""
+
+import math
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+from protocol_calculator import ProtocolCalculator
+from protocols import AlphaAsymmetry, BandPowers, BaselineEstimator, ProtocolFactory, ThetaBetaRatio
+
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), '..', 'config')
+CHANNELS = ('TP9', 'AF7', 'AF8', 'TP10')
+
+
+def load_configs():
+    with open(os.path.join(CONFIG_DIR, 'default.yaml')) as f:
+        config = yaml.safe_load(f)
+    with open(os.path.join(CONFIG_DIR, 'protocols.yaml')) as f:
+        protocols_config = yaml.safe_load(f)
+    return config, protocols_config
+
+
+def band_powers(alpha=20.0, theta=10.0, beta=10.0, af8_alpha=None, delta=10.0):
+    """Band powers dictionary with the same powers on every channel (AF8 alpha optional)."""
+    channels = {
+        channel: {'delta': delta, 'theta': theta, 'alpha': alpha, 'beta': beta, 'gamma': 5.0}
+        for channel in CHANNELS
+    }
+    if af8_alpha is not None:
+        channels['AF8']['alpha'] = af8_alpha
+    means = {band: sum(c[band] for c in channels.values()) / 4 for band in channels['TP9']}
+    return {**means, 'channels': channels}
+
+
+def test_every_protocol_is_evaluated_on_each_tick():
+    calculator = ProtocolCalculator(*load_configs())
+    metrics = calculator.evaluate_all(band_powers())
+
+    assert set(metrics) == set(ProtocolFactory.available())
+    for result in metrics.values():
+        assert 0 <= result['score'] <= 100
+        assert result['feedback_level'] in ('low', 'medium', 'good', 'excellent')
+    assert metrics['alpha_enhancement']['direction'] == 'higher'
+    assert metrics['theta_beta_ratio']['direction'] == 'lower'
+    assert metrics['alpha_asymmetry']['direction'] == 'balanced'
+    assert calculator.calculate_metrics(band_powers()) is calculator.latest_metrics['alpha_enhancement']
+
+
+def test_switching_is_instant_with_state_already_current():
+    config, protocols_config = load_configs()
+    calculator = ProtocolCalculator(config, protocols_config)
+    standalone = ThetaBetaRatio(protocols_config['protocols']['theta_beta_ratio'])
+
+    for theta in (10.0, 20.0, 30.0, 15.0):
+        calculator.calculate_metrics(band_powers(theta=theta))
+        expected = standalone.calculate_metrics(band_powers(theta=theta))
+
+    switched = calculator.set_protocol('theta_beta_ratio')
+    assert switched['score'] == pytest.approx(expected['score'])
+    assert calculator.active_protocol == 'theta_beta_ratio'
+
+    with pytest.raises(ValueError):
+        calculator.set_protocol('invalid_name')
+
+
+def test_ratio_and_asymmetry_scoring():
+    _, protocols_config = load_configs()
+    ratio = ThetaBetaRatio(protocols_config['protocols']['theta_beta_ratio'])
+    result = ratio.calculate_metrics(band_powers(theta=15.0, beta=10.0))
+    assert result['details']['ratio'] == pytest.approx(1.5)
+    assert result['score'] == pytest.approx(85)  # ratio at the 'excellent' threshold
+
+    asymmetry = AlphaAsymmetry(protocols_config['protocols']['alpha_asymmetry'])
+    result = asymmetry.calculate_metrics(band_powers(alpha=20.0, af8_alpha=20.0 * math.e))
+    assert result['details']['asymmetry'] == pytest.approx(1.0)
+    assert result['details']['dominance'] == 'right'
+    assert result['score'] == 0  # |1.05| beyond twice the 'low' threshold
+
+
+def test_enhancement_scores_against_baseline():
+    calculator = ProtocolCalculator(*load_configs())
+    calculator.set_baseline(band_powers(alpha=20.0))
+    details = calculator.calculate_metrics(band_powers(alpha=40.0))['details']
+
+    assert details['relative_increase'] > 0
+    assert details['alpha_power'] == pytest.approx(40.0)
+
+
+def test_timings_are_reported_per_protocol():
+    calculator = ProtocolCalculator(*load_configs())
+    for _ in range(3):
+        calculator.evaluate_all(band_powers())
+
+    timings = calculator.get_timings()
+    assert set(timings) == {'band_powers', *ProtocolFactory.available(), 'score_processing'}
+    assert all(t['ticks'] == 3 and t['mean_us'] > 0 for t in timings.values())
+
+
+def test_band_powers_validate_once_and_are_read_only():
+    powers = BandPowers.from_dict(band_powers(alpha=30.0))
+    assert powers.values[BandPowers.AF7, BandPowers.ALPHA] == 30.0
+    assert powers.relative.sum(axis=1) == pytest.approx([1.0] * 4)
+    with pytest.raises(ValueError):
+        powers.values[0, 0] = 1.0
+
+    assert BandPowers.coerce(powers) is powers
+    missing = band_powers()
+    del missing['channels']['AF8']
+    with pytest.raises(ValueError, match='AF8'):
+        BandPowers.from_dict(missing)
+    with pytest.raises(ValueError):
+        BandPowers(-powers.values)
+
+
+def random_band_powers(count: int, seed: int = 0):
+    """Log-normally distributed per-channel band powers."""
+    rng = np.random.default_rng(seed)
+    return [BandPowers(np.exp(rng.normal(2.0, 0.5, (4, 5)))) for _ in range(count)]
+
+
+def test_baseline_matches_batch_and_exponentially_weighted_statistics():
+    samples = random_band_powers(90)
+    baseline = BaselineEstimator(duration=60, update_interval=1.0, half_life=20)
+    for powers in samples[:60]:
+        baseline.update(powers)
+
+    logs = np.array([p.log_values for p in samples[:60]])
+    assert baseline.complete
+    np.testing.assert_allclose(baseline.log_mean, logs.mean(axis=0))
+    np.testing.assert_allclose(baseline.log_std, logs.std(axis=0))
+    np.testing.assert_allclose(baseline.mean.values, np.mean([p.values for p in samples[:60]], axis=0))
+
+    # After completion, older updates fade with a 20 s half life
+    for powers in samples[60:]:
+        baseline.update(powers)
+    weights = np.concatenate((np.full(60, 0.5 ** (30 / 20)), 0.5 ** (np.arange(29, -1, -1) / 20)))
+    logs = np.array([p.log_values for p in samples])
+    mean = np.tensordot(weights, logs, axes=1) / weights.sum()
+    variance = np.tensordot(weights, (logs - mean) ** 2, axes=1) / weights.sum()
+    np.testing.assert_allclose(baseline.log_mean, mean)
+    np.testing.assert_allclose(baseline.log_std, np.sqrt(variance))
+
+
+def test_calculator_collects_baseline_and_reports_zscores():
+    calculator = ProtocolCalculator(*load_configs())
+    calculator.start_baseline(duration=10)
+
+    for powers in random_band_powers(10):
+        details = calculator.calculate_metrics(powers)['details']
+        assert details['baseline'] is None  # protocols only get the baseline when it is complete
+    assert not calculator.collecting_baseline
+    assert calculator.get_baseline_status()['updates'] == 10
+
+    baseline = calculator.get_protocol().baseline
+    high_alpha = BandPowers(np.exp(baseline.log_mean + 2 * baseline.log_std * (np.arange(5) == BandPowers.ALPHA)))
+    details = calculator.calculate_metrics(high_alpha)['details']
+    assert details['zscore'] == pytest.approx(2.0)
+    assert details['baseline'] == pytest.approx(100 * baseline.relative_mean[:, BandPowers.ALPHA].mean())
+    assert calculator.get_baseline_status()['updates'] == 10  # auto_update is off
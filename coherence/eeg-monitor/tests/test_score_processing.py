@@ -0,0 +1,139 @@
+"""
+Tests: streaming post-processing of protocol scores
+
+Run with: python -m pytest tests/test_score_processing.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+from protocol_calculator import ProtocolCalculator
+from score_processing import P2Quantiles, ScoreProcessor
+
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), '..', 'config')
+
+
+def load_global_config() -> dict:
+    with open(os.path.join(CONFIG_DIR, 'protocols.yaml')) as f:
+        return yaml.safe_load(f)['global']
+
+
+def test_p2_quartiles_track_batch_percentiles():
+    rng = np.random.default_rng(0)
+    data = np.stack((rng.normal(50, 10, 5000), rng.exponential(5, 5000), rng.uniform(0, 100, 5000)), axis=1)
+    data[::97, 1] = np.nan  # a stream without a score on some ticks
+    estimator = P2Quantiles((0.25, 0.5, 0.75), 3)
+    for row in data:
+        estimator.update(row, np.isfinite(row))
+
+    expected = np.nanpercentile(data, (25, 50, 75), axis=0)
+    spread = expected[2] - expected[0]
+    assert np.all(np.abs(estimator.quantiles - expected) < 0.05 * spread)
+    assert estimator.count.tolist() == [5000, 5000 - len(data[::97]), 5000]
+
+
+def test_outliers_are_rejected_and_trends_follow_weighted_least_squares():
+    config = load_global_config()
+    processor = ScoreProcessor(config, [0.0, 0.0])  # no exponential smoothing
+    rng = np.random.default_rng(1)
+    slopes = (0.0, 2.0)
+
+    for tick in range(40):
+        scores = np.array([50 + rng.normal(0, 2), 10 + slopes[1] * tick])
+        result = processor.process(scores)
+    assert not result['outlier'].any()
+    assert result['trend'][1] == pytest.approx(2.0)
+    assert processor.trend_direction(result['trend'][1]) == 'improving'
+
+    # A spike on the first stream is held at the last accepted score
+    last = result['score'][0]
+    result = processor.process(np.array([100.0, 10 + slopes[1] * 40]))
+    assert result['outlier'].tolist() == [True, False]
+    assert result['score'][0] == pytest.approx(last)
+
+    # Trend matches an exponentially weighted polyfit over the cleaned scores
+    processor = ScoreProcessor(config, [0.0])
+    y = 50 + np.cumsum(rng.normal(0, 1, 30))
+    for value in y:
+        trend = processor.process(np.array([value]))['trend'][0]
+    forgetting = 1 - 1.0 / config['feedback']['trend_window']
+    t = np.arange(len(y))
+    weights = forgetting ** (len(y) - 1 - t)
+    expected = np.polyfit(t, y, 1, w=np.sqrt(weights))[0]
+    assert trend == pytest.approx(expected)
+
+
+def outlier_only_config(method: str = 'iqr') -> dict:
+    config = load_global_config()
+    config['outlier_rejection']['method'] = method
+    config['temporal_filter']['enabled'] = False
+    return config
+
+
+@pytest.mark.parametrize('method', ['iqr', 'zscore'])
+@pytest.mark.parametrize('before, noise, after', [(70.0, 1.0, 40.0), (100.0, 0.0, 60.0)])
+def test_level_shift_is_accepted_after_max_consecutive_rejections(method, before, noise, after):
+    config = outlier_only_config(method)
+    processor = ScoreProcessor(config, [0.0])
+    rng = np.random.default_rng(3)
+    for _ in range(1200):  # 20 minutes at 1 Hz
+        processor.process([min(before + rng.normal(0, noise), 100.0)])
+
+    held = config['outlier_rejection']['max_consecutive']
+    results = [processor.process([after + rng.normal(0, noise)]) for _ in range(held + 10)]
+    assert [bool(r['outlier'][0]) for r in results] == [True] * held + [False] * 10
+    assert all(r['score'][0] == pytest.approx(after, abs=5 * noise + 1e-9) for r in results[held:])
+    assert processor.get_stats()['level_shifts'] == [1]
+
+    # A lone spike at the new level is still rejected
+    assert processor.process([before])['outlier'][0]
+
+
+def test_saturated_scores_keep_a_minimum_spread():
+    processor = ScoreProcessor(outlier_only_config(), [0.0])
+    for _ in range(600):
+        processor.process([100.0])
+    # IQR is 0, but the spread floor lets a small dip through
+    assert not processor.process([95.0])['outlier'][0]
+    assert processor.process([60.0])['outlier'][0]
+
+
+def test_fences_follow_recent_scores_only():
+    config = outlier_only_config()
+    processor = ScoreProcessor(config, [0.0])
+    rng = np.random.default_rng(4)
+    for _ in range(600):
+        processor.process([50 + rng.normal(0, 10)])
+    for _ in range(int(config['outlier_rejection']['memory'])):
+        processor.process([50 + rng.normal(0, 1)])
+
+    lower, upper = processor.quartiles[:, 0]
+    assert upper - lower < 3  # the noisy early scores are forgotten
+    assert processor.process([62.0])['outlier'][0]
+
+
+def test_calculator_reports_processed_scores():
+    with open(os.path.join(CONFIG_DIR, 'default.yaml')) as f:
+        config = yaml.safe_load(f)
+    with open(os.path.join(CONFIG_DIR, 'protocols.yaml')) as f:
+        protocols_config = yaml.safe_load(f)
+    protocols_config['global']['temporal_filter']['method'] = 'moving_average'
+    calculator = ProtocolCalculator(config, protocols_config)
+
+    powers = {band: 10.0 for band in ('delta', 'theta', 'alpha', 'beta', 'gamma')}
+    raw = []
+    for alpha in (10.0, 20.0, 30.0):
+        metrics = calculator.evaluate_all({**powers, 'alpha': alpha})['alpha_enhancement']
+        raw.append(metrics['raw_score'])
+
+    assert metrics['score'] == pytest.approx(np.mean(raw))  # protocols no longer smooth themselves
+    assert metrics['trend'] > 0 and metrics['outlier'] is False
+    assert metrics['trend_direction'] == 'improving'
+    assert calculator.get_status()['score_processing']['temporal_filter'] == 'moving_average'
+
+    with pytest.raises(ValueError):
+        ScoreProcessor({'temporal_filter': {'method': 'median'}}, [0.5])
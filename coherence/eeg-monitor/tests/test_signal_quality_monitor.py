@@ -0,0 +1,69 @@
+"""
+Tests: continuous signal quality monitor
+
+Run with: python -m pytest tests/test_signal_quality_monitor.py
+"""
+
+import numpy as np
+
+from artifacts import ArtifactDetector
+from band_power import BandPowerEngine
+from filters import StreamingFilter
+from sample_ring import SampleRing
+from signal_quality import SignalQualityMonitor
+
+
+def raw_eeg(seconds: float, fs: int, seed: int = 0) -> np.ndarray:
+    """Raw-looking EEG: 10 Hz rhythm, slow noise and an 800 µV DC offset, 4 channels."""
+    n = int(seconds * fs)
+    t = np.arange(n) / fs
+    rng = np.random.default_rng(seed)
+    slow = np.cumsum(rng.normal(0, 1, (n, 4)), axis=0) * 0.3
+    slow -= np.linspace(slow[0], slow[-1], n)  # keep the random walk bounded
+    return 800 + 10 * np.sin(2 * np.pi * 10 * t)[:, None] + slow + rng.normal(0, 2, (n, 4))
+
+
+def run_pipeline(data: np.ndarray, config: dict):
+    """Stream raw data through filter, detector, engine and monitor like MuseHeadset does."""
+    fs = config['muse']['sample_rate']
+    raw_ring, filtered_ring = SampleRing(fs * 30, 4), SampleRing(fs * 30, 4)
+    streaming_filter, detector = StreamingFilter(config), ArtifactDetector(config)
+    engine = BandPowerEngine(config, filtered_ring, detector)
+    monitor = SignalQualityMonitor(config, engine, raw_ring)
+
+    timestamps = np.arange(len(data)) / fs
+    for start in range(0, len(data), 12):
+        chunk, times = data[start:start + 12], timestamps[start:start + 12]
+        raw_ring.write(chunk, times)
+        filtered = streaming_filter.process(chunk.copy())
+        detector.process(filtered)
+        filtered_ring.write(filtered, times)
+        engine.poll()
+    return engine, monitor
+
+
+def test_clean_signal_rates_good_on_every_channel(config, fs):
+    engine, monitor = run_pipeline(raw_eeg(8, fs), config)
+    report = monitor.get_report()
+
+    assert report['signal_quality'] in ('good', 'excellent')
+    assert set(report['channel_quality']) == {'TP9', 'AF7', 'AF8', 'TP10'}
+    assert all(score >= 70 for score in report['channel_scores'].values())
+    assert all(abs(offset - 800) < 20 for offset in report['details']['dc_offset'].values())
+    assert monitor.updates == engine.hops_computed == 7
+
+
+def test_flat_and_noisy_channels_are_scored_down(config, fs):
+    data = raw_eeg(8, fs)
+    data[:, 3] = 800.0                                                   # TP10 off the head
+    data[:, 1] += 15 * np.sin(2 * np.pi * 60 * np.arange(len(data)) / fs)  # mains on AF7
+    engine, monitor = run_pipeline(data, config)
+    report = monitor.get_report()
+
+    assert report['channel_quality']['TP10'] == 'disconnected'
+    assert report['signal_quality'] == 'disconnected'
+    assert report['details']['line_noise_ratio']['AF7'] > 0.5
+    assert report['channel_scores']['AF7'] < 40
+    assert report['channel_scores']['TP9'] >= 70
+    assert engine.windows_rejected == 7  # flat TP10 rejects every window, yet quality is reported
+    assert monitor.updates == 7
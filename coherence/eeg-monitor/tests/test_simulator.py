@@ -0,0 +1,81 @@
+"""
+Tests: Muse stream simulator (synthetic EEG, replay, in-process inlet)
+
+Run with: python -m pytest tests/test_simulator.py
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from band_power import BandPowerEngine
+from muse_headset import MuseHeadset
+from muse_simulator import MuseSimulator, RecordingSource, SimulatedInlet, SyntheticEEG
+from protocols import BandPowers
+
+
+@pytest.fixture
+def config(config):
+    config['simulator']['seed'] = 0
+    return config
+
+
+def test_synthetic_eeg_is_chunking_invariant_with_the_requested_content(fs):
+    whole = SyntheticEEG(fs, seed=3, blinks_per_minute=30).generate(fs * 20)
+    generator = SyntheticEEG(fs, seed=3, blinks_per_minute=30)
+    rng = np.random.default_rng(0)
+    parts, total = [], 0
+    while total < len(whole):
+        parts.append(generator.generate(min(int(rng.integers(1, 50)), len(whole) - total)))
+        total += len(parts[-1])
+    np.testing.assert_allclose(np.concatenate(parts), whole)
+
+    # Alpha on the temporal channels, line noise everywhere, blinks on the frontal channels
+    quiet = SyntheticEEG(fs, seed=1, blinks_per_minute=0, alpha_amplitude=20).generate(fs * 8)
+    spectrum = np.abs(np.fft.rfft(quiet, axis=0))
+    freqs = np.fft.rfftfreq(len(quiet), 1 / fs)
+    assert freqs[np.argmax(spectrum[:, 0])] == pytest.approx(10.0)
+    assert spectrum[freqs == 60.0].min() > 10 * np.median(spectrum[freqs > 55])
+    assert np.abs(whole[:, 1]).max() > 200 > np.abs(quiet).max()
+    assert np.abs(whole[:, 0]).max() < 100
+
+
+def test_chunks_have_muselsl_layout_jitter_and_replay(config, fs):
+    config['simulator'].update(chunk_size=12, jitter=0.005)
+    recording = np.arange(100 * 4, dtype=float).reshape(100, 4)
+    simulator = MuseSimulator(config, RecordingSource(recording))
+
+    chunks = list(simulator.chunks(duration=1.0, start_time=50.0))
+    samples = np.concatenate([chunk for chunk, _ in chunks])
+    timestamps = np.concatenate([stamps for _, stamps in chunks])
+    assert [len(chunk) for chunk, _ in chunks] == [12] * 21 + [4]
+    assert samples.shape == (fs, 5) and samples.dtype == np.float32  # AUX last
+    np.testing.assert_array_equal(samples[:, :4], recording[np.arange(fs) % 100])
+
+    offsets = timestamps - (50.0 + np.arange(fs) / fs)
+    assert np.ptp(offsets[:252].reshape(21, 12), axis=1).max() < 1e-9  # jitter per chunk
+    assert 0.001 < offsets[::12].std() < 0.01
+
+    finite = MuseSimulator(config, RecordingSource(recording, loop=False))
+    assert sum(len(chunk) for chunk, _ in finite.chunks()) == 100
+
+
+def test_headset_acquires_simulated_stream_without_lsl(config, fs):
+    config['simulator']['speed'] = 0  # as fast as possible
+    config['simulator']['synthetic'].update(blinks_per_minute=0, alpha_amplitude=30)
+    simulator = MuseSimulator(config)
+    inlet = SimulatedInlet(simulator, duration=8.0)
+
+    muse = MuseHeadset(config)
+    muse.start_acquisition(inlet, simulator.channel_count)
+    deadline = time.monotonic() + 5
+    while muse.samples_received < fs * 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    muse.stop_acquisition()
+    assert muse.samples_received == fs * 8
+
+    window, _ = muse.latest(2.0, filtered=True)
+    powers = BandPowerEngine(config).compute(window)
+    alpha = powers.relative[:, BandPowers.ALPHA]
+    assert alpha[0] > 0.5 and alpha[3] > 0.5  # TP9, TP10
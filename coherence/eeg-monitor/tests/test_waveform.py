@@ -0,0 +1,164 @@
+"""
+Tests: decimated binary EEG waveform streaming and the WebSocket server
+
+Run with: python -m pytest tests/test_waveform.py
+"""
+
+import asyncio
+import json
+import socket
+
+import numpy as np
+import pytest
+import websockets
+from scipy import signal
+
+from sample_ring import SampleRing
+from waveform import FRAME_HEADER, PolyphaseDecimator, WaveformFanout, decode_frame, encode_frame
+from websocket_server import ClientSendQueue, EEGWebSocketServer
+
+
+def tones(n: int, fs: int, *frequencies: float) -> np.ndarray:
+    """Sum of unit-amplitude (10 µV) tones, the same on 4 channels."""
+    t = np.arange(n) / fs
+    return sum(10 * np.sin(2 * np.pi * f * t) for f in frequencies)[:, None] * np.ones(4)
+
+
+def test_decimator_is_chunking_invariant_and_anti_aliased(fs):
+    data = tones(fs * 8, fs, 10.0) + tones(fs * 8, fs, 100.0)  # 100 Hz would alias to 28 Hz at 64 Hz
+    timestamps = np.arange(len(data)) / fs
+    decimator = PolyphaseDecimator(fs, 4, 4)
+
+    rng = np.random.default_rng(0)
+    outputs, start = [], 0
+    while start < len(data):
+        size = int(rng.integers(1, 40))
+        outputs.append(decimator.process(data[start:start + size], timestamps[start:start + size])[0])
+        start += size
+    output = np.concatenate(outputs)
+
+    carry = len(decimator.taps) - 1
+    primed = np.concatenate((np.repeat(data[:1], carry, axis=0), data))
+    expected = signal.lfilter(decimator.taps, 1.0, primed, axis=0)[carry::4]
+    np.testing.assert_allclose(output, expected, atol=1e-9)
+
+    # Steady state: the 10 Hz tone passes, the 100 Hz tone is gone
+    steady = output[64:, 0]
+    reference = tones(len(data), fs, 10.0)[::4, 0][64:]
+    delay = int(round(decimator.delay * fs / 4))
+    assert np.max(np.abs(steady[delay:] - reference[:len(reference) - delay])) < 0.1
+
+
+def test_frames_round_trip_and_are_encoded_once_per_setting(config, fs):
+    samples = tones(64, fs, 10.0)
+    for encoding, tolerance in (('float16', 0.01), ('int16', 0.01)):
+        frame = encode_frame(samples, 12.5, 64.0, 7, encoding, 0.02)
+        assert len(frame) == FRAME_HEADER.size + samples.size * 2
+        decoded = decode_frame(frame)
+        assert decoded['encoding'] == encoding and decoded['first_index'] == 7
+        np.testing.assert_allclose(decoded['samples'], samples, atol=tolerance)
+
+    fanout = WaveformFanout(config)
+    assert fanout.subscribe('a', 60)['display_rate'] == 64  # 256 / 4, not below the request
+    fanout.subscribe('b', 64)
+    fanout.subscribe('c', 64, 'int16')
+    frames = fanout.process(tones(fs, fs, 10.0), np.arange(fs) / fs)
+
+    assert sorted(sorted(clients) for _, clients in frames) == [['a', 'b'], ['c']]
+    assert fanout.get_stats()['decimations'] == [4]
+    with pytest.raises(ValueError):
+        fanout.subscribe('d', 64, 'float64')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_server_streams_binary_frames_to_subscribers(config, fs):
+    config['websocket'].update(host='127.0.0.1', port=free_port())
+    config['websocket']['waveform']['frame_interval'] = 0.02
+    ring = SampleRing(fs * 30, 4)
+
+    async def session():
+        server = EEGWebSocketServer(config)
+        serving = asyncio.create_task(server.start())
+        streaming = asyncio.create_task(server.stream_waveform(ring.reader()))
+        await asyncio.sleep(0.1)
+
+        async with websockets.connect(f"ws://127.0.0.1:{config['websocket']['port']}") as client:
+            assert json.loads(await client.recv())['type'] == 'initial_state'
+            await client.send(json.dumps({'type': 'subscribe_waveform', 'display_rate': 32, 'encoding': 'int16'}))
+            subscribed = json.loads(await client.recv())
+            assert subscribed['type'] == 'waveform_subscribed' and subscribed['decimation'] == 8
+
+            ring.write(tones(fs, fs, 5.0).astype(np.float32), np.arange(fs) / fs)
+            frame = decode_frame(await asyncio.wait_for(client.recv(), 2))
+            assert frame['sample_rate'] == 32 and frame['samples'].shape == (32, 4)
+
+            await client.send(json.dumps({'type': 'switch_protocol', 'protocol': 'alpha_enhancement'}))
+            error = json.loads(await client.recv())
+            assert error['type'] == 'error' and error['code'] == 'NOT_AVAILABLE'
+
+        await server.stop()
+        await serving
+        streaming.cancel()
+
+    asyncio.run(session())
+
+
+class FakeClient:
+    """Client stand-in; sends block while `paused` is set."""
+
+    def __init__(self, paused: bool = False):
+        self.sent = []
+        self.resume = asyncio.Event()
+        if not paused:
+            self.resume.set()
+
+    async def send(self, message) -> None:
+        await self.resume.wait()
+        self.sent.append(message)
+
+
+def test_stalled_client_does_not_hold_up_frames_for_the_others(config, fs):
+    config['websocket']['client_queue_size'] = 4
+    frame_interval = config['websocket']['waveform']['frame_interval']
+    ring = SampleRing(fs * 30, 4)
+
+    async def session():
+        server = EEGWebSocketServer(config)
+        fast, slow = FakeClient(), FakeClient(paused=True)
+        for client in (fast, slow):
+            server.clients.add(client)
+            server.send_queues[client] = ClientSendQueue(client, server.client_queue_size)
+            server.waveform.subscribe(client, 64)
+
+        streaming = asyncio.create_task(server.stream_waveform(ring.reader()))
+        for second in range(8):
+            ring.write(tones(fs, fs, 10.0), second + np.arange(fs) / fs)
+            await asyncio.sleep(frame_interval * 1.5)
+        streaming.cancel()
+        # A reply is never dropped and keeps its place among the broadcasts
+        await server._handle_message(slow, json.dumps({'type': 'ping'}))
+        await server._broadcast({'type': 'band_powers'})
+        await asyncio.sleep(0.01)
+        fast_received = list(fast.sent)
+        queued = len(server.send_queues[slow].messages)
+
+        slow.resume.set()
+        await asyncio.sleep(0.01)
+        for queue in server.send_queues.values():
+            queue.close()
+        return server, fast_received, queued, slow.sent
+
+    server, fast_received, queued, slow_sent = asyncio.run(session())
+
+    # Frames kept flowing to the other client while one was stalled
+    assert len(fast_received) >= 6 and json.loads(fast_received[-1])['type'] == 'band_powers'
+    assert queued == 5
+    # The stalled client gets the send it was stuck in, then only the newest messages
+    assert slow_sent[:4] == [fast_received[0]] + fast_received[-4:-1]
+    assert json.loads(slow_sent[4])['type'] == 'pong' and slow_sent[5] == fast_received[-1]
+    assert server.get_stats()['messages_dropped'] == len(fast_received) - 5
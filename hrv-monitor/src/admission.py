@@ -0,0 +1,262 @@
+"""
+WebSocket Admission Control
+Constant-time token-bucket rate limiting for connections and messages,
+per client and per IP address
+"""
+
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Token bucket refilled lazily on each check.
+
+    Holds up to `capacity` tokens and gains `rate` tokens per second, so it
+    allows bursts of `capacity` and a sustained rate of `rate`. Each check
+    is O(1) with no per-event history.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens (burst size)
+            now: Current time (seconds)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def consume(self, now: float, tokens: float = 1.0) -> bool:
+        """
+        Take tokens if available.
+
+        Args:
+            now: Current time (seconds)
+            tokens: Tokens to take
+
+        Returns:
+            True if the tokens were taken, False if the bucket is too empty
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens < tokens:
+            return False
+
+        self.tokens -= tokens
+        return True
+
+    def is_full(self, now: float) -> bool:
+        """Check whether the bucket would be full at `now` (i.e. idle)."""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _IPState:
+    """Admission state shared by all connections from one IP address."""
+
+    __slots__ = ('connections', 'connect_bucket', 'message_bucket')
+
+    def __init__(self, connect_bucket: TokenBucket, message_bucket: TokenBucket):
+        self.connections = 0
+        self.connect_bucket = connect_bucket
+        self.message_bucket = message_bucket
+
+
+class ClientTicket:
+    """Admission state for one accepted connection."""
+
+    __slots__ = ('ip', 'ip_state', 'message_bucket')
+
+    def __init__(self, ip: str, ip_state: _IPState, message_bucket: TokenBucket):
+        self.ip = ip
+        self.ip_state = ip_state
+        self.message_bucket = message_bucket
+
+
+class AdmissionController:
+    """
+    Admission and rate limiting for the WebSocket server.
+
+    Connections are checked against the server capacity, a global
+    connection rate, a per-IP connection rate and a per-IP connection cap.
+    Messages are checked against the size limit, a per-client rate and a
+    per-IP rate shared by all of that IP's clients. Every check is a
+    constant number of dict lookups and token-bucket updates, so a
+    connection storm costs O(1) per attempt.
+    """
+
+    REJECTION_REASONS = (
+        'server_full', 'connection_rate', 'ip_connection_rate', 'ip_connection_limit',
+        'message_size', 'message_rate', 'ip_message_rate'
+    )
+
+    # Idle per-IP entries are swept (at most once a second) past this many IPs
+    MAX_TRACKED_IPS = 4096
+
+    def __init__(self, websocket_config: dict, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize admission control.
+
+        Args:
+            websocket_config: The 'websocket' section of the configuration
+            clock: Monotonic time source (seconds)
+        """
+        self.clock = clock
+        self.ip_states: Dict[str, _IPState] = {}
+        self.rejections: Dict[str, int] = {reason: 0 for reason in self.REJECTION_REASONS}
+        self.connect_bucket: Optional[TokenBucket] = None
+        self.reconfigure(websocket_config)
+
+        now = clock()
+        self._last_sweep = now
+        self.connect_bucket = TokenBucket(
+            self.connections_per_second, self.connection_burst, now
+        )
+
+    def reconfigure(self, websocket_config: dict) -> None:
+        """
+        Apply limits from the 'websocket' config section.
+
+        New limits apply to buckets created afterwards; the global
+        connection bucket is updated immediately.
+
+        Args:
+            websocket_config: The 'websocket' section of the configuration
+        """
+        admission = websocket_config.get('admission', {})
+
+        self.max_clients = websocket_config.get('max_clients', 10)
+        self.max_message_size = websocket_config.get('max_message_size', 1024)
+        self.messages_per_second = websocket_config.get('max_messages_per_second', 10)
+        self.message_burst = admission.get('message_burst', self.messages_per_second)
+
+        self.ip_messages_per_second = admission.get('ip_messages_per_second', 50)
+        self.max_connections_per_ip = admission.get('max_connections_per_ip', 5)
+        self.connections_per_second = admission.get('connections_per_second', 20)
+        self.connection_burst = admission.get('connection_burst', 40)
+        self.ip_connections_per_second = admission.get('ip_connections_per_second', 1)
+        self.ip_connection_burst = admission.get('ip_connection_burst', 5)
+
+        if self.connect_bucket is not None:
+            self.connect_bucket.rate = self.connections_per_second
+            self.connect_bucket.capacity = self.connection_burst
+
+    def admit_connection(self, ip: str, active_clients: int) -> Tuple[Optional[ClientTicket], Optional[str]]:
+        """
+        Decide whether to accept a new connection.
+
+        Args:
+            ip: Client IP address
+            active_clients: Number of currently connected clients
+
+        Returns:
+            (ticket, None) if accepted, or (None, rejection reason)
+        """
+        now = self.clock()
+
+        if active_clients >= self.max_clients:
+            return None, self._reject('server_full')
+
+        ip_state = self.ip_states.get(ip)
+        if ip_state is None:
+            # Unknown IPs cost an allocation, so the global rate is checked first
+            if not self.connect_bucket.consume(now):
+                return None, self._reject('connection_rate')
+            ip_state = self._track_ip(ip, now)
+            ip_state.connect_bucket.consume(now)
+        else:
+            if ip_state.connections >= self.max_connections_per_ip:
+                return None, self._reject('ip_connection_limit')
+
+            # Per-IP bucket first so one reloading kiosk cannot drain the global bucket
+            if not ip_state.connect_bucket.consume(now):
+                return None, self._reject('ip_connection_rate')
+
+            if not self.connect_bucket.consume(now):
+                return None, self._reject('connection_rate')
+
+        ip_state.connections += 1
+        message_bucket = TokenBucket(self.messages_per_second, self.message_burst, now)
+        return ClientTicket(ip, ip_state, message_bucket), None
+
+    def admit_message(self, ticket: ClientTicket, size: int) -> Optional[str]:
+        """
+        Decide whether to accept a message from an admitted client.
+
+        Args:
+            ticket: Ticket returned by admit_connection()
+            size: Message size (bytes or characters)
+
+        Returns:
+            None if accepted, otherwise the rejection reason
+        """
+        if size > self.max_message_size:
+            return self._reject('message_size')
+
+        now = self.clock()
+
+        if not ticket.message_bucket.consume(now):
+            return self._reject('message_rate')
+
+        if not ticket.ip_state.message_bucket.consume(now):
+            return self._reject('ip_message_rate')
+
+        return None
+
+    def release(self, ticket: ClientTicket) -> None:
+        """
+        Release a connection's slot when it closes.
+
+        Args:
+            ticket: Ticket returned by admit_connection()
+        """
+        ticket.ip_state.connections -= 1
+
+    def _reject(self, reason: str) -> str:
+        """Count a rejection and return its reason."""
+        self.rejections[reason] += 1
+        return reason
+
+    def _track_ip(self, ip: str, now: float) -> _IPState:
+        """Create admission state for a new IP address."""
+        if len(self.ip_states) >= self.MAX_TRACKED_IPS and now - self._last_sweep >= 1.0:
+            self._sweep_idle(now)
+
+        ip_state = _IPState(
+            TokenBucket(self.ip_connections_per_second, self.ip_connection_burst, now),
+            TokenBucket(self.ip_messages_per_second, self.ip_messages_per_second, now)
+        )
+        self.ip_states[ip] = ip_state
+        return ip_state
+
+    def _sweep_idle(self, now: float) -> None:
+        """Forget IPs with no connections whose buckets have fully refilled."""
+        self._last_sweep = now
+        idle = [
+            ip for ip, state in self.ip_states.items()
+            if state.connections == 0
+            and state.connect_bucket.is_full(now)
+            and state.message_bucket.is_full(now)
+        ]
+        for ip in idle:
+            del self.ip_states[ip]
+
+    def get_stats(self) -> dict:
+        """
+        Get admission statistics.
+
+        Returns:
+            Dictionary with rejection counts by reason and tracked IPs
+        """
+        return {
+            'rejections': dict(self.rejections),
+            'total_rejections': sum(self.rejections.values()),
+            'tracked_ips': len(self.ip_states)
+        }
@@ -9,7 +9,12 @@ from scipy import signal
 from scipy.fft import rfft, rfftfreq
 import time
 from collections import deque
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .spectral_kernels import SpectralKernels, resolve_backend
+except ImportError:
+    from spectral_kernels import SpectralKernels, resolve_backend
 
 
 class CoherenceCalculator:
@@ -25,6 +30,11 @@ class CoherenceCalculator:
     - Peak Power: PSD integrated over 0.030 Hz window centered on maximum peak
     - Total Power: PSD integrated over 0.04-0.26 Hz range
     - Max Peak: Found in 0.04-0.26 Hz range
+
+    Beats can be flagged as recorded during movement (see MotionEstimator).
+    Flagged beats are replaced by interpolating between their unflagged
+    neighbours. If more than max_motion_fraction of the window is flagged,
+    the calculation is skipped with status 'motion_artifact'.
     """
 
     def __init__(self, config: Dict):
@@ -34,25 +44,136 @@ class CoherenceCalculator:
         Args:
             config: Configuration dictionary with coherence parameters
         """
-        self.window_duration = config['coherence']['window_duration']
-        self.min_beats_required = config['coherence']['min_beats_required']
-        self.resample_rate = config['coherence']['resample_rate']
-        self.fft_size = config['coherence']['fft_size']
-
-        self.coherence_min_freq = config['coherence']['coherence_min_freq']
-        self.coherence_max_freq = config['coherence']['coherence_max_freq']
-        self.peak_window_width = config['coherence']['peak_window_width']
-
-        self.low_threshold = config['coherence']['low_coherence_threshold']
-        self.high_threshold = config['coherence']['high_coherence_threshold']
+        self._apply_settings(config['coherence'])
 
         # Data buffers - using deque for O(1) left-side operations
         # Max length prevents unbounded growth (estimate: 120 bpm * 60s window = 120 beats max)
-        max_buffer_size = int(self.window_duration * 3)  # 3x window for safety margin
+        max_buffer_size = self._max_buffer_size()
         self.rr_buffer: deque = deque(maxlen=max_buffer_size)
         self.timestamps: deque = deque(maxlen=max_buffer_size)
+        self.motion_flags: deque = deque(maxlen=max_buffer_size)
+
+        # Number of buffered beats flagged as motion
+        self._motion_count = 0
+
+        # Buffer version: bumped on every change to the buffered beats or
+        # settings, so results computed for a version can be reused
+        self.version = 0
+
+        # Running sum of buffered RR intervals (O(1) mean on append/evict)
+        self._rr_sum = 0.0
+
+        # Results memoized for a buffer version: (version, result)
+        self._coherence_cache: Optional[Tuple[int, Dict]] = None
+        self._status_cache: Optional[Tuple[int, Dict]] = None
+
+        # Spectral plans keyed by resampled signal length:
+        # (hanning window, frequency bins, coherence range mask)
+        self._spectral_plans: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+        # Compiled kernels for the spectral hot path (None = NumPy path)
+        self._kernels: Optional[SpectralKernels] = None
+        self._build_kernels()
+
+    def _apply_settings(self, coherence_config: Dict) -> None:
+        """
+        Copy coherence settings onto the calculator.
+
+        Args:
+            coherence_config: The 'coherence' section of the configuration
+        """
+        self.window_duration = coherence_config['window_duration']
+        self.min_beats_required = coherence_config['min_beats_required']
+        self.resample_rate = coherence_config['resample_rate']
+        self.fft_size = coherence_config['fft_size']
+
+        self.coherence_min_freq = coherence_config['coherence_min_freq']
+        self.coherence_max_freq = coherence_config['coherence_max_freq']
+        self.peak_window_width = coherence_config['peak_window_width']
+
+        self.low_threshold = coherence_config['low_coherence_threshold']
+        self.high_threshold = coherence_config['high_coherence_threshold']
+
+        # 'auto' uses the compiled kernels when Numba is installed
+        self.backend = coherence_config.get('backend', 'auto')
+
+        # Windows with more motion-flagged beats than this are not analysed
+        self.max_motion_fraction = coherence_config.get('max_motion_fraction', 0.2)
+
+    def _build_kernels(self) -> None:
+        """Create (or drop) the compiled kernels for the configured backend."""
+        if resolve_backend(self.backend) == 'numba':
+            self._kernels = SpectralKernels(
+                self.resample_rate, self.coherence_min_freq,
+                self.coherence_max_freq, self.peak_window_width
+            )
+        else:
+            self._kernels = None
+
+    def _max_buffer_size(self) -> int:
+        """Buffer capacity for the current window (3x window for safety margin)."""
+        return int(self.window_duration * 3)
+
+    def reconfigure(self, config: Dict) -> List[str]:
+        """
+        Apply new coherence settings in place, keeping buffered beats.
+
+        Buffers are only resized when the window changes, and cached
+        spectral plans are only rebuilt when the resample rate or
+        frequency range changes.
+
+        Args:
+            config: Full (already validated) configuration dictionary
+
+        Returns:
+            Names of the coherence settings that changed
+        """
+        old_settings = self._settings_snapshot()
+        self._apply_settings(config['coherence'])
+        new_settings = self._settings_snapshot()
+
+        changed = [key for key in new_settings if new_settings[key] != old_settings[key]]
+        if changed:
+            self.version += 1
+
+        if 'window_duration' in changed:
+            # Rebuild deques with the new capacity; the newest beats are kept
+            max_buffer_size = self._max_buffer_size()
+            self.rr_buffer = deque(self.rr_buffer, maxlen=max_buffer_size)
+            self.timestamps = deque(self.timestamps, maxlen=max_buffer_size)
+            self.motion_flags = deque(self.motion_flags, maxlen=max_buffer_size)
+            self._rr_sum = float(sum(self.rr_buffer))
+            self._motion_count = sum(self.motion_flags)
+            if self.timestamps:
+                self._evict_older_than(self.timestamps[-1] - self.window_duration)
+
+        spectral_settings = {'resample_rate', 'coherence_min_freq', 'coherence_max_freq'}
+        if spectral_settings.intersection(changed):
+            self._spectral_plans.clear()
+
+        if spectral_settings.union({'peak_window_width', 'backend'}).intersection(changed):
+            self._build_kernels()
+
+        return changed
+
+    def _settings_snapshot(self) -> Dict:
+        """Current coherence settings, keyed by config name."""
+        return {
+            'window_duration': self.window_duration,
+            'min_beats_required': self.min_beats_required,
+            'resample_rate': self.resample_rate,
+            'fft_size': self.fft_size,
+            'coherence_min_freq': self.coherence_min_freq,
+            'coherence_max_freq': self.coherence_max_freq,
+            'peak_window_width': self.peak_window_width,
+            'low_coherence_threshold': self.low_threshold,
+            'high_coherence_threshold': self.high_threshold,
+            'backend': self.backend,
+            'max_motion_fraction': self.max_motion_fraction,
+        }
 
-    def add_rr_interval(self, interval_ms: float) -> None:
+    def add_rr_interval(self, interval_ms: float, timestamp: Optional[float] = None,
+                        motion: bool = False) -> None:
         """
         Add a new RR interval to the buffer.
 
@@ -61,21 +182,51 @@ class CoherenceCalculator:
 
         Args:
             interval_ms: RR interval in milliseconds from Polar H10
+            timestamp: Arrival time (time.time() seconds); defaults to now
+            motion: True if the beat was recorded during movement
         """
         # Additional validation layer (defense in depth)
         if not self._is_valid_rr_interval(interval_ms):
             return
 
-        now = time.time()
+        now = time.time() if timestamp is None else timestamp
+
+        # A full deque drops its oldest beat on append
+        if len(self.rr_buffer) == self.rr_buffer.maxlen:
+            self._rr_sum -= self.rr_buffer[0]
+            self._motion_count -= self.motion_flags[0]
+
         self.rr_buffer.append(interval_ms)
         self.timestamps.append(now)
+        self.motion_flags.append(bool(motion))
+        self._rr_sum += interval_ms
+        self._motion_count += bool(motion)
+        self.version += 1
+
+        # Remove old data outside the window
+        self._evict_older_than(now - self.window_duration)
+
+    def _evict_older_than(self, cutoff: float) -> None:
+        """
+        Drop beats timestamped before cutoff.
 
-        # Remove old data outside the window - O(k) where k is old entries
-        # Using deque.popleft() for efficient removal from the left side
-        cutoff = now - self.window_duration
+        O(k) where k is old entries, using deque.popleft() for efficient
+        removal from the left side.
+
+        Args:
+            cutoff: Oldest timestamp (seconds) to keep
+        """
+        evicted = False
         while self.timestamps and self.timestamps[0] < cutoff:
             self.timestamps.popleft()
-            self.rr_buffer.popleft()
+            self._rr_sum -= self.rr_buffer.popleft()
+            self._motion_count -= self.motion_flags.popleft()
+            evicted = True
+
+        if evicted:
+            self.version += 1
+            if not self.rr_buffer:
+                self._rr_sum = 0.0  # Drop accumulated rounding error
 
     def _is_valid_rr_interval(self, interval_ms: float) -> bool:
         """
@@ -105,50 +256,87 @@ class CoherenceCalculator:
         """
         Calculate the HeartMath coherence score.
 
+        The result is memoized per buffer version: calling again before a
+        new beat arrives (or a beat is evicted) returns it without
+        recomputing the spectrum.
+
         Returns:
             Dictionary containing:
-            - status: 'valid' or 'insufficient_data'
+            - status: 'valid', 'insufficient_data' or 'motion_artifact'
             - coherence: Score from 0-100
             - ratio: Raw coherence ratio
             - peak_frequency: Dominant frequency in Hz
             - peak_power: Power in peak window
             - total_power: Total power in coherence range
             - beats_used: Number of beats in calculation
+            - motion_beats: Number of those beats flagged as motion
+        """
+        cache = self._coherence_cache
+        if cache is not None and cache[0] == self.version:
+            return dict(cache[1])
+
+        result = self._compute_coherence()
+        self._coherence_cache = (self.version, result)
+        return dict(result)
+
+    def _compute_coherence(self) -> Dict:
+        """Run the coherence calculation on the current buffer."""
+        rr_intervals = np.fromiter(self.rr_buffer, dtype=np.float64, count=len(self.rr_buffer))
+        motion = None
+        if self._motion_count:
+            motion = np.fromiter(self.motion_flags, dtype=bool, count=len(self.motion_flags))
+        return self.analyse_intervals(rr_intervals, motion)
+
+    def analyse_intervals(self, rr_intervals: np.ndarray, motion: Optional[np.ndarray] = None) -> Dict:
         """
-        if len(self.rr_buffer) < self.min_beats_required:
-            return {
-                'status': 'insufficient_data',
-                'coherence': 0,
-                'ratio': 0.0,
-                'peak_frequency': 0.0,
-                'peak_power': 0.0,
-                'total_power': 0.0,
-                'beats_used': len(self.rr_buffer)
-            }
+        Run the coherence calculation on an RR interval series.
+
+        Uses this calculator's settings but not its buffer, so one
+        calculator can analyse series held elsewhere (see SubjectStore).
+
+        Args:
+            rr_intervals: RR intervals in milliseconds, oldest first (float64)
+            motion: Optional boolean mask of beats flagged as motion
+
+        Returns:
+            Same dictionary as calculate_coherence
+        """
+        beats_used = len(rr_intervals)
+        if beats_used < self.min_beats_required:
+            return self._insufficient_data_response(beats_used)
+
+        motion_beats = int(np.count_nonzero(motion)) if motion is not None else 0
+        if motion_beats:
+            # Skip the spectrum entirely: its score would be misleading
+            # (and with no clean beat left there is nothing to interpolate from)
+            if motion_beats > self.max_motion_fraction * beats_used or motion_beats == beats_used:
+                return self._motion_artifact_response(beats_used, motion_beats)
+            rr_intervals = self._interpolate_motion_beats(rr_intervals, motion)
+
+        if self._kernels is not None:
+            return self._compute_coherence_compiled(rr_intervals, motion_beats)
 
         try:
-            # 1. Resample to uniform 4 Hz (convert deque to list for numpy operations)
-            resampled = self._resample_rr_intervals(list(self.rr_buffer), self.resample_rate)
+            # 1. Resample to uniform 4 Hz
+            resampled = self._resample_rr_intervals(rr_intervals, self.resample_rate)
 
             # 2. Detrend to remove linear drift
             detrended = signal.detrend(resampled, type='linear')
 
             # 3. Apply Hanning window to reduce spectral leakage
-            window = np.hanning(len(detrended))
+            window, freqs, mask = self._get_spectral_plan(len(detrended))
             windowed = detrended * window
 
             # 4. Compute FFT and Power Spectral Density
             fft_vals = rfft(windowed)
-            freqs = rfftfreq(len(windowed), 1/self.resample_rate)
             psd = np.abs(fft_vals) ** 2 / len(windowed)
 
             # 5. Extract coherence range (0.04-0.26 Hz)
-            mask = (freqs >= self.coherence_min_freq) & (freqs <= self.coherence_max_freq)
             coherence_freqs = freqs[mask]
             coherence_psd = psd[mask]
 
             if len(coherence_psd) == 0:
-                return self._insufficient_data_response()
+                return self._insufficient_data_response(beats_used)
 
             # 6. Find peak frequency
             peak_idx = np.argmax(coherence_psd)
@@ -162,51 +350,132 @@ class CoherenceCalculator:
             # 8. Calculate total power in coherence range
             total_power = np.sum(coherence_psd)
 
-            # 9. Coherence ratio
-            if total_power <= peak_power:
-                ratio = 0.0
-            else:
-                ratio = peak_power / (total_power - peak_power)
-
-            # 10. Convert to 0-100 score
-            score = self._ratio_to_score(ratio)
-
-            return {
-                'status': 'valid',
-                'coherence': int(score),
-                'ratio': float(ratio),
-                'peak_frequency': float(peak_freq),
-                'peak_power': float(peak_power),
-                'total_power': float(total_power),
-                'beats_used': len(self.rr_buffer)
-            }
+            # 9-10. Coherence ratio and 0-100 score
+            return self._coherence_result(peak_freq, peak_power, total_power, beats_used, motion_beats)
+
+        except Exception as e:
+            return self._error_response(e, beats_used)
+
+    def _interpolate_motion_beats(self, rr_intervals: np.ndarray, motion: np.ndarray) -> np.ndarray:
+        """
+        Replace motion-flagged beats by interpolating between clean ones.
+
+        Args:
+            rr_intervals: RR intervals in milliseconds
+            motion: Boolean mask of flagged beats (at least one clean beat)
+
+        Returns:
+            RR intervals with flagged beats replaced (new array)
+        """
+        beats = np.arange(len(rr_intervals))
+        clean = ~motion
+        corrected = rr_intervals.copy()
+        corrected[motion] = np.interp(beats[motion], beats[clean], rr_intervals[clean])
+        return corrected
+
+    def _compute_coherence_compiled(self, rr_intervals: np.ndarray, motion_beats: int = 0) -> Dict:
+        """
+        Run the coherence calculation with the compiled kernels.
+
+        Same steps and results as the NumPy path in analyse_intervals,
+        run as compiled loops over preallocated buffers.
+        """
+        beats_used = len(rr_intervals)
+        try:
+            spectrum = self._kernels.coherence_spectrum(np.ascontiguousarray(rr_intervals, dtype=np.float64))
+            if spectrum is None:
+                return self._insufficient_data_response(beats_used)
+
+            peak_freq, peak_power, total_power = spectrum
+            return self._coherence_result(peak_freq, peak_power, total_power, beats_used, motion_beats)
 
         except Exception as e:
-            return {
-                'status': f'error: {str(e)}',
-                'coherence': 0,
-                'ratio': 0.0,
-                'peak_frequency': 0.0,
-                'peak_power': 0.0,
-                'total_power': 0.0,
-                'beats_used': len(self.rr_buffer)
-            }
-
-    def _resample_rr_intervals(self, rr_intervals: List[float], target_rate: float) -> np.ndarray:
+            return self._error_response(e, beats_used)
+
+    def _coherence_result(self, peak_freq: float, peak_power: float, total_power: float,
+                          beats_used: int, motion_beats: int = 0) -> Dict:
+        """
+        Build a valid result from the coherence-band spectrum statistics.
+
+        Args:
+            peak_freq: Dominant frequency in the coherence range (Hz)
+            peak_power: Power in the window around the peak
+            total_power: Total power in the coherence range
+            beats_used: Number of beats analysed
+            motion_beats: Number of those beats interpolated over motion
+
+        Returns:
+            Coherence result dictionary
+        """
+        # Coherence ratio
+        if total_power <= peak_power:
+            ratio = 0.0
+        else:
+            ratio = peak_power / (total_power - peak_power)
+
+        # Convert to 0-100 score
+        score = self._ratio_to_score(ratio)
+
+        return {
+            'status': 'valid',
+            'coherence': int(score),
+            'ratio': float(ratio),
+            'peak_frequency': float(peak_freq),
+            'peak_power': float(peak_power),
+            'total_power': float(total_power),
+            'beats_used': beats_used,
+            'motion_beats': motion_beats
+        }
+
+    def _error_response(self, error: Exception, beats_used: int) -> Dict:
+        """Return standard response for a failed calculation."""
+        return {
+            'status': f'error: {str(error)}',
+            'coherence': 0,
+            'ratio': 0.0,
+            'peak_frequency': 0.0,
+            'peak_power': 0.0,
+            'total_power': 0.0,
+            'beats_used': beats_used,
+            'motion_beats': 0
+        }
+
+    def _get_spectral_plan(self, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the cached window, frequency bins and coherence mask for a signal length.
+
+        The resampled length only takes a handful of values for a given
+        window, so plans are built once and reused across updates.
+
+        Args:
+            n: Length of the resampled signal
+
+        Returns:
+            Tuple of (hanning window, rfft frequencies, coherence range mask)
+        """
+        plan = self._spectral_plans.get(n)
+        if plan is None:
+            freqs = rfftfreq(n, 1/self.resample_rate)
+            mask = (freqs >= self.coherence_min_freq) & (freqs <= self.coherence_max_freq)
+            plan = (np.hanning(n), freqs, mask)
+            self._spectral_plans[n] = plan
+        return plan
+
+    def _resample_rr_intervals(self, rr_intervals: np.ndarray, target_rate: float) -> np.ndarray:
         """
         Resample irregularly spaced RR intervals to uniform sampling rate.
 
         Uses linear interpolation to create evenly-spaced samples.
 
         Args:
-            rr_intervals: List of RR intervals in milliseconds
+            rr_intervals: RR intervals in milliseconds
             target_rate: Target sampling rate in Hz
 
         Returns:
             Uniformly sampled RR interval series
         """
         # Create cumulative time array
-        cumulative_time = np.cumsum([0] + rr_intervals[:-1])
+        cumulative_time = np.concatenate(([0.0], np.cumsum(rr_intervals[:-1])))
         total_duration = cumulative_time[-1] + rr_intervals[-1]
 
         # Create uniform time grid
@@ -249,7 +518,7 @@ class CoherenceCalculator:
 
         return max(0, min(100, score))
 
-    def _insufficient_data_response(self) -> Dict:
+    def _insufficient_data_response(self, beats_used: int) -> Dict:
         """Return standard response for insufficient data."""
         return {
             'status': 'insufficient_data',
@@ -258,33 +527,61 @@ class CoherenceCalculator:
             'peak_frequency': 0.0,
             'peak_power': 0.0,
             'total_power': 0.0,
-            'beats_used': len(self.rr_buffer)
+            'beats_used': beats_used,
+            'motion_beats': 0
+        }
+
+    def _motion_artifact_response(self, beats_used: int, motion_beats: int) -> Dict:
+        """Return standard response for a window with too much motion."""
+        return {
+            'status': 'motion_artifact',
+            'coherence': 0,
+            'ratio': 0.0,
+            'peak_frequency': 0.0,
+            'peak_power': 0.0,
+            'total_power': 0.0,
+            'beats_used': beats_used,
+            'motion_beats': motion_beats
         }
 
     def get_buffer_status(self) -> Dict:
         """
         Get current buffer statistics.
 
+        O(1): the mean comes from the running RR sum and the duration
+        from the buffer ends. Memoized per buffer version.
+
         Returns:
             Dictionary with buffer information
         """
-        if len(self.rr_buffer) == 0:
+        cache = self._status_cache
+        if cache is not None and cache[0] == self.version:
+            return dict(cache[1])
+
+        count = len(self.rr_buffer)
+        if count == 0:
             mean_hr = 0
             duration = 0
         else:
-            mean_rr = np.mean(self.rr_buffer)
+            mean_rr = self._rr_sum / count
             mean_hr = 60000 / mean_rr if mean_rr > 0 else 0
-            duration = self.timestamps[-1] - self.timestamps[0] if len(self.timestamps) > 1 else 0
+            duration = self.timestamps[-1] - self.timestamps[0] if count > 1 else 0
 
-        return {
-            'beats_in_buffer': len(self.rr_buffer),
+        status = {
+            'beats_in_buffer': count,
             'min_beats_required': self.min_beats_required,
-            'buffer_ready': len(self.rr_buffer) >= self.min_beats_required,
+            'buffer_ready': count >= self.min_beats_required,
             'mean_heart_rate': mean_hr,
             'buffer_duration_seconds': duration
         }
+        self._status_cache = (self.version, status)
+        return dict(status)
 
     def reset(self) -> None:
         """Clear all buffered data."""
         self.rr_buffer.clear()
         self.timestamps.clear()
+        self.motion_flags.clear()
+        self._rr_sum = 0.0
+        self._motion_count = 0
+        self.version += 1
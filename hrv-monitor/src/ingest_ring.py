@@ -0,0 +1,178 @@
+"""
+Ingest Ring
+Bounded single-producer/single-consumer ring that hands BLE notification
+data from whichever thread bleak calls back on to a task on the event loop
+"""
+
+import asyncio
+import threading
+from typing import Any, List, Optional
+
+
+class IngestRing:
+    """
+    Lock-free SPSC ring between a BLE callback and an asyncio consumer.
+
+    The producer (notification callback, any thread) only ever advances
+    `_head`, and the consumer (one task on the loop) only ever advances
+    `_tail`; each slot is written before the head that publishes it, so
+    neither side needs a lock. put() never blocks: when the ring is full
+    the new item is dropped and counted.
+
+    The consumer only parks when the ring is empty, and the producer only
+    wakes it if it is parked, so a burst of N items costs one wakeup, not
+    N. Wakeups from the loop's own thread use call_soon; from other
+    threads, call_soon_threadsafe.
+    """
+
+    def __init__(self, capacity: int = 256):
+        """
+        Initialize the ring.
+
+        Args:
+            capacity: Maximum number of items waiting for the consumer
+        """
+        self.capacity = capacity
+        self._slots: List[Any] = [None] * capacity
+        self._head = 0  # items ever published (producer-owned)
+        self._tail = 0  # items ever consumed (consumer-owned)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._waiter: Optional[asyncio.Future] = None
+
+        # Statistics
+        self.dropped = 0           # items rejected because the ring was full
+        self.overflows = 0         # times the ring went from accepting to full
+        self.high_watermark = 0    # most items ever waiting at once
+        self.wakeups = 0           # times the producer woke the consumer
+        self._full = False
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Attach the ring to the event loop its consumer runs on.
+
+        Must be called from the loop's thread before producers start.
+
+        Args:
+            loop: Consumer's event loop
+        """
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def put(self, item: Any) -> bool:
+        """
+        Publish an item (producer only, any thread, never blocks).
+
+        Args:
+            item: Item for the consumer
+
+        Returns:
+            False if the ring was full and the item was dropped
+        """
+        head = self._head
+        waiting = head - self._tail
+        if waiting >= self.capacity:
+            self.dropped += 1
+            if not self._full:
+                self._full = True
+                self.overflows += 1
+            return False
+
+        self._full = False
+        self._slots[head % self.capacity] = item
+        self._head = head + 1  # publish only after the slot is written
+
+        if waiting + 1 > self.high_watermark:
+            self.high_watermark = waiting + 1
+
+        # Wake the consumer only if it is parked on an empty ring
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            self.wakeups += 1
+            if threading.get_ident() == self._loop_thread:
+                self._loop.call_soon(self._wake, waiter)
+            else:
+                self._loop.call_soon_threadsafe(self._wake, waiter)
+
+        return True
+
+    @staticmethod
+    def _wake(waiter: asyncio.Future) -> None:
+        """Resolve a parked consumer's future (on the loop)."""
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def get_nowait(self, max_items: Optional[int] = None) -> List[Any]:
+        """
+        Take every waiting item (consumer only).
+
+        Args:
+            max_items: Upper bound on the items taken
+
+        Returns:
+            Items oldest first (empty if none are waiting)
+        """
+        tail = self._tail
+        available = self._head - tail
+        if max_items is not None:
+            available = min(available, max_items)
+
+        items = []
+        for position in range(tail, tail + available):
+            slot = position % self.capacity
+            items.append(self._slots[slot])
+            self._slots[slot] = None
+        self._tail = tail + available  # free the slots only after reading them
+        return items
+
+    async def get_batch(self, max_items: Optional[int] = None) -> List[Any]:
+        """
+        Wait until at least one item is waiting, then take them (consumer only).
+
+        Args:
+            max_items: Upper bound on the items taken
+
+        Returns:
+            Items oldest first (never empty)
+        """
+        while True:
+            items = self.get_nowait(max_items)
+            if items:
+                return items
+
+            waiter = self._loop.create_future()
+            self._waiter = waiter
+            # Re-check after announcing the wait: a put() that ran before
+            # _waiter was set did not try to wake us
+            if self._head != self._tail:
+                self._waiter = None
+                continue
+
+            try:
+                await waiter
+            finally:
+                self._waiter = None
+
+    def get_stats(self) -> dict:
+        """
+        Get ingest statistics.
+
+        Returns:
+            Dictionary with counts of received, consumed and dropped items,
+            overflow episodes, consumer wakeups and queue depth
+        """
+        return {
+            'received': self._head + self.dropped,
+            'consumed': self._tail,
+            'dropped': self.dropped,
+            'overflows': self.overflows,
+            'wakeups': self.wakeups,
+            'queued': self._head - self._tail,
+            'high_watermark': self.high_watermark,
+            'capacity': self.capacity
+        }
@@ -8,13 +8,19 @@ Main application that connects all components:
 
 import asyncio
 import logging
+import signal
 import yaml
 import sys
+import time
 from pathlib import Path
+from typing import Optional
 
 from polar_h10 import PolarH10
 from coherence_calculator import CoherenceCalculator
-from websocket_server import CoherenceWebSocketServer
+from ingest_ring import IngestRing
+from spectral_kernels import BACKENDS
+from websocket_server import CoherenceWebSocketServer, batching_settings, compression_settings
+from pipeline import MultiProcessPipeline
 
 
 # Configure logging
@@ -51,6 +57,8 @@ def setup_logging(config: dict):
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CONFIG_PATH = "config/default.yaml"
+
 
 class HRVMonitorService:
     """
@@ -58,19 +66,27 @@ class HRVMonitorService:
     coherence calculation, and WebSocket streaming.
     """
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, config_path: str = DEFAULT_CONFIG_PATH):
         """
         Initialize the HRV monitoring service.
 
         Args:
             config: Configuration dictionary
+            config_path: Configuration file re-read on reload
         """
         self.config = config
+        self.config_path = config_path
         self.update_interval = config['coherence']['update_interval']
 
         # Initialize components
         self.coherence_calc = CoherenceCalculator(config)
-        self.websocket_server = CoherenceWebSocketServer(config)
+        self.websocket_server = CoherenceWebSocketServer(
+            config,
+            on_reload_config=self.reload_config
+        )
+        # RR intervals pass from the BLE callback (possibly another thread)
+        # to the event loop through a bounded ring
+        self.ingest_ring = IngestRing(config['polar'].get('ingest_capacity', 256))
         self.polar_h10 = PolarH10(config, on_rr_interval=self._on_rr_interval)
 
         # State
@@ -81,21 +97,36 @@ class HRVMonitorService:
         # Track background tasks for proper exception handling
         self.background_tasks = set()
 
-    def _on_rr_interval(self, rr_ms: float) -> None:
+        # Polar H10 auto-reconnect loop (restarted by reload_config if it has ended)
+        self.connection_task: Optional[asyncio.Task] = None
+
+    def _on_rr_interval(self, rr_ms: float, motion: bool = False) -> None:
         """
         Callback for new RR interval from Polar H10.
 
+        May run on a BLE backend thread, so it only timestamps the interval
+        and queues it for _consume_rr_intervals on the event loop.
+
         Args:
             rr_ms: RR interval in milliseconds
+            motion: True if the wearer was moving during the beat
         """
-        # Add to coherence calculator
-        self.coherence_calc.add_rr_interval(rr_ms)
+        self.ingest_ring.put((time.time(), rr_ms, motion))
+
+    async def _consume_rr_intervals(self) -> None:
+        """
+        Feed queued RR intervals to the calculator and broadcast heartbeats.
+        """
+        while True:
+            for timestamp, rr_ms, motion in await self.ingest_ring.get_batch():
+                # Add to coherence calculator
+                self.coherence_calc.add_rr_interval(rr_ms, timestamp=timestamp, motion=motion)
 
-        # Broadcast heartbeat event to WebSocket clients with exception handling
-        task = asyncio.create_task(self.websocket_server.broadcast_heartbeat(rr_ms))
-        self._track_background_task(task, "broadcast_heartbeat")
+                # Broadcast heartbeat event to WebSocket clients with exception handling
+                task = asyncio.create_task(self.websocket_server.broadcast_heartbeat(rr_ms))
+                self._track_background_task(task, "broadcast_heartbeat")
 
-        logger.debug(f"RR interval: {rr_ms:.1f} ms")
+                logger.debug(f"RR interval: {rr_ms:.1f} ms")
 
     def _track_background_task(self, task: asyncio.Task, task_name: str) -> None:
         """
@@ -119,6 +150,69 @@ class HRVMonitorService:
 
         task.add_done_callback(handle_task_exception)
 
+    async def reload_config(self) -> dict:
+        """
+        Re-read and validate the configuration file, then apply it in place.
+
+        Only components whose settings changed are touched: the calculator
+        keeps its buffered beats, and the BLE connection and WebSocket
+        listener are only rebuilt if the device or listen address changed.
+
+        Returns:
+            Dictionary with 'success' and the list of 'changed' settings
+        """
+        new_config = read_config(self.config_path)
+        if new_config is None:
+            logger.error("Config reload aborted: configuration is invalid")
+            return {'success': False, 'changed': [], 'error': 'invalid configuration'}
+
+        changed = []
+
+        if new_config['coherence'] != self.config['coherence']:
+            changed += [f"coherence.{key}" for key in self.coherence_calc.reconfigure(new_config)]
+            self.update_interval = new_config['coherence']['update_interval']
+            if self.update_interval != self.config['coherence']['update_interval']:
+                changed.append('coherence.update_interval')
+
+        if new_config['websocket'] != self.config['websocket']:
+            self.websocket_server.reconfigure(new_config)
+            changed.append('websocket')
+
+        if new_config['polar'] != self.config['polar']:
+            changed.append('polar')
+            if self.polar_h10.reconfigure(new_config):
+                logger.info(f"Device, ECG or motion settings changed, reconnecting to {self.polar_h10.device_name}")
+                await self.polar_h10.disconnect()
+                self.polar_h10.reconnect_count = 0
+                if not self.polar_h10.auto_reconnect:
+                    await self.polar_h10.connect()
+                else:
+                    self._ensure_connection_task()
+
+        if new_config['calibration'] != self.config['calibration']:
+            self.calibration_duration = new_config['calibration']['duration']
+            changed.append('calibration')
+
+        if new_config['logging']['level'] != self.config['logging']['level']:
+            logging.getLogger().setLevel(getattr(logging, new_config['logging']['level']))
+            changed.append('logging.level')
+
+        self.config = new_config
+        logger.info(f"Configuration reloaded (changed: {', '.join(changed) or 'nothing'})")
+        return {'success': True, 'changed': changed}
+
+    def _ensure_connection_task(self) -> None:
+        """Start maintain_connection unless it is already running."""
+        if self.connection_task is None or self.connection_task.done():
+            self.connection_task = asyncio.create_task(self.polar_h10.maintain_connection())
+            self._track_background_task(self.connection_task, "maintain_connection")
+
+    def _on_reload_signal(self) -> None:
+        """Handle SIGHUP by scheduling a configuration reload."""
+        logger.info("SIGHUP received, reloading configuration")
+        task = asyncio.create_task(self.reload_config())
+        self._track_background_task(task, "reload_config")
+
     async def _periodic_coherence_update(self) -> None:
         """
         Periodically calculate and broadcast coherence scores.
@@ -172,10 +266,18 @@ class HRVMonitorService:
         """
         Periodically broadcast connection status.
         """
+        reported_drops = 0
+
         while True:
             try:
                 status = self.polar_h10.get_status()
+                status['ingest'] = self.ingest_ring.get_stats()
                 await self.websocket_server.broadcast_connection_status(status)
+
+                dropped = status['ingest']['dropped']
+                if dropped > reported_drops:
+                    logger.warning(f"Ingest ring full: {dropped - reported_drops} RR intervals dropped")
+                    reported_drops = dropped
             except Exception as e:
                 logger.error(f"Error broadcasting status: {e}")
 
@@ -187,6 +289,9 @@ class HRVMonitorService:
         """
         logger.info("Starting HRV Monitor Service")
 
+        # Notifications may start as soon as the device connects
+        self.ingest_ring.bind(asyncio.get_running_loop())
+
         # Connect to Polar H10
         logger.info("Connecting to Polar H10...")
         connected = await self.polar_h10.connect()
@@ -197,16 +302,25 @@ class HRVMonitorService:
 
         logger.info("✓ Polar H10 connected")
 
+        # Reload configuration on SIGHUP (not available on Windows)
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self._on_reload_signal)
+        except (AttributeError, NotImplementedError):
+            logger.debug("SIGHUP reload not supported on this platform")
+
         # Start WebSocket server in background
         logger.info("Starting WebSocket server...")
         websocket_task = asyncio.create_task(self.websocket_server.start())
 
+        # Consume RR intervals queued by the BLE callback
+        ingest_task = asyncio.create_task(self._consume_rr_intervals())
+
         # Start periodic updates
         coherence_task = asyncio.create_task(self._periodic_coherence_update())
         status_task = asyncio.create_task(self._periodic_status_broadcast())
 
-        # Maintain Polar H10 connection
-        connection_task = asyncio.create_task(self.polar_h10.maintain_connection())
+        # Maintain Polar H10 connection (a reload may restart it after it gave up)
+        self._ensure_connection_task()
 
         logger.info("✓ Service running")
         logger.info(f"WebSocket server: ws://{self.config['websocket']['host']}:{self.config['websocket']['port']}")
@@ -218,14 +332,16 @@ class HRVMonitorService:
             # Wait for all tasks
             await asyncio.gather(
                 websocket_task,
+                ingest_task,
                 coherence_task,
-                status_task,
-                connection_task
+                status_task
             )
         except KeyboardInterrupt:
             logger.info("Shutting down...")
         finally:
             # Graceful shutdown: stop WebSocket server then disconnect Polar H10
+            if self.connection_task is not None:
+                self.connection_task.cancel()
             await self.websocket_server.stop()
             await self.polar_h10.disconnect()
             logger.info("Service stopped")
@@ -267,6 +383,14 @@ def validate_config(config: dict) -> bool:
         logger.error("coherence.resample_rate must be > 0")
         return False
 
+    if coherence.get('backend', 'auto') not in BACKENDS:
+        logger.error(f"coherence.backend must be one of {', '.join(BACKENDS)}")
+        return False
+
+    if not (0 < coherence.get('max_motion_fraction', 0.2) <= 1):
+        logger.error("coherence.max_motion_fraction must be in (0, 1]")
+        return False
+
     # Validate frequency ranges
     min_freq = coherence.get('coherence_min_freq', 0)
     max_freq = coherence.get('coherence_max_freq', 0)
@@ -303,6 +427,51 @@ def validate_config(config: dict) -> bool:
         logger.error("polar.max_reconnect_attempts must be >= 0")
         return False
 
+    if polar.get('ingest_capacity', 256) < 16:
+        logger.error("polar.ingest_capacity must be >= 16")
+        return False
+
+    ecg = polar.get('ecg')
+    if ecg is not None:
+        if ecg.get('sample_rate', 130) != 130:
+            logger.error("polar.ecg.sample_rate must be 130 (the Polar H10 ECG rate)")
+            return False
+
+        bandpass = ecg.get('bandpass', [5, 15])
+        if len(bandpass) != 2 or not (0 < bandpass[0] < bandpass[1] < 65):
+            logger.error("polar.ecg.bandpass must be [low, high] with 0 < low < high < 65 Hz")
+            return False
+
+        if not (0 < ecg.get('integration_window', 0.15) <= 0.5):
+            logger.error("polar.ecg.integration_window must be in (0, 0.5] seconds")
+            return False
+
+        if not (0.1 <= ecg.get('refractory_period', 0.2) <= 0.3):
+            logger.error("polar.ecg.refractory_period must be between 0.1 and 0.3 seconds")
+            return False
+
+    motion = polar.get('motion')
+    if motion is not None:
+        if motion.get('sample_rate', 200) not in PolarH10.ACC_SAMPLE_RATES:
+            logger.error(f"polar.motion.sample_rate must be one of {PolarH10.ACC_SAMPLE_RATES}")
+            return False
+
+        if motion.get('range', 8) not in PolarH10.ACC_RANGES:
+            logger.error(f"polar.motion.range must be one of {PolarH10.ACC_RANGES} (G)")
+            return False
+
+        if motion.get('threshold', 100) <= 0:
+            logger.error("polar.motion.threshold must be > 0 (mG)")
+            return False
+
+        if not (0 < motion.get('highpass', 0.5) < motion.get('sample_rate', 200) / 2):
+            logger.error("polar.motion.highpass must be between 0 and half the sample rate")
+            return False
+
+        if not (0 < motion.get('window', 1.0) <= 5):
+            logger.error("polar.motion.window must be in (0, 5] seconds")
+            return False
+
     # Validate websocket settings
     websocket = config['websocket']
 
@@ -311,6 +480,34 @@ def validate_config(config: dict) -> bool:
         logger.error(f"websocket.port must be between 1-65535, got {port}")
         return False
 
+    for limit in ('max_clients', 'max_message_size', 'max_messages_per_second'):
+        if websocket.get(limit, 1) < 1:
+            logger.error(f"websocket.{limit} must be >= 1")
+            return False
+
+    for limit, value in websocket.get('admission', {}).items():
+        if not isinstance(value, (int, float)) or value <= 0:
+            logger.error(f"websocket.admission.{limit} must be a number > 0")
+            return False
+
+    if websocket.get('workers', 1) < 0:
+        logger.error("websocket.workers must be >= 0")
+        return False
+
+    compression = compression_settings(websocket)
+    for bits in ('server_max_window_bits', 'client_max_window_bits'):
+        if not (9 <= compression[bits] <= 15):
+            logger.error(f"websocket.compression.{bits} must be between 9-15")
+            return False
+
+    if not (1 <= compression['mem_level'] <= 9):
+        logger.error("websocket.compression.mem_level must be between 1-9")
+        return False
+
+    if batching_settings(websocket)['window'] <= 0:
+        logger.error("websocket.batching.window must be > 0")
+        return False
+
     # Validate calibration settings
     calibration = config['calibration']
 
@@ -318,32 +515,153 @@ def validate_config(config: dict) -> bool:
         logger.error("calibration.duration must be >= 0")
         return False
 
+    # Validate pipeline settings (optional section)
+    pipeline = config.get('pipeline')
+    if pipeline is not None:
+        if pipeline.get('mode') not in ('single', 'multiprocess'):
+            logger.error("pipeline.mode must be 'single' or 'multiprocess'")
+            return False
+
+        if pipeline.get('ring_capacity', 0) < 16:
+            logger.error("pipeline.ring_capacity must be >= 16")
+            return False
+
+        if pipeline.get('poll_interval', 0) <= 0:
+            logger.error("pipeline.poll_interval must be > 0")
+            return False
+
+    # Validate relay settings (optional section)
+    relay = config.get('relay')
+    if relay is not None:
+        port = relay.get('port', 0)
+        if not (1 <= port <= 65535):
+            logger.error(f"relay.port must be between 1-65535, got {port}")
+            return False
+
+        if relay.get('reconnect_delay', 0) <= 0:
+            logger.error("relay.reconnect_delay must be > 0")
+            return False
+
+        if relay.get('max_reconnect_delay', 0) < relay.get('reconnect_delay', 0):
+            logger.error("relay.max_reconnect_delay must be >= relay.reconnect_delay")
+            return False
+
+        if relay.get('client_queue_size', 256) < 1:
+            logger.error("relay.client_queue_size must be >= 1")
+            return False
+
+        if relay.get('clock_probe_interval', 5.0) < 0:
+            logger.error("relay.clock_probe_interval must be >= 0")
+            return False
+
+        names = set()
+        for upstream in relay.get('upstreams') or []:
+            name = upstream.get('name')
+            url = upstream.get('url', '')
+            if not name or name in names:
+                logger.error(f"relay.upstreams names must be unique and non-empty, got '{name}'")
+                return False
+            if not url.startswith(('ws://', 'wss://')):
+                logger.error(f"relay upstream '{name}' url must start with ws:// or wss://")
+                return False
+            names.add(name)
+
+    # Validate synchrony settings (optional section)
+    synchrony = config.get('synchrony')
+    if synchrony is not None:
+        for setting in ('update_interval', 'resample_rate', 'analysis_window', 'xcorr_window',
+                        'xcorr_step', 'max_lag', 'segment_duration', 'band_min_freq'):
+            if synchrony.get(setting, 0) <= 0:
+                logger.error(f"synchrony.{setting} must be > 0")
+                return False
+
+        analysis_window = synchrony['analysis_window']
+        if synchrony['xcorr_window'] > analysis_window or synchrony['segment_duration'] > analysis_window:
+            logger.error("synchrony.xcorr_window and segment_duration must be <= analysis_window")
+            return False
+
+        if synchrony['max_lag'] >= synchrony['xcorr_window']:
+            logger.error("synchrony.max_lag must be < synchrony.xcorr_window")
+            return False
+
+        if synchrony.get('band_max_freq', 0) <= synchrony['band_min_freq']:
+            logger.error("synchrony.band_max_freq must be > synchrony.band_min_freq")
+            return False
+
+        if synchrony.get('min_subjects', 2) < 2:
+            logger.error("synchrony.min_subjects must be >= 2")
+            return False
+
+        if synchrony.get('surrogates', 10) < 0:
+            logger.error("synchrony.surrogates must be >= 0")
+            return False
+
+    # Validate fusion settings (optional section)
+    fusion = config.get('fusion')
+    if fusion is not None:
+        for setting in ('window', 'hop', 'max_buffered', 'offset_window'):
+            if fusion.get(setting, 0) <= 0:
+                logger.error(f"fusion.{setting} must be > 0")
+                return False
+
+        if fusion.get('max_latency', -1) < 0:
+            logger.error("fusion.max_latency must be >= 0")
+            return False
+
+        streams = fusion.get('streams') or {}
+        if fusion.get('enabled', False):
+            upstream_names = {upstream.get('name') for upstream in (relay or {}).get('upstreams') or []}
+            if not streams or any(upstream not in upstream_names for upstream in streams.values()):
+                logger.error("fusion.streams must map stream names to relay.upstreams names")
+                return False
+
     logger.debug("Configuration validation passed")
     return True
 
 
-def load_config(config_path: str = "config/default.yaml") -> dict:
+def read_config(config_path: str = DEFAULT_CONFIG_PATH) -> Optional[dict]:
     """
-    Load configuration from YAML file.
+    Read and validate configuration from YAML file.
 
     Args:
-        config_path: Path to configuration file
+        config_path: Path to configuration file (relative to the project root)
 
     Returns:
-        Configuration dictionary
+        Configuration dictionary, or None if missing or invalid
     """
     config_file = Path(__file__).parent.parent / config_path
 
     if not config_file.exists():
         logger.error(f"Configuration file not found: {config_file}")
-        sys.exit(1)
+        return None
 
-    with open(config_file, 'r') as f:
-        config = yaml.safe_load(f)
+    try:
+        with open(config_file, 'r') as f:
+            config = yaml.safe_load(f)
+    except yaml.YAMLError as e:
+        logger.error(f"Configuration file is not valid YAML: {e}")
+        return None
 
-    # Validate configuration
-    if not validate_config(config):
+    if not isinstance(config, dict) or not validate_config(config):
         logger.error("Configuration validation failed")
+        return None
+
+    return config
+
+
+def load_config(config_path: str = DEFAULT_CONFIG_PATH) -> dict:
+    """
+    Load configuration from YAML file, exiting if it is missing or invalid.
+
+    Args:
+        config_path: Path to configuration file
+
+    Returns:
+        Configuration dictionary
+    """
+    config = read_config(config_path)
+
+    if config is None:
         sys.exit(1)
 
     return config
@@ -358,7 +676,10 @@ async def main():
     setup_logging(config)
 
     # Create and run service
-    service = HRVMonitorService(config)
+    if config.get('pipeline', {}).get('mode') == 'multiprocess':
+        service = MultiProcessPipeline(config)
+    else:
+        service = HRVMonitorService(config)
     await service.run()
 
 
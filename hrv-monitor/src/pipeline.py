@@ -0,0 +1,404 @@
+"""
+Multi-Process Pipeline
+Optional topology that runs BLE ingest, coherence calculation and
+WebSocket fan-out in separate processes connected by shared-memory rings
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+try:
+    from .shared_ring import SharedMessageBus, SharedRingBuffer
+except ImportError:
+    from shared_ring import SharedMessageBus, SharedRingBuffer
+
+
+logger = logging.getLogger(__name__)
+
+
+# Record layouts exchanged between stages
+RR_DTYPE = np.dtype([
+    ('timestamp', 'f8'),   # time.time() at ingest
+    ('rr_ms', 'f8'),
+    ('motion', '?'),       # beat recorded during movement
+])
+
+STATUS_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('connected', '?'),
+    ('reconnect_count', 'i4'),
+    ('device_name', 'S64'),
+    ('client_address', 'S64'),
+])
+
+# Message types whose latest value fan-out workers cache for new clients
+STATE_MESSAGE_TYPES = (b'"coherence_update"', b'"buffer_status"', b'"connection_status"')
+
+
+def _ring_names(prefix: str) -> Dict[str, str]:
+    """Shared memory block names for one pipeline instance."""
+    return {
+        'rr': f"{prefix}_rr",
+        'status': f"{prefix}_status",
+        'messages': f"{prefix}_messages",
+    }
+
+
+def _worker_count(config: dict) -> int:
+    """Number of WebSocket fan-out workers (0 in config = one per CPU core)."""
+    workers = config['websocket'].get('workers', 1)
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def _setup_stage_logging(config: dict, stage: str) -> None:
+    """Configure console logging in a stage process, tagged with the stage name."""
+    logging.basicConfig(
+        level=getattr(logging, config['logging']['level']),
+        format=f"[{stage}] {config['logging']['format']}"
+    )
+
+
+def _attach_rings(config: dict, prefix: str) -> Dict[str, Union[SharedRingBuffer, SharedMessageBus]]:
+    """Attach to the pipeline's rings from a stage process."""
+    capacity = config['pipeline']['ring_capacity']
+    names = _ring_names(prefix)
+    return {
+        'rr': SharedRingBuffer.attach(names['rr'], RR_DTYPE, capacity),
+        'status': SharedRingBuffer.attach(names['status'], STATUS_DTYPE, capacity),
+        'messages': SharedMessageBus.attach(names['messages'], capacity),
+    }
+
+
+def _encode(text) -> bytes:
+    """Encode an optional string for a fixed-width bytes field."""
+    return (text or '').encode('utf-8')[:64]
+
+
+def _decode(raw: bytes):
+    """Decode a fixed-width bytes field back to an optional string."""
+    return raw.decode('utf-8') or None
+
+
+# ---------------------------------------------------------------------------
+# Stage: BLE ingest
+# ---------------------------------------------------------------------------
+
+def run_ingest_stage(config: dict, prefix: str) -> None:
+    """
+    Process entry point: connect to the Polar H10 and publish RR intervals.
+
+    Args:
+        config: Configuration dictionary
+        prefix: Shared memory name prefix
+    """
+    _setup_stage_logging(config, 'ingest')
+    try:
+        asyncio.run(_ingest(config, prefix))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _ingest(config: dict, prefix: str) -> None:
+    """Ingest stage main loop."""
+    try:
+        from .polar_h10 import PolarH10
+    except ImportError:
+        from polar_h10 import PolarH10
+
+    rings = _attach_rings(config, prefix)
+    rr_ring = rings['rr']
+    status_ring = rings['status']
+
+    polar_h10 = PolarH10(
+        config,
+        on_rr_interval=lambda rr_ms, motion: rr_ring.write(time.time(), rr_ms, motion)
+    )
+
+    def publish_status() -> None:
+        status = polar_h10.get_status()
+        status_ring.write(
+            time.time(),
+            status['connected'],
+            status['reconnect_count'],
+            _encode(status['device_name']),
+            _encode(status['client_address'])
+        )
+
+    try:
+        if not await polar_h10.connect():
+            logger.error("Failed to connect to Polar H10")
+            publish_status()
+            return
+
+        connection_task = asyncio.create_task(polar_h10.maintain_connection())
+        while not connection_task.done():
+            publish_status()
+            await asyncio.sleep(5)
+    finally:
+        await polar_h10.disconnect()
+        for ring in rings.values():
+            ring.close()
+
+
+# ---------------------------------------------------------------------------
+# Stage: coherence compute
+# ---------------------------------------------------------------------------
+
+def run_compute_stage(config: dict, prefix: str) -> None:
+    """
+    Process entry point: consume RR intervals and publish client messages.
+
+    Every message is JSON-encoded exactly once here and published on the
+    shared message bus, from which each fan-out worker forwards it.
+
+    Args:
+        config: Configuration dictionary
+        prefix: Shared memory name prefix
+    """
+    _setup_stage_logging(config, 'compute')
+
+    try:
+        from .coherence_calculator import CoherenceCalculator
+        from .websocket_server import connection_status_data, heartbeat_data, make_message
+    except ImportError:
+        from coherence_calculator import CoherenceCalculator
+        from websocket_server import connection_status_data, heartbeat_data, make_message
+
+    rings = _attach_rings(config, prefix)
+    rr_reader = rings['rr'].reader(from_start=True)
+    status_reader = rings['status'].reader(from_start=True)
+    bus = rings['messages']
+
+    def publish(msg_type: str, data: dict) -> None:
+        bus.publish(json.dumps(make_message(msg_type, data)).encode('utf-8'))
+
+    calculator = CoherenceCalculator(config)
+    update_interval = config['coherence']['update_interval']
+    poll_interval = config['pipeline']['poll_interval']
+    next_update = time.monotonic() + update_interval
+
+    try:
+        while True:
+            for timestamp, rr_ms, motion in rr_reader.read():
+                rr_ms = float(rr_ms)
+                calculator.add_rr_interval(rr_ms, timestamp=float(timestamp), motion=bool(motion))
+                publish('heartbeat', heartbeat_data(rr_ms))
+
+            statuses = status_reader.read()
+            if len(statuses):
+                status = statuses[-1]
+                publish('connection_status', connection_status_data({
+                    'connected': bool(status['connected']),
+                    'device_name': _decode(status['device_name']),
+                    'client_address': _decode(status['client_address'])
+                }))
+
+            now = time.monotonic()
+            if now >= next_update:
+                next_update = now + update_interval
+                result = calculator.calculate_coherence()
+                publish('coherence_update', result)
+                publish('buffer_status', calculator.get_buffer_status())
+
+                if result['status'] == 'valid':
+                    logger.info(
+                        f"Coherence: {result['coherence']}/100 "
+                        f"(ratio={result['ratio']:.2f}, beats={result['beats_used']}, "
+                        f"dropped={rr_reader.dropped}, oversized={bus.oversized})"
+                    )
+
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for ring in rings.values():
+            ring.close()
+
+
+# ---------------------------------------------------------------------------
+# Stage: WebSocket fan-out workers
+# ---------------------------------------------------------------------------
+
+def run_serve_stage(config: dict, prefix: str, reuse_port: bool = False) -> None:
+    """
+    Process entry point: serve this worker's WebSocket clients from the bus.
+
+    Args:
+        config: Configuration dictionary
+        prefix: Shared memory name prefix
+        reuse_port: Share the listen port with sibling workers (SO_REUSEPORT)
+    """
+    _setup_stage_logging(config, f"serve-{os.getpid()}")
+    try:
+        asyncio.run(_serve(config, prefix, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _serve(config: dict, prefix: str, reuse_port: bool) -> None:
+    """Fan-out worker main loop."""
+    try:
+        from .websocket_server import CoherenceWebSocketServer
+    except ImportError:
+        from websocket_server import CoherenceWebSocketServer
+
+    rings = _attach_rings(config, prefix)
+    # Replay retained messages so a (re)started worker has current state
+    subscriber = rings['messages'].subscribe(from_start=True)
+
+    server = CoherenceWebSocketServer(config, reuse_port=reuse_port)
+    server_task = asyncio.create_task(server.start())
+    poll_interval = config['pipeline']['poll_interval']
+
+    try:
+        while not server_task.done():
+            for raw in subscriber.receive():
+                # Only state messages are decoded (to cache for new clients);
+                # heartbeats are forwarded as-is
+                message = json.loads(raw) if _is_state_message(raw) else None
+                await server.broadcast_encoded(raw.decode('utf-8'), message)
+
+            await asyncio.sleep(poll_interval)
+    finally:
+        await server.stop()
+        await server_task
+        for ring in rings.values():
+            ring.close()
+
+
+def _is_state_message(raw: bytes) -> bool:
+    """Check the leading 'type' field of an encoded message without parsing it."""
+    head = raw[:40]
+    return any(msg_type in head for msg_type in STATE_MESSAGE_TYPES)
+
+
+# ---------------------------------------------------------------------------
+# Orchestrator
+# ---------------------------------------------------------------------------
+
+class MultiProcessPipeline:
+    """
+    Runs ingest, compute and WebSocket fan-out as separate processes.
+
+    The parent process owns the shared-memory rings and supervises the
+    stages; each stage has its own interpreter and GIL, so a GC pause or
+    burst in one stage does not stall the others. The compute stage
+    encodes every client message once onto a broadcast bus, and
+    `websocket.workers` fan-out processes share the listen port via
+    SO_REUSEPORT, each serving its own set of clients.
+    """
+
+    STAGE_TARGETS = {
+        'ingest': run_ingest_stage,
+        'compute': run_compute_stage,
+        'serve': run_serve_stage,
+    }
+
+    def __init__(self, config: dict):
+        """
+        Initialize the pipeline.
+
+        Args:
+            config: Configuration dictionary (with a 'pipeline' section)
+        """
+        self.config = config
+        self.prefix = f"hrv_{os.getpid()}"
+        self.rings: Dict[str, Union[SharedRingBuffer, SharedMessageBus]] = {}
+        self.processes: Dict[str, multiprocessing.Process] = {}
+
+        # Spawn gives each stage a clean interpreter (no inherited event loop or BLE state)
+        self._context = multiprocessing.get_context('spawn')
+
+    def _create_rings(self) -> None:
+        """Create the shared-memory rings (owned by this process)."""
+        capacity = self.config['pipeline']['ring_capacity']
+        names = _ring_names(self.prefix)
+        self.rings = {
+            'rr': SharedRingBuffer.create(names['rr'], RR_DTYPE, capacity),
+            'status': SharedRingBuffer.create(names['status'], STATUS_DTYPE, capacity),
+            'messages': SharedMessageBus.create(names['messages'], capacity),
+        }
+
+    def _start_stage(self, stage: str, name: Optional[str] = None, args: tuple = ()) -> None:
+        """
+        Start one stage process.
+
+        Args:
+            stage: Stage kind ('ingest', 'compute' or 'serve')
+            name: Unique process name (defaults to the stage kind)
+            args: Extra arguments for the stage entry point
+        """
+        name = name or stage
+        process = self._context.Process(
+            target=self.STAGE_TARGETS[stage],
+            args=(self.config, self.prefix, *args),
+            name=f"hrv-{name}",
+            daemon=True
+        )
+        process.start()
+        self.processes[name] = process
+        logger.info(f"Started {name} stage (pid {process.pid})")
+
+    async def run(self) -> None:
+        """
+        Start all stages and supervise them until one exits.
+        """
+        logger.info("Starting HRV Monitor multi-process pipeline")
+        self._create_rings()
+
+        try:
+            self._start_stage('ingest')
+            self._start_stage('compute')
+
+            workers = _worker_count(self.config)
+            for index in range(workers):
+                self._start_stage('serve', name=f"serve-{index}", args=(workers > 1,))
+            logger.info(
+                f"{workers} WebSocket worker(s), up to "
+                f"{workers * self.config['websocket'].get('max_clients', 10)} clients"
+            )
+
+            while all(process.is_alive() for process in self.processes.values()):
+                await asyncio.sleep(1)
+
+            for stage, process in self.processes.items():
+                if not process.is_alive():
+                    logger.error(f"{stage} stage exited (code {process.exitcode}), stopping pipeline")
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Terminate the stage processes and release the shared memory."""
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=5)
+
+        for ring in self.rings.values():
+            ring.close()
+            ring.unlink()
+        self.rings = {}
+        logger.info("Pipeline stopped")
+
+    def get_stats(self) -> dict:
+        """
+        Get pipeline statistics.
+
+        Returns:
+            Dictionary with per-stage liveness and ring write counters
+        """
+        return {
+            'stages': {
+                stage: {'pid': process.pid, 'alive': process.is_alive()}
+                for stage, process in self.processes.items()
+            },
+            'ring_heads': {name: ring.head for name, ring in self.rings.items()}
+        }
@@ -5,10 +5,19 @@ Connects to Polar H10 via Bluetooth LE and streams RR intervals
 
 import asyncio
 import logging
-from typing import Callable, Optional
+from typing import Callable, Optional, Tuple
+
+import numpy as np
 from bleak import BleakClient, BleakScanner
 from bleak.backends.characteristic import BleakGATTCharacteristic
 
+try:
+    from .motion_estimator import MotionEstimator
+    from .r_peak_detector import RPeakDetector
+except ImportError:
+    from motion_estimator import MotionEstimator
+    from r_peak_detector import RPeakDetector
+
 
 logger = logging.getLogger(__name__)
 
@@ -19,19 +28,47 @@ class PolarH10:
 
     Connects via Bluetooth LE and streams RR interval data
     using the standard Heart Rate Service (UUID: 0x180D).
+
+    With polar.ecg enabled, the raw ECG is also streamed from Polar
+    Measurement Data (PMD) at 130 Hz, and RR intervals come from R-peaks
+    detected on the host (millisecond accuracy) rather than the Heart Rate
+    Measurement's 1/1024 s values. If the ECG stream cannot be started,
+    the Heart Rate Measurement RR intervals are used as before.
+
+    With polar.motion enabled, the accelerometer is streamed from PMD as
+    well, and every RR interval is reported with a flag telling whether
+    the wearer was moving during that beat.
     """
 
     # Bluetooth LE Heart Rate Service UUIDs
     HEART_RATE_SERVICE_UUID = "0000180d-0000-1000-8000-00805f9b34fb"
     HEART_RATE_MEASUREMENT_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
 
-    def __init__(self, config: dict, on_rr_interval: Optional[Callable[[float], None]] = None):
+    # Polar Measurement Data service
+    PMD_SERVICE_UUID = "fb005c80-02e7-f387-1cad-8acd2d8df0c8"
+    PMD_CONTROL_UUID = "fb005c81-02e7-f387-1cad-8acd2d8df0c8"
+    PMD_DATA_UUID = "fb005c82-02e7-f387-1cad-8acd2d8df0c8"
+
+    # Start ECG: op 0x02, type 0x00 (ECG), sample rate 130 Hz, resolution 14 bits
+    PMD_START_ECG = bytearray([0x02, 0x00, 0x00, 0x01, 0x82, 0x00, 0x01, 0x01, 0x0E, 0x00])
+    PMD_STOP_ECG = bytearray([0x03, 0x00])
+    PMD_STOP_ACC = bytearray([0x03, 0x02])
+    PMD_ECG = 0x00
+    PMD_ACC = 0x02
+    PMD_CONTROL_RESPONSE = 0xF0
+
+    # ACC settings: sample rates the H10 offers (Hz) and ranges (G)
+    ACC_SAMPLE_RATES = (25, 50, 100, 200)
+    ACC_RANGES = (2, 4, 8)
+
+    def __init__(self, config: dict, on_rr_interval: Optional[Callable[[float, bool], None]] = None):
         """
         Initialize Polar H10 connection.
 
         Args:
             config: Configuration dictionary
-            on_rr_interval: Callback function called with each RR interval (ms)
+            on_rr_interval: Callback function called with each RR interval
+                            (ms) and whether the wearer was moving
         """
         self.config = config
         self.device_name = config['polar']['device_name']
@@ -44,6 +81,22 @@ class PolarH10:
         self.is_connected = False
         self.reconnect_count = 0
 
+        # Raw ECG (optional): R-peak detection on the PMD stream
+        self.ecg_config = config['polar'].get('ecg', {})
+        self.ecg_enabled = self.ecg_config.get('enabled', False)
+        self.ecg_streaming = False
+        self.detector = RPeakDetector(self.ecg_config) if self.ecg_enabled else None
+        self._last_ecg_timestamp: Optional[int] = None
+        self.ecg_frames = 0
+        self.ecg_gaps = 0
+
+        # Accelerometer (optional): motion flags for RR intervals
+        self.motion_config = config['polar'].get('motion', {})
+        self.motion_enabled = self.motion_config.get('enabled', False)
+        self.acc_streaming = False
+        self.motion = MotionEstimator(self.motion_config) if self.motion_enabled else None
+        self.acc_frames = 0
+
     async def connect(self) -> bool:
         """
         Scan for and connect to Polar H10 device.
@@ -112,6 +165,10 @@ class PolarH10:
             )
 
             logger.info("Heart rate notifications started")
+
+            if self.ecg_enabled or self.motion_enabled:
+                await self._start_pmd()
+
             return True
 
         except asyncio.TimeoutError:
@@ -124,10 +181,271 @@ class PolarH10:
             self.is_connected = False
             return False
 
+    def acc_start_command(self) -> bytearray:
+        """
+        Build the PMD command starting the accelerometer stream.
+
+        Settings: sample rate (Hz), resolution (16 bits), range (G), each
+        as setting type, count 1, uint16 value.
+
+        Returns:
+            Control point command
+        """
+        rate = self.motion_config.get('sample_rate', 200)
+        acc_range = self.motion_config.get('range', 8)
+        return bytearray([
+            0x02, self.PMD_ACC,
+            0x00, 0x01, rate & 0xFF, rate >> 8,
+            0x01, 0x01, 0x10, 0x00,
+            0x02, 0x01, acc_range & 0xFF, acc_range >> 8
+        ])
+
+    async def _start_pmd(self) -> None:
+        """
+        Start the enabled PMD streams (ECG, accelerometer).
+
+        On failure the Heart Rate Measurement RR intervals stay in use
+        (and without the accelerometer, no beats are flagged as motion).
+        """
+        self.ecg_streaming = False
+        self.acc_streaming = False
+        self._last_ecg_timestamp = None
+        if self.detector is not None:
+            self.detector.reset()
+        if self.motion is not None:
+            self.motion.reset()
+
+        try:
+            await self.client.start_notify(self.PMD_CONTROL_UUID, self._pmd_control_handler)
+            await self.client.start_notify(self.PMD_DATA_UUID, self._pmd_data_handler)
+        except Exception as e:
+            logger.warning(f"Could not subscribe to Polar Measurement Data: {e}")
+            return
+
+        if self.ecg_enabled:
+            try:
+                await self.client.write_gatt_char(self.PMD_CONTROL_UUID, self.PMD_START_ECG, response=True)
+                # RR intervals switch to the ECG once the start is confirmed
+                logger.info("ECG stream requested (PMD, 130 Hz)")
+            except Exception as e:
+                logger.warning(f"Could not start ECG stream, using heart rate RR intervals: {e}")
+
+        if self.motion_enabled:
+            try:
+                await self.client.write_gatt_char(self.PMD_CONTROL_UUID, self.acc_start_command(), response=True)
+                logger.info(f"Accelerometer stream requested (PMD, {self.motion.sample_rate} Hz)")
+            except Exception as e:
+                logger.warning(f"Could not start accelerometer stream, beats won't be motion-gated: {e}")
+
+    def _pmd_control_handler(self, sender: BleakGATTCharacteristic, data: bytearray) -> None:
+        """
+        Handle PMD control point responses.
+
+        Response format: 0xF0, op code, measurement type, error code, ...
+
+        Args:
+            sender: GATT characteristic that sent the indication
+            data: Raw response
+        """
+        if len(data) < 4 or data[0] != self.PMD_CONTROL_RESPONSE or data[1] != self.PMD_START_ECG[0]:
+            return
+
+        measurement, error = data[2], data[3]
+        if measurement == self.PMD_ECG:
+            self.ecg_streaming = error == 0
+            if error == 0:
+                logger.info("ECG stream started; RR intervals now from detected R-peaks")
+            else:
+                logger.warning(f"ECG stream refused (PMD error {error}), using heart rate RR intervals")
+        elif measurement == self.PMD_ACC:
+            self.acc_streaming = error == 0
+            if error == 0:
+                logger.info("Accelerometer stream started; beats during movement will be flagged")
+            else:
+                logger.warning(f"Accelerometer stream refused (PMD error {error}), beats won't be motion-gated")
+
+    @classmethod
+    def parse_ecg_frame(cls, data: bytearray) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Parse a PMD ECG data frame.
+
+        Frame format:
+        - Byte 0: Measurement type (0x00 = ECG)
+        - Bytes 1-8: Timestamp of the last sample (uint64, ns, sensor clock)
+        - Byte 9: Frame type (0x00 = 3-byte samples)
+        - Bytes 10+: Samples, signed 24-bit little-endian (µV)
+
+        Args:
+            data: Raw notification data
+
+        Returns:
+            Tuple of (timestamp in ns, samples in µV), or None if not an
+            ECG frame
+        """
+        if len(data) < 10 or data[0] != cls.PMD_ECG or data[9] != 0x00:
+            return None
+
+        timestamp = int.from_bytes(data[1:9], byteorder='little')
+        raw = np.frombuffer(bytes(data[10:10 + (len(data) - 10) // 3 * 3]), dtype=np.uint8)
+        raw = raw.reshape(-1, 3).astype(np.int32)
+        samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = (samples ^ 0x800000) - 0x800000  # sign-extend 24 bits
+        return timestamp, samples
+
+    @classmethod
+    def parse_acc_frame(cls, data: bytearray) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Parse a PMD accelerometer data frame.
+
+        Frame format:
+        - Byte 0: Measurement type (0x02 = ACC)
+        - Bytes 1-8: Timestamp of the last sample (uint64, ns, sensor clock)
+        - Byte 9: Frame type (0x00, 0x01, 0x02 = 1, 2, 3 bytes per axis)
+        - Bytes 10+: Samples as x, y, z, signed little-endian (mG)
+
+        Args:
+            data: Raw notification data
+
+        Returns:
+            Tuple of (timestamp in ns, samples of shape (n, 3) in mG), or
+            None if not an accelerometer frame
+        """
+        if len(data) < 10 or data[0] != cls.PMD_ACC or data[9] > 0x02:
+            return None
+
+        timestamp = int.from_bytes(data[1:9], byteorder='little')
+        width = data[9] + 1
+        payload = bytes(data[10:10 + (len(data) - 10) // (3 * width) * 3 * width])
+        if width == 1:
+            samples = np.frombuffer(payload, dtype=np.int8).astype(np.int32)
+        elif width == 2:
+            samples = np.frombuffer(payload, dtype='<i2').astype(np.int32)
+        else:
+            raw = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            samples = (samples ^ 0x800000) - 0x800000  # sign-extend 24 bits
+        return timestamp, samples.reshape(-1, 3)
+
+    def _pmd_data_handler(self, sender: BleakGATTCharacteristic, data: bytearray) -> None:
+        """
+        Handle PMD data frames.
+
+        ECG frames go through R-peak detection and emit RR intervals;
+        accelerometer frames update the motion estimate. ECG frames are
+        ignored until the stream start is confirmed: until then RR
+        intervals come from the heart rate service, and using both would
+        emit every beat twice.
+
+        Args:
+            sender: GATT characteristic that sent the notification
+            data: Raw notification data
+        """
+        if len(data) and data[0] == self.PMD_ACC:
+            self._handle_acc_frame(data)
+            return
+
+        try:
+            frame = self.parse_ecg_frame(data)
+            if frame is None or self.detector is None or not self.ecg_streaming:
+                return
+            timestamp, samples = frame
+            self.ecg_frames += 1
+
+            # Frames carry the last sample's time: a longer step than the
+            # frame's own duration means frames were lost
+            if self._last_ecg_timestamp is not None:
+                expected_ns = len(samples) * 1e9 / self.detector.sample_rate
+                if timestamp - self._last_ecg_timestamp > 1.5 * expected_ns:
+                    self.ecg_gaps += 1
+                    self.detector.mark_gap()
+            self._last_ecg_timestamp = timestamp
+
+            for rr_ms in self.detector.process(samples):
+                if self.on_rr_interval and self._is_valid_rr_interval(rr_ms):
+                    self._emit_rr_interval(rr_ms)
+
+        except (IndexError, ValueError) as e:
+            logger.warning(f"Error parsing ECG data (malformed packet): {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error processing ECG data: {e}", exc_info=True)
+
+    def _handle_acc_frame(self, data: bytearray) -> None:
+        """
+        Update the motion estimate from a PMD accelerometer frame.
+
+        Args:
+            data: Raw notification data
+        """
+        try:
+            frame = self.parse_acc_frame(data)
+            if frame is None or self.motion is None:
+                return
+            self.acc_frames += 1
+            self.motion.process(frame[1])
+
+        except (IndexError, ValueError) as e:
+            logger.warning(f"Error parsing accelerometer data (malformed packet): {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error processing accelerometer data: {e}", exc_info=True)
+
+    def _emit_rr_interval(self, rr_ms: float) -> None:
+        """
+        Pass a validated RR interval to the callback with its motion flag.
+
+        Args:
+            rr_ms: RR interval in milliseconds
+        """
+        moving = self.acc_streaming and self.motion.is_moving(rr_ms / 1000.0)
+        self.on_rr_interval(rr_ms, moving)
+
+    def reconfigure(self, config: dict) -> bool:
+        """
+        Apply new Polar settings in place.
+
+        Reconnect settings take effect immediately; the BLE connection is
+        left untouched unless the target device or ECG settings change.
+
+        Args:
+            config: Full (already validated) configuration dictionary
+
+        Returns:
+            True if the device name, ECG or motion settings changed and a
+            reconnect is required
+        """
+        polar_config = config['polar']
+        self.config = config
+        self.auto_reconnect = polar_config['auto_reconnect']
+        self.reconnect_delay = polar_config['reconnect_delay']
+        self.max_reconnect_attempts = polar_config['max_reconnect_attempts']
+
+        device_changed = polar_config['device_name'] != self.device_name
+        self.device_name = polar_config['device_name']
+
+        ecg_changed = polar_config.get('ecg', {}) != self.ecg_config
+        if ecg_changed:
+            self.ecg_config = polar_config.get('ecg', {})
+            self.ecg_enabled = self.ecg_config.get('enabled', False)
+            self.detector = RPeakDetector(self.ecg_config) if self.ecg_enabled else None
+
+        motion_changed = polar_config.get('motion', {}) != self.motion_config
+        if motion_changed:
+            self.motion_config = polar_config.get('motion', {})
+            self.motion_enabled = self.motion_config.get('enabled', False)
+            self.motion = MotionEstimator(self.motion_config) if self.motion_enabled else None
+
+        return device_changed or ecg_changed or motion_changed
+
     async def disconnect(self) -> None:
         """Disconnect from Polar H10."""
         if self.client and self.is_connected:
             try:
+                if self.acc_streaming:
+                    await self.client.write_gatt_char(self.PMD_CONTROL_UUID, self.PMD_STOP_ACC, response=True)
+                if self.ecg_streaming:
+                    await self.client.write_gatt_char(self.PMD_CONTROL_UUID, self.PMD_STOP_ECG, response=True)
+                if self.ecg_streaming or self.acc_streaming:
+                    await self.client.stop_notify(self.PMD_DATA_UUID)
+                    await self.client.stop_notify(self.PMD_CONTROL_UUID)
                 await self.client.stop_notify(self.HEART_RATE_MEASUREMENT_UUID)
                 await self.client.disconnect()
                 logger.info("Disconnected from Polar H10")
@@ -139,6 +457,8 @@ class PolarH10:
                 logger.error(f"Unexpected disconnect error: {e}", exc_info=True)
             finally:
                 self.is_connected = False
+                self.ecg_streaming = False
+                self.acc_streaming = False
 
     def _notification_handler(self, sender: BleakGATTCharacteristic, data: bytearray) -> None:
         """
@@ -161,7 +481,8 @@ class PolarH10:
             # Check if RR intervals are present (bit 4)
             rr_present = (flags & 0x10) != 0
 
-            if not rr_present:
+            # RR intervals come from the ECG while it is streaming
+            if not rr_present or self.ecg_streaming:
                 return
 
             # Determine heart rate value size
@@ -188,7 +509,7 @@ class PolarH10:
                 # Validate RR interval before calling callback
                 # Physiologically valid range: 300-2000ms (20-200 bpm)
                 if self.on_rr_interval and self._is_valid_rr_interval(rr_ms):
-                    self.on_rr_interval(rr_ms)
+                    self._emit_rr_interval(rr_ms)
 
         except (IndexError, ValueError) as e:
             # Expected parsing errors from malformed data
@@ -258,9 +579,23 @@ class PolarH10:
         Returns:
             Dictionary with connection information
         """
-        return {
+        status = {
             'connected': self.is_connected,
             'device_name': self.device_name,
             'reconnect_count': self.reconnect_count,
             'client_address': self.client.address if self.client else None
         }
+        if self.ecg_enabled:
+            status['ecg'] = {
+                'streaming': self.ecg_streaming,
+                'frames': self.ecg_frames,
+                'gaps': self.ecg_gaps,
+                **self.detector.get_stats()
+            }
+        if self.motion_enabled:
+            status['motion'] = {
+                'streaming': self.acc_streaming,
+                'frames': self.acc_frames,
+                **self.motion.get_stats()
+            }
+        return status
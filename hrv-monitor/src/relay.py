@@ -0,0 +1,677 @@
+"""
+Relay / Aggregator Service
+Subscribes to several upstream monitor instances and re-serves their
+merged, source-tagged streams to downstream clients from one port
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import websockets
+from websockets.asyncio.server import ServerConnection
+
+try:
+    from .stream_fusion import StreamFusion
+    from .synchrony import SynchronyEngine, resample_to_common_time_base
+    from .websocket_server import CoherenceWebSocketServer, make_message
+except ImportError:
+    from stream_fusion import StreamFusion
+    from synchrony import SynchronyEngine, resample_to_common_time_base
+    from websocket_server import CoherenceWebSocketServer, make_message
+
+
+logger = logging.getLogger(__name__)
+
+
+def fusion_payload(message: dict) -> Optional[dict]:
+    """
+    Payload of an upstream data message for a fused window.
+
+    hrv-monitor messages carry it under 'data'; EEG monitor messages put
+    their fields at the top level next to 'type' and the timestamps.
+    """
+    if 'data' in message:
+        return message['data']
+    return {key: value for key, value in message.items()
+            if key not in ('type', 'timestamp', 'sample_time')}
+
+
+class UpstreamConnection:
+    """
+    Connection to one upstream monitor (hrv-monitor or EEG monitor).
+
+    Reconnects with exponential backoff and tracks delivery lag. Upstream
+    timestamps come from the upstream's own monotonic clock, so lag is
+    measured relative to the fastest delivery seen on the current
+    connection: lag = (receive - sent) - min(receive - sent).
+
+    With a clock probe interval set, a 'ping' is sent that often and each
+    'pong' (which carries the upstream's clock time) is matched to the
+    oldest unanswered ping, so the upstream's clock offset can be
+    estimated from round trips rather than from one-way delays.
+    """
+
+    def __init__(self, name: str, url: str, reconnect_delay: float, max_reconnect_delay: float,
+                 on_message: Callable[[str, dict], Awaitable[None]],
+                 clock_probe_interval: float = 0.0,
+                 on_clock_probe: Optional[Callable[[str, float, float, float], None]] = None):
+        """
+        Initialize upstream connection.
+
+        Args:
+            name: Source tag added to every message from this upstream
+            url: Upstream WebSocket URL (ws:// or wss://)
+            reconnect_delay: Initial delay between reconnect attempts (seconds)
+            max_reconnect_delay: Upper bound for the backoff delay (seconds)
+            on_message: Coroutine function awaited with (source, message)
+                        for each message
+            clock_probe_interval: Seconds between clock probes (0 disables)
+            on_clock_probe: Called with (source, local send time, upstream
+                            time, local receive time) for each answered probe
+        """
+        self.name = name
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.on_message = on_message
+        self.clock_probe_interval = clock_probe_interval
+        self.on_clock_probe = on_clock_probe
+
+        self.is_connected = False
+        self.reconnect_count = 0
+        self.messages_received = 0
+        self.last_message_time: Optional[float] = None
+
+        # Lag tracking (reset on every connection)
+        self._min_offset: Optional[float] = None
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.mean_lag = 0.0
+
+        # Send times of unanswered clock probes, oldest first
+        self._probes: Deque[float] = deque()
+
+    async def run(self) -> None:
+        """Receive from the upstream forever, reconnecting on failure."""
+        delay = self.reconnect_delay
+
+        while True:
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    self.is_connected = True
+                    self._min_offset = None
+                    self._probes.clear()
+                    delay = self.reconnect_delay
+                    logger.info(f"Upstream '{self.name}' connected: {self.url}")
+
+                    probe_task = None
+                    if self.clock_probe_interval > 0:
+                        probe_task = asyncio.create_task(self._send_clock_probes(websocket))
+                    try:
+                        async for raw in websocket:
+                            await self._on_raw_message(raw)
+                    finally:
+                        if probe_task is not None:
+                            probe_task.cancel()
+
+            except asyncio.CancelledError:
+                raise
+            except (OSError, websockets.exceptions.WebSocketException) as e:
+                logger.warning(f"Upstream '{self.name}' unavailable: {e}")
+            except Exception as e:
+                logger.error(f"Unexpected error on upstream '{self.name}': {e}", exc_info=True)
+
+            self.is_connected = False
+            self.reconnect_count += 1
+            logger.info(f"Reconnecting to '{self.name}' in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _send_clock_probes(self, websocket) -> None:
+        """Send a timestamped-reply ping every clock_probe_interval seconds."""
+        try:
+            while True:
+                self._probes.append(time.monotonic())
+                await websocket.send(json.dumps({'type': 'ping'}))
+                await asyncio.sleep(self.clock_probe_interval)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def _on_raw_message(self, raw: str) -> None:
+        """Decode one upstream message, update metrics and hand it on."""
+        try:
+            message = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON from upstream '{self.name}'")
+            return
+
+        if not isinstance(message, dict):
+            return
+
+        now = time.monotonic()
+        self.messages_received += 1
+        self.last_message_time = now
+
+        sent = message.get('timestamp')
+        if message.get('type') == 'pong' and self._probes:
+            probe_sent = self._probes.popleft()
+            if isinstance(sent, (int, float)) and self.on_clock_probe is not None:
+                self.on_clock_probe(self.name, probe_sent, sent, now)
+        elif isinstance(sent, (int, float)):
+            self._update_lag(now - sent)
+
+        await self.on_message(self.name, message)
+
+    def _update_lag(self, offset: float) -> None:
+        """Update lag metrics from one (receive - sent) clock offset."""
+        if self._min_offset is None or offset < self._min_offset:
+            self._min_offset = offset
+
+        self.lag = offset - self._min_offset
+        self.max_lag = max(self.max_lag, self.lag)
+        # Exponential moving average over roughly the last 100 messages
+        self.mean_lag += (self.lag - self.mean_lag) * 0.01
+
+    def get_status(self) -> dict:
+        """
+        Get upstream status and lag metrics.
+
+        Returns:
+            Dictionary with connection state and lag (seconds)
+        """
+        age = None
+        if self.last_message_time is not None:
+            age = time.monotonic() - self.last_message_time
+
+        return {
+            'url': self.url,
+            'connected': self.is_connected,
+            'reconnect_count': self.reconnect_count,
+            'messages_received': self.messages_received,
+            'last_message_age': age,
+            'lag': self.lag,
+            'mean_lag': self.mean_lag,
+            'max_lag': self.max_lag
+        }
+
+
+class ClientSendQueue:
+    """
+    Bounded outgoing queue for one downstream client.
+
+    A dedicated task drains the queue, so a slow client never holds up the
+    upstream readers or the other clients. When the queue is full the
+    oldest message is dropped: a slow client loses part of its own
+    backlog instead of growing the relay's memory without limit.
+    """
+
+    def __init__(self, websocket: ServerConnection, max_messages: int):
+        """
+        Initialize the queue.
+
+        Args:
+            websocket: Client connection
+            max_messages: Queue capacity
+        """
+        self.websocket = websocket
+        self.messages: Deque[str] = deque(maxlen=max_messages)
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def put(self, message_json: str) -> bool:
+        """
+        Queue a message for sending.
+
+        Args:
+            message_json: JSON-encoded message
+
+        Returns:
+            False if the oldest queued message was dropped to make room
+        """
+        full = len(self.messages) == self.messages.maxlen
+        if full:
+            self.dropped += 1
+        self.messages.append(message_json)
+        self._wakeup.set()
+        return not full
+
+    def start(self) -> None:
+        """Start sending queued messages."""
+        self._task = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        """Stop sending and discard anything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+        self.messages.clear()
+
+    async def _run(self) -> None:
+        """Send queued messages in order until the connection closes."""
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.messages:
+                    await self.websocket.send(self.messages.popleft())
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class RelayWebSocketServer(CoherenceWebSocketServer):
+    """
+    Downstream server for the relay: keeps the latest state per source.
+
+    New clients receive an initial_state with one entry per upstream
+    source instead of the single-device state of the base server. Each
+    client is sent to from its own bounded ClientSendQueue.
+    """
+
+    def __init__(self, config: dict, upstreams: Dict[str, UpstreamConnection],
+                 client_queue_size: int = 256):
+        """
+        Initialize the downstream server.
+
+        Args:
+            config: Configuration dictionary
+            upstreams: Upstream connections by source name
+            client_queue_size: Messages buffered per client before the
+                               oldest are dropped
+        """
+        super().__init__(config)
+        self.upstreams = upstreams
+        self.source_state: Dict[str, dict] = {
+            name: {'connection_status': None, 'latest_coherence': None, 'buffer_status': None}
+            for name in upstreams
+        }
+        self.client_queue_size = client_queue_size
+        self.send_queues: Dict[ServerConnection, ClientSendQueue] = {}
+        self.messages_dropped = 0
+
+    def update_source_state(self, source: str, message: dict) -> None:
+        """
+        Cache state carried by an upstream message for new clients.
+
+        Args:
+            source: Upstream name
+            message: Decoded upstream message
+        """
+        state = self.source_state[source]
+        msg_type = message.get('type')
+
+        if msg_type == 'initial_state':
+            state['connection_status'] = message.get('connection_status')
+            state['latest_coherence'] = message.get('latest_coherence')
+            state['buffer_status'] = message.get('buffer_status')
+        elif msg_type == 'coherence_update':
+            state['latest_coherence'] = message.get('data')
+        elif msg_type == 'buffer_status':
+            state['buffer_status'] = message.get('data')
+        elif msg_type == 'connection_status':
+            state['connection_status'] = message.get('data')
+
+    def _relay_status(self) -> dict:
+        """Per-upstream connection and lag metrics."""
+        return {name: upstream.get_status() for name, upstream in self.upstreams.items()}
+
+    async def _handler(self, websocket: ServerConnection) -> None:
+        """
+        Handle a downstream connection, then release its send queue.
+
+        Args:
+            websocket: WebSocket connection
+        """
+        try:
+            await super()._handler(websocket)
+        finally:
+            queue = self.send_queues.pop(websocket, None)
+            if queue is not None:
+                queue.close()
+
+    async def _send_initial_state(self, websocket: ServerConnection) -> None:
+        """
+        Send per-source state to a newly connected client.
+
+        Messages broadcast meanwhile are queued and follow the initial state.
+
+        Args:
+            websocket: WebSocket connection
+        """
+        queue = ClientSendQueue(websocket, self.client_queue_size)
+        self.send_queues[websocket] = queue
+
+        initial_state = {
+            'type': 'initial_state',
+            'sources': self.source_state,
+            'relay_status': self._relay_status()
+        }
+
+        await websocket.send(json.dumps(initial_state))
+        queue.start()
+
+    async def _deliver(self, clients: Set[ServerConnection], message_json: str) -> None:
+        """
+        Queue an encoded message for each client without waiting for sends.
+
+        Args:
+            clients: Recipients
+            message_json: JSON-encoded message (or batch)
+        """
+        for client in clients:
+            queue = self.send_queues.get(client)
+            if queue is not None and not queue.put(message_json):
+                self.messages_dropped += 1
+
+    async def _handle_message(self, websocket: ServerConnection, message: str) -> None:
+        """
+        Handle incoming WebSocket messages.
+
+        Args:
+            websocket: WebSocket connection
+            message: Raw message string
+        """
+        try:
+            data = json.loads(message)
+            msg_type = data.get('type')
+
+            if msg_type == 'ping':
+                await websocket.send(json.dumps({'type': 'pong', 'timestamp': time.monotonic()}))
+
+            elif msg_type == 'request_status':
+                await websocket.send(json.dumps({
+                    'type': 'status',
+                    'sources': self.source_state,
+                    'relay_status': self._relay_status(),
+                    'connected_clients': len(self.clients)
+                }))
+
+            elif msg_type == 'set_batching':
+                await self._handle_set_batching(websocket, data)
+
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON received: {message}")
+        except Exception as e:
+            logger.error(f"Error handling message: {e}")
+
+    def get_stats(self) -> dict:
+        """
+        Get server statistics.
+
+        Returns:
+            Dictionary with server stats and per-upstream metrics
+        """
+        return {
+            'connected_clients': len(self.clients),
+            'max_clients': self.admission.max_clients,
+            'batched_clients': len(self.batched_clients),
+            'admission': self.admission.get_stats(),
+            'messages_dropped': self.messages_dropped,
+            'host': self.host,
+            'port': self.port,
+            'upstreams': self._relay_status()
+        }
+
+
+class RelayService:
+    """
+    Merges several monitor instances into one source-tagged stream.
+
+    Every upstream message gets a 'source' field naming its upstream and is
+    JSON-encoded once for all downstream clients. Per-connection
+    initial_state messages are cached rather than forwarded.
+
+    With synchrony enabled, upstream heartbeats are also timestamped on
+    arrival (one clock for all sources) and group synchrony across the
+    sources is broadcast as 'synchrony_update' messages.
+
+    With fusion enabled, data messages from the configured streams (e.g.
+    one person's HRV and EEG monitors) are mapped onto the relay's
+    monotonic clock and broadcast as time-aligned 'fused_window' messages.
+    Each upstream's clock offset comes from periodic ping/pong round trips
+    and items are placed at their 'sample_time' when the upstream sends
+    one (when the data was measured, not when it was sent).
+    """
+
+    STATUS_INTERVAL = 5  # seconds between relay_status broadcasts
+    BEAT_RESYNC_GAP = 2.0  # seconds a beat chain may lag arrival before it is re-anchored
+
+    def __init__(self, config: dict):
+        """
+        Initialize the relay.
+
+        Args:
+            config: Configuration dictionary (with a 'relay' section)
+        """
+        relay_config = config['relay']
+
+        self.upstreams: Dict[str, UpstreamConnection] = {
+            upstream['name']: UpstreamConnection(
+                upstream['name'],
+                upstream['url'],
+                relay_config['reconnect_delay'],
+                relay_config['max_reconnect_delay'],
+                on_message=self._on_upstream_message,
+                clock_probe_interval=relay_config.get('clock_probe_interval', 5.0),
+                on_clock_probe=self._on_clock_probe
+            )
+            for upstream in relay_config['upstreams']
+        }
+
+        # Downstream server listens on the relay port
+        server_config = {**config, 'websocket': {**config['websocket'], 'port': relay_config['port']}}
+        self.websocket_server = RelayWebSocketServer(
+            server_config, self.upstreams, relay_config.get('client_queue_size', 256)
+        )
+
+        # Group synchrony over the upstream heartbeats (optional)
+        self.synchrony_config = config.get('synchrony', {})
+        self.synchrony_engine: Optional[SynchronyEngine] = None
+        self.beats: Dict[str, Deque[Tuple[float, float]]] = {}
+        if self.synchrony_config.get('enabled', False):
+            self.synchrony_engine = SynchronyEngine(self.synchrony_config)
+            # Room for the analysis window at up to 200 bpm
+            max_beats = int(self.synchrony_config['analysis_window'] * 200 / 60) + 2
+            self.beats = {name: deque(maxlen=max_beats) for name in self.upstreams}
+
+        # Cross-modal time alignment (optional): upstream name -> stream name
+        self.fusion_config = config.get('fusion', {})
+        self.fusion: Optional[StreamFusion] = None
+        self.fusion_streams: Dict[str, str] = {}
+        if self.fusion_config.get('enabled', False):
+            self.fusion_streams = {
+                upstream: stream for stream, upstream in self.fusion_config['streams'].items()
+            }
+            self.fusion = StreamFusion(
+                list(self.fusion_config['streams']),
+                window=self.fusion_config['window'],
+                hop=self.fusion_config['hop'],
+                max_latency=self.fusion_config['max_latency'],
+                max_buffered=self.fusion_config['max_buffered'],
+                offset_window=self.fusion_config['offset_window']
+            )
+
+    def _on_clock_probe(self, source: str, local_send: float, remote_time: float,
+                        local_receive: float) -> None:
+        """Feed an upstream's clock probe to its fusion stream's offset estimate."""
+        if source in self.fusion_streams:
+            self.fusion.add_clock_probe(self.fusion_streams[source], local_send, remote_time, local_receive)
+
+    def _beat_time(self, source: str, rr_interval: float) -> float:
+        """
+        Place a heartbeat on the relay clock.
+
+        Arrival times carry network jitter and beats delivered in one batch
+        share an arrival time, so each beat is placed one RR interval after
+        the previous one. The chain is re-anchored to the arrival time when
+        it falls more than BEAT_RESYNC_GAP behind (missed beats, reconnects).
+
+        Args:
+            source: Upstream name
+            rr_interval: RR interval ending at this beat (ms)
+
+        Returns:
+            Beat time (relay monotonic seconds), strictly after the previous beat
+        """
+        arrival = time.monotonic()
+        beats = self.beats[source]
+        if not beats:
+            return arrival
+
+        expected = beats[-1][0] + rr_interval / 1000.0
+        return arrival if arrival - expected > self.BEAT_RESYNC_GAP else expected
+
+    async def _on_upstream_message(self, source: str, message: dict) -> None:
+        """
+        Tag an upstream message with its source and fan it out.
+
+        Args:
+            source: Upstream name
+            message: Decoded upstream message
+        """
+        self.websocket_server.update_source_state(source, message)
+
+        if message.get('type') == 'heartbeat' and self.synchrony_engine is not None:
+            rr_interval = (message.get('data') or {}).get('rr_interval')
+            if isinstance(rr_interval, (int, float)) and rr_interval > 0:
+                self.beats[source].append(
+                    (self._beat_time(source, float(rr_interval)), float(rr_interval))
+                )
+
+        if source in self.fusion_streams and message.get('type') in self.fusion_config['message_types']:
+            sent = message.get('timestamp')
+            sample_time = message.get('sample_time')
+            if isinstance(sent, (int, float)):
+                self.fusion.add(
+                    self.fusion_streams[source], sent,
+                    {'type': message['type'], 'data': fusion_payload(message)},
+                    sample_time=sample_time if isinstance(sample_time, (int, float)) else None
+                )
+
+        if message.get('type') in ('initial_state', 'status', 'pong', 'reload_result'):
+            return  # Replies to the relay's own connection
+
+        # Only queues the message per client, so this never waits on a slow client
+        message['source'] = source
+        await self.websocket_server.broadcast_encoded(json.dumps(message))
+
+    async def _periodic_status_broadcast(self) -> None:
+        """Periodically broadcast per-upstream connection and lag metrics."""
+        while True:
+            await asyncio.sleep(self.STATUS_INTERVAL)
+            await self.websocket_server.broadcast_encoded(
+                json.dumps(make_message('relay_status', self.websocket_server._relay_status()))
+            )
+
+    def calculate_synchrony(self) -> dict:
+        """
+        Compute group synchrony over the sources' recent heartbeats.
+
+        Returns:
+            'synchrony_update' payload; matrices are ordered like 'sources'
+        """
+        config = self.synchrony_config
+        names = list(self.beats)
+        beats = [
+            (np.array([t for t, _ in self.beats[name]]), np.array([rr for _, rr in self.beats[name]]))
+            for name in names
+        ]
+
+        signals, valid = resample_to_common_time_base(
+            beats,
+            end_time=time.monotonic(),
+            duration=config['analysis_window'],
+            rate=config['resample_rate']
+        )
+        result = self.synchrony_engine.compute(signals, valid)
+
+        return {
+            'status': result['status'],
+            'sources': [names[index] for index in result['subjects']],
+            'room_score': result['room_score'],
+            'room_index': round(result['room_index'], 3),
+            'room_xcorr': round(result['room_xcorr'], 3),
+            'room_coherence': round(result['room_coherence'], 3),
+            'chance_xcorr': round(result['chance_xcorr'], 3),
+            'chance_coherence': round(result['chance_coherence'], 3),
+            'connectedness': np.round(result['connectedness'], 3).tolist(),
+            'xcorr': np.round(result['xcorr'], 3).tolist(),
+            'lag': np.round(result['lag'], 2).tolist(),
+            'coherence': np.round(result['coherence'], 3).tolist()
+        }
+
+    async def _periodic_synchrony_broadcast(self) -> None:
+        """Periodically broadcast group synchrony."""
+        while True:
+            await asyncio.sleep(self.synchrony_config['update_interval'])
+            try:
+                synchrony = self.calculate_synchrony()
+            except Exception as e:
+                logger.error(f"Error calculating synchrony: {e}", exc_info=True)
+                continue
+
+            if synchrony['status'] == 'valid':
+                logger.info(
+                    f"Room synchrony: {synchrony['room_score']}/100 "
+                    f"({len(synchrony['sources'])} sources)"
+                )
+            await self.websocket_server.broadcast_encoded(
+                json.dumps(make_message('synchrony_update', synchrony))
+            )
+
+    async def _periodic_fusion_broadcast(self) -> None:
+        """Broadcast joint windows as they become ready."""
+        while True:
+            await asyncio.sleep(self.fusion.hop / 2)
+            for window in self.fusion.poll():
+                await self.websocket_server.broadcast_encoded(
+                    json.dumps(make_message('fused_window', window))
+                )
+
+    async def run(self) -> None:
+        """Run the relay until cancelled."""
+        logger.info(f"Starting relay for {len(self.upstreams)} upstream(s)")
+
+        tasks: List[asyncio.Task] = [
+            asyncio.create_task(self.websocket_server.start()),
+            asyncio.create_task(self._periodic_status_broadcast()),
+        ]
+        tasks += [asyncio.create_task(upstream.run()) for upstream in self.upstreams.values()]
+        if self.synchrony_engine is not None:
+            tasks.append(asyncio.create_task(self._periodic_synchrony_broadcast()))
+        if self.fusion is not None:
+            tasks.append(asyncio.create_task(self._periodic_fusion_broadcast()))
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.websocket_server.stop()
+            logger.info("Relay stopped")
+
+
+async def main():
+    """Relay entry point."""
+    from main import load_config, setup_logging
+
+    config = load_config()
+    setup_logging(config)
+
+    if not config.get('relay', {}).get('upstreams'):
+        logger.error("No relay.upstreams configured")
+        sys.exit(1)
+
+    await RelayService(config).run()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nShutdown requested")
@@ -0,0 +1,280 @@
+"""
+Shared-Memory Ring Buffer
+Lock-free single-producer ring of fixed-layout records for passing
+RR intervals and results between processes without pickling
+"""
+
+import logging
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class SharedRingBuffer:
+    """
+    Single-producer, multi-reader ring of numpy records in shared memory.
+
+    The producer writes a record into its slot and then publishes it by
+    advancing a 64-bit write counter in the header. Readers never write to
+    shared memory: each one keeps its own cursor (see RingReader), so any
+    number of processes can consume the same stream and a slow reader never
+    blocks the producer. The slot after the newest record may be mid-write,
+    so readers only rely on the newest `capacity - 1` records: a reader that
+    falls further behind skips ahead and counts the skipped records as
+    dropped.
+
+    Layout: [header (64 bytes): uint64 write counter][capacity x dtype records]
+    """
+
+    HEADER_BYTES = 64  # one cache line, keeps the counter off the record slots
+
+    def __init__(self, name: str, dtype: np.dtype, capacity: int, create: bool = False):
+        """
+        Create or attach to a shared ring.
+
+        Args:
+            name: Shared memory block name (shared by all processes)
+            dtype: Record layout (numpy structured dtype)
+            capacity: Number of record slots
+            create: True in the owning process, False to attach
+        """
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.name = name
+        self._owner = create
+
+        size = self.HEADER_BYTES + self.dtype.itemsize * capacity
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            # Child processes share the parent's resource tracker, so
+            # attaching does not hand ownership (or unlinking) to them
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        self._head = np.ndarray((1,), dtype=np.uint64, buffer=self._shm.buf)
+        self._records = np.ndarray(
+            (capacity,), dtype=self.dtype, buffer=self._shm.buf, offset=self.HEADER_BYTES
+        )
+
+        if create:
+            self._head[0] = 0
+
+    @classmethod
+    def create(cls, name: str, dtype: np.dtype, capacity: int) -> 'SharedRingBuffer':
+        """Create a new ring (owning process)."""
+        return cls(name, dtype, capacity, create=True)
+
+    @classmethod
+    def attach(cls, name: str, dtype: np.dtype, capacity: int) -> 'SharedRingBuffer':
+        """Attach to an existing ring created by another process."""
+        return cls(name, dtype, capacity, create=False)
+
+    @property
+    def head(self) -> int:
+        """Total number of records ever written."""
+        return int(self._head[0])
+
+    def write(self, *values) -> None:
+        """
+        Append one record (producer only).
+
+        Args:
+            values: Field values in dtype order
+        """
+        head = int(self._head[0])
+        self._records[head % self.capacity] = values
+        # Publish only after the record is fully written
+        self._head[0] = head + 1
+
+    def reader(self, from_start: bool = False) -> 'RingReader':
+        """
+        Create a reader with its own cursor.
+
+        Args:
+            from_start: Start at the oldest retained record instead of
+                        only seeing records written from now on
+
+        Returns:
+            New RingReader
+        """
+        return RingReader(self, from_start)
+
+    def close(self) -> None:
+        """Detach from the shared memory block."""
+        # Drop numpy views before closing the underlying buffer
+        self._head = None
+        self._records = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory block (owning process only)."""
+        if self._owner:
+            self._shm.unlink()
+
+
+class RingReader:
+    """
+    Independent read cursor over a SharedRingBuffer.
+
+    Attributes:
+        dropped: Records overwritten before this reader could copy them
+    """
+
+    def __init__(self, ring: SharedRingBuffer, from_start: bool = False):
+        self.ring = ring
+        # The oldest slot is the next one the producer writes
+        self.retained = ring.capacity - 1
+        head = ring.head
+        self.cursor = max(0, head - self.retained) if from_start else head
+        self.dropped = 0
+
+    def read(self, max_records: Optional[int] = None) -> np.ndarray:
+        """
+        Copy out all records published since the last read.
+
+        Args:
+            max_records: Optional cap on the number of records returned
+
+        Returns:
+            Structured array of records (empty if nothing new)
+        """
+        ring = self.ring
+        capacity = ring.capacity
+        head = ring.head
+
+        # Skip records the producer has already lapped
+        if head - self.cursor > self.retained:
+            self.dropped += head - self.cursor - self.retained
+            self.cursor = head - self.retained
+
+        end = head if max_records is None else min(head, self.cursor + max_records)
+        count = end - self.cursor
+        if count <= 0:
+            return np.empty(0, dtype=ring.dtype)
+
+        start_slot = self.cursor % capacity
+        if start_slot + count <= capacity:
+            records = ring._records[start_slot:start_slot + count].copy()
+        else:
+            first = capacity - start_slot
+            records = np.concatenate((ring._records[start_slot:], ring._records[:count - first]))
+
+        # Discard any records overwritten (or mid-write) while we were copying:
+        # slot `seq` is reused once the producer starts record seq + capacity
+        overwritten = ring.head - capacity - self.cursor + 1
+        if overwritten > 0:
+            overwritten = min(overwritten, count)
+            self.dropped += overwritten
+            records = records[overwritten:]
+
+        self.cursor = end
+        return records
+
+    def pending(self) -> int:
+        """Number of records waiting to be read."""
+        return min(self.ring.head - self.cursor, self.retained)
+
+
+class SharedMessageBus(SharedRingBuffer):
+    """
+    Broadcast channel of variable-length byte messages in shared memory.
+
+    One publisher encodes each message once; every subscriber (e.g. each
+    WebSocket fan-out worker) reads it with its own cursor, with the same
+    skip-ahead semantics as SharedRingBuffer.
+
+    Attributes:
+        oversized: Messages dropped because they did not fit in a slot
+    """
+
+    def __init__(self, name: str, capacity: int, max_message_bytes: int = 2048,
+                 create: bool = False):
+        """
+        Create or attach to a message bus.
+
+        Args:
+            name: Shared memory block name
+            capacity: Number of message slots
+            max_message_bytes: Largest message a slot can hold
+            create: True in the owning process, False to attach
+        """
+        dtype = np.dtype([('length', 'u4'), ('payload', 'u1', (max_message_bytes,))])
+        super().__init__(name, dtype, capacity, create=create)
+        self.max_message_bytes = max_message_bytes
+        self.oversized = 0
+
+    @classmethod
+    def create(cls, name: str, capacity: int, max_message_bytes: int = 2048) -> 'SharedMessageBus':
+        """Create a new bus (owning process)."""
+        return cls(name, capacity, max_message_bytes, create=True)
+
+    @classmethod
+    def attach(cls, name: str, capacity: int, max_message_bytes: int = 2048) -> 'SharedMessageBus':
+        """Attach to an existing bus created by another process."""
+        return cls(name, capacity, max_message_bytes, create=False)
+
+    def publish(self, message: bytes) -> bool:
+        """
+        Append one message (publisher only).
+
+        A message that does not fit in a slot is logged, counted in
+        `oversized` and dropped, so one bad message cannot take down the
+        publishing process.
+
+        Args:
+            message: Encoded message
+
+        Returns:
+            True if published, False if dropped
+        """
+        length = len(message)
+        if length > self.max_message_bytes:
+            self.oversized += 1
+            logger.warning(
+                f"Dropped {length}-byte message (slot size {self.max_message_bytes}, "
+                f"{self.oversized} dropped so far): {bytes(message[:40])!r}..."
+            )
+            return False
+
+        head = int(self._head[0])
+        slot = self._records[head % self.capacity]
+        slot['length'] = length
+        slot['payload'][:length] = np.frombuffer(message, dtype=np.uint8)
+        # Publish only after the message is fully written
+        self._head[0] = head + 1
+        return True
+
+    def subscribe(self, from_start: bool = False) -> 'BusSubscriber':
+        """
+        Create a subscriber with its own cursor.
+
+        Args:
+            from_start: Replay the messages still retained in the bus
+
+        Returns:
+            New BusSubscriber
+        """
+        return BusSubscriber(self, from_start)
+
+
+class BusSubscriber(RingReader):
+    """Read cursor over a SharedMessageBus that yields message bytes."""
+
+    def receive(self, max_messages: Optional[int] = None) -> List[bytes]:
+        """
+        Get all messages published since the last call.
+
+        Args:
+            max_messages: Optional cap on the number of messages returned
+
+        Returns:
+            List of encoded messages
+        """
+        return [
+            record['payload'][:record['length']].tobytes()
+            for record in self.read(max_messages)
+        ]
@@ -0,0 +1,279 @@
+"""
+Compiled Coherence Kernels
+Optional Numba backend for the coherence hot path: resampling, detrending,
+windowing and the coherence-band spectrum as compiled loops over
+preallocated buffers
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.fft import rfft, rfftfreq
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+
+BACKENDS = ('auto', 'numpy', 'numba')
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    Pick the coherence backend to use.
+
+    Args:
+        backend: Configured backend ('auto', 'numpy' or 'numba')
+
+    Returns:
+        'numba' if requested (or 'auto') and Numba is installed, else 'numpy'
+    """
+    if backend == 'numpy':
+        return 'numpy'
+
+    if NUMBA_AVAILABLE:
+        return 'numba'
+
+    if backend == 'numba':
+        logger.warning("coherence.backend is 'numba' but Numba is not installed; using NumPy")
+    return 'numpy'
+
+
+def _resample_detrend(rr_intervals, dt, out):
+    """
+    Resample RR intervals onto a uniform grid and remove the linear trend.
+
+    Matches CoherenceCalculator._resample_rr_intervals (np.interp over the
+    cumulative beat times) followed by signal.detrend(type='linear').
+
+    Args:
+        rr_intervals: RR intervals (ms)
+        dt: Grid spacing (ms)
+        out: Output buffer
+
+    Returns:
+        Number of samples written, or minus the number needed if `out`
+        is too small
+    """
+    count = rr_intervals.shape[0]
+
+    # Beat i starts at the sum of the intervals before it
+    total = 0.0
+    for i in range(count - 1):
+        total += rr_intervals[i]
+    total += rr_intervals[count - 1]
+
+    n = int(np.ceil(total / dt))
+    if n > out.shape[0]:
+        return -n
+
+    # Linear interpolation, walking the beats alongside the grid
+    beat = 0
+    beat_time = 0.0
+    next_time = rr_intervals[0]
+    for k in range(n):
+        t = k * dt
+        while beat < count - 1 and t >= next_time:
+            beat += 1
+            beat_time = next_time
+            next_time += rr_intervals[beat]
+        if beat == count - 1:
+            out[k] = rr_intervals[count - 1]
+        else:
+            fraction = (t - beat_time) / (next_time - beat_time)
+            out[k] = rr_intervals[beat] + fraction * (rr_intervals[beat + 1] - rr_intervals[beat])
+
+    # Least-squares line over sample index, subtracted in place
+    mean_index = (n - 1) / 2.0
+    mean_value = 0.0
+    for k in range(n):
+        mean_value += out[k]
+    mean_value /= n
+
+    covariance = 0.0
+    variance = 0.0
+    for k in range(n):
+        offset = k - mean_index
+        covariance += offset * (out[k] - mean_value)
+        variance += offset * offset
+    slope = covariance / variance if variance > 0 else 0.0
+
+    for k in range(n):
+        out[k] -= mean_value + slope * (k - mean_index)
+
+    return n
+
+
+def _dft_power(samples, n, window, bins, psd):
+    """
+    Windowed power spectrum at selected DFT bins.
+
+    Evaluates the DFT only at the bins that matter (the coherence band plus
+    half a peak window either side), using a rotating phasor per bin, so no
+    full FFT or spectrum array is needed.
+
+    Args:
+        samples: Detrended samples (first n are used)
+        n: Number of samples
+        window: Hanning window of length n
+        bins: DFT bin indices to evaluate
+        psd: Output buffer for the evaluated bins' power
+    """
+    for b in range(bins.shape[0]):
+        step = -2.0 * np.pi * bins[b] / n
+        step_cos = np.cos(step)
+        step_sin = np.sin(step)
+        phase_cos = 1.0
+        phase_sin = 0.0
+        real = 0.0
+        imag = 0.0
+        for k in range(n):
+            value = samples[k] * window[k]
+            real += value * phase_cos
+            imag += value * phase_sin
+            phase_cos, phase_sin = (
+                phase_cos * step_cos - phase_sin * step_sin,
+                phase_cos * step_sin + phase_sin * step_cos
+            )
+        psd[b] = (real * real + imag * imag) / n
+
+
+def _peak_statistics(psd, bin_freqs, band_start, band_stop, peak_half_width):
+    """
+    Peak frequency, peak-window power and total power in the coherence band.
+
+    Args:
+        psd: Power at the evaluated bins
+        bin_freqs: Frequencies of those bins (Hz)
+        band_start, band_stop: Slice of the bins inside the coherence band
+        peak_half_width: Half of the peak window (Hz)
+
+    Returns:
+        Tuple of (peak frequency, peak power, total power)
+    """
+    peak = band_start
+    total_power = 0.0
+    for b in range(band_start, band_stop):
+        total_power += psd[b]
+        if psd[b] > psd[peak]:
+            peak = b
+    peak_freq = bin_freqs[peak]
+
+    peak_power = 0.0
+    for b in range(bin_freqs.shape[0]):
+        if abs(bin_freqs[b] - peak_freq) <= peak_half_width:
+            peak_power += psd[b]
+
+    return peak_freq, peak_power, total_power
+
+
+if NUMBA_AVAILABLE:
+    # Eager compilation (explicit signatures) so the first coherence update
+    # doesn't stall the event loop; cache=True keeps the machine code on disk
+    _resample_detrend = njit('i8(f8[::1], f8, f8[::1])', cache=True, nogil=True)(_resample_detrend)
+    _dft_power = njit('void(f8[::1], i8, f8[::1], i8[::1], f8[::1])', cache=True, nogil=True)(_dft_power)
+    _peak_statistics = njit(
+        'UniTuple(f8, 3)(f8[::1], f8[::1], i8, i8, f8)', cache=True, nogil=True
+    )(_peak_statistics)
+
+
+class SpectralKernels:
+    """
+    Compiled coherence spectrum for CoherenceCalculator.
+
+    Computes the same peak frequency, peak power and total power as the
+    NumPy path. Work buffers are allocated once (and grown if a longer
+    buffer arrives); per-length plans (window, DFT bins) are cached.
+
+    The band is evaluated with a direct DFT, which beats a full FFT while
+    the band spans few bins (typical 45-120 s windows); longer windows,
+    whose band spans more than MAX_DFT_BINS bins, use the FFT instead.
+    """
+
+    MAX_DFT_BINS = 48
+
+    def __init__(self, resample_rate: float, coherence_min_freq: float,
+                 coherence_max_freq: float, peak_window_width: float):
+        """
+        Initialize the kernels.
+
+        Args:
+            resample_rate: Resampling rate (Hz)
+            coherence_min_freq: Lower bound of the coherence band (Hz)
+            coherence_max_freq: Upper bound of the coherence band (Hz)
+            peak_window_width: Width of the window around the peak (Hz)
+        """
+        if not NUMBA_AVAILABLE:
+            raise RuntimeError("Numba is not installed")
+
+        self.resample_rate = resample_rate
+        self.coherence_min_freq = coherence_min_freq
+        self.coherence_max_freq = coherence_max_freq
+        self.peak_half_width = peak_window_width / 2
+
+        self._samples = np.empty(1024)
+        self._psd = np.empty(64)
+        self._plans: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray, int, int]] = {}
+
+    def _get_plan(self, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int, int]:
+        """
+        Get the cached window and DFT bins for a resampled length.
+
+        Returns:
+            Tuple of (hanning window, bin indices, bin frequencies,
+            band start, band stop) with band start/stop indexing the bins
+        """
+        plan = self._plans.get(n)
+        if plan is None:
+            freqs = rfftfreq(n, 1 / self.resample_rate)
+            in_band = (freqs >= self.coherence_min_freq) & (freqs <= self.coherence_max_freq)
+            # Bins a peak window centred anywhere in the band can reach
+            needed = (
+                (freqs >= self.coherence_min_freq - self.peak_half_width)
+                & (freqs <= self.coherence_max_freq + self.peak_half_width)
+            )
+            bins = np.flatnonzero(needed).astype(np.int64)
+            band = np.flatnonzero(in_band[bins])
+            band_start, band_stop = (int(band[0]), int(band[-1]) + 1) if len(band) else (0, 0)
+
+            plan = (np.hanning(n), bins, freqs[bins].copy(), band_start, band_stop)
+            self._plans[n] = plan
+
+            if len(bins) > len(self._psd):
+                self._psd = np.empty(2 * len(bins))
+        return plan
+
+    def coherence_spectrum(self, rr_intervals: np.ndarray) -> Optional[Tuple[float, float, float]]:
+        """
+        Resample, detrend, window and analyse an RR interval series.
+
+        Args:
+            rr_intervals: RR intervals (ms), contiguous float64
+
+        Returns:
+            Tuple of (peak frequency, peak power, total power), or None if
+            the coherence band contains no frequency bins
+        """
+        dt = 1000 / self.resample_rate
+        n = _resample_detrend(rr_intervals, dt, self._samples)
+        if n < 0:
+            self._samples = np.empty(2 * -n)
+            n = _resample_detrend(rr_intervals, dt, self._samples)
+
+        window, bins, bin_freqs, band_start, band_stop = self._get_plan(n)
+        if band_stop == band_start:
+            return None
+
+        if len(bins) <= self.MAX_DFT_BINS:
+            psd = self._psd[:len(bins)]
+            _dft_power(self._samples, n, window, bins, psd)
+        else:
+            psd = np.abs(rfft(self._samples[:n] * window)[bins]) ** 2 / n
+
+        return _peak_statistics(psd, bin_freqs, band_start, band_stop, self.peak_half_width)
@@ -0,0 +1,284 @@
+"""
+Cross-Modal Stream Fusion
+Maps HRV and EEG streams onto one monotonic clock and emits time-aligned
+joint windows for combined metrics (e.g. flow state)
+"""
+
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+class ClockOffsetEstimator:
+    """
+    Estimates the offset from a source clock to the local monotonic clock.
+
+    Works like LSL's time_correction(): of all recent observations, the
+    one with the least delay is trusted, because queueing and network
+    jitter only ever add delay. Two kinds of observation are supported:
+
+    - Round trip: a probe sent at `local_send` was answered with
+      `remote_time` and received at `local_receive`; the offset of the
+      lowest round-trip probe is used (NTP/LSL style). Its error is at most
+      half that round trip.
+    - One-way: a message stamped `source_time` arrived at `receive_time`;
+      the smallest (receive - source) is the offset plus the minimum
+      transport delay. Used only until the first round-trip probe.
+
+    Observations older than `window` seconds are forgotten so the estimate
+    follows clock drift and reconnects. Each sliding minimum is kept in a
+    monotonic deque, so each update is O(1) amortized.
+    """
+
+    def __init__(self, window: float = 60.0):
+        """
+        Initialize the estimator.
+
+        Args:
+            window: Seconds of observations the estimate is based on
+        """
+        self.window = window
+        # (receive time, delay key, offset), keys increasing front to back
+        self._one_way: Deque[Tuple[float, float, float]] = deque()
+        self._round_trip: Deque[Tuple[float, float, float]] = deque()
+
+    @property
+    def offset(self) -> Optional[float]:
+        """Current offset (local = source + offset), or None before any data."""
+        candidates = self._round_trip or self._one_way
+        if not candidates:
+            return None
+        return candidates[0][2]
+
+    @property
+    def round_trip(self) -> Optional[float]:
+        """Round trip of the probe the offset comes from (None if one-way)."""
+        return self._round_trip[0][1] if self._round_trip else None
+
+    def update(self, source_time: float, receive_time: float) -> float:
+        """
+        Add a one-way observation.
+
+        Args:
+            source_time: Timestamp the source put on the message
+            receive_time: Local monotonic time the message arrived
+
+        Returns:
+            Current offset estimate
+        """
+        offset = receive_time - source_time
+        self._push(self._one_way, receive_time, offset, offset)
+        return self.offset
+
+    def update_round_trip(self, local_send: float, remote_time: float,
+                          local_receive: float) -> float:
+        """
+        Add a round-trip probe observation.
+
+        Args:
+            local_send: Local monotonic time the probe was sent
+            remote_time: Source clock time in the reply
+            local_receive: Local monotonic time the reply arrived
+
+        Returns:
+            Current offset estimate
+        """
+        offset = (local_send + local_receive) / 2 - remote_time
+        self._push(self._round_trip, local_receive, local_receive - local_send, offset)
+        return self.offset
+
+    def _push(self, candidates: Deque[Tuple[float, float, float]], now: float,
+              key: float, offset: float) -> None:
+        """Add an observation to a sliding-window minimum."""
+        while candidates and candidates[-1][1] >= key:
+            candidates.pop()
+        candidates.append((now, key, offset))
+
+        cutoff = now - self.window
+        while len(candidates) > 1 and candidates[0][0] < cutoff:
+            candidates.popleft()
+
+
+class StreamFusion:
+    """
+    Aligns several timestamped streams and cuts them into joint windows.
+
+    Each stream's clock is mapped onto the local monotonic clock by its own
+    ClockOffsetEstimator, fed by clock probes and by the send timestamps
+    of its messages. An item is placed at its sample time (when the data
+    was measured, e.g. an EEG window's last LSL sample) on that mapping,
+    so streams line up by when things happened rather than when messages
+    arrived. Items are kept in a bounded buffer per stream, only until the
+    last window that needs them has been emitted.
+
+    A window [start, start + window) is emitted as soon as every stream's
+    watermark (the newest aligned timestamp seen) has passed its end, or
+    at the latest max_latency seconds after its end, marked incomplete,
+    if a stream is late or silent. Window starts advance by `hop`.
+    """
+
+    def __init__(self, streams: List[str], window: float, hop: float, max_latency: float,
+                 max_buffered: int = 4096, offset_window: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the fusion.
+
+        Args:
+            streams: Stream names (e.g. ['hrv', 'eeg'])
+            window: Joint window length (seconds)
+            hop: Seconds between consecutive window starts
+            max_latency: Longest wait after a window ends before emitting it
+            max_buffered: Maximum items buffered per stream
+            offset_window: Seconds of history for clock offset estimation
+            clock: Local monotonic time source
+        """
+        self.window = window
+        self.hop = hop
+        self.max_latency = max_latency
+        self.clock = clock
+
+        self.estimators = {name: ClockOffsetEstimator(offset_window) for name in streams}
+        self.buffers: Dict[str, Deque[Tuple[float, dict]]] = {
+            name: deque(maxlen=max_buffered) for name in streams
+        }
+        self.watermarks: Dict[str, float] = {name: float('-inf') for name in streams}
+
+        self.next_start: Optional[float] = None
+        self.windows_emitted = 0
+        self.incomplete_windows = 0
+
+    def add(self, stream: str, source_time: float, item: dict,
+            receive_time: Optional[float] = None, sample_time: Optional[float] = None) -> float:
+        """
+        Add one timestamped item from a stream.
+
+        Args:
+            stream: Stream name
+            source_time: Time the stream sent the item, on its own clock
+            item: Payload to include in joint windows
+            receive_time: Local arrival time (defaults to now)
+            sample_time: Time the item's data was measured, on the same
+                         clock as source_time (defaults to source_time)
+
+        Returns:
+            The item's aligned (local monotonic) time
+        """
+        if receive_time is None:
+            receive_time = self.clock()
+
+        offset = self.estimators[stream].update(source_time, receive_time)
+        aligned = (source_time if sample_time is None else sample_time) + offset
+
+        self.buffers[stream].append((aligned, item))
+        if aligned > self.watermarks[stream]:
+            self.watermarks[stream] = aligned
+
+        if self.next_start is None:
+            self.next_start = aligned
+
+        return aligned
+
+    def add_clock_probe(self, stream: str, local_send: float, remote_time: float,
+                        local_receive: float) -> float:
+        """
+        Add a round-trip clock probe for a stream.
+
+        Args:
+            stream: Stream name
+            local_send: Local monotonic time the probe was sent
+            remote_time: The stream's clock time in the reply
+            local_receive: Local monotonic time the reply arrived
+
+        Returns:
+            The stream's current clock offset
+        """
+        return self.estimators[stream].update_round_trip(local_send, remote_time, local_receive)
+
+    def poll(self, now: Optional[float] = None) -> List[dict]:
+        """
+        Emit every joint window that is ready.
+
+        Args:
+            now: Local time (defaults to now)
+
+        Returns:
+            List of joint windows, oldest first. Each has 'start', 'end',
+            'complete', 'streams' (per stream, items as
+            {'time': aligned time, **item}) and 'clock_offsets'.
+        """
+        if self.next_start is None:
+            return []
+        if now is None:
+            now = self.clock()
+
+        # After a long gap, skip straight to the windows that can still be filled
+        newest_due = now - self.max_latency - self.window
+        if newest_due - self.next_start > self.window:
+            skipped = int((newest_due - self.next_start) // self.hop)
+            self.next_start += skipped * self.hop
+
+        windows = []
+        while True:
+            start = self.next_start
+            end = start + self.window
+            complete = all(watermark >= end for watermark in self.watermarks.values())
+            if not complete and now < end + self.max_latency:
+                break
+
+            window = self._extract(start, end, complete)
+            if window is not None:
+                windows.append(window)
+
+            self.next_start = start + self.hop
+            self._evict_before(self.next_start)
+
+        return windows
+
+    def _extract(self, start: float, end: float, complete: bool) -> Optional[dict]:
+        """Build one joint window, or None if no stream has data in it."""
+        streams = {
+            name: sorted(
+                ({'time': t, **item} for t, item in buffer if start <= t < end),
+                key=lambda entry: entry['time']
+            )
+            for name, buffer in self.buffers.items()
+        }
+        if not any(streams.values()):
+            return None
+
+        self.windows_emitted += 1
+        if not complete:
+            self.incomplete_windows += 1
+
+        return {
+            'start': start,
+            'end': end,
+            'complete': complete,
+            'streams': streams,
+            'clock_offsets': {name: est.offset for name, est in self.estimators.items()}
+        }
+
+    def _evict_before(self, cutoff: float) -> None:
+        """Drop buffered items no future window can contain."""
+        for buffer in self.buffers.values():
+            while buffer and buffer[0][0] < cutoff:
+                buffer.popleft()
+
+    def get_stats(self) -> dict:
+        """
+        Get fusion statistics.
+
+        Returns:
+            Dictionary with buffer sizes, watermark lag, offsets and window counts
+        """
+        now = self.clock()
+        return {
+            'buffered': {name: len(buffer) for name, buffer in self.buffers.items()},
+            'watermark_lag': {
+                name: (now - watermark if watermark != float('-inf') else None)
+                for name, watermark in self.watermarks.items()
+            },
+            'clock_offsets': {name: est.offset for name, est in self.estimators.items()},
+            'windows_emitted': self.windows_emitted,
+            'incomplete_windows': self.incomplete_windows
+        }
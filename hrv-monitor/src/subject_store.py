@@ -0,0 +1,397 @@
+"""
+Compact Subject Store
+Struct-of-arrays RR interval storage for hubs tracking thousands of
+subjects (recorded sessions, simulations, relays), analysed by one shared
+CoherenceCalculator
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from .coherence_calculator import CoherenceCalculator
+except ImportError:
+    from coherence_calculator import CoherenceCalculator
+
+
+# Fastest heart rate accepted (RR intervals below 300 ms are rejected)
+MAX_HEART_RATE = 200
+
+
+class SubjectState:
+    """
+    One subject's ring metadata and handle on its row in a SubjectStore.
+
+    Offers the CoherenceCalculator interface for a single subject; the
+    beats themselves live in the store's shared arrays.
+
+    Attributes:
+        start: Ring slot of the oldest buffered beat
+        count: Number of buffered beats
+        rr_sum: Running sum of buffered RR intervals (O(1) mean heart rate)
+        version: Buffer version (bumped on every change to the buffered beats)
+    """
+
+    __slots__ = ('store', 'index', 'subject_id', 'start', 'count', 'rr_sum', 'version',
+                 '_coherence_cache')
+
+    def __init__(self, store: 'SubjectStore', index: int, subject_id: str):
+        """
+        Initialize the handle.
+
+        Args:
+            store: Owning store
+            index: Row of this subject in the store's arrays
+            subject_id: Subject identifier
+        """
+        self.store = store
+        self.index = index
+        self.subject_id = subject_id
+        self.start = 0
+        self.count = 0
+        self.rr_sum = 0.0
+        self.version = 0
+        # (version, result) of the last coherence calculation
+        self._coherence_cache = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add_rr_interval(self, interval_ms: float, timestamp: Optional[float] = None) -> None:
+        """Add an RR interval (see SubjectStore.add_rr_interval)."""
+        self.store.add_rr_interval(self, interval_ms, timestamp)
+
+    def rr_intervals(self) -> np.ndarray:
+        """Buffered RR intervals in ms, oldest first (float64 copy)."""
+        return self.store.rr_intervals(self)
+
+    def timestamps(self) -> np.ndarray:
+        """Beat arrival times (time.time() seconds), oldest first (float64)."""
+        return self.store.timestamps(self)
+
+    def calculate_coherence(self) -> Dict:
+        """
+        Calculate the coherence score, memoized per buffer version.
+
+        Returns:
+            Same dictionary as CoherenceCalculator.calculate_coherence
+        """
+        cache = self._coherence_cache
+        if cache is not None and cache[0] == self.version:
+            return dict(cache[1])
+
+        result = self.store.calculator.analyse_intervals(self.rr_intervals())
+        self._coherence_cache = (self.version, result)
+        return dict(result)
+
+    def get_buffer_status(self) -> Dict:
+        """Get buffer statistics (see SubjectStore.get_buffer_status)."""
+        return self.store.get_buffer_status(self)
+
+    def reset(self) -> None:
+        """Clear this subject's buffered beats."""
+        self.start = 0
+        self.count = 0
+        self.rr_sum = 0.0
+        self.version += 1
+
+
+class SubjectStore:
+    """
+    Fixed-capacity RR interval rings for many subjects in a few arrays.
+
+    A CoherenceCalculator keeps two deques of boxed floats plus its own
+    settings and spectral plans per subject. Here every subject is one row
+    of two shared 2-D arrays instead:
+
+    - rr: float32 RR intervals (ms); float32 resolves far finer than the
+      sensor's 1/1024 s
+    - times: float32 arrival times, as seconds since the store's epoch
+
+    plus a SubjectState (__slots__, no instance dict) holding the row's
+    ring position, fill, running RR sum and version.
+
+    Rings hold window_duration seconds of beats at max_heart_rate (200 bpm
+    by default), so a full ring never drops a beat that is still inside
+    the window. Rows are
+    reused after remove_subject and the arrays double when full. One
+    CoherenceCalculator (settings, spectral plans, compiled kernels) is
+    shared by all subjects.
+    """
+
+    # Keep float32 time offsets under ~4 ms resolution by moving the epoch
+    REBASE_AFTER = 65536.0  # seconds
+
+    def __init__(self, config: Dict, initial_subjects: int = 64,
+                 max_heart_rate: float = MAX_HEART_RATE):
+        """
+        Initialize the store.
+
+        Args:
+            config: Configuration dictionary with coherence parameters
+            initial_subjects: Rows to allocate up front
+            max_heart_rate: Heart rate (bpm) the rings are sized for; lower
+                            values save memory, but beyond it the oldest
+                            beats of a window are dropped
+        """
+        self.calculator = CoherenceCalculator(config)
+        self.max_heart_rate = max_heart_rate
+        self.window_duration = self.calculator.window_duration
+        self.ring_capacity = self._ring_capacity()
+
+        self.epoch: Optional[float] = None
+        self.subjects: Dict[str, SubjectState] = {}
+        self._free_rows: List[int] = []
+        self._rows_used = 0
+
+        self.rr = np.zeros((initial_subjects, self.ring_capacity), dtype=np.float32)
+        self.times = np.zeros((initial_subjects, self.ring_capacity), dtype=np.float32)
+
+    def _ring_capacity(self) -> int:
+        """Beats in one window at the fastest accepted heart rate."""
+        return int(np.ceil(self.window_duration * self.max_heart_rate / 60)) + 1
+
+    def _grow(self) -> None:
+        """Double the number of rows, keeping existing subjects in place."""
+        rows = max(1, 2 * len(self.rr))
+        for name in ('rr', 'times'):
+            old = getattr(self, name)
+            new = np.zeros((rows, self.ring_capacity), dtype=np.float32)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    def __contains__(self, subject_id: str) -> bool:
+        return subject_id in self.subjects
+
+    def add_subject(self, subject_id: str) -> SubjectState:
+        """
+        Add a subject (or return the existing one).
+
+        Args:
+            subject_id: Subject identifier
+
+        Returns:
+            The subject's handle
+        """
+        state = self.subjects.get(subject_id)
+        if state is not None:
+            return state
+
+        if self._free_rows:
+            index = self._free_rows.pop()
+        else:
+            if self._rows_used == len(self.rr):
+                self._grow()
+            index = self._rows_used
+            self._rows_used += 1
+
+        state = SubjectState(self, index, subject_id)
+        self.subjects[subject_id] = state
+        return state
+
+    def get(self, subject_id: str) -> Optional[SubjectState]:
+        """Get a subject's handle, or None if unknown."""
+        return self.subjects.get(subject_id)
+
+    def remove_subject(self, subject_id: str) -> None:
+        """
+        Remove a subject and free its row for reuse.
+
+        Args:
+            subject_id: Subject identifier
+        """
+        state = self.subjects.pop(subject_id, None)
+        if state is None:
+            return
+        state.reset()
+        self._free_rows.append(state.index)
+
+    def add_rr_interval(self, state: SubjectState, interval_ms: float,
+                        timestamp: Optional[float] = None) -> None:
+        """
+        Add an RR interval to a subject's ring.
+
+        Invalid intervals are rejected as in CoherenceCalculator, and beats
+        older than window_duration are evicted.
+
+        Args:
+            state: Subject
+            interval_ms: RR interval in milliseconds
+            timestamp: Arrival time (time.time() seconds); defaults to now
+        """
+        if not self.calculator._is_valid_rr_interval(interval_ms):
+            return
+
+        now = time.time() if timestamp is None else timestamp
+        if self.epoch is None:
+            self.epoch = now
+        elif now - self.epoch > self.REBASE_AFTER:
+            self._rebase(now)
+        offset = now - self.epoch
+
+        rr = self.rr
+        times = self.times
+        index = state.index
+        capacity = self.ring_capacity
+        start = state.start
+        count = state.count
+        rr_sum = state.rr_sum
+
+        # A full ring drops its oldest beat
+        if count == capacity:
+            rr_sum -= float(rr[index, start])
+            start = (start + 1) % capacity
+            count -= 1
+
+        slot = (start + count) % capacity
+        rr[index, slot] = interval_ms
+        times[index, slot] = offset
+        rr_sum += float(rr[index, slot])  # as stored (float32)
+        count += 1
+
+        # Remove old data outside the window
+        cutoff = offset - self.window_duration
+        while times[index, start] < cutoff:
+            rr_sum -= float(rr[index, start])
+            start = (start + 1) % capacity
+            count -= 1
+
+        state.start = start
+        state.count = count
+        state.rr_sum = rr_sum
+        state.version += 1
+
+    def _rebase(self, now: float) -> None:
+        """Move the epoch to `now` so time offsets stay small."""
+        shift = now - self.epoch
+        self.times -= np.float32(shift)
+        self.epoch = now
+
+    def _ordered(self, array: np.ndarray, state: SubjectState) -> np.ndarray:
+        """One subject's ring contents, oldest first (float64 copy)."""
+        row = array[state.index]
+        end = state.start + state.count
+        if end <= self.ring_capacity:
+            return row[state.start:end].astype(np.float64)
+        return np.concatenate((row[state.start:], row[:end - self.ring_capacity])).astype(np.float64)
+
+    def rr_intervals(self, state: SubjectState) -> np.ndarray:
+        """
+        Get a subject's buffered RR intervals.
+
+        Args:
+            state: Subject
+
+        Returns:
+            RR intervals in ms, oldest first (float64)
+        """
+        return self._ordered(self.rr, state)
+
+    def timestamps(self, state: SubjectState) -> np.ndarray:
+        """
+        Get a subject's beat arrival times.
+
+        Args:
+            state: Subject
+
+        Returns:
+            Arrival times (time.time() seconds), oldest first (float64)
+        """
+        return self._ordered(self.times, state) + (self.epoch or 0.0)
+
+    def get_buffer_status(self, state: SubjectState) -> Dict:
+        """
+        Get a subject's buffer statistics.
+
+        Args:
+            state: Subject
+
+        Returns:
+            Same dictionary as CoherenceCalculator.get_buffer_status
+        """
+        count = state.count
+        min_beats = self.calculator.min_beats_required
+
+        if count == 0:
+            mean_hr = 0
+            duration = 0
+        else:
+            mean_rr = state.rr_sum / count
+            mean_hr = 60000 / mean_rr if mean_rr > 0 else 0
+            last = (state.start + count - 1) % self.ring_capacity
+            times = self.times[state.index]
+            duration = float(times[last] - times[state.start]) if count > 1 else 0
+
+        return {
+            'beats_in_buffer': count,
+            'min_beats_required': min_beats,
+            'buffer_ready': count >= min_beats,
+            'mean_heart_rate': mean_hr,
+            'buffer_duration_seconds': duration
+        }
+
+    def calculate_all(self) -> Dict[str, Dict]:
+        """
+        Calculate coherence for every subject.
+
+        Returns:
+            Coherence result per subject ID
+        """
+        return {subject_id: state.calculate_coherence() for subject_id, state in self.subjects.items()}
+
+    def reconfigure(self, config: Dict) -> List[str]:
+        """
+        Apply new coherence settings, keeping buffered beats.
+
+        Rings are resized (newest beats kept) when the window changes.
+
+        Args:
+            config: Full (already validated) configuration dictionary
+
+        Returns:
+            Names of the coherence settings that changed
+        """
+        changed = self.calculator.reconfigure(config)
+        if changed:
+            # Settings changes invalidate every subject's memoized result
+            for state in self.subjects.values():
+                state.version += 1
+
+        if 'window_duration' in changed:
+            self.window_duration = self.calculator.window_duration
+            self._resize_rings()
+
+        return changed
+
+    def _resize_rings(self) -> None:
+        """Rebuild the rings for the current window, keeping the newest beats."""
+        old = {state: (self._ordered(self.rr, state), self._ordered(self.times, state))
+               for state in self.subjects.values()}
+
+        self.ring_capacity = self._ring_capacity()
+        rows = len(self.rr)
+        self.rr = np.zeros((rows, self.ring_capacity), dtype=np.float32)
+        self.times = np.zeros((rows, self.ring_capacity), dtype=np.float32)
+
+        for state, (rr, times) in old.items():
+            rr = rr[-self.ring_capacity:]
+            times = times[-self.ring_capacity:]
+            if len(times):
+                keep = times >= times[-1] - self.window_duration
+                rr, times = rr[keep], times[keep]
+
+            count = len(rr)
+            self.rr[state.index, :count] = rr
+            self.times[state.index, :count] = times
+            state.start = 0
+            state.count = count
+            state.rr_sum = float(rr.sum())
+
+    def nbytes(self) -> int:
+        """Bytes held by the ring arrays."""
+        return self.rr.nbytes + self.times.nbytes
@@ -0,0 +1,313 @@
+"""
+Group HRV Synchrony Engine
+Pairwise windowed cross-correlation and spectral coherence for every pair
+of subjects in one vectorized pass, plus a room-level synchrony index
+Based on /workspace/coherence/docs/research/INTERPERSONAL_SYNCHRONY_METHODS_COMPARISON.md
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import signal
+from scipy.fft import irfft, next_fast_len, rfft, rfftfreq
+from typing import Dict, Optional, Sequence, Tuple
+
+
+def resample_to_common_time_base(beats: Sequence[Tuple[Sequence[float], Sequence[float]]],
+                                 end_time: float,
+                                 duration: float,
+                                 rate: float,
+                                 max_hold: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Interpolate each subject's heart rate onto one shared, uniform time grid.
+
+    Args:
+        beats: Per subject, (beat times in seconds, RR intervals in ms);
+               all beat times must come from the same clock. Beats that
+               are not later than every earlier beat are dropped
+        end_time: Time of the last grid sample (seconds)
+        duration: Grid length (seconds)
+        rate: Grid sampling rate (Hz)
+        max_hold: Longest gap (seconds) between a subject's last beat and
+                  end_time over which their heart rate is held
+
+    Returns:
+        Tuple of (heart rate in bpm, shape (subjects, samples),
+        boolean mask of subjects whose beats cover the whole grid)
+    """
+    n_samples = int(round(duration * rate))
+    grid = end_time - np.arange(n_samples - 1, -1, -1) / rate
+
+    signals = np.zeros((len(beats), n_samples))
+    valid = np.zeros(len(beats), dtype=bool)
+
+    for row, (times, rr_intervals) in enumerate(beats):
+        times = np.asarray(times, dtype=float)
+        rr_intervals = np.asarray(rr_intervals, dtype=float)
+
+        # np.interp needs strictly increasing times: drop beats that do not advance
+        if len(times) > 1:
+            advances = np.concatenate(([True], times[1:] > np.maximum.accumulate(times)[:-1]))
+            times, rr_intervals = times[advances], rr_intervals[advances]
+
+        if len(times) < 2 or times[0] > grid[0] or end_time - times[-1] > max_hold:
+            continue
+
+        signals[row] = np.interp(grid, times, 60000.0 / rr_intervals)
+        valid[row] = True
+
+    return signals, valid
+
+
+class SynchronyEngine:
+    """
+    Computes interpersonal synchrony for a group of subjects.
+
+    Works on heart rate series already on a common time base (see
+    resample_to_common_time_base). Both metrics are computed for all
+    N(N-1)/2 pairs at once from per-subject FFTs:
+
+    - Windowed cross-correlation: the analysis window is split into
+      overlapping windows; in each window the peak Pearson correlation
+      within ±max_lag is found from the irfft of the pair's cross-spectrum,
+      and peaks are averaged across windows (Boker et al.)
+    - Spectral coherence: magnitude-squared coherence from Welch-averaged
+      cross-spectral matrices (one batched matrix product per frequency
+      bin), averaged over the coherence band
+
+    Both metrics are biased upward for unrelated subjects: the peak over
+    lags of a noisy correlation is positive, and Welch coherence from a
+    few segments is about 1/segments. The chance level of every pair is
+    therefore estimated from phase-randomized surrogates (each subject's
+    spectrum kept, the timing between subjects destroyed), and pair scores
+    measure synchrony above chance: (metric - chance) / (1 - chance).
+
+    Each subject is transformed once per surrogate round, so the cost per
+    update is O(N) FFTs plus O(N²) vectorized array work per round, with
+    no per-pair Python calls.
+    """
+
+    def __init__(self, synchrony_config: Dict):
+        """
+        Initialize the engine.
+
+        Args:
+            synchrony_config: The 'synchrony' section of the configuration
+        """
+        self.resample_rate = synchrony_config['resample_rate']
+        self.analysis_window = synchrony_config['analysis_window']
+        self.min_subjects = synchrony_config.get('min_subjects', 2)
+
+        # Chance level from phase-randomized surrogates (seed for repeatability)
+        self.surrogates = synchrony_config.get('surrogates', 10)
+        self._rng = np.random.default_rng(synchrony_config.get('seed'))
+
+        rate = self.resample_rate
+        self.n_samples = int(round(self.analysis_window * rate))
+
+        # Windowed cross-correlation plan
+        self.xcorr_samples = int(round(synchrony_config['xcorr_window'] * rate))
+        self.xcorr_step = max(1, int(round(synchrony_config['xcorr_step'] * rate)))
+        self.max_lag = int(round(synchrony_config['max_lag'] * rate))
+        self.xcorr_nfft = next_fast_len(self.xcorr_samples + self.max_lag)
+
+        lags = np.arange(-self.max_lag, self.max_lag + 1)
+        self._lags_seconds = lags / rate
+        # irfft output index of each lag (negative lags wrap around)
+        self._lag_index = lags % self.xcorr_nfft
+        # Unbiased normalization: lag k overlaps in (window - |k|) samples
+        self._lag_norm = 1.0 / (self.xcorr_samples - np.abs(lags))
+
+        # Spectral coherence plan (Welch segments with 50% overlap)
+        self.segment_samples = int(round(synchrony_config['segment_duration'] * rate))
+        self.segment_step = max(1, self.segment_samples // 2)
+        # Periodic Hann window, as scipy.signal.coherence uses
+        self._segment_window = signal.get_window('hann', self.segment_samples)
+        freqs = rfftfreq(self.segment_samples, 1 / rate)
+        self._band = (
+            (freqs >= synchrony_config['band_min_freq'])
+            & (freqs <= synchrony_config['band_max_freq'])
+        )
+
+    def compute(self, signals: np.ndarray, valid: Optional[np.ndarray] = None) -> Dict:
+        """
+        Compute pairwise and room-level synchrony.
+
+        Args:
+            signals: Heart rate series, shape (subjects, samples); only the
+                     last analysis_window seconds are used
+            valid: Optional mask of subjects to include
+
+        Returns:
+            Dictionary containing:
+            - status: 'valid' or 'insufficient_data'
+            - subjects: Indices (into signals) of the subjects analysed
+            - xcorr: Peak cross-correlation matrix (-1 to 1)
+            - lag: Lag at the peak (seconds; positive = column follows row)
+            - coherence: Band-averaged spectral coherence matrix (0 to 1)
+            - pair_synchrony: Per-pair score (0 to 1), the mean of the
+              cross-correlation and the spectral coherence above their
+              chance levels
+            - connectedness: Each subject's mean pair score with the others
+            - room_xcorr, room_coherence: Means over all pairs (raw)
+            - chance_xcorr, chance_coherence: Mean chance levels over all
+              pairs (what unrelated subjects would score)
+            - room_index: Mean pair score (0 to 1, about 0 at chance)
+            - room_score: room_index on the 0-100 coherence score scale
+        """
+        subjects = np.arange(len(signals))
+        if valid is not None:
+            subjects = subjects[np.asarray(valid, dtype=bool)]
+
+        if len(subjects) < self.min_subjects or signals.shape[1] < self.n_samples:
+            return self._insufficient_data_response(subjects)
+
+        data = signals[subjects, -self.n_samples:]
+        rows, cols = np.triu_indices(len(subjects), k=1)
+
+        pair_xcorr, pair_lag = self._pairwise_xcorr(data, rows, cols)
+        pair_coherence = self._pairwise_coherence(data, rows, cols)
+        xcorr_chance, coherence_chance = self._chance_levels(data, rows, cols)
+
+        # Scores above chance are left unclipped for the room and subject
+        # means, so noise around chance averages out instead of adding up
+        excess = 0.5 * (
+            _above_chance(pair_xcorr, xcorr_chance) + _above_chance(pair_coherence, coherence_chance)
+        )
+
+        n = len(subjects)
+        excess_matrix = _symmetric(excess, rows, cols, n, diagonal=0.0)
+        connectedness = np.clip(excess_matrix.sum(axis=1) / (n - 1), 0.0, 1.0)
+        room_index = float(np.clip(excess.mean(), 0.0, 1.0))
+
+        return {
+            'status': 'valid',
+            'subjects': subjects,
+            'xcorr': _symmetric(pair_xcorr, rows, cols, n),
+            'lag': _symmetric(pair_lag, rows, cols, n, diagonal=0.0, antisymmetric=True),
+            'coherence': _symmetric(pair_coherence, rows, cols, n),
+            'pair_synchrony': _symmetric(np.clip(excess, 0.0, 1.0), rows, cols, n),
+            'connectedness': connectedness,
+            'room_xcorr': float(pair_xcorr.mean()),
+            'room_coherence': float(pair_coherence.mean()),
+            'chance_xcorr': float(xcorr_chance.mean()),
+            'chance_coherence': float(coherence_chance.mean()),
+            'room_index': room_index,
+            'room_score': int(round(room_index * 100))
+        }
+
+    def _chance_levels(self, data: np.ndarray, rows: np.ndarray,
+                       cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Expected metrics for each pair if the subjects were unrelated.
+
+        Every subject's series is phase-randomized independently (same
+        power spectrum and autocorrelation, random timing), and both
+        metrics are averaged over the surrogate rounds.
+
+        Returns:
+            Tuple of per-pair (cross-correlation, coherence) chance levels
+        """
+        spectra = rfft(data, axis=-1)
+        xcorr_chance = np.zeros(len(rows))
+        coherence_chance = np.zeros(len(rows))
+
+        for _ in range(self.surrogates):
+            phases = np.exp(2j * np.pi * self._rng.random(spectra.shape))
+            phases[:, 0] = 1.0  # keep the mean...
+            if self.n_samples % 2 == 0:
+                phases[:, -1] = 1.0  # ...and a real Nyquist bin
+            surrogate = irfft(spectra * phases, n=self.n_samples, axis=-1)
+
+            xcorr_chance += self._pairwise_xcorr(surrogate, rows, cols)[0]
+            coherence_chance += self._pairwise_coherence(surrogate, rows, cols)
+
+        rounds = max(self.surrogates, 1)
+        return xcorr_chance / rounds, coherence_chance / rounds
+
+    def _pairwise_xcorr(self, data: np.ndarray, rows: np.ndarray,
+                        cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Windowed peak cross-correlation for all pairs.
+
+        Returns:
+            Tuple of per-pair (peak correlation, lag in seconds), ordered
+            like rows/cols
+        """
+        # (subjects, windows, samples), each window z-normalized
+        windows = sliding_window_view(data, self.xcorr_samples, axis=1)[:, ::self.xcorr_step]
+        windows = windows - windows.mean(axis=-1, keepdims=True)
+        std = windows.std(axis=-1, keepdims=True)
+        windows = np.divide(windows, std, out=np.zeros_like(windows), where=std > 0)
+
+        spectra = rfft(windows, n=self.xcorr_nfft, axis=-1)
+
+        # corr[k] = sum_t a[t] * b[t + k] for every pair and window at once
+        cross = irfft(np.conj(spectra[rows]) * spectra[cols], n=self.xcorr_nfft, axis=-1)
+        corr = cross[..., self._lag_index] * self._lag_norm  # (pairs, windows, lags)
+
+        peak_index = corr.argmax(axis=-1)
+        peak_corr = np.take_along_axis(corr, peak_index[..., None], axis=-1)[..., 0]
+
+        pair_corr = np.clip(peak_corr.mean(axis=1), -1.0, 1.0)
+        pair_lag = self._lags_seconds[peak_index].mean(axis=1)
+        return pair_corr, pair_lag
+
+    def _pairwise_coherence(self, data: np.ndarray, rows: np.ndarray,
+                            cols: np.ndarray) -> np.ndarray:
+        """
+        Band-averaged magnitude-squared coherence for all pairs.
+
+        Returns:
+            Per-pair coherence, ordered like rows/cols
+        """
+        segments = sliding_window_view(data, self.segment_samples, axis=1)[:, ::self.segment_step]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        spectra = rfft(segments * self._segment_window, axis=-1)[..., self._band]
+
+        # Cross-spectral matrix per frequency bin: (freqs, subjects, subjects)
+        per_freq = spectra.transpose(2, 0, 1)
+        csd = per_freq @ per_freq.conj().transpose(0, 2, 1)
+        power = np.real(np.diagonal(csd, axis1=1, axis2=2))  # (freqs, subjects)
+
+        denominator = power[:, rows] * power[:, cols]
+        msc = np.divide(
+            np.abs(csd[:, rows, cols]) ** 2, denominator,
+            out=np.zeros_like(denominator), where=denominator > 0
+        )
+
+        return msc.mean(axis=0)
+
+    def _insufficient_data_response(self, subjects: np.ndarray) -> Dict:
+        """Return standard response when fewer than min_subjects are usable."""
+        n = len(subjects)
+        return {
+            'status': 'insufficient_data',
+            'subjects': subjects,
+            'xcorr': np.eye(n),
+            'lag': np.zeros((n, n)),
+            'coherence': np.eye(n),
+            'pair_synchrony': np.eye(n),
+            'connectedness': np.zeros(n),
+            'room_xcorr': 0.0,
+            'room_coherence': 0.0,
+            'chance_xcorr': 0.0,
+            'chance_coherence': 0.0,
+            'room_index': 0.0,
+            'room_score': 0
+        }
+
+
+def _above_chance(values: np.ndarray, chance: np.ndarray) -> np.ndarray:
+    """Rescale metrics so chance maps to 0 and perfect agreement to 1."""
+    return (values - chance) / np.maximum(1.0 - chance, 1e-6)
+
+
+def _symmetric(values: np.ndarray, rows: np.ndarray, cols: np.ndarray, n: int,
+               diagonal: float = 1.0, antisymmetric: bool = False) -> np.ndarray:
+    """Build an (n, n) matrix from per-pair values of the upper triangle."""
+    matrix = np.full((n, n), 0.0)
+    np.fill_diagonal(matrix, diagonal)
+    matrix[rows, cols] = values
+    # (0.0 - x avoids -0.0 in JSON)
+    matrix[cols, rows] = 0.0 - values if antisymmetric else values
+    return matrix
@@ -4,49 +4,235 @@ Broadcasts coherence scores to connected clients for visualization
 """
 
 import asyncio
+import ipaddress
 import json
 import logging
 import time
 import websockets
-from typing import Set
-from websockets.server import WebSocketServerProtocol
+from http import HTTPStatus
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+from websockets.http11 import Request, Response
+from websockets.asyncio.server import ServerConnection, serve
+
+try:
+    from .admission import AdmissionController, ClientTicket
+except ImportError:
+    from admission import AdmissionController, ClientTicket
 
 
 logger = logging.getLogger(__name__)
 
 
+# Defaults for settings missing from the 'websocket' config section. They
+# match config/default.yaml, and validate_config() checks the same values.
+COMPRESSION_DEFAULTS = {
+    'enabled': True,
+    'server_max_window_bits': 12,  # 4 KB history for server -> client messages
+    'client_max_window_bits': 9,   # client -> server messages are tiny
+    'mem_level': 1,
+}
+
+BATCHING_DEFAULTS = {
+    'enabled': False,
+    'window': 1.0,  # seconds
+}
+
+
+def compression_settings(websocket_config: dict) -> dict:
+    """'websocket.compression' settings with defaults filled in."""
+    return {**COMPRESSION_DEFAULTS, **(websocket_config.get('compression') or {})}
+
+
+def batching_settings(websocket_config: dict) -> dict:
+    """'websocket.batching' settings with defaults filled in."""
+    return {**BATCHING_DEFAULTS, **(websocket_config.get('batching') or {})}
+
+
+def make_message(msg_type: str, data: dict) -> dict:
+    """
+    Build a server-to-client message envelope.
+
+    Timestamps are monotonic seconds (the event loop clock), so messages
+    built outside the server process line up with ones built inside it.
+
+    Args:
+        msg_type: Message type (e.g. 'coherence_update')
+        data: Message payload
+
+    Returns:
+        Message dictionary ready for JSON encoding
+    """
+    return {
+        'type': msg_type,
+        'timestamp': time.monotonic(),
+        'data': data
+    }
+
+
+def heartbeat_data(rr_interval: float) -> dict:
+    """Payload of a 'heartbeat' message for one RR interval (ms)."""
+    return {
+        'rr_interval': rr_interval,
+        'heart_rate': 60000 / rr_interval if rr_interval > 0 else 0
+    }
+
+
+def connection_status_data(status: dict) -> dict:
+    """Payload of a 'connection_status' message from PolarH10.get_status()."""
+    return {
+        'polar_h10_connected': status.get('connected', False),
+        'device_name': status.get('device_name'),
+        'device_address': status.get('client_address')
+    }
+
+
+def is_loopback(host: str) -> bool:
+    """
+    Check whether a peer address is this machine.
+
+    IPv4-mapped IPv6 addresses (::ffff:127.0.0.1, as reported by dual-stack
+    listeners) are unmapped first.
+
+    Args:
+        host: Peer host from remote_address
+
+    Returns:
+        True for loopback addresses and 'localhost'
+    """
+    if host == 'localhost':
+        return True
+    try:
+        address = ipaddress.ip_address(host.split('%', 1)[0])
+    except ValueError:
+        return False
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_loopback
+
+
+def encode_batch(messages_json: List[str]) -> str:
+    """
+    Wrap already-encoded messages in a single 'batch' message.
+
+    The messages are spliced in as-is, so batching never re-encodes them.
+
+    Args:
+        messages_json: JSON-encoded messages, oldest first
+
+    Returns:
+        JSON-encoded batch message
+    """
+    return (
+        f'{{"type": "batch", "timestamp": {time.monotonic()!r}, '
+        f'"messages": [{", ".join(messages_json)}]}}'
+    )
+
+
+def deflate_extensions(compression_config: Optional[dict]) -> Optional[List[ServerPerMessageDeflateFactory]]:
+    """
+    Build the permessage-deflate extension from the 'compression' config.
+
+    Compression is negotiated per client: clients that do not offer
+    permessage-deflate get uncompressed frames. Each compressing client
+    holds its own deflate context, whose size is set by the window bits
+    and memory level.
+
+    Args:
+        compression_config: The 'websocket.compression' config section
+
+    Returns:
+        Extension factories for serve(), or None if disabled
+    """
+    if not compression_config:
+        return None
+
+    settings = {**COMPRESSION_DEFAULTS, **compression_config}
+    if not settings['enabled']:
+        return None
+
+    return [
+        ServerPerMessageDeflateFactory(
+            server_max_window_bits=settings['server_max_window_bits'],
+            client_max_window_bits=settings['client_max_window_bits'],
+            compress_settings={'memLevel': settings['mem_level']}
+        )
+    ]
+
+
 class CoherenceWebSocketServer:
     """
     WebSocket server that broadcasts coherence data to connected clients.
 
     Clients can subscribe to real-time coherence scores, buffer status,
-    and connection events.
+    and connection events. Clients in batching mode receive everything
+    produced within the batch window as one 'batch' message.
     """
 
-    # Security limits
-    MAX_MESSAGE_SIZE = 1024  # bytes
-    MAX_MESSAGES_PER_SECOND = 10
-    MAX_CLIENTS = 10
-
-    def __init__(self, config: dict):
+    # HTTP status and body returned for each rejected connection attempt
+    # (sent instead of the handshake response, before any upgrade)
+    REJECT_RESPONSES = {
+        'server_full': (HTTPStatus.SERVICE_UNAVAILABLE, "Server full"),
+        'connection_rate': (HTTPStatus.TOO_MANY_REQUESTS, "Too many connections, try again later"),
+        'ip_connection_rate': (HTTPStatus.TOO_MANY_REQUESTS, "Too many connections, try again later"),
+        'ip_connection_limit': (HTTPStatus.TOO_MANY_REQUESTS, "Too many connections from this address"),
+    }
+
+    # Close code and reason sent for each rejected message
+    CLOSE_REASONS = {
+        'message_size': (1009, "Message too large"),
+        'message_rate': (1008, "Rate limit exceeded"),
+        'ip_message_rate': (1008, "Rate limit exceeded"),
+    }
+
+    def __init__(self, config: dict,
+                 on_reload_config: Optional[Callable[[], Awaitable[dict]]] = None,
+                 reuse_port: bool = False):
         """
         Initialize WebSocket server.
 
         Args:
             config: Configuration dictionary
+            on_reload_config: Coroutine function invoked for the admin
+                'reload_config' message; returns the reload result
+            reuse_port: Bind with SO_REUSEPORT so several worker
+                processes can share the port
         """
         self.host = config['websocket']['host']
         self.port = config['websocket']['port']
+        self.on_reload_config = on_reload_config
+        self.reuse_port = reuse_port
         self.cors_origins = config['websocket']['cors_origins']
 
-        # Connected clients
-        self.clients: Set[WebSocketServerProtocol] = set()
+        # Connection/message limits (token buckets, configured per deployment)
+        self.admission = AdmissionController(config['websocket'])
+
+        # permessage-deflate settings offered to clients
+        self.compression = config['websocket'].get('compression')
+
+        # Micro-batching (clients opt in, or all clients if enabled in config)
+        batching = batching_settings(config['websocket'])
+        self.batch_by_default = batching['enabled']
+        self.batch_window = batching['window']
+
+        # Connected clients, and admission tickets of every admitted
+        # connection (including ones still completing the handshake)
+        self.clients: Set[ServerConnection] = set()
+        self._tickets: Dict[ServerConnection, ClientTicket] = {}
+        self._release_tasks: Set[asyncio.Task] = set()
+
+        # Clients receiving batches, messages waiting for the next batch,
+        # and batching changes deferred until that batch is sent
+        self.batched_clients: Set[ServerConnection] = set()
+        self._pending_batch: List[str] = []
+        self._batch_task: Optional[asyncio.Task] = None
+        self._batching_changes: Dict[ServerConnection, bool] = {}
 
         # Shutdown event for clean server termination
         self.shutdown_event = asyncio.Event()
 
-        # Rate limiting tracking: client_id -> list of message timestamps
-        self.client_message_times: dict = {}
+        # Set when host/port change so the listener is re-bound
+        self.rebind_event = asyncio.Event()
 
         # Latest data cache
         self.latest_coherence = None
@@ -58,42 +244,133 @@ class CoherenceWebSocketServer:
 
     async def start(self) -> None:
         """Start the WebSocket server."""
-        logger.info(f"Starting WebSocket server on ws://{self.host}:{self.port}")
-
-        async with websockets.serve(
-            self._handler,
-            self.host,
-            self.port
-        ):
-            # Wait for shutdown signal instead of unresolving Future
-            await self.shutdown_event.wait()
+        while not self.shutdown_event.is_set():
+            logger.info(f"Starting WebSocket server on ws://{self.host}:{self.port}")
+            self.rebind_event.clear()
+
+            async with serve(
+                self._handler,
+                self.host,
+                self.port,
+                process_request=self._process_request,
+                reuse_port=self.reuse_port,
+                compression=None,
+                extensions=deflate_extensions(self.compression)
+            ):
+                # Wait for shutdown (or a rebind request) instead of unresolving Future
+                shutdown_wait = asyncio.create_task(self.shutdown_event.wait())
+                rebind_wait = asyncio.create_task(self.rebind_event.wait())
+                await asyncio.wait(
+                    {shutdown_wait, rebind_wait},
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                shutdown_wait.cancel()
+                rebind_wait.cancel()
 
         logger.info("WebSocket server stopped")
 
     async def stop(self) -> None:
         """Stop the WebSocket server gracefully."""
         logger.info("Stopping WebSocket server...")
+        if self._batch_task is not None:
+            self._batch_task.cancel()
         self.shutdown_event.set()
 
-    async def _handler(self, websocket: WebSocketServerProtocol) -> None:
+    def reconfigure(self, config: dict) -> bool:
+        """
+        Apply new WebSocket settings in place.
+
+        Connected clients are kept unless the listen address or the
+        compression settings change, in which case the listener is re-bound
+        (and its clients dropped). A new batch window applies from the next
+        batch; the batching default only affects new clients.
+
+        Args:
+            config: Full (already validated) configuration dictionary
+
+        Returns:
+            True if the server is re-binding
+        """
+        websocket_config = config['websocket']
+        self.cors_origins = websocket_config['cors_origins']
+        self.admission.reconfigure(websocket_config)
+
+        batching = batching_settings(websocket_config)
+        self.batch_by_default = batching['enabled']
+        self.batch_window = batching['window']
+
+        compression = websocket_config.get('compression')
+        rebind = (
+            (websocket_config['host'], websocket_config['port']) != (self.host, self.port)
+            or compression != self.compression
+        )
+        if rebind:
+            self.host = websocket_config['host']
+            self.port = websocket_config['port']
+            self.compression = compression
+            logger.info(f"Re-binding WebSocket server to ws://{self.host}:{self.port}")
+            self.rebind_event.set()
+
+        return rebind
+
+    def _process_request(self, connection: ServerConnection, request: Request) -> Optional[Response]:
+        """
+        Admission control, run before the opening handshake.
+
+        Rejected clients get a plain HTTP error (503 when the server is
+        full, 429 when rate limited) without the server ever upgrading the
+        connection. An admitted connection holds its ticket until it
+        closes, whether or not the handshake completes.
+
+        Args:
+            connection: Connection being opened
+            request: Handshake request
+
+        Returns:
+            Rejection response, or None to continue the handshake
+        """
+        client_address = connection.remote_address
+
+        # Capacity, connection rates and the per-IP cap; connections still
+        # in the handshake count towards capacity
+        ticket, reason = self.admission.admit_connection(client_address[0], len(self._tickets))
+        if ticket is None:
+            # Counted in admission stats; kept at debug level to stay cheap under a storm
+            logger.debug(f"Rejecting {client_address[0]}:{client_address[1]}: {reason}")
+            status, text = self.REJECT_RESPONSES[reason]
+            response = connection.respond(status, f"{text}\n")
+            if status == HTTPStatus.TOO_MANY_REQUESTS:
+                response.headers['Retry-After'] = '1'
+            return response
+
+        self._tickets[connection] = ticket
+        task = asyncio.create_task(self._release_when_closed(connection))
+        self._release_tasks.add(task)
+        task.add_done_callback(self._release_tasks.discard)
+        return None
+
+    async def _release_when_closed(self, connection: ServerConnection) -> None:
+        """Release a connection's admission ticket once it has closed."""
+        try:
+            await connection.wait_closed()
+        finally:
+            self.admission.release(self._tickets.pop(connection))
+
+    async def _handler(self, websocket: ServerConnection) -> None:
         """
-        Handle WebSocket connections.
+        Handle WebSocket connections admitted by _process_request().
 
         Args:
             websocket: WebSocket connection
         """
         client_address = websocket.remote_address
         client_id = f"{client_address[0]}:{client_address[1]}"
-
-        # Check max clients limit
-        if len(self.clients) >= self.MAX_CLIENTS:
-            logger.warning(f"Max clients ({self.MAX_CLIENTS}) reached, rejecting {client_id}")
-            await websocket.close(1008, "Server full")
-            return
+        ticket = self._tickets[websocket]
 
         # Register client
         self.clients.add(websocket)
-        self.client_message_times[client_id] = []
+        if self.batch_by_default:
+            self._set_client_batching(websocket, True)
         logger.info(f"Client connected: {client_address}")
 
         try:
@@ -102,26 +379,11 @@ class CoherenceWebSocketServer:
 
             # Keep connection alive and handle messages
             async for message in websocket:
-                # Check message size
-                if len(message) > self.MAX_MESSAGE_SIZE:
-                    logger.warning(f"Oversized message from {client_id}: {len(message)} bytes")
-                    await websocket.close(1009, "Message too large")
-                    break
-
-                # Rate limiting
-                now = time.time()
-                self.client_message_times[client_id].append(now)
-
-                # Remove old timestamps (older than 1 second)
-                self.client_message_times[client_id] = [
-                    t for t in self.client_message_times[client_id]
-                    if now - t < 1.0
-                ]
-
-                # Check rate limit
-                if len(self.client_message_times[client_id]) > self.MAX_MESSAGES_PER_SECOND:
-                    logger.warning(f"Rate limit exceeded for {client_id}")
-                    await websocket.close(1008, "Rate limit exceeded")
+                # Size and rate limits (per client and per IP)
+                reason = self.admission.admit_message(ticket, len(message))
+                if reason is not None:
+                    logger.warning(f"Closing {client_id}: {reason}")
+                    await websocket.close(*self.CLOSE_REASONS[reason])
                     break
 
                 # Handle the message
@@ -134,10 +396,10 @@ class CoherenceWebSocketServer:
         finally:
             # Unregister client
             self.clients.discard(websocket)
-            if client_id in self.client_message_times:
-                del self.client_message_times[client_id]
+            self.batched_clients.discard(websocket)
+            self._batching_changes.pop(websocket, None)
 
-    async def _send_initial_state(self, websocket: WebSocketServerProtocol) -> None:
+    async def _send_initial_state(self, websocket: ServerConnection) -> None:
         """
         Send current state to newly connected client.
 
@@ -153,7 +415,7 @@ class CoherenceWebSocketServer:
 
         await websocket.send(json.dumps(initial_state))
 
-    async def _handle_message(self, websocket: WebSocketServerProtocol, message: str) -> None:
+    async def _handle_message(self, websocket: ServerConnection, message: str) -> None:
         """
         Handle incoming WebSocket messages.
 
@@ -166,7 +428,7 @@ class CoherenceWebSocketServer:
             msg_type = data.get('type')
 
             if msg_type == 'ping':
-                await websocket.send(json.dumps({'type': 'pong'}))
+                await websocket.send(json.dumps({'type': 'pong', 'timestamp': time.monotonic()}))
 
             elif msg_type == 'request_status':
                 status = {
@@ -177,11 +439,71 @@ class CoherenceWebSocketServer:
                 }
                 await websocket.send(json.dumps(status))
 
+            elif msg_type == 'set_batching':
+                await self._handle_set_batching(websocket, data)
+
+            elif msg_type == 'reload_config':
+                await self._handle_reload_config(websocket)
+
         except json.JSONDecodeError:
             logger.warning(f"Invalid JSON received: {message}")
         except Exception as e:
             logger.error(f"Error handling message: {e}")
 
+    async def _handle_reload_config(self, websocket: ServerConnection) -> None:
+        """
+        Handle the admin 'reload_config' message (loopback clients only).
+
+        Args:
+            websocket: WebSocket connection
+        """
+        client_host = websocket.remote_address[0]
+        if not is_loopback(client_host) or self.on_reload_config is None:
+            logger.warning(f"Rejected reload_config from {client_host}")
+            await websocket.send(json.dumps({
+                'type': 'reload_result',
+                'success': False,
+                'error': 'not permitted'
+            }))
+            return
+
+        result = await self.on_reload_config()
+        await websocket.send(json.dumps({'type': 'reload_result', **result}))
+
+    async def _handle_set_batching(self, websocket: ServerConnection, data: dict) -> None:
+        """
+        Handle a client's 'set_batching' message.
+
+        Args:
+            websocket: WebSocket connection
+            data: Decoded message ({'type': 'set_batching', 'enabled': bool})
+        """
+        enabled = bool(data.get('enabled', True))
+        self._set_client_batching(websocket, enabled)
+        await websocket.send(json.dumps({
+            'type': 'batching',
+            'enabled': enabled,
+            'window': self.batch_window
+        }))
+
+    def _set_client_batching(self, websocket: ServerConnection, enabled: bool) -> None:
+        """
+        Switch a client between immediate and batched delivery.
+
+        While a batch is pending the switch waits until it has been sent,
+        so the client neither misses nor repeats the messages in it.
+
+        Args:
+            websocket: WebSocket connection
+            enabled: True for batched delivery
+        """
+        if self._batch_task is not None:
+            self._batching_changes[websocket] = enabled
+        elif enabled:
+            self.batched_clients.add(websocket)
+        else:
+            self.batched_clients.discard(websocket)
+
     async def broadcast_coherence(self, coherence_data: dict) -> None:
         """
         Broadcast coherence update to all connected clients.
@@ -190,14 +512,7 @@ class CoherenceWebSocketServer:
             coherence_data: Coherence calculation result
         """
         self.latest_coherence = coherence_data
-
-        message = {
-            'type': 'coherence_update',
-            'timestamp': asyncio.get_event_loop().time(),
-            'data': coherence_data
-        }
-
-        await self._broadcast(message)
+        await self._broadcast(make_message('coherence_update', coherence_data))
 
     async def broadcast_heartbeat(self, rr_interval: float) -> None:
         """
@@ -206,16 +521,7 @@ class CoherenceWebSocketServer:
         Args:
             rr_interval: RR interval in milliseconds
         """
-        message = {
-            'type': 'heartbeat',
-            'timestamp': asyncio.get_event_loop().time(),
-            'data': {
-                'rr_interval': rr_interval,
-                'heart_rate': 60000 / rr_interval if rr_interval > 0 else 0
-            }
-        }
-
-        await self._broadcast(message)
+        await self._broadcast(make_message('heartbeat', heartbeat_data(rr_interval)))
 
     async def broadcast_buffer_status(self, buffer_status: dict) -> None:
         """
@@ -225,14 +531,7 @@ class CoherenceWebSocketServer:
             buffer_status: Buffer statistics
         """
         self.latest_buffer_status = buffer_status
-
-        message = {
-            'type': 'buffer_status',
-            'timestamp': asyncio.get_event_loop().time(),
-            'data': buffer_status
-        }
-
-        await self._broadcast(message)
+        await self._broadcast(make_message('buffer_status', buffer_status))
 
     async def broadcast_connection_status(self, status: dict) -> None:
         """
@@ -241,19 +540,31 @@ class CoherenceWebSocketServer:
         Args:
             status: Connection status dictionary
         """
-        self.connection_status = {
-            'polar_h10_connected': status.get('connected', False),
-            'device_name': status.get('device_name'),
-            'device_address': status.get('client_address')
-        }
+        self.connection_status = connection_status_data(status)
+        await self._broadcast(make_message('connection_status', self.connection_status))
 
-        message = {
-            'type': 'connection_status',
-            'timestamp': asyncio.get_event_loop().time(),
-            'data': self.connection_status
-        }
+    async def broadcast_encoded(self, message_json: str, message: Optional[dict] = None) -> None:
+        """
+        Forward an already-encoded message to all connected clients.
+
+        Used by fan-out workers, which receive each message serialized
+        once by the compute process. State messages (coherence, buffer and
+        connection status) also update the cache sent to new clients.
+
+        Args:
+            message_json: JSON-encoded message
+            message: Decoded message, only needed for state messages
+        """
+        if message is not None:
+            msg_type = message.get('type')
+            if msg_type == 'coherence_update':
+                self.latest_coherence = message['data']
+            elif msg_type == 'buffer_status':
+                self.latest_buffer_status = message['data']
+            elif msg_type == 'connection_status':
+                self.connection_status = message['data']
 
-        await self._broadcast(message)
+        await self._send_all(message_json)
 
     async def _broadcast(self, message: dict) -> None:
         """
@@ -265,14 +576,59 @@ class CoherenceWebSocketServer:
         if not self.clients:
             return
 
-        message_json = json.dumps(message)
+        await self._send_all(json.dumps(message))
+
+    async def _send_all(self, message_json: str) -> None:
+        """
+        Send an encoded message to all connected clients.
 
+        Args:
+            message_json: JSON-encoded message
+        """
+        if not self.clients:
+            return
+
+        if self.batched_clients:
+            self._pending_batch.append(message_json)
+            if self._batch_task is None:
+                self._batch_task = asyncio.create_task(self._send_batch_after_window())
+            recipients = self.clients - self.batched_clients
+        else:
+            recipients = self.clients
+
+        await self._deliver(recipients, message_json)
+
+    async def _deliver(self, clients: Set[ServerConnection], message_json: str) -> None:
+        """
+        Send an encoded message to the given clients.
+
+        Args:
+            clients: Recipients
+            message_json: JSON-encoded message (or batch)
+        """
         # Send to all clients concurrently
         await asyncio.gather(
-            *[client.send(message_json) for client in self.clients],
+            *[client.send(message_json) for client in clients],
             return_exceptions=True
         )
 
+    async def _send_batch_after_window(self) -> None:
+        """Send everything queued during the batch window as one message."""
+        await asyncio.sleep(self.batch_window)
+
+        # A lone message goes out as-is rather than wrapped
+        pending, self._pending_batch = self._pending_batch, []
+        batch_json = pending[0] if len(pending) == 1 else encode_batch(pending)
+        self._batch_task = None
+
+        await self._deliver(self.batched_clients, batch_json)
+
+        # Apply batching switches requested while this batch was pending
+        changes, self._batching_changes = self._batching_changes, {}
+        for client, enabled in changes.items():
+            if client in self.clients:
+                self._set_client_batching(client, enabled)
+
     def get_stats(self) -> dict:
         """
         Get server statistics.
@@ -282,6 +638,9 @@ class CoherenceWebSocketServer:
         """
         return {
             'connected_clients': len(self.clients),
+            'max_clients': self.admission.max_clients,
+            'batched_clients': len(self.batched_clients),
+            'admission': self.admission.get_stats(),
             'host': self.host,
             'port': self.port,
             'has_coherence_data': self.latest_coherence is not None,
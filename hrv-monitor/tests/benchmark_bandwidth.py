@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+WebSocket Bandwidth-per-Client Benchmark
+
+Replays a simulated session (heartbeat per beat, coherence and buffer
+status every update interval, connection status every 5 s) through the
+same message encoding the server uses and reports what one client costs
+on the wire with:
+- plain frames
+- permessage-deflate at several window sizes (websockets' own codec)
+- micro-batching at several windows, with and without deflate
+
+Wire bytes include the WebSocket frame header and 52 bytes of IPv4/TCP
+headers per frame (one segment per frame, as with TCP_NODELAY), which is
+where batching saves most on a radio link.
+
+Usage:
+    python tests/benchmark_bandwidth.py [--minutes 5]
+
+Requirements:
+    - numpy, scipy and websockets installed
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import Frame, Opcode
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+from main import DEFAULT_CONFIG_PATH, read_config  # noqa: E402
+from websocket_server import (  # noqa: E402
+    connection_status_data, encode_batch, heartbeat_data, make_message
+)
+
+
+PACKET_OVERHEAD = 52  # IPv4 (20) + TCP with timestamps (32) per segment
+STATUS_INTERVAL = 5   # seconds between connection_status broadcasts
+
+
+def simulate_session(config: dict, minutes: float) -> List[Tuple[float, str]]:
+    """
+    Build the server's message stream for a simulated session.
+
+    Args:
+        config: Configuration dictionary
+        minutes: Session length
+
+    Returns:
+        (send time, JSON message) pairs in send order
+    """
+    rng = np.random.default_rng(0)
+    calculator = CoherenceCalculator(config)
+    update_interval = config['coherence']['update_interval']
+    duration = minutes * 60
+    clock_offset = 86400.0  # monotonic clocks are not 0 at session start
+
+    events = []
+
+    def emit(t: float, msg_type: str, data: dict) -> None:
+        message = make_message(msg_type, data)
+        message['timestamp'] = clock_offset + t
+        events.append((t, json.dumps(message)))
+
+    # Beats: ~65 bpm with a 0.1 Hz (coherent breathing) oscillation
+    t = 0.0
+    next_update = update_interval
+    next_status = 0.0
+    while t < duration:
+        rr_ms = 920 + 60 * np.sin(2 * np.pi * 0.1 * t) + rng.normal(0, 15)
+        t += rr_ms / 1000
+
+        while next_status <= t:
+            emit(next_status, 'connection_status', connection_status_data({
+                'connected': True, 'device_name': 'Polar H10 A1B2C3D4',
+                'client_address': 'AA:BB:CC:DD:EE:FF'
+            }))
+            next_status += STATUS_INTERVAL
+
+        while next_update <= t:
+            emit(next_update, 'coherence_update', calculator.calculate_coherence())
+            emit(next_update, 'buffer_status', calculator.get_buffer_status())
+            next_update += update_interval
+
+        calculator.add_rr_interval(float(rr_ms), timestamp=t)
+        emit(t, 'heartbeat', heartbeat_data(float(rr_ms)))
+
+    return events
+
+
+def batch_frames(events: List[Tuple[float, str]], window: float) -> Tuple[List[str], float]:
+    """
+    Group messages as the server does: a batch opens with the first
+    queued message and is sent `window` seconds later (a lone message
+    is sent unwrapped).
+
+    Returns:
+        (batch messages, mean added latency in seconds)
+    """
+    frames = []
+    delays = []
+
+    def flush(batch: List[str]) -> None:
+        frames.append(batch[0] if len(batch) == 1 else encode_batch(batch))
+
+    batch: List[str] = []
+    batch_end = None
+
+    for t, message in events:
+        if batch_end is not None and t >= batch_end:
+            flush(batch)
+            batch, batch_end = [], None
+        if batch_end is None:
+            batch_end = t + window
+        batch.append(message)
+        delays.append(batch_end - t)
+
+    if batch:
+        flush(batch)
+
+    return frames, float(np.mean(delays))
+
+
+def frame_header_bytes(payload_length: int) -> int:
+    """Server-to-client (unmasked) WebSocket frame header size."""
+    if payload_length < 126:
+        return 2
+    if payload_length < 65536:
+        return 4
+    return 10
+
+
+def deflate_memory(window_bits: int, mem_level: int) -> int:
+    """zlib compressor state held per client (bytes, per zlib's docs)."""
+    return (1 << (window_bits + 2)) + (1 << (mem_level + 9))
+
+
+def measure(frames: List[str], window_bits: Optional[int], mem_level: int = 5) -> Tuple[int, int]:
+    """
+    Encode frames for one client.
+
+    Args:
+        frames: JSON messages, one per frame
+        window_bits: Deflate window bits, or None for no compression
+        mem_level: Deflate memory level
+
+    Returns:
+        (payload bytes, wire bytes)
+    """
+    codec = None
+    if window_bits is not None:
+        # One context per client, kept across messages (context takeover)
+        codec = PerMessageDeflate(False, False, window_bits, window_bits, {'memLevel': mem_level})
+
+    payload_total = 0
+    wire_total = 0
+    for message in frames:
+        frame = Frame(Opcode.TEXT, message.encode('utf-8'))
+        if codec is not None:
+            frame = codec.encode(frame)
+        length = len(frame.data)
+        payload_total += length
+        wire_total += length + frame_header_bytes(length) + PACKET_OVERHEAD
+
+    return payload_total, wire_total
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--minutes', type=float, default=5, help="simulated session length")
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help="config file (relative to the project root)")
+    args = parser.parse_args()
+
+    config = read_config(args.config)
+    if config is None:
+        sys.exit(1)
+
+    events = simulate_session(config, args.minutes)
+    plain_frames = [message for _, message in events]
+    per_minute = 1 / args.minutes
+
+    compression = config['websocket'].get('compression') or {}
+    tuned_bits = compression.get('server_max_window_bits', 12)
+    tuned_mem = compression.get('mem_level', 5)
+
+    print("=" * 86)
+    print(f"Bandwidth per client: {len(events)} messages over {args.minutes:g} simulated minutes")
+    print("=" * 86)
+    print(f"{'mode':<34}{'frames/min':>11}{'payload KB/min':>16}{'wire KB/min':>13}"
+          f"{'saved':>7}{'latency':>9}")
+    print("-" * 86)
+
+    _, baseline_wire = measure(plain_frames, None)
+
+    def report(label: str, frames: List[str], window_bits: Optional[int], mem_level: int = 5,
+               latency: float = 0.0) -> None:
+        payload, wire = measure(frames, window_bits, mem_level)
+        saved = 1 - wire / baseline_wire
+        print(f"{label:<34}{len(frames) * per_minute:>11.0f}{payload * per_minute / 1024:>16.1f}"
+              f"{wire * per_minute / 1024:>13.1f}{saved:>7.0%}{latency * 1000:>7.0f}ms")
+
+    report("plain", plain_frames, None)
+    for bits in (9, 10, 11, 12, 15):
+        memory = deflate_memory(bits, tuned_mem) / 1024
+        report(f"deflate {bits} bits ({memory:.0f} KB/client)", plain_frames, bits, tuned_mem)
+
+    for window in (0.25, 1.0, 3.0):
+        frames, latency = batch_frames(events, window)
+        report(f"batch {window:g}s", frames, None, latency=latency)
+        report(f"batch {window:g}s + deflate {tuned_bits} bits", frames, tuned_bits, tuned_mem,
+               latency=latency)
+
+    print("-" * 86)
+    print(f"Configured: deflate {tuned_bits} window bits, mem_level {tuned_mem} "
+          f"({deflate_memory(tuned_bits, tuned_mem) / 1024:.0f} KB compressor state per client)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Coherence Backend Benchmark
+
+Times one full coherence calculation (resample, detrend, window, spectrum,
+peak statistics) with the NumPy path and the compiled Numba kernels, for
+several window durations, and reports how many subjects one core could
+update at the configured update interval.
+
+Usage:
+    python tests/benchmark_coherence_backends.py [--repeats 2000]
+
+Requirements:
+    - numpy and scipy installed
+    - numba installed for the compiled backend (skipped otherwise)
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+from main import DEFAULT_CONFIG_PATH, read_config  # noqa: E402
+from spectral_kernels import NUMBA_AVAILABLE  # noqa: E402
+
+
+def filled_calculator(config: dict, backend: str, window_duration: float) -> CoherenceCalculator:
+    """Create a calculator with a full window of synthetic beats."""
+    config = copy.deepcopy(config)
+    config['coherence'].update(backend=backend, window_duration=window_duration)
+    calculator = CoherenceCalculator(config)
+
+    rng = np.random.default_rng(0)
+    t = 0.0
+    while t < window_duration * 1.5:
+        rr = float(850 + 90 * np.sin(2 * np.pi * 0.1 * t) + rng.normal(0, 30))
+        t += rr / 1000
+        calculator.add_rr_interval(rr, timestamp=t)
+
+    return calculator
+
+
+def time_calculation(calculator: CoherenceCalculator, repeats: int) -> float:
+    """Mean seconds per calculation, bypassing the per-version memo."""
+    calculator._compute_coherence()  # warm-up (plans, buffers)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        calculator._compute_coherence()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeats', type=int, default=2000, help="calculations per measurement")
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help="config file (relative to the project root)")
+    args = parser.parse_args()
+
+    config = read_config(args.config)
+    if config is None:
+        sys.exit(1)
+
+    backends = ['numpy'] + (['numba'] if NUMBA_AVAILABLE else [])
+    update_interval = config['coherence']['update_interval']
+
+    print("=" * 72)
+    print(f"Coherence calculation cost ({args.repeats} runs each, "
+          f"update interval {update_interval}s)")
+    print("=" * 72)
+    if not NUMBA_AVAILABLE:
+        print("Numba not installed: compiled backend skipped (pip install numba)")
+
+    print(f"{'window':>8}{'beats':>8}{'backend':>10}{'us/update':>12}{'subjects/core':>16}{'speedup':>10}")
+    print("-" * 72)
+
+    for window_duration in (45, 60, 120, 300):
+        baseline = None
+        for backend in backends:
+            calculator = filled_calculator(config, backend, window_duration)
+            seconds = time_calculation(calculator, args.repeats)
+            baseline = baseline or seconds
+            print(f"{window_duration:>7}s{len(calculator.rr_buffer):>8}{backend:>10}"
+                  f"{seconds * 1e6:>12.1f}{update_interval / seconds:>16,.0f}"
+                  f"{baseline / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Ingest Benchmark
+
+Simulates several BLE devices delivering bursts of RR intervals from their
+own threads and compares two ways of handing them to the event loop:
+
+- call_soon_threadsafe: one loop callback (and self-pipe write) per interval
+- IngestRing: one SPSC ring and consumer task per device, woken only when
+  the consumer is parked
+
+Reports throughput, loop wakeups per interval, drops and handoff latency.
+
+Usage:
+    python tests/benchmark_ingest.py [--devices 8] [--bursts 200] [--burst-size 50]
+
+Requirements:
+    - numpy installed
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ingest_ring import IngestRing  # noqa: E402
+
+
+def produce(put, bursts: int, burst_size: int, gap: float) -> None:
+    """One device: bursts of back-to-back notifications, gap seconds apart."""
+    for _ in range(bursts):
+        for _ in range(burst_size):
+            put((time.perf_counter(), 850.0))
+        time.sleep(gap)
+
+
+async def run_threadsafe(args) -> dict:
+    """Baseline: every interval scheduled onto the loop individually."""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    expected = args.devices * args.bursts * args.burst_size
+    done = asyncio.Event()
+
+    def consume(item):
+        latencies.append(time.perf_counter() - item[0])
+        if len(latencies) == expected:
+            done.set()
+
+    def put(item):
+        loop.call_soon_threadsafe(consume, item)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(put, args.bursts, args.burst_size, args.gap))
+               for _ in range(args.devices)]
+    for thread in threads:
+        thread.start()
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+
+    return {'elapsed': elapsed, 'latencies': latencies, 'wakeups': expected, 'dropped': 0}
+
+
+async def run_ring(args) -> dict:
+    """IngestRing per device, one consumer task each."""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    rings = [IngestRing(args.capacity) for _ in range(args.devices)]
+    for ring in rings:
+        ring.bind(loop)
+    per_device = args.bursts * args.burst_size
+
+    async def consume(ring):
+        while ring.get_stats()['consumed'] + ring.dropped < per_device:
+            for item in await ring.get_batch():
+                latencies.append(time.perf_counter() - item[0])
+
+    start = time.perf_counter()
+    consumers = [asyncio.create_task(consume(ring)) for ring in rings]
+    threads = [threading.Thread(target=produce, args=(ring.put, args.bursts, args.burst_size, args.gap))
+               for ring in rings]
+    for thread in threads:
+        thread.start()
+    await asyncio.gather(*consumers)
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+
+    return {
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'wakeups': sum(ring.wakeups for ring in rings),
+        'dropped': sum(ring.dropped for ring in rings)
+    }
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--devices', type=int, default=8, help="producer threads")
+    parser.add_argument('--bursts', type=int, default=200, help="bursts per device")
+    parser.add_argument('--burst-size', type=int, default=50, help="intervals per burst")
+    parser.add_argument('--gap', type=float, default=0.005, help="seconds between bursts")
+    parser.add_argument('--capacity', type=int, default=256, help="IngestRing capacity")
+    args = parser.parse_args()
+
+    total = args.devices * args.bursts * args.burst_size
+    print("=" * 78)
+    print(f"{args.devices} devices x {args.bursts} bursts x {args.burst_size} intervals "
+          f"({total:,} total), ring capacity {args.capacity}")
+    print("=" * 78)
+    print(f"{'handoff':>22}{'intervals/s':>14}{'wakeups/item':>14}{'dropped':>9}"
+          f"{'p50 us':>9}{'p99 us':>10}")
+    print("-" * 78)
+
+    for name, runner in (('call_soon_threadsafe', run_threadsafe), ('IngestRing', run_ring)):
+        result = asyncio.run(runner(args))
+        latencies = np.array(result['latencies']) * 1e6
+        delivered = len(latencies)
+        print(f"{name:>22}{delivered / result['elapsed']:>14,.0f}"
+              f"{result['wakeups'] / max(delivered, 1):>14.3f}{result['dropped']:>9}"
+              f"{np.percentile(latencies, 50):>9.0f}{np.percentile(latencies, 99):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
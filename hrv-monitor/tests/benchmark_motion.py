@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Motion Gating Benchmark
+
+Runs the accelerometer motion estimator frame by frame at each sample rate
+the Polar H10 offers and reports the cost per second of signal, then
+compares a coherence update on a clean window with one skipped as
+'motion_artifact'.
+
+Usage:
+    python tests/benchmark_motion.py [--duration 600]
+
+Requirements:
+    - numpy and scipy installed
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+from main import DEFAULT_CONFIG_PATH, read_config  # noqa: E402
+from motion_estimator import MotionEstimator  # noqa: E402
+from polar_h10 import PolarH10  # noqa: E402
+
+
+FRAME_DURATION = 0.18  # seconds of samples per PMD ACC frame (approx.)
+
+
+def accelerometer(duration: float, fs: int) -> np.ndarray:
+    """Gravity plus alternating still and walking minutes (mG)."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(duration * fs)) / fs
+    walking = (t // 60) % 2 == 1
+    xyz = np.zeros((len(t), 3))
+    xyz[:, 2] = 1000 + walking * 300 * np.sin(2 * np.pi * 1.8 * t)
+    return xyz + rng.normal(0, 5, xyz.shape)
+
+
+def time_coherence(calculator: CoherenceCalculator, repeats: int) -> float:
+    """Mean seconds per uncached coherence calculation."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        calculator.version += 1  # defeat memoization
+        calculator.calculate_coherence()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--duration', type=float, default=600, help="signal length (s)")
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help="config file (relative to the project root)")
+    args = parser.parse_args()
+
+    config = read_config(args.config)
+    if config is None:
+        sys.exit(1)
+    motion_config = config['polar'].get('motion', {})
+
+    print("=" * 64)
+    print(f"Motion estimator: {args.duration:.0f}s of 3-axis accelerometer")
+    print("=" * 64)
+    for fs in PolarH10.ACC_SAMPLE_RATES:
+        estimator = MotionEstimator({**motion_config, 'sample_rate': fs})
+        xyz = accelerometer(args.duration, fs)
+        frame = max(1, int(FRAME_DURATION * fs))
+        start = time.perf_counter()
+        for i in range(0, len(xyz), frame):
+            estimator.process(xyz[i:i + frame], now=i / fs)
+            estimator.is_moving(0.85, now=i / fs)
+        elapsed = time.perf_counter() - start
+        frames = -(-len(xyz) // frame)
+        print(f"{fs:4d} Hz: {elapsed / frames * 1e6:7.1f} us/frame, "
+              f"{elapsed / args.duration * 1e6:7.1f} us per second of signal "
+              f"({args.duration / elapsed:6.0f}x real time)")
+
+    print()
+    print("Coherence update, 60 s window:")
+    for label, flagged in (("clean", 0.0), ("3 beats flagged", 0.05), ("motion_artifact", 0.5)):
+        calculator = CoherenceCalculator(copy.deepcopy(config))
+        t = 0.0
+        for i in range(70):
+            rr = 850 + 90 * np.sin(2 * np.pi * 0.1 * t)
+            t += rr / 1000
+            calculator.add_rr_interval(rr, timestamp=t, motion=i < flagged * 70)
+        status = calculator.calculate_coherence()['status']
+        print(f"  {label:16s} {time_coherence(calculator, 200) * 1e6:8.1f} us  ({status})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+R-Peak Detector Benchmark
+
+Runs the streaming R-peak detector frame by frame (73 samples, one Polar
+H10 PMD frame) and reports the processing cost per frame and how many
+130 Hz straps one core could keep up with. On synthetic ECG it also
+reports RR interval accuracy against the known beat times.
+
+Usage:
+    python tests/benchmark_r_peak_detector.py [--duration 600]
+    python tests/benchmark_r_peak_detector.py --file recording.txt
+
+Requirements:
+    - numpy and scipy installed
+    - Optional: an ECG recording (.npy, or text/CSV with ECG in µV in the
+      last column, e.g. a Polar Sensor Logger export)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from main import DEFAULT_CONFIG_PATH, read_config  # noqa: E402
+from r_peak_detector import RPeakDetector, load_ecg_recording, synthetic_ecg  # noqa: E402
+
+
+FRAME = 73  # samples per PMD ECG frame
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--file', help="ECG recording to analyse instead of synthetic ECG")
+    parser.add_argument('--duration', type=float, default=600, help="synthetic ECG length (s)")
+    parser.add_argument('--heart-rate', type=float, default=70, help="synthetic mean heart rate")
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help="config file (relative to the project root)")
+    args = parser.parse_args()
+
+    config = read_config(args.config)
+    if config is None:
+        sys.exit(1)
+    ecg_config = config['polar'].get('ecg', {})
+    fs = ecg_config.get('sample_rate', 130)
+
+    beats = None
+    if args.file:
+        ecg = load_ecg_recording(args.file)
+    else:
+        rng = np.random.default_rng(0)
+        beats = [1.0]
+        while beats[-1] < args.duration - 1:
+            t = beats[-1]
+            beats.append(t + 60 / args.heart_rate + 0.08 * np.sin(2 * np.pi * 0.1 * t)
+                         + rng.normal(0, 0.01))
+        beats = np.array(beats[:-1])
+        ecg = synthetic_ecg(beats, args.duration, fs)
+
+    detector = RPeakDetector(ecg_config)
+    peaks = []
+    start = time.perf_counter()
+    for i in range(0, len(ecg), FRAME):
+        peaks.append(detector.process_peaks(ecg[i:i + FRAME]))
+    elapsed = time.perf_counter() - start
+    peaks = np.concatenate(peaks) / fs
+
+    frames = -(-len(ecg) // FRAME)
+    duration = len(ecg) / fs
+    print("=" * 64)
+    print(f"{'recording' if args.file else 'synthetic'} ECG: {duration:.0f}s at {fs} Hz, "
+          f"{frames} frames of {FRAME} samples")
+    print("=" * 64)
+    print(f"Cost per frame:        {elapsed / frames * 1e6:8.1f} us")
+    print(f"Real-time factor:      {duration / elapsed:8.0f}x  (= straps per core)")
+
+    rr = np.diff(peaks) * 1000
+    stats = detector.get_stats()
+    print(f"Beats detected:        {stats['beats_detected']:8d}  "
+          f"({stats['searchback_beats']} by searchback)")
+    if len(rr):
+        print(f"Mean heart rate:       {60000 / rr.mean():8.1f} bpm")
+
+    if beats is not None and len(peaks) > 1:
+        # Remove the constant filter delay, then pair peaks with beats
+        delay = np.median([peaks[np.argmin(np.abs(peaks - b))] - b for b in beats[3:]])
+        nearest = np.array([np.argmin(np.abs(peaks - delay - b)) for b in beats])
+        hit = np.abs(peaks[nearest] - delay - beats) < 0.05
+        errors = np.abs(np.diff(peaks[nearest[hit]]) - np.diff(beats[hit])) * 1000
+        print(f"Beats found:           {hit.mean() * 100:8.1f} %  (first 2 s are learning)")
+        print(f"RR error median / max: {np.median(errors):8.2f} / {errors.max():.2f} ms")
+        print(f"Heart rate service quantization: 1/1024 s = {1000 / 1024:.2f} ms steps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Subject Memory Benchmark
+
+Measures bytes per subject for N subjects, each holding a full coherence
+window of beats: one CoherenceCalculator per subject versus one shared
+SubjectStore, plus the time per added beat and to calculate coherence
+for every subject.
+
+Usage:
+    python tests/benchmark_subject_memory.py [--subjects 1000 5000]
+
+Requirements:
+    - numpy and scipy installed
+"""
+
+import argparse
+import copy
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+from main import DEFAULT_CONFIG_PATH, read_config  # noqa: E402
+from subject_store import SubjectStore  # noqa: E402
+
+
+def synthetic_beats(window_duration: float, seed: int):
+    """One window of (rr_ms, timestamp) beats with 0.1 Hz modulation."""
+    rng = np.random.default_rng(seed)
+    beats = []
+    t = 0.0
+    while t < window_duration:
+        rr = float(850 + 90 * np.sin(2 * np.pi * 0.1 * t) + rng.normal(0, 30))
+        t += rr / 1000
+        beats.append((rr, t))
+    return beats
+
+
+def measure(build) -> tuple:
+    """
+    Run build() twice: once under tracemalloc, once timed.
+
+    Returns:
+        Tuple of (result, bytes allocated, seconds)
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del result
+    gc.collect()
+    start = time.perf_counter()
+    result = build()
+    return result, allocated, time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--subjects', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help="config file (relative to the project root)")
+    args = parser.parse_args()
+
+    config = read_config(args.config)
+    if config is None:
+        sys.exit(1)
+    # Per-subject calculators with the NumPy path (no per-subject kernel buffers)
+    config = copy.deepcopy(config)
+    config['coherence']['backend'] = 'numpy'
+
+    beats = synthetic_beats(config['coherence']['window_duration'], seed=0)
+
+    print("=" * 76)
+    print(f"Bytes per subject ({len(beats)} beats each, "
+          f"{config['coherence']['window_duration']}s window)")
+    print("=" * 76)
+    print(f"{'subjects':>9}{'layout':>22}{'bytes/subject':>15}{'us/beat':>10}{'all coherence s':>17}")
+    print("-" * 76)
+
+    for n_subjects in args.subjects:
+        def build_calculators():
+            calculators = [CoherenceCalculator(config) for _ in range(n_subjects)]
+            for rr, t in beats:
+                for i, calculator in enumerate(calculators):
+                    # Distinct float objects per subject, as live beats would be
+                    calculator.add_rr_interval(rr + i % 7, timestamp=t + 0.0)
+            return calculators
+
+        def build_store():
+            store = SubjectStore(config, initial_subjects=n_subjects)
+            states = [store.add_subject(f"subject-{i}") for i in range(n_subjects)]
+            for rr, t in beats:
+                for i, state in enumerate(states):
+                    state.add_rr_interval(rr + i % 7, timestamp=t + 0.0)
+            return store
+
+        calculators, calc_bytes, calc_fill = measure(build_calculators)
+        start = time.perf_counter()
+        for calculator in calculators:
+            calculator.calculate_coherence()
+        calc_all = time.perf_counter() - start
+        del calculators
+
+        store, store_bytes, store_fill = measure(build_store)
+        start = time.perf_counter()
+        store.calculate_all()
+        store_all = time.perf_counter() - start
+
+        total_beats = n_subjects * len(beats)
+        print(f"{n_subjects:>9}{'CoherenceCalculator':>22}{calc_bytes / n_subjects:>15,.0f}"
+              f"{calc_fill / total_beats * 1e6:>10.2f}{calc_all:>17.2f}")
+        print(f"{n_subjects:>9}{'SubjectStore':>22}{store_bytes / n_subjects:>15,.0f}"
+              f"{store_fill / total_beats * 1e6:>10.2f}{store_all:>17.2f}")
+        print(f"{'':>9}{'(ring arrays only)':>22}{store.nbytes() / n_subjects:>15,.0f}")
+        del store
+
+
+if __name__ == "__main__":
+    main()
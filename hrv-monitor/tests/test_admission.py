@@ -0,0 +1,166 @@
+"""
+Tests: WebSocket admission control (token buckets, per-IP limits, HTTP rejection)
+
+Run with: python -m pytest tests/test_admission.py
+"""
+
+import asyncio
+import os
+import socket
+import sys
+
+import pytest
+import websockets
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from admission import AdmissionController, TokenBucket  # noqa: E402
+from websocket_server import CoherenceWebSocketServer  # noqa: E402
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_controller(**admission) -> tuple:
+    clock = FakeClock()
+    config = {'max_clients': 100, 'max_message_size': 64, 'max_messages_per_second': 2,
+              'admission': {'connections_per_second': 1000, 'connection_burst': 1000, **admission}}
+    return AdmissionController(config, clock=clock), clock
+
+
+def test_token_bucket_allows_a_burst_then_refills_at_the_rate():
+    bucket = TokenBucket(rate=2, capacity=3, now=0.0)
+    assert [bucket.consume(0.0) for _ in range(4)] == [True, True, True, False]
+
+    assert bucket.consume(0.5)  # one token back after 1 / rate
+    assert not bucket.consume(0.5)
+    assert not bucket.is_full(1.9) and bucket.is_full(2.0)
+
+    # Refill is capped at the burst size
+    assert [bucket.consume(60.0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_global_connection_rate_limits_new_ips():
+    controller, clock = make_controller(connections_per_second=1, connection_burst=3)
+    assert all(controller.admit_connection(f"10.0.0.{i}", 0)[0] for i in range(3))
+    assert controller.admit_connection('10.0.0.9', 0) == (None, 'connection_rate')
+    assert '10.0.0.9' not in controller.ip_states  # rejected before any allocation
+
+    clock.now += 1
+    assert controller.admit_connection('10.0.0.9', 0)[0] is not None
+    assert controller.admit_connection('10.0.0.10', 0) == (None, 'connection_rate')
+
+
+def test_per_ip_connection_rate():
+    controller, clock = make_controller(ip_connections_per_second=0.5, ip_connection_burst=2)
+    assert controller.admit_connection('10.0.0.1', 0)[0] is not None
+    assert controller.admit_connection('10.0.0.1', 0)[0] is not None
+    assert controller.admit_connection('10.0.0.1', 0) == (None, 'ip_connection_rate')
+    assert controller.admit_connection('10.0.0.2', 0)[0] is not None
+
+    clock.now += 2
+    assert controller.admit_connection('10.0.0.1', 0)[0] is not None
+    assert controller.get_stats()['rejections']['ip_connection_rate'] == 1
+
+
+def test_per_ip_cap_capacity_and_release():
+    controller, clock = make_controller(max_connections_per_ip=2, ip_connection_burst=10)
+    first, _ = controller.admit_connection('10.0.0.1', 0)
+    second, _ = controller.admit_connection('10.0.0.1', 1)
+    assert controller.admit_connection('10.0.0.1', 2) == (None, 'ip_connection_limit')
+    assert controller.admit_connection('10.0.0.2', 2)[0] is not None  # other IPs unaffected
+    assert controller.admit_connection('10.0.0.3', 100) == (None, 'server_full')
+
+    controller.release(first)
+    assert controller.admit_connection('10.0.0.1', 2)[0] is not None
+    assert controller.get_stats()['total_rejections'] == 2
+
+
+def test_message_limits_per_client_and_per_ip():
+    controller, clock = make_controller(message_burst=2, ip_messages_per_second=3)
+    first, _ = controller.admit_connection('10.0.0.1', 0)
+    second, _ = controller.admit_connection('10.0.0.1', 1)
+
+    assert controller.admit_message(first, 65) == 'message_size'
+    assert [controller.admit_message(first, 10) for _ in range(3)] == [None, None, 'message_rate']
+    # The IP's shared bucket had 3 tokens; `first` used 2
+    assert [controller.admit_message(second, 10) for _ in range(2)] == [None, 'ip_message_rate']
+
+    clock.now += 1
+    assert controller.admit_message(second, 10) is None
+
+
+def test_idle_ips_are_evicted_past_the_tracking_limit():
+    controller, clock = make_controller(ip_connections_per_second=1, ip_connection_burst=5)
+    controller.MAX_TRACKED_IPS = 4
+    tickets = [controller.admit_connection(f"10.0.0.{i}", 0)[0] for i in range(4)]
+    for ticket in tickets[1:]:
+        controller.release(ticket)
+
+    # Under a second since the last sweep: nothing is evicted yet
+    controller.admit_connection('10.0.1.1', 0)
+    assert controller.get_stats()['tracked_ips'] == 5
+
+    # Buckets refilled: released IPs are forgotten, the connected one is kept
+    clock.now += 2
+    controller.admit_connection('10.0.1.2', 0)
+    assert set(controller.ip_states) == {'10.0.0.0', '10.0.1.1', '10.0.1.2'}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize('limits, status', [
+    ({'max_clients': 1}, 503),
+    ({'admission': {'max_connections_per_ip': 1}}, 429),
+])
+def test_rejected_connections_get_an_http_error_before_the_upgrade(limits, status):
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+    config['websocket'].update(host='127.0.0.1', port=free_port(), **limits)
+    url = f"ws://127.0.0.1:{config['websocket']['port']}"
+
+    async def scenario():
+        server = CoherenceWebSocketServer(config)
+        server_task = asyncio.create_task(server.start())
+        try:
+            for _ in range(100):
+                try:
+                    first = await websockets.connect(url)
+                    break
+                except OSError:
+                    await asyncio.sleep(0.02)
+            await first.recv()  # initial_state
+
+            with pytest.raises(websockets.exceptions.InvalidStatus) as rejected:
+                await websockets.connect(url)
+
+            # The slot is released when the admitted client leaves
+            await first.close()
+            for _ in range(100):
+                if not server._tickets:
+                    break
+                await asyncio.sleep(0.01)
+            async with websockets.connect(url) as again:
+                await again.recv()
+            return rejected.value.response, server.admission.get_stats()
+        finally:
+            await server.stop()
+            await server_task
+
+    response, stats = asyncio.run(scenario())
+    assert response.status_code == status
+    assert ('Retry-After' in response.headers) == (status == 429)
+    assert stats['total_rejections'] == 1
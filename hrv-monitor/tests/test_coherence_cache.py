@@ -0,0 +1,110 @@
+"""
+Tests: CoherenceCalculator result memoization per buffer version
+
+Run with: python -m pytest tests/test_coherence_cache.py
+"""
+
+import copy
+import os
+import sys
+
+import numpy as np
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+
+
+def load_config() -> dict:
+    with open(CONFIG_PATH) as f:
+        return yaml.safe_load(f)
+
+
+def make_calculator(config: dict = None):
+    """Calculator filled with 60 s of paced breathing, counting real computations."""
+    calculator = CoherenceCalculator(config or load_config())
+    calls = []
+    compute = calculator._compute_coherence
+
+    def counting_compute():
+        calls.append(calculator.version)
+        return compute()
+
+    calculator._compute_coherence = counting_compute
+
+    t = 0.0
+    while t < 60:
+        rr = 900 + 100 * np.sin(2 * np.pi * 0.1 * t)
+        calculator.add_rr_interval(rr, timestamp=1000 + t)
+        t += rr / 1000
+    return calculator, calls, 1000 + t
+
+
+def test_repeat_calls_without_new_data_reuse_the_cached_result():
+    calculator, calls, _ = make_calculator()
+    first = calculator.calculate_coherence()
+    status = calculator.get_buffer_status()
+    assert first['status'] == 'valid'
+
+    cached, cached_status = calculator._coherence_cache[1], calculator._status_cache[1]
+    for _ in range(3):
+        assert calculator.calculate_coherence() == first
+        assert calculator.get_buffer_status() == status
+    assert len(calls) == 1
+    assert calculator._coherence_cache[1] is cached
+    assert calculator._status_cache[1] is cached_status
+
+    # Callers get copies, so mutating a result cannot corrupt the cache
+    first['coherence'] = -1
+    assert calculator.calculate_coherence()['coherence'] != -1
+
+    # A rejected beat changes nothing
+    calculator.add_rr_interval(5000.0)
+    calculator.calculate_coherence()
+    assert len(calls) == 1
+
+
+def test_new_beats_reconfigure_and_reset_invalidate_the_cache():
+    config = load_config()
+    calculator, calls, now = make_calculator(copy.deepcopy(config))
+    calculator.calculate_coherence()
+    beats = calculator.get_buffer_status()['beats_in_buffer']
+
+    calculator.add_rr_interval(950.0, timestamp=now)
+    calculator.calculate_coherence()
+    assert len(calls) == 2
+    assert calculator.get_buffer_status()['beats_in_buffer'] in (beats, beats + 1)
+
+    # A reload that changes nothing keeps the cache; a real change drops it
+    assert calculator.reconfigure(copy.deepcopy(config)) == []
+    calculator.calculate_coherence()
+    assert len(calls) == 2
+
+    config['coherence']['min_beats_required'] += 1
+    assert calculator.reconfigure(copy.deepcopy(config)) == ['min_beats_required']
+    calculator.calculate_coherence()
+    assert len(calls) == 3
+    assert calculator.get_buffer_status()['min_beats_required'] == config['coherence']['min_beats_required']
+
+    calculator.reset()
+    result = calculator.calculate_coherence()
+    assert len(calls) == 4
+    assert result['status'] == 'insufficient_data' and result['beats_used'] == 0
+    assert calculator.get_buffer_status()['beats_in_buffer'] == 0
+
+
+def test_time_based_eviction_invalidates_the_cache():
+    calculator, calls, now = make_calculator()
+    calculator.calculate_coherence()
+    version = calculator.version
+
+    # One beat after a long gap evicts the whole old window
+    calculator.add_rr_interval(900.0, timestamp=now + 120)
+    assert calculator.version > version + 1
+    result = calculator.calculate_coherence()
+    assert len(calls) == 2
+    assert result['beats_used'] == 1
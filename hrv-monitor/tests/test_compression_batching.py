@@ -0,0 +1,117 @@
+"""
+Tests: permessage-deflate negotiation and micro-batching
+
+Run with: python -m pytest tests/test_compression_batching.py
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+import websockets
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from main import validate_config  # noqa: E402
+from websocket_server import (  # noqa: E402
+    BATCHING_DEFAULTS, COMPRESSION_DEFAULTS, CoherenceWebSocketServer, deflate_extensions
+)
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+
+
+def load_config() -> dict:
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    config['websocket'].update(host='127.0.0.1', port=port)
+    return config
+
+
+async def run_with_server(config: dict, scenario):
+    """Run `scenario(server, url)` against a live server."""
+    server = CoherenceWebSocketServer(config)
+    server_task = asyncio.create_task(server.start())
+    url = f"ws://127.0.0.1:{config['websocket']['port']}"
+    try:
+        for _ in range(100):
+            try:
+                async with websockets.connect(url) as probe:
+                    await probe.recv()
+                break
+            except OSError:
+                await asyncio.sleep(0.02)
+        return await scenario(server, url)
+    finally:
+        await server.stop()
+        await server_task
+
+
+def test_code_defaults_match_the_default_config():
+    config = load_config()
+    assert config['websocket']['compression'] == COMPRESSION_DEFAULTS
+    assert config['websocket']['batching'] == BATCHING_DEFAULTS
+
+    # A config without the optional sections gets the same settings
+    del config['websocket']['compression'], config['websocket']['batching']
+    assert validate_config(config)
+    server = CoherenceWebSocketServer(config)
+    assert server.batch_window == BATCHING_DEFAULTS['window'] and not server.batch_by_default
+
+
+def test_deflate_negotiation_uses_the_configured_parameters():
+    config = load_config()
+    config['websocket']['compression'].update(server_max_window_bits=10, client_max_window_bits=11, mem_level=2)
+    factory, = deflate_extensions(config['websocket']['compression'])
+    assert factory.compress_settings == {'memLevel': 2}
+
+    async def scenario(server, url):
+        async with websockets.connect(url) as client:
+            await client.recv()
+            await server.broadcast_heartbeat(812.0)
+            message = json.loads(await client.recv())
+            return client.protocol.extensions, message
+
+    extensions, message = asyncio.run(run_with_server(config, scenario))
+
+    deflate, = extensions
+    assert deflate.name == 'permessage-deflate'
+    assert deflate.remote_max_window_bits == 10  # server -> client
+    assert deflate.local_max_window_bits == 11   # client -> server
+    assert message['data']['rr_interval'] == 812.0
+
+    config['websocket']['compression']['enabled'] = False
+    assert deflate_extensions(config['websocket']['compression']) is None
+
+
+def test_batch_is_flushed_once_after_the_window():
+    config = load_config()
+    config['websocket']['batching'] = {'enabled': True, 'window': 0.2}
+
+    async def scenario(server, url):
+        async with websockets.connect(url) as client:
+            await client.recv()  # initial_state
+            start = time.monotonic()
+            for rr in (800.0, 810.0, 820.0):
+                await server.broadcast_heartbeat(rr)
+            batch = json.loads(await client.recv())
+            batch_delay = time.monotonic() - start
+
+            # A lone message in the next window is sent unwrapped
+            await server.broadcast_heartbeat(830.0)
+            single = json.loads(await client.recv())
+            return batch, batch_delay, single
+
+    batch, batch_delay, single = asyncio.run(run_with_server(config, scenario))
+
+    assert batch['type'] == 'batch'
+    assert [message['data']['rr_interval'] for message in batch['messages']] == [800.0, 810.0, 820.0]
+    assert 0.2 <= batch_delay < 1.0
+    assert single['type'] == 'heartbeat' and single['data']['rr_interval'] == 830.0
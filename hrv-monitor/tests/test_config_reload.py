@@ -0,0 +1,103 @@
+"""
+Tests: in-place configuration reload (SIGHUP / admin message)
+
+Run with: python -m pytest tests/test_config_reload.py
+"""
+
+import asyncio
+import copy
+import os
+import sys
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from main import HRVMonitorService  # noqa: E402
+from websocket_server import is_loopback  # noqa: E402
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+
+
+def load_config() -> dict:
+    with open(CONFIG_PATH) as f:
+        return yaml.safe_load(f)
+
+
+def make_service(tmp_path):
+    """Service reading its config from a temporary file, with the BLE connect stubbed."""
+    path = tmp_path / 'config.yaml'
+    config = load_config()
+    path.write_text(yaml.safe_dump(config))
+    service = HRVMonitorService(copy.deepcopy(config), config_path=str(path))
+
+    connects = []
+
+    async def connect():
+        connects.append(service.polar_h10.device_name)
+        service.polar_h10.is_connected = True
+        return True
+
+    service.polar_h10.connect = connect
+    return service, path, config, connects
+
+
+def test_reload_applies_only_changed_settings(tmp_path):
+    service, path, config, connects = make_service(tmp_path)
+    config['coherence']['update_interval'] = 5
+    config['websocket']['batching']['window'] = 0.5
+    path.write_text(yaml.safe_dump(config))
+
+    result = asyncio.run(service.reload_config())
+
+    assert result['success']
+    assert 'coherence.update_interval' in result['changed'] and 'websocket' in result['changed']
+    assert service.update_interval == 5
+    assert service.websocket_server.batch_window == 0.5
+    assert not service.websocket_server.rebind_event.is_set()  # same host/port: clients kept
+    assert connects == []
+
+
+def test_invalid_config_is_rejected_and_the_old_one_kept(tmp_path):
+    service, path, config, _ = make_service(tmp_path)
+    before = copy.deepcopy(service.config)
+    config['coherence']['window_duration'] = 10  # below the 30 s minimum
+    config['coherence']['update_interval'] = 5
+    path.write_text(yaml.safe_dump(config))
+
+    result = asyncio.run(service.reload_config())
+
+    assert not result['success'] and result['changed'] == []
+    assert service.config == before
+    assert service.update_interval == before['coherence']['update_interval']
+
+
+def test_device_change_reconnects_even_after_the_reconnect_loop_ended(tmp_path):
+    service, path, config, connects = make_service(tmp_path)
+    config['polar']['device_name'] = 'Polar H10 ABCD1234'
+    path.write_text(yaml.safe_dump(config))
+
+    async def scenario():
+        finished = asyncio.get_running_loop().create_future()
+        finished.set_result(None)
+        service.connection_task = finished  # maintain_connection gave up earlier
+
+        result = await service.reload_config()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        service.connection_task.cancel()
+        return result
+
+    result = asyncio.run(scenario())
+
+    assert 'polar' in result['changed']
+    assert connects == ['Polar H10 ABCD1234']
+    assert service.polar_h10.device_name == 'Polar H10 ABCD1234'
+
+
+def test_admin_peers_include_mapped_loopback():
+    for host in ('127.0.0.1', '127.0.0.2', '::1', '::ffff:127.0.0.1', 'localhost'):
+        assert is_loopback(host)
+    for host in ('192.168.1.20', '::ffff:192.168.1.20', 'example.com'):
+        assert not is_loopback(host)
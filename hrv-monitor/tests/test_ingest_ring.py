@@ -0,0 +1,99 @@
+"""
+Tests: IngestRing (BLE thread -> event loop handoff)
+
+Run with: python -m pytest tests/test_ingest_ring.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ingest_ring import IngestRing  # noqa: E402
+
+
+def test_items_cross_threads_in_order():
+    async def scenario():
+        ring = IngestRing(capacity=64)
+        ring.bind(asyncio.get_running_loop())
+        total = 20000
+
+        def produce():
+            sent = 0
+            while sent < total:
+                if ring.put(sent):
+                    sent += 1
+                else:
+                    threading.Event().wait(0.0001)  # back off while full
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+
+        received = []
+        while len(received) < total:
+            received += await ring.get_batch()
+        producer.join()
+        return ring, received
+
+    ring, received = asyncio.run(scenario())
+    assert received == list(range(20000))
+    assert ring.get_stats()['consumed'] == 20000
+    assert ring.get_stats()['queued'] == 0
+
+
+def test_full_ring_drops_and_counts():
+    ring = IngestRing(capacity=16)
+    accepted = [ring.put(i) for i in range(20)]
+
+    assert accepted == [True] * 16 + [False] * 4
+    assert ring.dropped == 4
+    assert ring.overflows == 1
+    assert ring.get_nowait() == list(range(16))
+
+    # Room again: a second overflow episode is counted separately
+    for i in range(17):
+        ring.put(i)
+    stats = ring.get_stats()
+    assert stats['overflows'] == 2
+    assert stats['dropped'] == 5
+    assert stats['received'] == 37
+    assert stats['high_watermark'] == 16
+
+
+def test_wakeup_only_when_consumer_parked():
+    async def scenario():
+        ring = IngestRing(capacity=64)
+        ring.bind(asyncio.get_running_loop())
+
+        # Consumer not waiting: no wakeups, however many items arrive
+        for i in range(10):
+            ring.put(i)
+        assert ring.wakeups == 0
+        assert await ring.get_batch() == list(range(10))
+
+        # Parked consumer: the first put wakes it, later ones don't
+        consumer = asyncio.create_task(ring.get_batch())
+        await asyncio.sleep(0)
+        ring.put('a')
+        ring.put('b')
+        batch = await consumer
+        return ring, batch
+
+    ring, batch = asyncio.run(scenario())
+    assert batch == ['a', 'b']
+    assert ring.wakeups == 1
+
+
+def test_get_batch_respects_max_items():
+    async def scenario():
+        ring = IngestRing(capacity=32)
+        ring.bind(asyncio.get_running_loop())
+        for i in range(10):
+            ring.put(i)
+        return await ring.get_batch(max_items=4), ring.get_nowait()
+
+    first, rest = asyncio.run(scenario())
+    assert first == [0, 1, 2, 3]
+    assert rest == list(range(4, 10))
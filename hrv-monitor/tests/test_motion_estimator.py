@@ -0,0 +1,144 @@
+"""
+Tests: accelerometer motion estimation, PMD ACC frame parsing and motion
+gating in the coherence calculator
+
+Run with: python -m pytest tests/test_motion_estimator.py
+"""
+
+import copy
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+from main import read_config  # noqa: E402
+from motion_estimator import MotionEstimator  # noqa: E402
+from polar_h10 import PolarH10  # noqa: E402
+
+
+FS = 200
+MOTION_CONFIG = {'sample_rate': FS, 'threshold': 100}
+
+
+def accelerometer(duration: float, walking: bool = False, seed: int = 0) -> np.ndarray:
+    """Chest accelerometer (mG): gravity, breathing and optional walking."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * FS)) / FS
+    # Wearer slowly leans back: gravity moves from z towards y
+    tilt = 0.3 * t / duration
+    xyz = np.stack((np.zeros_like(t), 1000 * np.sin(tilt), 1000 * np.cos(tilt)), axis=1)
+    xyz[:, 2] += 15 * np.sin(2 * np.pi * 0.1 * t)  # breathing
+    if walking:
+        xyz[:, 2] += 300 * np.sin(2 * np.pi * 1.8 * t)
+        xyz[:, 0] += 150 * np.sin(2 * np.pi * 0.9 * t)
+    return xyz + rng.normal(0, 5, xyz.shape)
+
+
+def feed(estimator: MotionEstimator, xyz: np.ndarray, chunk: int = 36, start: float = 0.0) -> None:
+    """Feed samples in PMD-sized chunks, timestamped at each chunk's end."""
+    for i in range(0, len(xyz), chunk):
+        estimator.process(xyz[i:i + chunk], now=start + (i + chunk) / FS)
+
+
+def test_still_wearer_is_not_moving():
+    estimator = MotionEstimator(MOTION_CONFIG)
+    feed(estimator, accelerometer(30))
+    assert estimator.peak_since(5.0) < 30
+    assert not estimator.is_moving(1.0, now=30.0)
+
+
+def test_walking_is_flagged_only_while_it_lasts():
+    estimator = MotionEstimator(MOTION_CONFIG)
+    feed(estimator, accelerometer(10))
+    feed(estimator, accelerometer(5, walking=True), start=10.0)
+    feed(estimator, accelerometer(5), start=15.0)
+
+    assert estimator.is_moving(1.0, now=13.0)
+    assert not estimator.is_moving(1.0, now=20.0)
+    assert estimator.get_stats()['beats_flagged'] == 1
+
+
+def test_chunking_does_not_change_intensity():
+    xyz = accelerometer(8, walking=True)
+    peaks = []
+    for chunk in (1, 36, 500):
+        estimator = MotionEstimator(MOTION_CONFIG)
+        feed(estimator, xyz, chunk=chunk)
+        peaks.append(estimator.intensity)
+    assert peaks[0] == pytest.approx(peaks[1]) == pytest.approx(peaks[2])
+
+
+@pytest.mark.parametrize("frame_type, width", [(0x00, 1), (0x01, 2), (0x02, 3)])
+def test_parse_pmd_acc_frame(frame_type, width):
+    samples = [[0, -1, 127], [-128, 64, -3]]
+    frame = bytearray([0x02]) + (987654321).to_bytes(8, 'little') + bytearray([frame_type])
+    for value in np.ravel(samples):
+        frame += int(value).to_bytes(width, 'little', signed=True)
+
+    timestamp, parsed = PolarH10.parse_acc_frame(frame)
+    assert timestamp == 987654321
+    np.testing.assert_array_equal(parsed, samples)
+
+    frame[0] = 0x00  # ECG frame
+    assert PolarH10.parse_acc_frame(frame) is None
+
+
+def make_calculator(**coherence_overrides) -> CoherenceCalculator:
+    config = copy.deepcopy(read_config())
+    config['coherence'].update(backend='numpy', **coherence_overrides)
+    return CoherenceCalculator(config)
+
+
+def rr_series(beats: int) -> np.ndarray:
+    t = np.cumsum(np.full(beats, 0.85))
+    return 850 + 90 * np.sin(2 * np.pi * 0.1 * t)
+
+
+def test_flagged_beats_are_interpolated_over():
+    clean = rr_series(70)
+    corrupted = clean.copy()
+    flagged = np.zeros(len(clean), dtype=bool)
+    flagged[[20, 21, 45]] = True
+    corrupted[flagged] = [1400, 420, 1700]
+
+    calculator = make_calculator()
+    t = 0.0
+    for rr, motion in zip(corrupted, flagged):
+        t += rr / 1000
+        calculator.add_rr_interval(float(rr), timestamp=t, motion=bool(motion))
+
+    result = calculator.calculate_coherence()
+    expected = make_calculator().analyse_intervals(clean)
+    assert result['status'] == 'valid'
+    assert result['motion_beats'] == 3
+    assert result['peak_frequency'] == pytest.approx(expected['peak_frequency'], abs=0.005)
+    assert result['coherence'] == pytest.approx(expected['coherence'], abs=3)
+
+
+def test_heavy_motion_skips_the_calculation():
+    calculator = make_calculator(max_motion_fraction=0.2)
+    rr = rr_series(60)
+    for i, value in enumerate(rr):
+        calculator.add_rr_interval(float(value), timestamp=i * 0.85, motion=i >= 45)
+
+    result = calculator.calculate_coherence()
+    assert result['status'] == 'motion_artifact'
+    assert result['motion_beats'] == 15
+    assert result['beats_used'] == 60
+
+    # Once the flagged beats leave the window, scores resume
+    for i, value in enumerate(np.tile(rr, 2), start=60):
+        calculator.add_rr_interval(float(value), timestamp=i * 0.85)
+    assert calculator.calculate_coherence()['status'] == 'valid'
+    assert calculator.calculate_coherence()['motion_beats'] == 0
+
+
+def test_fully_flagged_window_is_a_motion_artifact_even_without_a_limit():
+    calculator = make_calculator(max_motion_fraction=1.0)
+    result = calculator.analyse_intervals(np.full(80, 850.0), np.ones(80, bool))
+    assert result['status'] == 'motion_artifact'
+    assert result['motion_beats'] == result['beats_used'] == 80
@@ -0,0 +1,167 @@
+"""
+Tests: streaming R-peak detection and PMD ECG frame parsing
+
+Run with: python -m pytest tests/test_r_peak_detector.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from polar_h10 import PolarH10  # noqa: E402
+from r_peak_detector import (  # noqa: E402
+    RPeakDetector, detect_r_peaks, load_ecg_recording, synthetic_ecg
+)
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+ECG_CONFIG = {'sample_rate': 130}
+FS = 130
+
+
+def beat_times(duration: float, heart_rate: float, seed: int) -> np.ndarray:
+    """Beat times with 0.1 Hz (resonant breathing) RR modulation."""
+    rng = np.random.default_rng(seed)
+    times = [1.0]
+    while times[-1] < duration - 1:
+        t = times[-1]
+        times.append(t + 60 / heart_rate + 0.08 * np.sin(2 * np.pi * 0.1 * t) + rng.normal(0, 0.01))
+    return np.array(times[:-1])
+
+
+def match(peaks: np.ndarray, beats: np.ndarray):
+    """Pair detected peaks with true beats, removing the constant filter delay."""
+    times = peaks / FS
+    delay = np.median([times[np.argmin(np.abs(times - b))] - b for b in beats[3:]])
+    nearest = np.array([np.argmin(np.abs(times - delay - b)) for b in beats])
+    hit = np.abs(times[nearest] - delay - beats) < 0.05
+    return times, nearest, hit
+
+
+@pytest.mark.parametrize('heart_rate', [45, 70, 110, 160, 190])
+def test_rr_intervals_within_a_millisecond(heart_rate):
+    beats = beat_times(120, heart_rate, seed=heart_rate)
+    ecg = synthetic_ecg(beats, 120, seed=heart_rate)
+    peaks = detect_r_peaks(ecg, ECG_CONFIG)
+
+    times, nearest, hit = match(peaks, beats)
+    # Beats inside the 2 s learning period are not reported
+    assert hit[beats > RPeakDetector.LEARNING_DURATION + 0.5].all()
+    assert len(peaks) == hit.sum()  # no false detections
+
+    detected = beats[hit]
+    errors = np.abs(np.diff(times[nearest[hit]]) - np.diff(detected)) * 1000
+    assert np.median(errors) < 0.5
+    assert errors.max() < 2.0
+
+
+def test_chunking_does_not_change_result():
+    beats = beat_times(60, 75, seed=1)
+    ecg = synthetic_ecg(beats, 60, seed=1)
+    reference = detect_r_peaks(ecg, ECG_CONFIG, chunk_size=len(ecg))
+
+    for chunk_size in (1, 7, 73, 500):
+        np.testing.assert_allclose(detect_r_peaks(ecg, ECG_CONFIG, chunk_size=chunk_size), reference)
+
+
+def test_process_returns_rr_intervals_in_ms():
+    beats = beat_times(30, 60, seed=2)
+    ecg = synthetic_ecg(beats, 30, seed=2)
+
+    detector = RPeakDetector(ECG_CONFIG)
+    rr_intervals = []
+    for i in range(0, len(ecg), 73):
+        rr_intervals += detector.process(ecg[i:i + 73])
+
+    assert len(rr_intervals) == detector.beats_detected - 1
+    assert np.mean(rr_intervals) == pytest.approx(np.mean(np.diff(beats)) * 1000, rel=0.02)
+
+
+def test_gap_breaks_rr_chain():
+    beats = beat_times(30, 60, seed=3)
+    ecg = synthetic_ecg(beats, 30, seed=3)
+    detector = RPeakDetector(ECG_CONFIG)
+
+    half = len(ecg) // 2
+    first = detector.process(ecg[:half])
+    detector.mark_gap()
+    second = detector.process(ecg[half + 2 * FS:])  # 2 s of samples lost
+
+    # No interval spans the gap
+    assert max(first + second) < 1500
+    assert detector.beats_detected - 2 == len(first) + len(second)
+
+
+def test_relearns_after_amplitude_drop():
+    beats = beat_times(60, 75, seed=4)
+    ecg = synthetic_ecg(beats, 60, seed=4)
+    ecg[30 * FS:] = (ecg[30 * FS:] - 500) * 0.2  # electrode contact changes
+
+    peaks = detect_r_peaks(ecg, ECG_CONFIG)
+    late = beats[beats > 30 + RPeakDetector.RELEARN_AFTER + RPeakDetector.LEARNING_DURATION + 1]
+    _, _, hit = match(peaks, beats)
+    assert hit[np.isin(beats, late)].all()
+
+
+def test_load_polar_sensor_logger_export(tmp_path):
+    ecg = np.array([-120, 35, 480, -60])
+    path = tmp_path / 'ecg.txt'
+    lines = ["Phone timestamp;sensor timestamp [ns];timestamp [ms];ecg [uV]"]
+    lines += [f"2024-01-01T00:00:00.{i:03d};{i * 7692307};{i * 7.69};{v}" for i, v in enumerate(ecg)]
+    path.write_text("\n".join(lines) + "\n")
+
+    np.testing.assert_array_equal(load_ecg_recording(str(path)), ecg)
+
+    np.save(tmp_path / 'ecg.npy', ecg)
+    np.testing.assert_array_equal(load_ecg_recording(str(tmp_path / 'ecg.npy')), ecg)
+
+
+def test_parse_pmd_ecg_frame():
+    samples = [0, 1, -1, 8388607, -8388608, -1234]
+    frame = bytearray([0x00]) + (123456789).to_bytes(8, 'little') + bytearray([0x00])
+    for value in samples:
+        frame += (value & 0xFFFFFF).to_bytes(3, 'little')
+
+    timestamp, parsed = PolarH10.parse_ecg_frame(frame)
+    assert timestamp == 123456789
+    np.testing.assert_array_equal(parsed, samples)
+
+    frame[0] = 0x02  # accelerometer frame
+    assert PolarH10.parse_ecg_frame(frame) is None
+
+
+def ecg_frames(ecg: np.ndarray, samples_per_frame: int = 73):
+    """Split an ECG into PMD data frames stamped with their last sample's time (ns)."""
+    for start in range(0, len(ecg) - samples_per_frame + 1, samples_per_frame):
+        chunk = np.round(ecg[start:start + samples_per_frame]).astype(int)
+        timestamp = int((start + samples_per_frame - 1) * 1e9 / FS)
+        frame = bytearray([0x00]) + timestamp.to_bytes(8, 'little') + bytearray([0x00])
+        for value in chunk:
+            frame += (int(value) & 0xFFFFFF).to_bytes(3, 'little')
+        yield frame
+
+
+def test_ecg_frames_are_ignored_until_the_stream_is_confirmed():
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+    config['polar']['ecg']['enabled'] = True
+    emitted = []
+    polar = PolarH10(config, on_rr_interval=lambda rr, moving: emitted.append(rr))
+
+    frames = list(ecg_frames(synthetic_ecg(beat_times(60, 70, seed=5), 60, seed=5)))
+    half = len(frames) // 2
+    for frame in frames[:half]:
+        polar._pmd_data_handler(None, frame)
+    assert emitted == [] and polar.ecg_frames == 0
+
+    polar._pmd_control_handler(None, bytearray([0xF0, 0x02, 0x00, 0x00]))  # start confirmed
+    assert polar.ecg_streaming
+    for frame in frames[half:]:
+        polar._pmd_data_handler(None, frame)
+    assert polar.ecg_frames == len(frames) - half
+    assert len(emitted) > 20 and all(700 < rr < 1000 for rr in emitted)
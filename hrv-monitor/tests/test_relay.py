@@ -0,0 +1,188 @@
+"""
+Tests: relay upstream reconnects, source tagging and per-client send queues
+
+Run with: python -m pytest tests/test_relay.py
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+import websockets
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import relay  # noqa: E402
+from relay import RelayService, RelayWebSocketServer, UpstreamConnection  # noqa: E402
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+
+
+def load_config() -> dict:
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+    config['websocket']['host'] = '127.0.0.1'
+    return config
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class FakeClient:
+    """Downstream client stand-in; sends block while `paused` is set."""
+
+    def __init__(self, paused: bool = False):
+        self.sent = []
+        self.resume = asyncio.Event()
+        if not paused:
+            self.resume.set()
+
+    async def send(self, message: str) -> None:
+        await self.resume.wait()
+        self.sent.append(json.loads(message))
+
+
+def test_upstream_backs_off_exponentially_while_unavailable(monkeypatch):
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def recording_sleep(delay):
+        delays.append(delay)
+        if len(delays) == 5:
+            raise asyncio.CancelledError
+        await real_sleep(0)
+
+    monkeypatch.setattr(relay.asyncio, 'sleep', recording_sleep)
+
+    async def ignore(source, message):
+        pass
+
+    upstream = UpstreamConnection('a', f"ws://127.0.0.1:{free_port()}", 1, 4, on_message=ignore)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(upstream.run())
+
+    assert delays == [1, 2, 4, 4, 4]
+    assert upstream.reconnect_count == 5
+    assert not upstream.is_connected
+
+
+def test_relay_reconnects_and_tags_messages_with_their_source():
+    connections = []
+
+    async def upstream_handler(websocket):
+        connections.append(time.monotonic())
+        await websocket.send(json.dumps({'type': 'pong'}))  # reply to the relay itself
+        await websocket.send(json.dumps({
+            'type': 'heartbeat', 'timestamp': time.monotonic(),
+            'data': {'rr_interval': 800 + len(connections)}
+        }))
+        await websocket.close()  # upstream restarts after every message
+
+    async def scenario():
+        upstream_port = free_port()
+        config = load_config()
+        config['relay'].update(
+            port=free_port(), reconnect_delay=0.05, max_reconnect_delay=5,
+            upstreams=[{'name': 'participant-a', 'url': f"ws://127.0.0.1:{upstream_port}"}]
+        )
+        service = RelayService(config)
+
+        async with websockets.serve(upstream_handler, '127.0.0.1', upstream_port):
+            relay_task = asyncio.create_task(service.run())
+            try:
+                for _ in range(100):
+                    try:
+                        client = await websockets.connect(f"ws://127.0.0.1:{config['relay']['port']}")
+                        break
+                    except OSError:
+                        await asyncio.sleep(0.02)
+
+                async with client:
+                    initial = json.loads(await client.recv())
+                    received = []
+                    while len(received) < 6:
+                        received.append(json.loads(await asyncio.wait_for(client.recv(), 5)))
+            finally:
+                relay_task.cancel()
+                await asyncio.gather(relay_task, return_exceptions=True)
+        return service, initial, received
+
+    service, initial, received = asyncio.run(scenario())
+
+    assert initial['type'] == 'initial_state' and list(initial['sources']) == ['participant-a']
+    assert all(message['source'] == 'participant-a' for message in received)
+    assert [message['type'] for message in received] == ['heartbeat'] * 6  # pongs not forwarded
+    rr = [message['data']['rr_interval'] for message in received]
+    assert rr == sorted(rr) and len(set(rr)) == 6  # one per upstream connection
+
+    upstream = service.upstreams['participant-a']
+    assert len(connections) >= 6 and upstream.reconnect_count >= 5
+    # The backoff resets on every successful connection (else the 5th gap would be 0.8 s)
+    gaps = [b - a for a, b in zip(connections, connections[1:])]
+    assert max(gaps) < 0.5
+
+
+def test_slow_client_drops_its_own_oldest_messages_only():
+    async def scenario():
+        server = RelayWebSocketServer(load_config(), {}, client_queue_size=4)
+        fast, slow = FakeClient(), FakeClient(paused=True)
+        for client in (fast, slow):
+            server.clients.add(client)
+        await server._send_initial_state(fast)
+        slow_start = asyncio.create_task(server._send_initial_state(slow))
+        await asyncio.sleep(0)
+
+        for index in range(10):
+            # Never waits on the stalled client
+            await asyncio.wait_for(
+                server.broadcast_encoded(json.dumps({'type': 'heartbeat', 'index': index})), 0.1
+            )
+        await asyncio.sleep(0.01)
+        fast_indexes = [message.get('index') for message in fast.sent[1:]]
+        queued = len(server.send_queues[slow].messages)
+
+        slow.resume.set()
+        await slow_start
+        await asyncio.sleep(0.01)
+        for queue in server.send_queues.values():
+            queue.close()
+        return server, fast_indexes, queued, slow.sent
+
+    server, fast_indexes, queued, slow_sent = asyncio.run(scenario())
+
+    assert fast_indexes == list(range(10))
+    assert queued == 4
+    assert slow_sent[0]['type'] == 'initial_state'
+    assert [message['index'] for message in slow_sent[1:]] == [6, 7, 8, 9]
+    assert server.get_stats()['messages_dropped'] == 6
+
+
+def test_batched_beats_get_strictly_increasing_times(monkeypatch):
+    arrivals = iter([100.0, 101.35, 101.35, 101.35, 115.0, 115.9])
+    # Only the relay's clock: the event loop keeps the real one
+    monkeypatch.setattr(relay, 'time', SimpleNamespace(monotonic=lambda: next(arrivals)))
+
+    config = load_config()
+    config['relay']['upstreams'] = [{'name': 'a', 'url': 'ws://127.0.0.1:1'}]
+    config['synchrony']['enabled'] = True
+    service = RelayService(config)
+
+    async def deliver(rr_intervals):
+        for rr in rr_intervals:
+            await service._on_upstream_message('a', {'type': 'heartbeat', 'data': {'rr_interval': rr}})
+
+    # One beat, three delivered in a single batch, then a 13 s outage
+    asyncio.run(deliver([800.0, 450.0, 450.0, 450.0, 900.0, 900.0]))
+
+    times = [t for t, _ in service.beats['a']]
+    assert times == pytest.approx([100.0, 100.45, 100.9, 101.35, 115.0, 115.9])
@@ -0,0 +1,199 @@
+"""
+Tests: shared-memory rings and the multi-process pipeline stages
+
+Run with: python -m pytest tests/test_shared_ring.py
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pipeline import MultiProcessPipeline, _is_state_message, _ring_names, run_compute_stage  # noqa: E402
+from shared_ring import SharedMessageBus, SharedRingBuffer  # noqa: E402
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+DTYPE = np.dtype([('seq', 'i8'), ('value', 'f8')])
+
+
+def load_config() -> dict:
+    with open(CONFIG_PATH) as f:
+        return yaml.safe_load(f)
+
+
+def unique_name(label: str) -> str:
+    return f"test_{label}_{uuid.uuid4().hex[:8]}"
+
+
+def write_in_child(name: str, capacity: int, count: int) -> None:
+    """Spawned process: attach, append records, detach without unlinking."""
+    ring = SharedRingBuffer.attach(name, DTYPE, capacity)
+    for seq in range(count):
+        ring.write(seq, seq * 0.5)
+    ring.close()
+
+
+def test_reader_wraps_around_the_end_of_the_ring():
+    ring = SharedRingBuffer.create(unique_name('wrap'), DTYPE, 8)
+    try:
+        reader = ring.reader()
+        for seq in range(6):
+            ring.write(seq, 0.0)
+        assert reader.read()['seq'].tolist() == list(range(6))
+
+        # Records 6..11 occupy slots 6, 7, 0, 1, 2, 3
+        for seq in range(6, 12):
+            ring.write(seq, 0.0)
+        assert reader.pending() == 6
+        assert reader.read(max_records=4)['seq'].tolist() == [6, 7, 8, 9]
+        assert reader.read()['seq'].tolist() == [10, 11]
+        assert len(reader.read()) == 0
+        assert reader.dropped == 0
+
+        # A late reader starts from the oldest record that is safe to read
+        # (slot 4 is the next one the producer overwrites)
+        assert ring.reader(from_start=True).read()['seq'].tolist() == list(range(5, 12))
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_lapped_reader_skips_ahead_and_counts_dropped_records():
+    ring = SharedRingBuffer.create(unique_name('lap'), DTYPE, 8)
+    try:
+        slow, fast = ring.reader(), ring.reader()
+        for seq in range(20):
+            ring.write(seq, 0.0)
+            assert fast.read()['seq'].tolist() == [seq]
+
+        assert slow.pending() == 7
+        assert slow.read()['seq'].tolist() == list(range(13, 20))
+        assert slow.dropped == 13
+        assert fast.dropped == 0
+
+        # Lapped again after catching up: only the new overwrites are counted
+        for seq in range(20, 30):
+            ring.write(seq, 0.0)
+        assert slow.read()['seq'].tolist() == list(range(23, 30))
+        assert slow.dropped == 16
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_spawned_process_attaches_and_detaches():
+    name = unique_name('spawn')
+    ring = SharedRingBuffer.create(name, DTYPE, 64)
+    try:
+        reader = ring.reader()
+        process = multiprocessing.get_context('spawn').Process(target=write_in_child, args=(name, 64, 100))
+        process.start()
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+        # The child's detach leaves the block alive for the owner
+        records = reader.read()
+        assert ring.head == 100
+        assert records['seq'].tolist() == list(range(37, 100))
+        assert records['value'].tolist() == [seq * 0.5 for seq in range(37, 100)]
+        assert reader.dropped == 37
+
+        again = SharedRingBuffer.attach(name, DTYPE, 64)
+        assert again.head == 100
+        again.close()
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_compute_stage_publishes_encoded_messages():
+    config = load_config()
+    config['pipeline']['ring_capacity'] = 256
+    config['coherence']['update_interval'] = 0.2
+    pipeline = MultiProcessPipeline(config)
+    pipeline.prefix = unique_name('pipeline')
+    pipeline._create_rings()
+    names = _ring_names(pipeline.prefix)
+    assert set(pipeline.rings) == set(names)
+
+    subscriber = pipeline.rings['messages'].subscribe()
+    now = time.time()
+    for beat in range(40):
+        pipeline.rings['rr'].write(now + beat, 1000.0, False)
+    pipeline.rings['status'].write(now, True, 0, b'Polar H10 TEST', b'')
+
+    process = multiprocessing.get_context('spawn').Process(
+        target=run_compute_stage, args=(config, pipeline.prefix), daemon=True
+    )
+    process.start()
+    try:
+        received = []
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and not any(b'coherence_update' in raw for raw in received):
+            received += subscriber.receive()
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.join(timeout=5)
+        pipeline.stop()
+
+    messages = [json.loads(raw) for raw in received]
+    types = [message['type'] for message in messages]
+    assert types.count('heartbeat') == 40
+    assert 'connection_status' in types and 'coherence_update' in types
+    status = messages[types.index('connection_status')]['data']
+    assert status['polar_h10_connected'] and status['device_name'] == 'Polar H10 TEST'
+
+    # Only state messages are parsed by the fan-out workers
+    assert [_is_state_message(raw) for raw in received] == [
+        msg_type != 'heartbeat' for msg_type in types
+    ]
+
+
+
+def test_bus_subscribers_receive_variable_length_messages():
+    bus = SharedMessageBus.create(unique_name('bus'), 4, max_message_bytes=64)
+    try:
+        first, second = bus.subscribe(), bus.subscribe()
+        messages = [b'', b'x', '{"type": "heartbeat", "data": "\u00e9"}'.encode('utf-8'), b'y' * 64]
+        for message in messages[:3]:
+            assert bus.publish(message)
+
+        assert first.receive(max_messages=2) == messages[:2]
+        assert first.receive() == messages[2:3]
+        assert second.receive() == messages[:3]
+
+        # Lapping works per subscriber, as for record rings
+        for message in messages * 2:
+            bus.publish(message)
+        assert first.receive() == (messages * 2)[-3:]
+        assert first.dropped == 5
+        assert bus.subscribe(from_start=True).receive() == (messages * 2)[-3:]
+    finally:
+        bus.close()
+        bus.unlink()
+
+
+def test_oversized_message_is_dropped_and_counted(caplog):
+    bus = SharedMessageBus.create(unique_name('oversized'), 8, max_message_bytes=32)
+    try:
+        subscriber = bus.subscribe()
+        assert bus.publish(b'before')
+        assert not bus.publish(b'z' * 33)
+        assert bus.publish(b'after')
+
+        assert subscriber.receive() == [b'before', b'after']
+        assert bus.oversized == 1
+        assert bus.head == 2
+        assert 'Dropped 33-byte message' in caplog.text
+    finally:
+        bus.close()
+        bus.unlink()
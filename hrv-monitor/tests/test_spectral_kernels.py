@@ -0,0 +1,91 @@
+"""
+Parity tests: compiled coherence kernels vs the NumPy path
+
+Run with: python -m pytest tests/test_spectral_kernels.py
+"""
+
+import copy
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+from main import read_config  # noqa: E402
+from spectral_kernels import NUMBA_AVAILABLE, resolve_backend  # noqa: E402
+
+
+requires_numba = pytest.mark.skipif(not NUMBA_AVAILABLE, reason="Numba not installed")
+
+
+def make_calculator(backend: str, **coherence_overrides) -> CoherenceCalculator:
+    config = copy.deepcopy(read_config())
+    config['coherence'].update(backend=backend, **coherence_overrides)
+    return CoherenceCalculator(config)
+
+
+def feed(calculators, beats: int, seed: int, breathing_freq: float = 0.1) -> None:
+    """Feed the same synthetic RR series to every calculator."""
+    rng = np.random.default_rng(seed)
+    t = 0.0
+    for _ in range(beats):
+        rr = float(np.clip(850 + 90 * np.sin(2 * np.pi * breathing_freq * t) + rng.normal(0, 30), 300, 2000))
+        t += rr / 1000
+        for calculator in calculators:
+            calculator.add_rr_interval(rr, timestamp=t)
+
+
+def assert_same_result(expected: dict, actual: dict) -> None:
+    assert actual['status'] == expected['status']
+    assert actual['coherence'] == expected['coherence']
+    assert actual['beats_used'] == expected['beats_used']
+    assert actual['peak_frequency'] == expected['peak_frequency']
+    for key in ('ratio', 'peak_power', 'total_power'):
+        assert actual[key] == pytest.approx(expected[key], rel=1e-9, abs=1e-9)
+
+
+@requires_numba
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('breathing_freq', [0.06, 0.1, 0.2])
+def test_compiled_matches_numpy(seed, breathing_freq):
+    numpy_calc = make_calculator('numpy')
+    compiled_calc = make_calculator('numba')
+    assert compiled_calc._kernels is not None
+
+    rng = np.random.default_rng(seed)
+    for _ in range(20):
+        feed([numpy_calc, compiled_calc], int(rng.integers(1, 15)), int(rng.integers(1 << 30)), breathing_freq)
+        assert_same_result(numpy_calc.calculate_coherence(), compiled_calc.calculate_coherence())
+
+
+@requires_numba
+@pytest.mark.parametrize('overrides', [
+    {'resample_rate': 2},
+    {'window_duration': 45},
+    {'coherence_min_freq': 0.02, 'peak_window_width': 0.06},
+])
+def test_compiled_matches_numpy_with_other_settings(overrides):
+    numpy_calc = make_calculator('numpy', **overrides)
+    compiled_calc = make_calculator('numba', **overrides)
+
+    feed([numpy_calc, compiled_calc], 300, seed=7)
+    assert_same_result(numpy_calc.calculate_coherence(), compiled_calc.calculate_coherence())
+
+
+@requires_numba
+def test_compiled_grows_buffers_for_long_windows():
+    numpy_calc = make_calculator('numpy', window_duration=600)
+    compiled_calc = make_calculator('numba', window_duration=600)
+
+    feed([numpy_calc, compiled_calc], 700, seed=11)
+    assert_same_result(numpy_calc.calculate_coherence(), compiled_calc.calculate_coherence())
+
+
+def test_backend_resolution():
+    assert resolve_backend('numpy') == 'numpy'
+    expected = 'numba' if NUMBA_AVAILABLE else 'numpy'
+    assert resolve_backend('auto') == expected
+    assert resolve_backend('numba') == expected
@@ -0,0 +1,157 @@
+"""
+Tests: cross-modal clock offset estimation and window alignment
+
+Run with: python -m pytest tests/test_stream_fusion.py
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+import numpy as np
+import pytest
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from relay import UpstreamConnection  # noqa: E402
+from stream_fusion import ClockOffsetEstimator, StreamFusion  # noqa: E402
+
+
+EEG_OFFSET = -1_700_000_000.0  # relay monotonic = EEG Unix time + offset
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_round_trip_probes_recover_the_offset_within_half_the_round_trip():
+    rng = np.random.default_rng(0)
+    estimator = ClockOffsetEstimator(window=60)
+    true_offset = 12.5  # local = remote + true_offset
+
+    # Every message takes at least 40 ms to arrive: one-way overestimates by that much
+    for t in np.arange(0, 30, 0.25):
+        estimator.update(t - true_offset - 0.04 - rng.exponential(0.02), t)
+    assert estimator.round_trip is None
+    assert estimator.offset == pytest.approx(true_offset + 0.04, abs=0.005)
+
+    # Probes with asymmetric, jittery legs
+    worst_error = 0.0
+    for t in np.arange(30, 60, 5.0):
+        outbound, inbound = 0.01 + rng.exponential(0.03), 0.01 + rng.exponential(0.03)
+        remote = t + outbound - true_offset
+        estimator.update_round_trip(t, remote, t + outbound + inbound)
+        worst_error = abs(estimator.offset - true_offset)
+        assert worst_error <= estimator.round_trip / 2 + 1e-12
+
+    # Once probes exist they win over the biased one-way estimate
+    estimator.update(60 - true_offset - 0.04, 60)
+    assert abs(estimator.offset - true_offset) == worst_error < 0.04
+
+
+def test_old_observations_expire():
+    estimator = ClockOffsetEstimator(window=10)
+    estimator.update_round_trip(0.0, 0.0, 0.002)    # tight probe, offset 0.001
+    estimator.update_round_trip(20.0, 15.0, 20.1)   # after a clock step
+    assert estimator.offset == pytest.approx(5.05)
+    assert estimator.round_trip == pytest.approx(0.1)
+
+
+def test_sample_time_aligns_streams_despite_send_delay():
+    clock = FakeClock()
+    fusion = StreamFusion(['hrv', 'eeg'], window=2.0, hop=2.0, max_latency=1.0, clock=clock)
+    rng = np.random.default_rng(1)
+
+    # Windows start at the first item, so put their edges between events
+    fusion.add('hrv', 999.75, {'event': 999.75}, receive_time=999.76)
+
+    # Both streams see the same events at relay times 1000.0, 1000.5, ...
+    windows = []
+    for event in np.arange(1000.0, 1006.0, 0.5):
+        clock.now = event + 0.01 + rng.exponential(0.01)
+        fusion.add_clock_probe('eeg', clock.now - 0.02, clock.now - 0.01 - EEG_OFFSET, clock.now)
+        fusion.add('hrv', event + 0.005, {'event': event}, receive_time=clock.now)
+
+        # EEG results go out 0.4-0.6 s after their newest sample
+        sent = event + rng.uniform(0.4, 0.6)
+        fusion.add('eeg', sent - EEG_OFFSET, {'event': event},
+                   receive_time=sent + 0.01, sample_time=event - EEG_OFFSET)
+        windows += fusion.poll()
+
+    assert len(windows) == 2 and all(window['complete'] for window in windows)
+    for window in windows:
+        # EEG is probed (error <= 10 ms); HRV relies on its one-way delays
+        for stream, error in (('hrv', 0.05), ('eeg', 0.01)):
+            for item in window['streams'][stream]:
+                assert item['time'] == pytest.approx(item['event'], abs=error)
+        assert [item['event'] for item in window['streams']['hrv'] if item['event'] >= 1000] == \
+            [item['event'] for item in window['streams']['eeg']]
+    assert fusion.get_stats()['clock_offsets']['eeg'] == pytest.approx(EEG_OFFSET, abs=0.01)
+
+
+def test_without_probes_the_one_way_estimate_is_used():
+    fusion = StreamFusion(['eeg'], window=1.0, hop=1.0, max_latency=0.5, clock=FakeClock())
+    aligned = [
+        fusion.add('eeg', t - EEG_OFFSET, {}, receive_time=t + delay)
+        for t, delay in [(10.0, 0.05), (10.5, 0.02), (11.0, 0.3)]
+    ]
+    # The least-delayed message sets the offset for everything after it
+    assert aligned == pytest.approx([10.05, 10.52, 11.02])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_upstream_matches_pongs_to_its_probes():
+    remote_offset = 500.0  # upstream clock runs 500 s ahead of ours
+    probes = []
+
+    async def upstream_handler(websocket):
+        async for raw in websocket:
+            if json.loads(raw).get('type') == 'ping':
+                await asyncio.sleep(0.01)
+                await websocket.send(json.dumps({'type': 'pong', 'timestamp': time.monotonic() + remote_offset}))
+
+    async def ignore(source, message):
+        pass
+
+    async def scenario():
+        port = free_port()
+        upstream = UpstreamConnection(
+            'eeg', f"ws://127.0.0.1:{port}", 1, 1, on_message=ignore,
+            clock_probe_interval=0.05, on_clock_probe=lambda *probe: probes.append(probe)
+        )
+        async with websockets.serve(upstream_handler, '127.0.0.1', port):
+            task = asyncio.create_task(upstream.run())
+            try:
+                for _ in range(200):
+                    if len(probes) >= 4:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        return upstream
+
+    upstream = asyncio.run(scenario())
+
+    assert len(probes) >= 4
+    estimator = ClockOffsetEstimator()
+    for source, local_send, remote_time, local_receive in probes:
+        assert source == 'eeg'
+        assert local_send < remote_time - remote_offset < local_receive
+        estimator.update_round_trip(local_send, remote_time, local_receive)
+    assert estimator.offset == pytest.approx(-remote_offset, abs=estimator.round_trip / 2)
+    # Pongs are not delivery-lag samples
+    assert upstream.lag == 0.0
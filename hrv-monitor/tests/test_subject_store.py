@@ -0,0 +1,152 @@
+"""
+Tests: SubjectStore vs one CoherenceCalculator per subject
+
+Run with: python -m pytest tests/test_subject_store.py
+"""
+
+import copy
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from coherence_calculator import CoherenceCalculator  # noqa: E402
+from main import read_config  # noqa: E402
+from subject_store import SubjectStore  # noqa: E402
+
+
+def make_config(**coherence_overrides) -> dict:
+    config = copy.deepcopy(read_config())
+    config['coherence'].update(backend='numpy', **coherence_overrides)
+    return config
+
+
+def beats(count: int, seed: int, start: float = 0.0):
+    """Synthetic (rr_ms, timestamp) beats; rr values are exact in float32."""
+    rng = np.random.default_rng(seed)
+    t = start
+    for _ in range(count):
+        rr = float(np.float32(np.clip(850 + 90 * np.sin(0.2 * np.pi * t) + rng.normal(0, 30), 300, 2000)))
+        t += rr / 1000
+        yield rr, t
+
+
+def assert_matches(calculator: CoherenceCalculator, state) -> None:
+    np.testing.assert_array_equal(state.rr_intervals(), np.array(calculator.rr_buffer))
+    expected = calculator.calculate_coherence()
+    actual = state.calculate_coherence()
+    assert actual['status'] == expected['status']
+    assert actual['coherence'] == expected['coherence']
+    assert actual['beats_used'] == expected['beats_used']
+    assert actual['ratio'] == pytest.approx(expected['ratio'], rel=1e-9)
+
+    expected_status = calculator.get_buffer_status()
+    actual_status = state.get_buffer_status()
+    assert actual_status['beats_in_buffer'] == expected_status['beats_in_buffer']
+    assert actual_status['mean_heart_rate'] == pytest.approx(expected_status['mean_heart_rate'], rel=1e-9)
+    assert actual_status['buffer_duration_seconds'] == pytest.approx(
+        expected_status['buffer_duration_seconds'], abs=1e-3)
+
+
+def test_store_matches_calculators():
+    config = make_config()
+    store = SubjectStore(config, initial_subjects=2)  # forces growth
+    calculators = {}
+
+    for subject in range(5):
+        subject_id = f"subject-{subject}"
+        state = store.add_subject(subject_id)
+        calculators[subject_id] = CoherenceCalculator(config)
+        for rr, t in beats(150 + 20 * subject, seed=subject):
+            state.add_rr_interval(rr, timestamp=t)
+            calculators[subject_id].add_rr_interval(rr, timestamp=t)
+
+    assert len(store) == 5
+    for subject_id, calculator in calculators.items():
+        assert_matches(calculator, store.get(subject_id))
+
+
+def test_invalid_intervals_rejected():
+    store = SubjectStore(make_config())
+    state = store.add_subject('a')
+    for rr in (250.0, 2500.0, float('nan'), float('inf')):
+        state.add_rr_interval(rr, timestamp=1.0)
+    assert len(state) == 0
+    assert state.version == 0
+
+
+def test_memoized_per_version():
+    store = SubjectStore(make_config())
+    state = store.add_subject('a')
+    for rr, t in beats(80, seed=1):
+        state.add_rr_interval(rr, timestamp=t)
+
+    state.calculate_coherence()
+    cached = state._coherence_cache
+    state.calculate_coherence()
+    assert state._coherence_cache is cached
+
+    state.add_rr_interval(900.0, timestamp=t + 0.9)
+    state.calculate_coherence()
+    assert state._coherence_cache is not cached
+
+
+def test_full_ring_drops_oldest_beat():
+    # 10 s window at 200 bpm: 35 slots; 300 ms beats arrive every 0.1 s
+    store = SubjectStore(make_config(window_duration=10))
+    state = store.add_subject('a')
+    for i in range(100):
+        state.add_rr_interval(300.0 + i, timestamp=i * 0.1)
+
+    assert len(state) == store.ring_capacity
+    np.testing.assert_array_equal(state.rr_intervals(), 300.0 + np.arange(100 - store.ring_capacity, 100))
+    assert state.rr_sum == pytest.approx(state.rr_intervals().sum())
+
+
+def test_removed_rows_are_reused_empty():
+    store = SubjectStore(make_config())
+    a = store.add_subject('a')
+    for rr, t in beats(50, seed=2):
+        a.add_rr_interval(rr, timestamp=t)
+
+    store.remove_subject('a')
+    b = store.add_subject('b')
+    assert 'a' not in store
+    assert b.index == a.index
+    assert len(b) == 0
+    assert b.calculate_coherence()['status'] == 'insufficient_data'
+
+
+def test_timestamps_survive_rebase():
+    store = SubjectStore(make_config())
+    state = store.add_subject('a')
+    start = 1.7e9
+    for rr, t in beats(60, seed=3, start=start):
+        state.add_rr_interval(rr, timestamp=t)
+    state.add_rr_interval(900.0, timestamp=t + store.REBASE_AFTER + 1)
+
+    assert store.epoch == pytest.approx(t + store.REBASE_AFTER + 1)
+    assert len(state) == 1
+    assert state.timestamps()[-1] == pytest.approx(t + store.REBASE_AFTER + 1, abs=1e-3)
+
+
+def test_reconfigure_resizes_rings():
+    config = make_config()
+    store = SubjectStore(config)
+    calculator = CoherenceCalculator(config)
+    state = store.add_subject('a')
+    for rr, t in beats(100, seed=4):
+        state.add_rr_interval(rr, timestamp=t)
+        calculator.add_rr_interval(rr, timestamp=t)
+
+    new_config = make_config(window_duration=45)
+    version = state.version
+    assert store.reconfigure(new_config) == ['window_duration']
+    calculator.reconfigure(new_config)
+
+    assert state.version > version
+    assert store.ring_capacity == 151
+    assert_matches(calculator, state)
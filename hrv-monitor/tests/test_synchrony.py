@@ -0,0 +1,124 @@
+"""
+Tests: group synchrony engine (chance correction, lag recovery)
+
+Run with: python -m pytest tests/test_synchrony.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+import yaml
+from scipy.signal import lfilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from synchrony import SynchronyEngine, resample_to_common_time_base  # noqa: E402
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'default.yaml')
+
+
+def make_engine(**overrides) -> SynchronyEngine:
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)['synchrony']
+    config.update(seed=0, **overrides)
+    return SynchronyEngine(config)
+
+
+def heart_rate(rng, samples: int, rate: float = 4.0) -> np.ndarray:
+    """Heart rate with a 0.1 Hz breathing rhythm over AR(1) variability (bpm)."""
+    t = np.arange(samples) / rate
+    return 70 + 4 * np.sin(2 * np.pi * 0.1 * t + rng.uniform(0, 2 * np.pi)) \
+        + lfilter([1.0], [1.0, -0.9], rng.normal(0, 0.5, samples))
+
+
+@pytest.mark.parametrize('kind', ['random_walk', 'breathing'])
+def test_independent_subjects_score_near_zero(kind):
+    engine = make_engine()
+    rng = np.random.default_rng(1)
+    n = engine.n_samples
+    if kind == 'random_walk':
+        signals = 70 + np.cumsum(rng.normal(0, 1, (30, n)), axis=1)
+    else:
+        signals = np.stack([heart_rate(rng, n) for _ in range(30)])
+
+    result = engine.compute(signals)
+
+    assert result['status'] == 'valid'
+    # Raw metrics sit well above zero at chance, and the surrogates find that level
+    assert result['room_xcorr'] > 0.2 and result['room_coherence'] > 0.25
+    assert result['chance_xcorr'] == pytest.approx(result['room_xcorr'], abs=0.05)
+    assert result['chance_coherence'] == pytest.approx(result['room_coherence'], abs=0.05)
+    assert result['room_score'] <= 5
+    assert result['connectedness'].max() < 0.15
+
+
+def test_lagged_copy_recovers_the_lag_and_scores_high():
+    engine = make_engine()
+    rng = np.random.default_rng(2)
+    n, shift = engine.n_samples, 8  # 2 s at 4 Hz
+    leader = heart_rate(rng, n + shift)
+    signals = np.stack([
+        leader[shift:],                                    # leads
+        leader[:-shift] + rng.normal(0, 0.3, n),           # follows 2 s later
+        heart_rate(rng, n),                                # unrelated
+    ])
+
+    result = engine.compute(signals)
+
+    assert result['lag'][0, 1] == pytest.approx(2.0)
+    assert result['lag'][1, 0] == pytest.approx(-2.0)
+    assert result['xcorr'][0, 1] > 0.9 and result['coherence'][0, 1] > 0.9
+    # Same-tempo breathing alone correlates strongly within ±max_lag, so the
+    # unrelated subject's raw xcorr is high too; only the excess counts
+    assert result['xcorr'][0, 2] > 0.8
+    assert result['pair_synchrony'][0, 1] > 0.7
+    assert result['pair_synchrony'][0, 2] < 0.3 and result['pair_synchrony'][1, 2] < 0.3
+    assert result['connectedness'][2] < min(result['connectedness'][:2])
+
+    # The pair alone is clearly synchronized
+    pair = engine.compute(signals[:2])
+    assert pair['room_score'] > 70
+
+
+def test_surrogates_disabled_reports_raw_metrics_and_invalid_subjects_are_skipped():
+    engine = make_engine(surrogates=0)
+    rng = np.random.default_rng(3)
+    signals = np.stack([heart_rate(rng, engine.n_samples) for _ in range(3)])
+
+    result = engine.compute(signals, valid=[True, False, True])
+    assert result['subjects'].tolist() == [0, 2]
+    assert result['chance_xcorr'] == 0.0
+    expected = 0.5 * (result['xcorr'][0, 1] + result['coherence'][0, 1])
+    assert result['room_index'] == pytest.approx(max(expected, 0.0))
+
+    assert engine.compute(signals, valid=[True, False, False])['status'] == 'insufficient_data'
+
+
+def test_resampling_marks_subjects_without_coverage_invalid():
+    beats = [
+        (np.arange(0, 61, 1.0), np.full(61, 1000.0)),   # 60 bpm throughout
+        (np.arange(30, 61, 0.5), np.full(62, 500.0)),   # starts late
+        (np.arange(0, 50, 1.0), np.full(50, 1000.0)),   # stopped 10 s ago
+    ]
+    signals, valid = resample_to_common_time_base(beats, end_time=60.0, duration=60, rate=4)
+
+    assert signals.shape == (3, 240)
+    assert valid.tolist() == [True, False, False]
+    np.testing.assert_allclose(signals[0], 60.0)
+
+
+def test_resampling_drops_beats_that_do_not_advance_in_time():
+    times = np.arange(0, 61, 1.0)
+    rr_intervals = np.full(61, 1000.0)
+    times[[20, 21]] = times[19]     # batch stamped with one arrival time
+    times[40] = times[38]           # out of order
+    rr_intervals[[20, 21, 40]] = 500.0
+    signals, valid = resample_to_common_time_base(
+        [(times, rr_intervals)], end_time=60.0, duration=60, rate=4
+    )
+
+    assert valid.tolist() == [True]
+    np.testing.assert_allclose(signals[0], 60.0)